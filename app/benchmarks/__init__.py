@@ -0,0 +1,67 @@
+import os
+import timeit
+
+DUMMY_ENVIRONMENTS = {
+    'ORION_ENDPOINT': 'http://orion:1026',
+    'FIWARE_SERVICE': 'benchmark',
+    'DELIVERY_ROBOT_SERVICEPATH': '/robot',
+    'DELIVERY_ROBOT_TYPE': 'delivery_robot',
+    'DELIVERY_ROBOT_LIST': '["robot_01", "robot_02"]',
+    'ROBOT_UI_SERVICEPATH': '/robot_ui',
+    'ROBOT_UI_TYPE': 'robot_ui',
+    'ID_TABLE': '{"robot_01": "ui_01", "robot_02": "ui_02"}',
+    'TOKEN_SERVICEPATH': '/token',
+    'TOKEN_TYPE': 'token',
+    'MONGODB_HOST': 'localhost',
+    'MONGODB_PORT': '27017',
+    'MONGODB_REPLICASET': 'rs0',
+    'MONGODB_DB_NAME': 'benchmark',
+    'MONGODB_COLLECTION_NAME': 'benchmark',
+}
+
+for key, value in DUMMY_ENVIRONMENTS.items():
+    os.environ.setdefault(key, value)
+
+
+def measure(label, stmt, number=100, repeat=5):
+    best = min(timeit.repeat(stmt, number=number, repeat=repeat)) / number
+    print(f'{label:<48} {best * 1000:10.3f} msec/op')
+    return best
+
+
+def make_place_entities(num):
+    return [{
+        'id': f'place_{i:04d}',
+        'type': 'place',
+        'name': {'type': 'string', 'value': f'棚_{i:04d}', 'metadata': {}},
+        'pose': {
+            'type': 'object',
+            'value': {
+                'point': {'x': i * 0.25, 'y': -i * 0.5, 'z': 0.0},
+                'angle': {'roll': 0.0, 'pitch': 0.0, 'yaw': (i % 360) * 0.0174533},
+            },
+            'metadata': {'TimeInstant': {'type': 'datetime', 'value': '2020-01-02T03:04:05.678+09:00'}},
+        },
+    } for i in range(num)]
+
+
+def make_route_plan_entities(num, num_routes=5, num_via=20):
+    return [{
+        'id': f'route_plan_{i:04d}',
+        'type': 'route_plan',
+        'source': {'type': 'string', 'value': 'place_0000', 'metadata': {}},
+        'destination': {'type': 'string', 'value': f'place_{i:04d}', 'metadata': {}},
+        'via': {'type': 'string', 'value': f'place_{i + 1:04d}', 'metadata': {}},
+        'robot_id': {'type': 'string', 'value': 'robot_01', 'metadata': {}},
+        'routes': {
+            'type': 'array',
+            'value': [{
+                'from': f'place_{r:04d}',
+                'via': [f'place_{r * num_via + v:04d}' for v in range(num_via)],
+                'to': f'place_{r + 1:04d}',
+                'destination': f'place_{i:04d}',
+                'action': {'func': '', 'token': '', 'waiting_route': {}},
+            } for r in range(num_routes)],
+            'metadata': {},
+        },
+    } for i in range(num)]
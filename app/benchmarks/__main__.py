@@ -0,0 +1,6 @@
+from benchmarks import (bench_json, bench_flatten, bench_route_metrics, bench_orion_command, bench_waypoints, bench_startup,
+                        bench_gevent)
+
+for bench in [bench_json, bench_flatten, bench_route_metrics, bench_orion_command, bench_waypoints, bench_startup,
+              bench_gevent]:
+    bench.run()
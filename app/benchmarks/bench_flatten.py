@@ -0,0 +1,22 @@
+from benchmarks import measure, make_route_plan_entities
+from src.utils import flatten, iter_flatten
+
+
+def recursive_flatten(x):
+    return [z for y in x for z in (recursive_flatten(y) if hasattr(y, '__iter__') and not isinstance(y, str) else (y,))]
+
+
+def run():
+    for num_routes, num_via in [(5, 20), (10, 200), (10, 1000)]:
+        routes = make_route_plan_entities(1, num_routes=num_routes, num_via=num_via)[0]['routes']['value']
+        print(f'## place ids of {num_routes} routes x {num_via} via points')
+        measure('recursive flatten (nested lists)', lambda: set(recursive_flatten(
+            [recursive_flatten([r['from'], r['via'], r['to'], r['destination']]) for r in routes])))
+        measure('flatten (nested lists)', lambda: set(flatten(
+            [flatten([r['from'], r['via'], r['to'], r['destination']]) for r in routes])))
+        measure('iter_flatten (generator)', lambda: set(iter_flatten(
+            (r['from'], r['via'], r['to'], r['destination']) for r in routes)))
+
+
+if __name__ == '__main__':
+    run()
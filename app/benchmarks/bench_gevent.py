@@ -0,0 +1,156 @@
+import os
+import subprocess
+import sys
+import time
+from importlib.util import find_spec
+from urllib.parse import parse_qs
+
+CONCURRENCY = 1000
+UI_POLL_INTERVAL_MSEC = 100
+PENDING_POLLS = 5
+WAIT_MSEC = 5000
+ORION_PORT = 18026
+
+
+def fake_orion():
+    from src import json_backend
+
+    polls = {}
+
+    def app(environ, start_response):
+        method = environ['REQUEST_METHOD']
+        path = environ['PATH_INFO'].rstrip('/').split('/')
+        params = parse_qs(environ.get('QUERY_STRING', ''))
+        attrs = params.get('attrs', [''])[0].split(',')
+        if method == 'PATCH':
+            polls[path[3]] = 0
+            start_response('204 No Content', [])
+            return [b'']
+        if method == 'POST':
+            start_response('204 No Content', [])
+            return [b'']
+
+        entity_id = path[3]
+        if 'send_cmd_status' in attrs:
+            polls[entity_id] = polls.get(entity_id, 0) + 1
+            body = {
+                'send_cmd_status': 'OK' if polls[entity_id] > PENDING_POLLS else 'PENDING',
+                'send_cmd_info': {'result': 'ack'},
+            }
+        elif 'keyValues' in params.get('options', [''])[0]:
+            body = {
+                'mode': 'standby',
+                'remaining_waypoints_list': [{'to': 'place_a', 'destination': 'place_a', 'waypoints': []}],
+            }
+        else:
+            body = {'id': entity_id, 'type': 'delivery_robot', 'mode': {'type': 'string', 'value': 'standby', 'metadata': {}}}
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        return [json_backend.dumps(body).encode('utf-8')]
+
+    return app
+
+
+class FakeCollection:
+
+    def find_one(self, *args, **kwargs):
+        return None
+
+    def find_one_and_update(self, *args, **kwargs):
+        return None
+
+    def update_one(self, *args, **kwargs):
+        return None
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def serve_orion(port):
+    from gevent import monkey
+    monkey.patch_all()
+
+    from gevent.pywsgi import WSGIServer
+    WSGIServer(('127.0.0.1', port), fake_orion(), log=None, backlog=CONCURRENCY * 2).serve_forever()
+
+
+def load(port):
+    from gevent import monkey
+    monkey.patch_all()
+
+    import logging
+    import gevent
+
+    os.environ['ORION_ENDPOINT'] = f'http://127.0.0.1:{port}'
+    os.environ['MOVENEXT_WAIT_MSEC'] = str(WAIT_MSEC)
+    os.environ['MOVENEXT_WAIT_MAX_NUM'] = str(PENDING_POLLS + 1)
+
+    import main
+    from src.robot_actor import RobotActor
+    from src.route_store import RouteStore
+    logging.disable(logging.INFO)
+
+    # PATCH /nexts/ takes the robot lease and reads the stored route from MongoDB; measure without a server
+    RobotActor._collection = FakeCollection()
+    RouteStore._collection = FakeCollection()
+
+    def move(i):
+        response = main.app.test_client().patch(f'/api/v1/robots/robot_{i:04d}/nexts/')
+        assert response.status_code == 200, response.data
+
+    def poll(i):
+        start = time.monotonic()
+        response = main.app.test_client().get(f'/api/v1/robots/ui_{i:04d}/')
+        assert response.status_code == 200, response.data
+        return time.monotonic() - start
+
+    start = time.monotonic()
+    move(-1)
+    single = time.monotonic() - start
+
+    start = time.monotonic()
+    moves = []
+    for i in range(CONCURRENCY):
+        moves.append(gevent.spawn(move, i))
+        gevent.sleep(WAIT_MSEC / 1000.0 / CONCURRENCY)
+    in_flight = sum(not m.ready() for m in moves)
+    latencies = []
+    while not all(m.ready() for m in moves):
+        latencies.append(poll(len(latencies)))
+        gevent.sleep(UI_POLL_INTERVAL_MSEC / 1000.0)
+    gevent.joinall(moves, raise_error=True)
+    elapsed = time.monotonic() - start
+
+    print(f'{"single move_robot wait":<48} {single * 1000:10.3f} msec')
+    print(f'{f"{CONCURRENCY} concurrent move_robot waits":<48} {elapsed * 1000:10.3f} msec')
+    print(f'{"max in-flight move_robot waits":<48} {in_flight:10d}')
+    print(f'{"ui polling p50 while waiting":<48} {percentile(latencies, 0.5) * 1000:10.3f} msec')
+    print(f'{"ui polling p99 while waiting":<48} {percentile(latencies, 0.99) * 1000:10.3f} msec')
+    if percentile(latencies, 0.99) >= single:
+        raise SystemExit('head-of-line blocking, ui polling waited for move_robot')
+
+
+def run():
+    print('# gevent')
+    if find_spec('gevent') is None:
+        print('gevent is not installed, skipped')
+        return
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    port = str(ORION_PORT)
+    orion = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_gevent', 'orion', port], env=os.environ, cwd=cwd)
+    try:
+        time.sleep(1)
+        subprocess.run([sys.executable, '-m', 'benchmarks.bench_gevent', 'load', port], check=True, env=os.environ, cwd=cwd)
+    finally:
+        orion.terminate()
+        orion.wait()
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['orion']:
+        serve_orion(int(sys.argv[2]))
+    elif sys.argv[1:2] == ['load']:
+        load(int(sys.argv[2]))
+    else:
+        run()
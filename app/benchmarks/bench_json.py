@@ -0,0 +1,20 @@
+import json
+
+from benchmarks import measure, make_place_entities, make_route_plan_entities
+from src import json_backend
+
+
+def run():
+    print(f'# json backend: {json_backend.backend.name}')
+    for label, entities in [('1000 place entities', make_place_entities(1000)),
+                            ('100 route_plan entities', make_route_plan_entities(100))]:
+        raw = json.dumps(entities).encode('utf-8')
+        print(f'## {label} ({len(raw)} bytes)')
+        measure('stdlib json.loads', lambda: json.loads(raw))
+        measure(f'{json_backend.backend.name} loads', lambda: json_backend.loads(raw))
+        measure('stdlib json.dumps', lambda: json.dumps(entities, ensure_ascii=False, separators=(',', ':')))
+        measure(f'{json_backend.backend.name} dumps', lambda: json_backend.dumps(entities))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,86 @@
+import datetime
+
+from benchmarks import measure
+from src import const, json_backend, orion
+from src.caller import Caller
+
+
+def legacy_make_delivery_robot_command(cmd, cmd_waypoints, navigating_waypoints,
+                                       remaining_waypoints_list=None, current_routes=None, order=None, caller=None):
+    t = datetime.datetime.now(orion.get_timezone()).isoformat(timespec='milliseconds')
+    payload = {
+        'send_cmd': {'value': {'time': t, 'cmd': cmd, 'waypoints': cmd_waypoints}},
+        'navigating_waypoints': {'type': 'object', 'value': navigating_waypoints,
+                                 'metadata': {'TimeInstant': {'type': 'datetime', 'value': t}}},
+    }
+    if remaining_waypoints_list is not None:
+        payload['remaining_waypoints_list'] = {'type': 'array', 'value': remaining_waypoints_list,
+                                               'metadata': {'TimeInstant': {'type': 'datetime', 'value': t}}}
+    if current_routes is not None:
+        payload['current_routes'] = {'type': 'array', 'value': current_routes,
+                                     'metadata': {'TimeInstant': {'type': 'datetime', 'value': t}}}
+    if order is not None:
+        payload['order'] = {'type': 'object', 'value': order,
+                            'metadata': {'TimeInstant': {'type': 'datetime', 'value': t}}}
+    if caller is not None:
+        payload['caller'] = {'type': 'string', 'value': caller.value,
+                             'metadata': {'TimeInstant': {'type': 'datetime', 'value': t}}}
+    return payload
+
+
+def legacy_send_state(next_state, destination):
+    t = datetime.datetime.now(orion.get_timezone()).isoformat(timespec='milliseconds')
+    state = {'current_state': {'type': 'string', 'value': next_state,
+                               'metadata': {'TimeInstant': {'type': 'datetime', 'value': t}}}}
+    t = datetime.datetime.now(orion.get_timezone()).isoformat(timespec='milliseconds')
+    sendstate = {'send_state': {'value': {'time': t, 'state': next_state, 'destination': destination}}}
+    return state, sendstate
+
+
+def send_state(next_state, destination):
+    with orion.unit_of_work():
+        return orion.make_updatestate_command(next_state), orion.make_robotui_sendstate_command(next_state, destination)
+
+
+def make_waypoints(num):
+    return [{
+        'point': {'x': i * 0.25, 'y': -i * 0.5, 'z': 0.0},
+        'angle': {'roll': 0.0, 'pitch': 0.0, 'yaw': (i % 360) * 0.0174533},
+    } for i in range(num)]
+
+
+def run():
+    print(f'# orion command builders: timezone={const.TIMEZONE}, json backend={json_backend.backend.name}')
+    for num_waypoints, num_steps in [(20, 5), (200, 30), (2000, 30)]:
+        waypoints = make_waypoints(num_waypoints)
+        navigating_waypoints = {'to': 'place_0001', 'destination': 'place_0002', 'waypoints': waypoints}
+        remaining_waypoints_list = [dict(navigating_waypoints) for _ in range(num_steps)]
+        args = ('navi', waypoints, navigating_waypoints, remaining_waypoints_list, [], {'metrics': {}}, Caller.ORDERING)
+        print(f'## delivery robot command, {num_waypoints} waypoints x {num_steps} steps')
+        measure('legacy make_delivery_robot_command', lambda: legacy_make_delivery_robot_command(*args), number=1000)
+        measure('make_delivery_robot_command', lambda: orion.make_delivery_robot_command(*args), number=1000)
+        measure('legacy build + dumps', lambda: json_backend.dumps(legacy_make_delivery_robot_command(*args)), number=20)
+        measure('build + dumps', lambda: json_backend.dumps(orion.make_delivery_robot_command(*args)), number=20)
+    for num_waypoints, num_steps in [(20, 30), (200, 30)]:
+        route = [{'to': f'place_{i:04d}', 'destination': 'place_9999', 'action': {},
+                  'waypoints': make_waypoints(num_waypoints)} for i in range(num_steps)]
+        legacy = sum(len(json_backend.dumps(orion.make_delivery_robot_command(
+            'navi', head['waypoints'], head, route[i + 1:]))) for i, head in enumerate(route))
+        cursor = len(json_backend.dumps(orion.make_delivery_robot_command(
+            'navi', route[0]['waypoints'], route[0], route[1:]))) + sum(len(json_backend.dumps(
+                orion.make_delivery_robot_command('navi', head['waypoints'], head))) for head in route[1:]) + sum(
+            len(json_backend.dumps(orion.make_route_cursor_command(i))) for i in range(num_steps))
+        print(f'## bytes written to orion over a route of {num_steps} steps x {num_waypoints} waypoints')
+        print(f'{"remaining_waypoints_list tail per step":<48} {legacy:10d} bytes')
+        print(f'{"route_cursor per step":<48} {cursor:10d} bytes')
+    print('## robot state and robot ui state in a unit of work')
+    measure('legacy (2 timestamps)', lambda: legacy_send_state('moving', 'place_0001'), number=1000)
+    measure('unit_of_work (1 timestamp)', lambda: send_state('moving', 'place_0001'), number=1000)
+    print('## emergency command body')
+    measure('make_emergency_command + dumps', lambda: json_backend.dumps(orion.make_emergency_command('stop')).encode('utf-8'),
+            number=1000)
+    measure('make_emergency_command_body (template)', lambda: orion.make_emergency_command_body('stop'), number=1000)
+
+
+if __name__ == '__main__':
+    run()
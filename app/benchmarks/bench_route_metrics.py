@@ -0,0 +1,25 @@
+from benchmarks import measure
+from src import route_metrics
+
+
+def make_routes(num_routes, num_via):
+    places = {f'place_{i:05d}': {'point': {'x': i * 0.25, 'y': -i * 0.5, 'z': 0.0}}
+              for i in range(num_routes * (num_via + 1) + 1)}
+    routes = [{
+        'from': f'place_{r * (num_via + 1):05d}',
+        'via': [f'place_{r * (num_via + 1) + v + 1:05d}' for v in range(num_via)],
+        'to': f'place_{(r + 1) * (num_via + 1):05d}',
+    } for r in range(num_routes)]
+    return routes, places
+
+
+def run():
+    print(f'# route metrics: {"numpy" if route_metrics.numpy is not None else "pure python"}')
+    for num_routes, num_via in [(5, 20), (10, 500), (5, 2000)]:
+        routes, places = make_routes(num_routes, num_via)
+        label = f'{num_routes} routes x {num_via + 2} waypoints'
+        measure(label, lambda: route_metrics.measure(routes, places), number=20)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+import timeit
+
+from benchmarks import measure
+from src import const
+from src.config import Config
+
+READY = 'import main; main.app.test_client()'
+
+
+def spawn(stmt):
+    subprocess.run([sys.executable, '-c', stmt], check=True, env=os.environ,
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run():
+    print('# startup')
+    measure('parse and validate environment variables', lambda: Config(os.environ), number=1000)
+    measure('load const (first access after reset)', lambda: (const.reset(), const.ORION_ENDPOINT), number=1000)
+    interpreter = min(timeit.repeat(lambda: spawn('pass'), number=1, repeat=5))
+    ready = min(timeit.repeat(lambda: spawn(READY), number=1, repeat=5))
+    print(f'{"spawn interpreter":<48} {interpreter * 1000:10.3f} msec/op')
+    print(f'{"spawn to ready (import main, create app)":<48} {ready * 1000:10.3f} msec/op')
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,59 @@
+import gc
+import tracemalloc
+
+from benchmarks import measure
+from src.waypoint_array import WaypointArray
+
+
+def make_places(num):
+    return {f'place_{i:05d}': {
+        'point': {'x': i * 0.25, 'y': -i * 0.5, 'z': 0.0},
+        'angle': {'roll': 0.0, 'pitch': 0.0, 'yaw': (i % 360) * 0.0174533},
+    } for i in range(num)}
+
+
+def make_waypoints_list(places, num_routes, num_via):
+    place_ids = list(places)
+    waypoints_list = []
+    for r in range(num_routes):
+        via = [places[place_ids[(r * num_via + v) % len(place_ids)]] for v in range(num_via)]
+        to = places[place_ids[(r + 1) * num_via % len(place_ids)]]
+        waypoints_list.append([{'point': p['point'], 'angle': None} for p in via]
+                              + [{'point': to['point'], 'angle': to['angle']}])
+    return waypoints_list
+
+
+def allocated(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def run():
+    print('# cached waypoints: list of dicts vs WaypointArray')
+    for num_plans, num_routes, num_via in [(100, 5, 20), (1000, 5, 20), (100, 10, 500)]:
+        places = make_places(num_routes * num_via + 1)
+        label = f'{num_plans} plans x {num_routes} routes x {num_via + 1} waypoints'
+
+        def dicts():
+            return [make_waypoints_list(places, num_routes, num_via) for _ in range(num_plans)]
+
+        def packed():
+            return [[WaypointArray.pack(w) for w in make_waypoints_list(places, num_routes, num_via)]
+                    for _ in range(num_plans)]
+
+        print(f'{label:<48} {allocated(dicts) / 1000000:7.2f} MB -> {allocated(packed) / 1000000:7.2f} MB')
+
+    waypoints = make_waypoints_list(make_places(501), 1, 500)[0]
+    packed = WaypointArray.pack(waypoints)
+    measure('pack 501 waypoints', lambda: WaypointArray.pack(waypoints), number=100)
+    measure('to_list 501 waypoints', lambda: packed.to_list(), number=100)
+
+
+if __name__ == '__main__':
+    run()
@@ -7,7 +7,7 @@ from logging import getLogger
 from flask import Flask
 from flask_cors import CORS
 
-from src import api, const, errors
+from src import api, const, errors, json_backend, warmup
 
 
 try:
@@ -22,24 +22,44 @@ except FileNotFoundError:
     print(f'can not open {const.LOGGING_JSON}')
     pass
 
+const.load()
+
 app = Flask(__name__)
+app.json_encoder = json_backend.JSONEncoder
+app.json_decoder = json_backend.JSONDecoder
 if const.CORS_ORIGINS:
     CORS(app, resources={r'/*': {'origins': const.CORS_ORIGINS}})
 app.config.from_pyfile('config.cfg')
 
 shipment_api_view = api.ShipmentAPI.as_view(api.ShipmentAPI.NAME)
+shipment_status_api_view = api.ShipmentStatusAPI.as_view(api.ShipmentStatusAPI.NAME)
+robot_list_api_view = api.RobotListAPI.as_view(api.RobotListAPI.NAME)
 robot_state_api_view = api.RobotStateAPI.as_view(api.RobotStateAPI.NAME)
+robot_state_stream_api_view = api.RobotStateStreamAPI.as_view(api.RobotStateStreamAPI.NAME)
 movenext_api_view = api.MoveNextAPI.as_view(api.MoveNextAPI.NAME)
 emergency_api_view = api.EmergencyAPI.as_view(api.EmergencyAPI.NAME)
+emergency_all_api_view = api.EmergencyAllAPI.as_view(api.EmergencyAllAPI.NAME)
+metrics_api_view = api.MetricsAPI.as_view(api.MetricsAPI.NAME)
 robot_notification_api_view = api.RobotNotificationAPI.as_view(api.RobotNotificationAPI.NAME)
+robot_cache_notification_api_view = api.RobotCacheNotificationAPI.as_view(api.RobotCacheNotificationAPI.NAME)
 app.add_url_rule('/api/v1/shipments/', view_func=shipment_api_view, methods=['POST', ])
+app.add_url_rule('/api/v1/shipments/<ticket_id>/', view_func=shipment_status_api_view, methods=['GET', ])
+app.add_url_rule('/api/v1/robots/', view_func=robot_list_api_view, methods=['GET', ])
 app.add_url_rule('/api/v1/robots/<robot_id>/', view_func=robot_state_api_view, methods=['GET', ])
+app.add_url_rule('/api/v1/robots/<robot_id>/streams/', view_func=robot_state_stream_api_view, methods=['GET', ])
 app.add_url_rule('/api/v1/robots/<robot_id>/nexts/', view_func=movenext_api_view, methods=['PATCH', ])
 app.add_url_rule('/api/v1/robots/<robot_id>/emergencies/', view_func=emergency_api_view, methods=['PATCH', ])
+app.add_url_rule('/api/v1/robots/emergencies/', view_func=emergency_all_api_view, methods=['PATCH', ])
 app.add_url_rule('/api/v1/robots/notifications/', view_func=robot_notification_api_view, methods=['POST', ])
+app.add_url_rule('/api/v1/robots/notifications/caches/', view_func=robot_cache_notification_api_view, methods=['POST', ])
+app.add_url_rule('/api/v1/metrics/', view_func=metrics_api_view, methods=['GET', ])
+app.add_url_rule('/api/v1/metrics/emergencies/', view_func=metrics_api_view, methods=['GET', ])
 
 app.register_blueprint(errors.app)
 
+warmup.prefork()
+api.prefork()
+
 
 if __name__ == '__main__':
     default_port = app.config['DEFAULT_PORT']
@@ -1,23 +1,43 @@
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep, monotonic
 from logging import getLogger
+from threading import Lock
 
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request, stream_with_context, url_for
 from flask.views import MethodView
 
 import dateutil.parser
+from pymongo.errors import ConnectionFailure
+from werkzeug.exceptions import HTTPException
 
-from src import const, orion
+from src import const, orion, json_backend, warmup
 from src.waypoint import Waypoint
 from src.token import Token, TokenMode
 from src.caller import Caller
-from src.utils import flatten
+from src.command_log import CommandLog
+from src.metrics import Latency
+from src.utils import make_etag
 from src.mongo_lock import MongoThrottling, MongoLockError
+from src.robot_actor import RobotActor
+from src.robot_cache import RobotCache
+from src.robot_state import derive_state
+from src.route_store import RouteStore
+from src.shipment_queue import ShipmentQueue
+
+try:
+    import uwsgi
+except ImportError:
+    uwsgi = None
 
 logger = getLogger(__name__)
 
+RETRYABLE_DISPATCH_CODES = (423, 503)
+
 
 class CommonMixin:
     _waypoint = None
+    _orion_executor = None
+    _lock = Lock()
 
     @classmethod
     def waypoint(cls):
@@ -26,6 +46,15 @@ class CommonMixin:
             logger.debug('waypoint created')
         return cls._waypoint
 
+    @staticmethod
+    def orion_executor():
+        if CommonMixin._orion_executor is None:
+            with CommonMixin._lock:
+                if CommonMixin._orion_executor is None:
+                    CommonMixin._orion_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='orion')
+                    logger.debug('orion executor created')
+        return CommonMixin._orion_executor
+
     def check_mode(self, robot_id):
         if self.__check_navi(robot_id):
             abort(423, {
@@ -33,35 +62,126 @@ class CommonMixin:
                 'id': robot_id,
             })
 
-    def __check_navi(self, robot_id):
-        current_mode = orion.get_entity(
+    def get_robot_entity(self, robot_id, attrs):
+        return orion.get_entity(
             const.FIWARE_SERVICE,
             const.DELIVERY_ROBOT_SERVICEPATH,
             const.DELIVERY_ROBOT_TYPE,
-            robot_id)['mode']['value']
+            robot_id,
+            attrs=attrs,
+            key_values=True)
+
+    def __check_navi(self, robot_id):
+        current_mode = self.get_robot_entity(robot_id, ['mode'])['mode']
 
         return current_mode == const.MODE_NAVI
 
-    def check_working(self, robot_id):
-        remaining_waypoints_list = self.get_remaining_waypoints_list(robot_id)
+    def check_working(self, robot_id, remaining_waypoints_list=None):
+        if remaining_waypoints_list is None:
+            remaining_waypoints_list = self.get_remaining_waypoints_list(robot_id)
         return isinstance(remaining_waypoints_list, list) and len(remaining_waypoints_list) != 0
 
     def get_remaining_waypoints_list(self, robot_id):
-        return orion.get_entity(
+        remaining_waypoints_list = RouteStore.get(robot_id)
+        if remaining_waypoints_list is not None:
+            return remaining_waypoints_list
+
+        remaining_waypoints_list, route_cursor = self.get_route(robot_id)
+        if not isinstance(remaining_waypoints_list, list):
+            return remaining_waypoints_list
+        return remaining_waypoints_list[route_cursor:]
+
+    def get_route(self, robot_id):
+        robot_entity = self.get_robot_entity(robot_id, ['remaining_waypoints_list', 'route_cursor'])
+        route_cursor = robot_entity.get('route_cursor')
+        if not (isinstance(route_cursor, (int, float)) and not isinstance(route_cursor, bool) and route_cursor >= 0):
+            route_cursor = 0
+        return robot_entity['remaining_waypoints_list'], int(route_cursor)
+
+    def get_available_robots(self):
+        modes = {entity['id']: entity.get('mode') for entity in orion.iter_entities(
             const.FIWARE_SERVICE,
             const.DELIVERY_ROBOT_SERVICEPATH,
             const.DELIVERY_ROBOT_TYPE,
-            robot_id)['remaining_waypoints_list']['value']
-
-    def get_available_robot(self):
-        for robot_id in const.DELIVERY_ROBOT_LIST:
-            if robot_id and not (self.__check_navi(robot_id) or self.check_working(robot_id)):
-                return {
-                    'id': robot_id
-                }
-        abort(422, {
-            'message': f'no available robot',
-        })
+            attrs=['mode'],
+            key_values=True)}
+        robot_ids = [robot_id for robot_id in const.DELIVERY_ROBOT_LIST
+                     if robot_id in modes and modes[robot_id] != const.MODE_NAVI]
+        stored = RouteStore.get_all(robot_ids) if robot_ids else {}
+        return [{
+            'id': robot_id
+        } for robot_id in robot_ids if not self.check_working(robot_id, stored.get(robot_id))]
+
+    def dispatch_shipment(self, shipment_list, available_robots):
+        caller = Caller.get(shipment_list)
+
+        robot_ids = [available_robot['id'] for available_robot in available_robots]
+        while True:
+            robot_id, routes, waypoints_list, order = self.waypoint().estimate_best_routes(shipment_list, robot_ids)
+            if not(isinstance(waypoints_list, list) and len(waypoints_list) > 0):
+                return {'result': 'ignore',
+                        'message': 'no available waypoints_list'}
+
+            head, *tail = waypoints_list
+
+            with RobotActor.of(robot_id):
+                if not self.__check_navi(robot_id) and not self.check_working(robot_id):
+                    self.move_robot(robot_id, head['waypoints'], head, tail, routes, order, caller, 0)
+                    RouteStore.start(robot_id, tail)
+                    return {'result': 'success',
+                            'delivery_robot': {'id': robot_id},
+                            'order': order,
+                            'caller': caller.value}
+
+            logger.info(f'robot has been assigned by another request, robot_id={robot_id}')
+            robot_ids = [r for r in robot_ids if r != robot_id]
+            if not robot_ids:
+                abort(423, {
+                    'message': 'all available robots are busy now',
+                })
+
+    def dispatch_queued_shipments(self):
+        try:
+            return self._dispatch_shipments()
+        except Exception as e:
+            logger.warning(f'can not dispatch queued shipments, {type(e).__name__}: {e}')
+            return False
+
+    def _dispatch_shipments(self):
+        ShipmentQueue.requeue(const.SHIPMENT_DISPATCH_TIMEOUT_SEC)
+        acquired = False
+        dispatched_robot_ids = set()
+        while True:
+            ticket = ShipmentQueue.acquire()
+            if ticket is None:
+                return acquired
+            acquired = True
+            try:
+                available_robots = [available_robot for available_robot in self.get_available_robots()
+                                    if available_robot['id'] not in dispatched_robot_ids]
+                result = self.dispatch_shipment(ticket['shipment_list'], available_robots) if available_robots else None
+            except HTTPException as e:
+                if e.code in RETRYABLE_DISPATCH_CODES:
+                    logger.warning(f'can not dispatch shipment now, ticket_id={ticket["ticket_id"]}, {e}')
+                    ShipmentQueue.release(ticket['ticket_id'])
+                    return acquired
+                ShipmentQueue.fail(ticket['ticket_id'],
+                                   e.description['message'] if isinstance(e.description, dict) else str(e))
+                continue
+            except ConnectionFailure as e:
+                logger.warning(f'can not dispatch shipment now, ticket_id={ticket["ticket_id"]}, {e}')
+                ShipmentQueue.release(ticket['ticket_id'])
+                return acquired
+            except Exception as e:
+                logger.error(f'can not dispatch shipment, ticket_id={ticket["ticket_id"]}, {type(e).__name__}: {e}')
+                ShipmentQueue.fail(ticket['ticket_id'], str(e))
+                continue
+            if result is None:
+                ShipmentQueue.release(ticket['ticket_id'])
+                return acquired
+            ShipmentQueue.complete(ticket['ticket_id'], result)
+            if result.get('result') == 'success':
+                dispatched_robot_ids.add(result['delivery_robot']['id'])
 
     def get_state(self, robot_id):
         is_navi = self.__check_navi(robot_id)
@@ -72,39 +192,17 @@ class CommonMixin:
             return const.STATE_MOVING
         else:
             if not robot_entity:
-                robot_entity = orion.get_entity(
-                    const.FIWARE_SERVICE,
-                    const.DELIVERY_ROBOT_SERVICEPATH,
-                    const.DELIVERY_ROBOT_TYPE,
-                    robot_id)
-            navigating_waypoints = robot_entity['navigating_waypoints']['value']
-            order = robot_entity['order']['value']
-
-            if not (isinstance(navigating_waypoints, dict) and 'to' in navigating_waypoints and isinstance(order, dict)
-                    and 'source' in order and 'destination' in order and 'via' in order and isinstance(order['via'], list)):
-                return const.STATE_STANDBY
-            else:
-                to = navigating_waypoints['to']
-                if to == order['source']:
-                    return const.STATE_STANDBY
-                elif to == order['destination']:
-                    try:
-                        caller = Caller.value_of(robot_entity['caller']['value'])
-                        return const.STATE_DELIVERING if caller == Caller.ORDERING else const.STATE_PICKING
-                    except ValueError as e:
-                        logger.warning(f'unkown caller (estimate "state" as const.STATE_PICKING), {e}')
-                        return const.STATE_PICKING
-                elif to in order['via']:
-                    return const.STATE_PICKING
-                else:
-                    return const.STATE_MOVING
-
-    def get_destination_id(self, robot_id):
-        navigating_waypoints = orion.get_entity(
-            const.FIWARE_SERVICE,
-            const.DELIVERY_ROBOT_SERVICEPATH,
-            const.DELIVERY_ROBOT_TYPE,
-            robot_id)['navigating_waypoints']['value']
+                robot_entity = self.get_robot_entity(robot_id, ['navigating_waypoints', 'order', 'caller'])
+            try:
+                return derive_state(robot_entity['navigating_waypoints'], robot_entity['order'], lambda: robot_entity['caller'])
+            except ValueError as e:
+                logger.warning(f'unkown caller (estimate "state" as const.STATE_PICKING), {e}')
+                return const.STATE_PICKING
+
+    def get_destination_id(self, robot_id, robot_entity=None):
+        if not robot_entity:
+            robot_entity = self.get_robot_entity(robot_id, ['navigating_waypoints'])
+        navigating_waypoints = robot_entity['navigating_waypoints']
         if not isinstance(navigating_waypoints, dict) or 'destination' not in navigating_waypoints:
             return ''
         else:
@@ -119,14 +217,16 @@ class CommonMixin:
             const.FIWARE_SERVICE,
             const.DELIVERY_ROBOT_SERVICEPATH,
             const.PLACE_TYPE,
-            navigating_waypoints_to)
+            navigating_waypoints_to,
+            attrs=['name'],
+            key_values=True)
         if not isinstance(destination, dict) or 'name' not in destination:
             return ''
 
-        return destination['name']['value']
+        return destination['name']
 
     def move_robot(self, robot_id, cmd_waypoints, navigating_waypoints,
-                   remaining_waypoints_list=None, current_routes=None, order=None, caller=None):
+                   remaining_waypoints_list=None, current_routes=None, order=None, caller=None, route_cursor=None):
 
         def _move(cmd):
             payload = orion.make_delivery_robot_command(cmd, cmd_waypoints, navigating_waypoints,
@@ -142,12 +242,8 @@ class CommonMixin:
             cnt = 0
             while cnt < const.MOVENEXT_WAIT_MAX_NUM:
                 cnt += 1
-                robot_entity = orion.get_entity(
-                    const.FIWARE_SERVICE,
-                    const.DELIVERY_ROBOT_SERVICEPATH,
-                    const.DELIVERY_ROBOT_TYPE,
-                    robot_id)
-                if robot_entity['send_cmd_status']['value'] == 'OK':
+                robot_entity = self.get_robot_entity(robot_id, ['send_cmd_status', 'send_cmd_info'])
+                if robot_entity['send_cmd_status'] == 'OK':
                     break
                 sleep(const.MOVENEXT_WAIT_MSEC / 1000.0)
             else:
@@ -158,7 +254,7 @@ class CommonMixin:
                     'message': msg
                 })
 
-            cmd_info = robot_entity['send_cmd_info']['value']
+            cmd_info = robot_entity['send_cmd_info']
             if not (isinstance(cmd_info, dict) and 'result' in cmd_info):
                 msg = f'invalid send_cmd_info, {cmd_info}'
                 logger.error(msg)
@@ -173,35 +269,62 @@ class CommonMixin:
                 })
             return cmd_info['result']
 
-        result = _move('navi')
-        logger.info(f'send "navi" command to robot({robot_id}), result={result}')
-        if result == 'ignore':
-            result2 = _move('refresh')
-            logger.info(f'send "refresh" command to robot({robot_id}), result={result2}')
-            if result2 != 'ack':
-                msg = f'cannot move robot({robot_id}) to "{navigating_waypoints["to"]}" using "navi" and "refresh", ' \
-                    f'navi result={result} refresh result={result2}'
-                logger.error(msg)
-                abort(500, {
-                    'message': msg,
-                })
-
-        logger.info(f'move robot({robot_id}) to "{navigating_waypoints["to"]}" (waypoints={navigating_waypoints["waypoints"]}, '
-                    f'order={order}, caller={caller}')
+        with RobotActor.of(robot_id):
+            result = _move('navi')
+            logger.info(f'send "navi" command to robot({robot_id}), result={result}')
+            if result == 'ignore':
+                result2 = _move('refresh')
+                logger.info(f'send "refresh" command to robot({robot_id}), result={result2}')
+                if result2 != 'ack':
+                    msg = f'cannot move robot({robot_id}) to "{navigating_waypoints["to"]}" using "navi" and "refresh", ' \
+                        f'navi result={result} refresh result={result2}'
+                    logger.error(msg)
+                    abort(500, {
+                        'message': msg,
+                    })
+
+            if route_cursor is not None:
+                self.orion_executor().submit(self._update_route_cursor, robot_id, route_cursor)
+
+            logger.info(f'move robot({robot_id}) to "{navigating_waypoints["to"]}" '
+                        f'(waypoints={navigating_waypoints["waypoints"]}, order={order}, caller={caller}')
+
+    @staticmethod
+    def _update_route_cursor(robot_id, route_cursor):
+        try:
+            orion.append_attrs(
+                const.FIWARE_SERVICE,
+                const.DELIVERY_ROBOT_SERVICEPATH,
+                const.DELIVERY_ROBOT_TYPE,
+                robot_id,
+                orion.make_route_cursor_command(route_cursor))
+        except Exception as e:
+            logger.warning(f'can not update route_cursor, robot_id={robot_id}, route_cursor={route_cursor}, {e}')
 
     def move_next(self, robot_id, check=True):
-        if check:
-            self.check_mode(robot_id)
-
-        remaining_waypoints_list = self.get_remaining_waypoints_list(robot_id)
-        if not isinstance(remaining_waypoints_list, list) or len(remaining_waypoints_list) == 0:
-            abort(412, {
-                'message': f'no remaining waypoints for robot({robot_id})',
-                'id': robot_id,
-            })
+        with RobotActor.of(robot_id):
+            if check:
+                self.check_mode(robot_id)
+
+            peeked = RouteStore.peek(robot_id)
+            is_stored = peeked is not None
+            if not is_stored and RouteStore.get(robot_id) is None:
+                remaining_waypoints_list, route_cursor = self.get_route(robot_id)
+                if isinstance(remaining_waypoints_list, list) and len(remaining_waypoints_list) > route_cursor:
+                    peeked = remaining_waypoints_list[route_cursor], route_cursor
+            if peeked is None:
+                abort(412, {
+                    'message': f'no remaining waypoints for robot({robot_id})',
+                    'id': robot_id,
+                })
 
-        head, *tail = remaining_waypoints_list
-        self.move_robot(robot_id, head['waypoints'], head, tail)
+            head, route_cursor = peeked
+            if is_stored:
+                self.move_robot(robot_id, head['waypoints'], head, route_cursor=route_cursor + 1)
+                RouteStore.pop(robot_id, route_cursor)
+            else:
+                self.move_robot(robot_id, head['waypoints'], head)
+                self._update_route_cursor(robot_id, route_cursor + 1)
 
 
 class ShipmentAPI(CommonMixin, MethodView):
@@ -216,22 +339,49 @@ class ShipmentAPI(CommonMixin, MethodView):
                 'message': f'invalid shipment_list, {shipment_list}',
             })
 
-        available_robot = self.get_available_robot()
-        caller = Caller.get(shipment_list)
-
-        routes, waypoints_list, order = ShipmentAPI.waypoint().estimate_routes(shipment_list, available_robot['id'])
-        if not(isinstance(waypoints_list, list) and len(waypoints_list) > 0):
-            return jsonify({'result': 'ignore',
-                            'message': 'no available waypoints_list'}), 200
-
-        head, *tail = waypoints_list
-
-        self.move_robot(available_robot['id'], head['waypoints'], head, tail, routes, order, caller)
+        available_robots = self.get_available_robots()
+        if available_robots and self._dispatch_shipments():
+            available_robots = self.get_available_robots()
+        if available_robots:
+            try:
+                result = self.dispatch_shipment(shipment_list, available_robots)
+                return jsonify(result), 201 if result['result'] == 'success' else 200
+            except HTTPException as e:
+                if e.code != 423:
+                    raise
+                logger.info(f'no robot is free now, queue the shipment, {e}')
+
+        try:
+            ShipmentAPI.waypoint().check_shipment_list(shipment_list)
+        except TypeError:
+            abort(400, {
+                'message': f'invalid shipment_list, {shipment_list}',
+            })
+        ticket_id = ShipmentQueue.enqueue(shipment_list)
+        self.dispatch_queued_shipments()
+        response = jsonify({'result': 'queued',
+                            'ticket_id': ticket_id})
+        response.headers['Location'] = url_for(ShipmentStatusAPI.NAME, ticket_id=ticket_id)
+        return response, 202
+
+
+class ShipmentStatusAPI(MethodView):
+    NAME = 'shipmentstatusapi'
+
+    def get(self, ticket_id):
+        logger.debug(f'ShipmentStatusAPI.get, ticket_id={ticket_id}')
+        ticket = ShipmentQueue.get(ticket_id)
+        if ticket is None:
+            abort(404, {
+                'message': f'ticket({ticket_id}) not found',
+                'id': ticket_id,
+            })
 
-        return jsonify({'result': 'success',
-                        'delivery_robot': available_robot,
-                        'order': order,
-                        'caller': caller.value}), 201
+        return jsonify({'ticket_id': ticket['ticket_id'],
+                        'status': ticket['status'],
+                        'created_at': ticket['created_at'].isoformat(),
+                        'updated_at': ticket['updated_at'].isoformat(),
+                        'result': ticket.get('result')}), 200
 
 
 class RobotStateAPI(CommonMixin, MethodView):
@@ -239,9 +389,96 @@ class RobotStateAPI(CommonMixin, MethodView):
 
     def get(self, robot_id):
         logger.debug(f'RobotStateAPI.get, robot_id={robot_id}')
-        current_state = self.get_state(robot_id)
-        destination = self.get_destination_name(robot_id)
-        return jsonify({'id': robot_id, 'state': current_state, 'destination': destination}), 200
+        robot_entity, version = RobotCache.get_with_version(robot_id)
+        etag = None
+        if version is not None:
+            etag = make_etag([robot_id, version, self.get_destination_id(robot_id, robot_entity)])
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+
+        state = self.make_state(robot_id, robot_entity)
+        response = jsonify(state)
+        response.set_etag(etag if etag is not None else make_etag(state))
+        return response.make_conditional(request)
+
+    def make_state(self, robot_id, robot_entity=None):
+        if robot_entity is None:
+            robot_entity = RobotCache.get(robot_id)
+        current_state = self.calc_state(robot_entity['mode'] == const.MODE_NAVI, robot_id, robot_entity)
+        destination_id = self.get_destination_id(robot_id, robot_entity)
+        destination = RobotCache.get_place_name(destination_id) if destination_id else ''
+        return {'id': robot_id, 'state': current_state, 'destination': destination}
+
+
+class RobotListAPI(RobotStateAPI):
+    NAME = 'robotlistapi'
+
+    def get(self):
+        logger.debug('RobotListAPI.get')
+        robot_ids = [robot_id for robot_id in const.DELIVERY_ROBOT_LIST if robot_id]
+        robot_entities = RobotCache.get_all(robot_ids)
+        destination_ids = {robot_id: self.get_destination_id(robot_id, robot_entity)
+                           for robot_id, robot_entity in robot_entities.items()}
+        place_names = RobotCache.get_place_names([d for d in set(destination_ids.values()) if d])
+
+        robots = []
+        for robot_id, robot_entity in robot_entities.items():
+            current_state = self.calc_state(robot_entity['mode'] == const.MODE_NAVI, robot_id, robot_entity)
+            destination = place_names.get(destination_ids[robot_id], '') if destination_ids[robot_id] else ''
+            robots.append({'id': robot_id, 'state': current_state, 'destination': destination})
+
+        response = jsonify(robots)
+        response.set_etag(make_etag(robots))
+        return response.make_conditional(request)
+
+
+class RobotStateStreamAPI(RobotStateAPI):
+    NAME = 'robotstatestreamapi'
+
+    def get(self, robot_id):
+        logger.debug(f'RobotStateStreamAPI.get, robot_id={robot_id}')
+        if not const.GEVENT_ASYNC_CORES:
+            abort(501, {
+                'message': 'robot state stream is available only in gevent mode (GEVENT_ASYNC_CORES)',
+            })
+        if request.accept_mimetypes.best_match(['application/json', 'text/event-stream']) == 'text/event-stream':
+            return Response(stream_with_context(self._stream(robot_id)), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+        etags = request.if_none_match
+        deadline = monotonic() + const.ROBOT_STATE_STREAM_SEC
+        while True:
+            state = self._current_state(robot_id)
+            etag = make_etag(state)
+            if not etags.contains(etag):
+                response = jsonify(state)
+                response.set_etag(etag)
+                return response
+            if monotonic() >= deadline:
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+            sleep(const.ROBOT_STATE_STREAM_INTERVAL_MSEC / 1000.0)
+
+    def _current_state(self, robot_id):
+        state = RobotCache.get_state(robot_id)
+        return state if state is not None else self.make_state(robot_id)
+
+    def _stream(self, robot_id):
+        last_etag = request.headers.get('Last-Event-ID')
+        deadline = monotonic() + const.ROBOT_STATE_STREAM_SEC
+        yield f'retry: {const.ROBOT_STATE_STREAM_INTERVAL_MSEC}\n\n'
+        while True:
+            state = self._current_state(robot_id)
+            etag = make_etag(state)
+            if etag != last_etag:
+                last_etag = etag
+                yield f'id: {etag}\nevent: state\ndata: {json_backend.dumps(state)}\n\n'
+            if monotonic() >= deadline:
+                return
+            sleep(const.ROBOT_STATE_STREAM_INTERVAL_MSEC / 1000.0)
 
 
 class MoveNextAPI(CommonMixin, MethodView):
@@ -249,8 +486,21 @@ class MoveNextAPI(CommonMixin, MethodView):
 
     def patch(self, robot_id):
         logger.debug(f'MoveNextAPI.patch, robot_id={robot_id}')
-        self.move_next(robot_id)
-        return jsonify({'result': 'success'}), 200
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if not idempotency_key:
+            self.move_next(robot_id)
+            return jsonify({'result': 'success'}), 200
+
+        with RobotActor.of(robot_id):
+            key = CommandLog.key_of('nexts', robot_id, idempotency_key)
+            result = CommandLog.get(key)
+            if result is None:
+                self.move_next(robot_id)
+                result = {'result': 'success'}
+                CommandLog.put(key, result)
+            else:
+                logger.info(f'replay recorded result of PATCH nexts, robot_id={robot_id}, idempotency_key={idempotency_key}')
+        return jsonify(result), 200
 
 
 class EmergencyAPI(MethodView):
@@ -258,20 +508,81 @@ class EmergencyAPI(MethodView):
 
     def patch(self, robot_id):
         logger.debug(f'EmergencyAPI.patch, robot_id={robot_id}')
-        payload = orion.make_emergency_command('stop')
-
-        orion.send_command(
-            const.FIWARE_SERVICE,
-            const.DELIVERY_ROBOT_SERVICEPATH,
-            const.DELIVERY_ROBOT_TYPE,
-            robot_id,
-            payload
-        )
+        orion.send_emergency_command(robot_id, 'stop')
         logger.info(f'send emergency command ("stop") to robot({robot_id})')
 
         return jsonify({'result': 'success'}), 200
 
 
+class EmergencyAllAPI(MethodView):
+    NAME = 'emergencyallapi'
+    _executor = None
+    _lock = Lock()
+
+    @classmethod
+    def executor(cls):
+        if cls._executor is None:
+            with cls._lock:
+                if cls._executor is None:
+                    cls._executor = ThreadPoolExecutor(max_workers=const.ORION_EMERGENCY_MAX_CONCURRENCY,
+                                                       thread_name_prefix='emergency')
+                    logger.debug('emergency executor created')
+        return cls._executor
+
+    def patch(self):
+        logger.debug('EmergencyAllAPI.patch')
+        robot_ids = [robot_id for robot_id in const.DELIVERY_ROBOT_LIST if robot_id]
+        futures = [self.executor().submit(self.__stop, robot_id) for robot_id in robot_ids]
+        robots = [future.result() for future in futures]
+
+        if all(robot['result'] == 'success' for robot in robots):
+            logger.info(f'send emergency command ("stop") to all robots({robot_ids})')
+            return jsonify({'result': 'success', 'robots': robots}), 200
+        logger.error(f'can not send emergency command ("stop") to some robots, robots={robots}')
+        return jsonify({'result': 'failure', 'robots': robots}), 500
+
+    @staticmethod
+    def __stop(robot_id):
+        try:
+            orion.send_emergency_command(robot_id, 'stop')
+        except HTTPException as e:
+            return {'id': robot_id, 'result': 'failure', 'code': e.code, 'error': e.description}
+        return {'id': robot_id, 'result': 'success'}
+
+
+class MetricsAPI(MethodView):
+    NAME = 'metricsapi'
+
+    def get(self):
+        logger.debug('MetricsAPI.get')
+        return jsonify(Latency.snapshot()), 200
+
+
+class RobotCacheNotificationAPI(MethodView):
+    NAME = 'robotcachenotificationapi'
+
+    def post(self):
+        logger.debug('RobotCacheNotificationAPI.post')
+        ignored_data = []
+        processed_data = []
+
+        for data in request.json['data']:
+            try:
+                if RobotCache.notify(data):
+                    processed_data.append(data)
+                else:
+                    ignored_data.append(data)
+            except TypeError as e:
+                logger.warning(str(e))
+                ignored_data.append(data)
+
+        if any(data.get('type') == const.PLACE_TYPE for data in processed_data):
+            warmup.request_refresh()
+
+        logger.debug(f'processed_data = {processed_data}, ignored_data = {ignored_data}')
+        return jsonify({'result': 'success', 'processed_data': processed_data, 'ignored_data': ignored_data}), 200
+
+
 class RobotNotificationAPI(CommonMixin, MethodView):
     NAME = 'robotnotificationapi'
 
@@ -279,6 +590,7 @@ class RobotNotificationAPI(CommonMixin, MethodView):
         logger.debug(f'RobotNotificationAPI.post')
         ignored_data = []
         processed_data = []
+        has_standby = False
 
         for data in request.json['data']:
             robot_id = data['id']
@@ -287,16 +599,13 @@ class RobotNotificationAPI(CommonMixin, MethodView):
 
             try:
                 MongoThrottling.lock(robot_id, time)
-                robot_entity = orion.get_entity(
-                    const.FIWARE_SERVICE,
-                    const.DELIVERY_ROBOT_SERVICEPATH,
-                    const.DELIVERY_ROBOT_TYPE,
-                    robot_id)
+                robot_entity = self.get_robot_entity(robot_id, [
+                    'navigating_waypoints', 'order', 'caller', 'current_mode', 'current_state', 'last_processed_time'])
 
                 next_state = self.calc_state(next_mode == const.MODE_NAVI, robot_id, robot_entity)
-                current_mode = robot_entity['current_mode']['value']
-                current_state = robot_entity['current_state']['value']
-                last_processed_time = dateutil.parser.parse(robot_entity['last_processed_time']['value'])
+                current_mode = robot_entity['current_mode']
+                current_state = robot_entity['current_state']
+                last_processed_time = dateutil.parser.parse(robot_entity['last_processed_time'])
                 ui_id = const.ID_TABLE[robot_id]
 
                 payload = orion.make_updatelastprocessedtime_command(time)
@@ -322,6 +631,7 @@ class RobotNotificationAPI(CommonMixin, MethodView):
 
                     self._action(robot_id, ui_id, robot_entity, next_mode)
                     self._send_state(robot_id, ui_id, next_state, current_state)
+                    has_standby = has_standby or next_mode == const.MODE_STANDBY
                     processed_data.append(data)
                 else:
                     logger.debug(f'ignore notification, next_mode={next_mode} current_mode={current_mode}')
@@ -330,12 +640,15 @@ class RobotNotificationAPI(CommonMixin, MethodView):
                 logger.warning(str(e))
                 ignored_data.append(data)
 
+        if has_standby:
+            self._dispatch_shipments()
+
         logger.debug(f'processed_data = {processed_data}, ignored_data = {ignored_data}')
         return jsonify({'result': 'success', 'processed_data': processed_data, 'ignored_data': ignored_data}), 200
 
     def _action(self, robot_id, ui_id, robot_entity, next_mode):
         if next_mode == const.MODE_STANDBY:
-            nws = robot_entity['navigating_waypoints']['value']
+            nws = robot_entity['navigating_waypoints']
 
             if isinstance(nws, dict) and nws and 'action' in nws \
                     and 'func' in nws['action'] and nws['action']['func'] \
@@ -355,51 +668,54 @@ class RobotNotificationAPI(CommonMixin, MethodView):
                         self._send_token_info(ui_id, token, TokenMode.SUSPEND)
                 elif func == 'release':
                     new_owner_id = token.release_lock(robot_id)
-                    self.move_next(robot_id, check=False)
-                    self._send_token_info(ui_id, token, TokenMode.RELEASE)
-                    if new_owner_id:
-                        self.move_next(new_owner_id, check=False)
-                        self._send_token_info(const.ID_TABLE[new_owner_id], token, TokenMode.RESUME)
-                        self._send_token_info(const.ID_TABLE[new_owner_id], token, TokenMode.LOCK)
+                    batch = orion.BatchUpdate()
+                    with batch:
+                        self.move_next(robot_id, check=False)
+                        self._send_token_info(ui_id, token, TokenMode.RELEASE, batch)
+                        if new_owner_id:
+                            self.move_next(new_owner_id, check=False)
+                            self._send_token_info(const.ID_TABLE[new_owner_id], token, TokenMode.RESUME, batch)
+                            self._send_token_info(const.ID_TABLE[new_owner_id], token, TokenMode.LOCK, batch)
 
     def _send_state(self, robot_id, ui_id, next_state, current_state):
         if next_state != current_state:
-            payload = orion.make_updatestate_command(next_state)
-            orion.send_command(
-                const.FIWARE_SERVICE,
-                const.DELIVERY_ROBOT_SERVICEPATH,
-                const.DELIVERY_ROBOT_TYPE,
-                robot_id,
-                payload)
+            with orion.unit_of_work():
+                payload = orion.make_updatestate_command(next_state)
+                orion.send_command(
+                    const.FIWARE_SERVICE,
+                    const.DELIVERY_ROBOT_SERVICEPATH,
+                    const.DELIVERY_ROBOT_TYPE,
+                    robot_id,
+                    payload)
+
+                destination = self.get_destination_name(robot_id)
+                payload = orion.make_robotui_sendstate_command(next_state, destination)
+                orion.send_command(
+                    const.FIWARE_SERVICE,
+                    const.ROBOT_UI_SERVICEPATH,
+                    const.ROBOT_UI_TYPE,
+                    ui_id,
+                    payload)
+            logger.info(f'publish new state to robot ui({ui_id}), '
+                        f'current_state={current_state}, next_state={next_state}, destination={destination}')
+            RobotCache.put_state(robot_id, next_state, destination)
 
-            destination = self.get_destination_name(robot_id)
-            payload = orion.make_robotui_sendstate_command(next_state, destination)
+    def _send_token_info(self, ui_id, token, mode, batch=None):
+        payload = orion.make_robotui_sendtokeninfo_command(token, mode)
+        if batch is not None:
+            batch.add(const.FIWARE_SERVICE, const.ROBOT_UI_SERVICEPATH, const.ROBOT_UI_TYPE, ui_id, payload)
+        else:
             orion.send_command(
                 const.FIWARE_SERVICE,
                 const.ROBOT_UI_SERVICEPATH,
                 const.ROBOT_UI_TYPE,
                 ui_id,
                 payload)
-            logger.info(f'publish new state to robot ui({ui_id}), '
-                        f'current_state={current_state}, next_state={next_state}, destination={destination}')
-
-    def _send_token_info(self, ui_id, token, mode):
-        payload = orion.make_robotui_sendtokeninfo_command(token, mode)
-        orion.send_command(
-            const.FIWARE_SERVICE,
-            const.ROBOT_UI_SERVICEPATH,
-            const.ROBOT_UI_TYPE,
-            ui_id,
-            payload)
         logger.info(f'publish new token_info to robot ui({ui_id}), token={token}, mode={mode}, '
                     f'lock_owner_id={token.lock_owner_id}, prev_owner_id={token.prev_owner_id}')
 
     def _take_refuge(self, robot_id, waiting_route):
-        places = RobotNotificationAPI.waypoint().get_places([flatten([waiting_route['via'], waiting_route['to']])])
-        waypoints = RobotNotificationAPI.waypoint().get_waypoints(
-            [places[place_id] for place_id in waiting_route['via']],
-            [places[waiting_route['to']]]
-        )
+        waypoints = RobotNotificationAPI.waypoint().get_refuge_waypoints(waiting_route)
         navigating_waypoints = {
             'to': waiting_route['to'],
             'destination': self.get_destination_id(robot_id),
@@ -412,3 +728,16 @@ class RobotNotificationAPI(CommonMixin, MethodView):
         }
         self.move_robot(robot_id, waypoints, navigating_waypoints)
         logger.info(f'take refuge a robot({robot_id}) in "{waiting_route["to"]}"')
+
+
+def _sweep_shipments(signum):
+    logger.debug(f'dispatch queued shipments by signal {signum}')
+    CommonMixin().dispatch_queued_shipments()
+
+
+def prefork():
+    if uwsgi is None or const.SHIPMENT_SWEEP_SEC <= 0:
+        return False
+    uwsgi.register_signal(const.SHIPMENT_SWEEP_SIGNAL, 'worker', _sweep_shipments)
+    uwsgi.add_timer(const.SHIPMENT_SWEEP_SIGNAL, const.SHIPMENT_SWEEP_SEC)
+    return True
@@ -0,0 +1,73 @@
+import datetime
+from logging import getLogger
+from threading import Lock
+
+from pymongo import MongoClient, ASCENDING
+
+from src import const
+from src.utils import make_etag
+
+logger = getLogger(__name__)
+
+
+class CommandLog:
+    _collection = None
+    _lock = Lock()
+
+    @classmethod
+    def _get_mongo_collection(cls):
+        if cls._collection is None:
+            with cls._lock:
+                if cls._collection is None:
+                    mongo_client = MongoClient(
+                        const.MONGODB_HOST,
+                        const.MONGODB_PORT,
+                        replicaset=const.MONGODB_REPLICASET)
+                    collection = mongo_client[const.MONGODB_DB_NAME][const.MONGODB_COMMAND_LOG_COLLECTION_NAME]
+                    collection.create_index([('key', ASCENDING)], unique=True)
+                    collection.create_index([('expires_at', ASCENDING)], expireAfterSeconds=0)
+                    cls._collection = collection
+        return cls._collection
+
+    @classmethod
+    def key_of(cls, *parts):
+        return make_etag(parts)
+
+    @classmethod
+    def get(cls, key):
+        if not isinstance(key, str):
+            raise TypeError(f'invalid type of key, type(key)={type(key)}')
+        if const.COMMAND_IDEMPOTENCY_TTL_SEC <= 0:
+            return None
+
+        record = cls._get_mongo_collection().find_one(
+            {
+                'key': key,
+                'expires_at': {
+                    '$gt': datetime.datetime.utcnow()
+                },
+            },
+            {'_id': False})
+        if record is None:
+            return None
+        logger.debug(f'found recorded command, key={key}, result={record["result"]}')
+        return record['result']
+
+    @classmethod
+    def put(cls, key, result):
+        if not isinstance(key, str):
+            raise TypeError(f'invalid type of key, type(key)={type(key)}')
+        if const.COMMAND_IDEMPOTENCY_TTL_SEC <= 0:
+            return
+
+        cls._get_mongo_collection().replace_one(
+            {
+                'key': key,
+            },
+            {
+                'key': key,
+                'result': result,
+                'expires_at': datetime.datetime.utcnow() + datetime.timedelta(seconds=const.COMMAND_IDEMPOTENCY_TTL_SEC),
+            },
+            upsert=True)
+        logger.debug(f'record command, key={key}, result={result}')
@@ -0,0 +1,149 @@
+import json
+
+REQUIRED = object()
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def _json_list(value):
+    v = json.loads(value)
+    if not isinstance(v, list):
+        raise ValueError('must be a json array')
+    return v
+
+
+def _json_dict(value):
+    v = json.loads(value)
+    if not isinstance(v, dict):
+        raise ValueError('must be a json object')
+    return v
+
+
+def _non_negative_int(value):
+    v = int(value)
+    if v < 0:
+        raise ValueError('must not be negative')
+    return v
+
+
+def _port(value):
+    v = int(value)
+    if not 0 < v <= 65535:
+        raise ValueError('must be between 1 and 65535')
+    return v
+
+
+def _positive_int(value):
+    v = int(value)
+    if v <= 0:
+        raise ValueError('must be positive')
+    return v
+
+
+def _non_negative_float(value):
+    v = float(value)
+    if not v >= 0:
+        raise ValueError('must not be negative')
+    return v
+
+
+def _json_backend(value):
+    if value not in ('', 'orjson', 'ujson', 'json'):
+        raise ValueError('must be one of "orjson", "ujson" or "json"')
+    return value
+
+
+def _bool(value):
+    v = value.lower()
+    if v not in ('true', 'false', '1', '0'):
+        raise ValueError('must be one of "true", "false", "1" or "0"')
+    return v in ('true', '1')
+
+
+def _positive_float(value):
+    v = float(value)
+    if not v > 0:
+        raise ValueError('must be positive')
+    return v
+
+
+SETTINGS = (
+    ('TIMEZONE', str, 'UTC'),
+    ('ORION_ENDPOINT', str, REQUIRED),
+    ('ORION_TOKEN', str, None),
+    ('ORION_CONNECT_TIMEOUT_SEC', _positive_float, 3.0),
+    ('ORION_READ_TIMEOUT_SEC', _positive_float, 10.0),
+    ('ORION_WRITE_TIMEOUT_SEC', _positive_float, 10.0),
+    ('ORION_CIRCUIT_FAILURE_THRESHOLD', _non_negative_int, 5),
+    ('ORION_CIRCUIT_RESET_SEC', _positive_float, 10.0),
+    ('ORION_MAX_CONCURRENCY', _positive_int, 100),
+    ('ORION_EMERGENCY_MAX_CONCURRENCY', _positive_int, 10),
+    ('ORION_BULKHEAD_TIMEOUT_SEC', _non_negative_float, 1.0),
+    ('ORION_EMERGENCY_TIMEOUT_SEC', _positive_float, 3.0),
+    ('FIWARE_SERVICE', str, REQUIRED),
+    ('DELIVERY_ROBOT_SERVICEPATH', str, REQUIRED),
+    ('DELIVERY_ROBOT_TYPE', str, REQUIRED),
+    ('DELIVERY_ROBOT_LIST', _json_list, REQUIRED),
+    ('ROBOT_UI_SERVICEPATH', str, REQUIRED),
+    ('ROBOT_UI_TYPE', str, REQUIRED),
+    ('ID_TABLE', _json_dict, REQUIRED),
+    ('CORS_ORIGINS', str, None),
+    ('TOKEN_SERVICEPATH', str, REQUIRED),
+    ('TOKEN_TYPE', str, REQUIRED),
+    ('MOVENEXT_WAIT_MSEC', _non_negative_int, 200),
+    ('MOVENEXT_WAIT_MAX_NUM', _non_negative_int, 25),
+    ('NOTIFICATION_THROTTLING_MSEC', _non_negative_int, 500),
+    ('MONGODB_HOST', str, REQUIRED),
+    ('MONGODB_PORT', _port, REQUIRED),
+    ('MONGODB_REPLICASET', str, REQUIRED),
+    ('MONGODB_DB_NAME', str, REQUIRED),
+    ('MONGODB_COLLECTION_NAME', str, REQUIRED),
+    ('MONGODB_SHIPMENT_QUEUE_COLLECTION_NAME', str, 'shipment_queue'),
+    ('MONGODB_ROBOT_ACTOR_COLLECTION_NAME', str, 'robot_actors'),
+    ('MONGODB_COMMAND_LOG_COLLECTION_NAME', str, 'command_log'),
+    ('MONGODB_ROUTE_STORE_COLLECTION_NAME', str, 'routes'),
+    ('JSON_BACKEND', _json_backend, ''),
+    ('ROBOT_CACHE_NAME', str, 'robots'),
+    ('PLACE_CACHE_NAME', str, 'places'),
+    ('ROBOT_CACHE_TTL_SEC', _non_negative_int, 60),
+    ('ROBOT_STATE_STREAM_SEC', _non_negative_int, 30),
+    ('ROBOT_STATE_STREAM_INTERVAL_MSEC', _positive_int, 200),
+    ('ROBOT_SPEED_MPS', _positive_float, 0.5),
+    ('WAYPOINT_CACHE_TTL_SEC', _non_negative_int, 600),
+    ('WARMUP_ENABLED', _bool, True),
+    ('WARMUP_REFRESH_SEC', _non_negative_int, 600),
+    ('GEVENT_ASYNC_CORES', _non_negative_int, 0),
+    ('ROBOT_ACTOR_LEASE_SEC', _positive_float, 30.0),
+    ('ROBOT_ACTOR_TIMEOUT_SEC', _positive_float, 15.0),
+    ('COMMAND_IDEMPOTENCY_TTL_SEC', _non_negative_int, 30),
+    ('SHIPMENT_DISPATCH_TIMEOUT_SEC', _positive_int, 120),
+    ('SHIPMENT_SWEEP_SEC', _non_negative_int, 30),
+)
+
+NAMES = frozenset(name for name, _, _ in SETTINGS)
+
+
+class Config:
+    __slots__ = tuple(NAMES)
+
+    def __init__(self, environ):
+        errors = []
+        for name, parse, default in SETTINGS:
+            value = environ.get(name)
+            if value is None:
+                if default is REQUIRED:
+                    errors.append(f'{name} is required')
+                else:
+                    setattr(self, name, default)
+                continue
+            try:
+                setattr(self, name, parse(value))
+            except (TypeError, ValueError) as e:
+                errors.append(f'{name} is invalid ({e})')
+        if errors:
+            raise ConfigError(f'invalid environment variables, {", ".join(errors)}')
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name, _, _ in SETTINGS}
@@ -15,6 +15,8 @@ app = Blueprint('errors', __name__)
 @app.app_errorhandler(422)
 @app.app_errorhandler(423)
 @app.app_errorhandler(500)
+@app.app_errorhandler(501)
+@app.app_errorhandler(503)
 @app.app_errorhandler(Exception)
 def error_handler(error):
     code = error.code if hasattr(error, 'code') else 500
@@ -26,4 +28,8 @@ def error_handler(error):
         level = 'warning'
     getattr(logger, level)(str(error))
 
-    return make_response(jsonify(description), code)
+    response = make_response(jsonify(description), code)
+    retry_after = getattr(error, 'retry_after', None)
+    if retry_after is not None:
+        response.headers['Retry-After'] = str(retry_after)
+    return response
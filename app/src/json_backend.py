@@ -0,0 +1,133 @@
+import json
+from logging import getLogger
+
+from flask.json import JSONEncoder as FlaskJSONEncoder, JSONDecoder as FlaskJSONDecoder
+
+from src import const
+
+logger = getLogger(__name__)
+
+SUPPORTED_BACKENDS = ['orjson', 'ujson', 'json']
+
+
+class _StdlibBackend:
+    name = 'json'
+    decode_errors = (json.decoder.JSONDecodeError, )
+
+    def loads(self, s):
+        return json.loads(s)
+
+    def dumps(self, obj, sort_keys=False, indent=None, default=None):
+        return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, indent=indent,
+                          separators=(',', ':') if indent is None else None, default=default)
+
+
+class _OrjsonBackend:
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        self.decode_errors = (orjson.JSONDecodeError, )
+
+    def loads(self, s):
+        return self._orjson.loads(s)
+
+    def dumps(self, obj, sort_keys=False, indent=None, default=None):
+        if indent not in (None, 2):
+            raise TypeError(f'orjson does not support indent={indent}')
+        option = self._orjson.OPT_PASSTHROUGH_DATETIME | self._orjson.OPT_PASSTHROUGH_DATACLASS
+        if sort_keys:
+            option |= self._orjson.OPT_SORT_KEYS
+        if indent is not None:
+            option |= self._orjson.OPT_INDENT_2
+        return self._orjson.dumps(obj, default=default, option=option).decode('utf-8')
+
+
+class _UjsonBackend:
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+        self.decode_errors = (getattr(ujson, 'JSONDecodeError', ValueError), )
+
+    def loads(self, s):
+        return self._ujson.loads(s)
+
+    def dumps(self, obj, sort_keys=False, indent=None, default=None):
+        if default is not None:
+            return self._ujson.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, indent=indent or 0,
+                                     escape_forward_slashes=False, default=default)
+        return self._ujson.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, indent=indent or 0,
+                                 escape_forward_slashes=False)
+
+
+_BACKEND_CLASSES = {
+    'orjson': _OrjsonBackend,
+    'ujson': _UjsonBackend,
+    'json': _StdlibBackend,
+}
+
+
+def _select_backend(name):
+    if name and name not in SUPPORTED_BACKENDS:
+        raise ValueError(f'unsupported json backend, {name}')
+    candidates = [name] if name else SUPPORTED_BACKENDS
+    for candidate in candidates:
+        try:
+            return _BACKEND_CLASSES[candidate]()
+        except ImportError:
+            logger.debug(f'json backend "{candidate}" is not installed')
+    logger.warning(f'json backend "{name}" is not installed, fallback to "json"')
+    return _StdlibBackend()
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    name = const.JSON_BACKEND
+    selected = _backend
+    if selected is None or selected[0] != name:
+        selected = _backend = (name, _select_backend(name))
+    return selected[1]
+
+
+def __getattr__(name):
+    if name == 'backend':
+        return get_backend()
+    if name == 'JSONDecodeError':
+        return (json.decoder.JSONDecodeError, ) + get_backend().decode_errors
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def loads(s):
+    return get_backend().loads(s)
+
+
+def dumps(obj, sort_keys=False, indent=None, default=None):
+    return get_backend().dumps(obj, sort_keys=sort_keys, indent=indent, default=default)
+
+
+class JSONEncoder(FlaskJSONEncoder):
+    def encode(self, o):
+        backend = get_backend()
+        if self.ensure_ascii or backend.name == 'json':
+            return super().encode(o)
+        try:
+            return backend.dumps(o, sort_keys=self.sort_keys, indent=self.indent, default=self.default)
+        except (TypeError, OverflowError):
+            return super().encode(o)
+
+
+class JSONDecoder(FlaskJSONDecoder):
+    def decode(self, s, *args, **kwargs):
+        backend = get_backend()
+        if backend.name == 'json':
+            return super().decode(s, *args, **kwargs)
+        try:
+            return backend.loads(s)
+        except backend.decode_errors as e:
+            raise json.decoder.JSONDecodeError(str(e), s, 0) from e
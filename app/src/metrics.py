@@ -0,0 +1,79 @@
+import threading
+from logging import getLogger
+
+try:
+    import uwsgi
+except ImportError:
+    uwsgi = None
+
+logger = getLogger(__name__)
+
+LATENCY_ORION_REGULAR = 'orion_regular'
+LATENCY_ORION_EMERGENCY = 'orion_emergency'
+LATENCY_NAMES = (LATENCY_ORION_REGULAR, LATENCY_ORION_EMERGENCY)
+
+
+class _LocalMetrics:
+    name = 'local'
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, key, value):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set_max(self, key, value):
+        with self._lock:
+            self._values[key] = max(self._values.get(key, 0), value)
+
+    def get(self, key):
+        return self._values.get(key, 0)
+
+
+class _UwsgiMetrics:
+    name = 'uwsgi'
+
+    def inc(self, key, value):
+        uwsgi.metric_inc(key, value)
+
+    def set_max(self, key, value):
+        uwsgi.metric_set_max(key, value)
+
+    def get(self, key):
+        return uwsgi.metric_get(key) or 0
+
+
+class Latency:
+    _metrics = None
+
+    @classmethod
+    def _get_metrics(cls):
+        if cls._metrics is None:
+            cls._metrics = _UwsgiMetrics() if uwsgi is not None else _LocalMetrics()
+            logger.debug(f'latency metrics created, metrics={cls._metrics.name}')
+        return cls._metrics
+
+    @classmethod
+    def record(cls, name, elapsed_sec):
+        if name not in LATENCY_NAMES:
+            raise ValueError(f'unknown latency, name={name}')
+        usec = max(round(elapsed_sec * 1000000), 0)
+        metrics = cls._get_metrics()
+        metrics.inc(f'{name}_count', 1)
+        metrics.inc(f'{name}_usec_sum', usec)
+        metrics.set_max(f'{name}_usec_max', usec)
+
+    @classmethod
+    def snapshot(cls):
+        metrics = cls._get_metrics()
+        result = {}
+        for name in LATENCY_NAMES:
+            count = metrics.get(f'{name}_count')
+            result[name] = {
+                'count': count,
+                'avg_msec': round(metrics.get(f'{name}_usec_sum') / count / 1000.0, 3) if count else 0.0,
+                'max_msec': round(metrics.get(f'{name}_usec_max') / 1000.0, 3),
+            }
+        return result
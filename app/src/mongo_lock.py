@@ -1,5 +1,6 @@
 import datetime
 from logging import getLogger
+from threading import Lock
 
 from pymongo import MongoClient
 
@@ -15,6 +16,7 @@ class MongoLockError(Exception):
 class MongoThrottling:
     _throttling_msec = None
     _collection = None
+    _lock = Lock()
 
     @classmethod
     def _throttling(cls):
@@ -25,16 +27,19 @@ class MongoThrottling:
     @classmethod
     def _get_mongo_collection(cls):
         if cls._collection is None:
-            mongo_client = MongoClient(
-                const.MONGODB_HOST,
-                const.MONGODB_PORT,
-                replicaset=const.MONGODB_REPLICASET)
-            cls._collection = mongo_client[const.MONGODB_DB_NAME][const.MONGODB_COLLECTION_NAME]
-            for robot_id in const.ID_TABLE.keys():
-                cls._collection.replace_one(
-                    {'robot_id': robot_id},
-                    {'robot_id': robot_id, 'time': datetime.datetime.utcnow()},
-                    upsert=True)
+            with cls._lock:
+                if cls._collection is None:
+                    mongo_client = MongoClient(
+                        const.MONGODB_HOST,
+                        const.MONGODB_PORT,
+                        replicaset=const.MONGODB_REPLICASET)
+                    collection = mongo_client[const.MONGODB_DB_NAME][const.MONGODB_COLLECTION_NAME]
+                    for robot_id in const.ID_TABLE.keys():
+                        collection.replace_one(
+                            {'robot_id': robot_id},
+                            {'robot_id': robot_id, 'time': datetime.datetime.utcnow()},
+                            upsert=True)
+                    cls._collection = collection
         return cls._collection
 
     @classmethod
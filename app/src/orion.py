@@ -1,21 +1,85 @@
 import datetime
-import json
+import math
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from logging import getLogger
+from threading import Lock, local
 
 from flask import abort
 
 import pytz
 
 import requests
+from requests.exceptions import RequestException
+from werkzeug.exceptions import ServiceUnavailable
 
-from src import const
+from src import const, json_backend
+from src.metrics import Latency, LATENCY_ORION_REGULAR, LATENCY_ORION_EMERGENCY
+from src.resilience import Bulkhead, BulkheadFullError, CircuitBreaker, CircuitOpenError
 from src.utils import is_jsonable
 from src.caller import Caller
 
-TZ = pytz.timezone(const.TIMEZONE)
+logger = getLogger(__name__)
+
+LANE_REGULAR = 'regular'
+LANE_EMERGENCY = 'emergency'
+
+_timezone = None
+_breaker = None
+_bulkheads = {}
+_resilience_lock = Lock()
+_emergency_session = None
+_emergency_session_pid = None
+_emergency_session_lock = Lock()
+_emergency_templates = {}
+_EMERGENCY_TIME_PLACEHOLDER = '@@time@@'
+_unit_of_work = local()
+_clock = None
+
+
+def get_timezone():
+    global _timezone
+    timezone = _timezone
+    if timezone is None or timezone.zone != const.TIMEZONE:
+        timezone = _timezone = pytz.timezone(const.TIMEZONE)
+    return timezone
+
+
+def get_breaker():
+    global _breaker
+    settings = (const.ORION_CIRCUIT_FAILURE_THRESHOLD, const.ORION_CIRCUIT_RESET_SEC)
+    breaker = _breaker
+    if breaker is None or (breaker.failure_threshold, breaker.reset_sec) != settings:
+        with _resilience_lock:
+            if _breaker is None or (_breaker.failure_threshold, _breaker.reset_sec) != settings:
+                _breaker = CircuitBreaker('orion', *settings)
+            breaker = _breaker
+    return breaker
+
+
+def get_bulkhead(lane):
+    max_concurrency = const.ORION_MAX_CONCURRENCY if lane == LANE_REGULAR else const.ORION_EMERGENCY_MAX_CONCURRENCY
+    settings = (max_concurrency, const.ORION_BULKHEAD_TIMEOUT_SEC)
+    bulkhead = _bulkheads.get(lane)
+    if bulkhead is None or (bulkhead.max_concurrency, bulkhead.timeout_sec) != settings:
+        with _resilience_lock:
+            bulkhead = _bulkheads.get(lane)
+            if bulkhead is None or (bulkhead.max_concurrency, bulkhead.timeout_sec) != settings:
+                bulkhead = _bulkheads[lane] = Bulkhead(lane, *settings)
+    return bulkhead
 
 
 def send_command(fiware_service, fiware_servicepath, entity_type, entity_id, payload):
+    return __send_attrs('patch', fiware_service, fiware_servicepath, entity_type, entity_id, payload)
+
+
+def append_attrs(fiware_service, fiware_servicepath, entity_type, entity_id, payload):
+    return __send_attrs('post', fiware_service, fiware_servicepath, entity_type, entity_id, payload)
+
+
+def __send_attrs(method, fiware_service, fiware_servicepath, entity_type, entity_id, payload):
     if not (isinstance(fiware_service, str) and isinstance(fiware_servicepath, str)
             and isinstance(entity_type, str) and isinstance(entity_id, str)):
         raise TypeError('fiware_service, fiware_servicepath, entity_type and entity_id must be "str"')
@@ -26,7 +90,7 @@ def send_command(fiware_service, fiware_servicepath, entity_type, entity_id, pay
     path = os.path.join(const.ORION_BASE_PATH, entity_id, 'attrs')
     endpoint = f'{const.ORION_ENDPOINT}{path}?type={entity_type}'
 
-    result = requests.patch(endpoint, headers=headers, json=payload)
+    result = __request(method, endpoint, const.ORION_WRITE_TIMEOUT_SEC, headers=headers, json=payload)
     if not (200 <= result.status_code < 300):
         code = result.status_code if result.status_code in (404, ) else 500
         abort(code, {
@@ -37,19 +101,145 @@ def send_command(fiware_service, fiware_servicepath, entity_type, entity_id, pay
     return result
 
 
-def query_entity(fiware_service, fiware_servicepath, entity_type, query):
+def send_emergency_command(entity_id, cmd):
+    if not (isinstance(entity_id, str) and isinstance(cmd, str)):
+        raise TypeError('entity_id and cmd must be "str"')
+
+    headers = __make_headers(const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, True)
+    path = os.path.join(const.ORION_BASE_PATH, entity_id, 'attrs')
+    endpoint = f'{const.ORION_ENDPOINT}{path}?type={const.DELIVERY_ROBOT_TYPE}'
+    session = get_emergency_session()
+
+    start = time.monotonic()
+    try:
+        with get_bulkhead(LANE_EMERGENCY):
+            result = session.patch(endpoint, timeout=(const.ORION_CONNECT_TIMEOUT_SEC, const.ORION_EMERGENCY_TIMEOUT_SEC),
+                                   headers=headers, data=make_emergency_command_body(cmd))
+    except BulkheadFullError as e:
+        __unavailable('too many emergency requests to orion', str(e), 1)
+    except RequestException as e:
+        logger.warning(f'can not send emergency command to orion, endpoint={endpoint}, {e}')
+        __unavailable('can not connect to orion', str(e), 1)
+    finally:
+        Latency.record(LATENCY_ORION_EMERGENCY, time.monotonic() - start)
+
+    if not (200 <= result.status_code < 300):
+        code = result.status_code if result.status_code in (404, ) else 500
+        abort(code, {
+            'message': 'can not send emergency command to orion',
+            'root_cause': result.text if hasattr(result, 'text') else ''
+        })
+
+    return result
+
+
+def get_emergency_session():
+    global _emergency_session, _emergency_session_pid
+    pid = os.getpid()
+    if _emergency_session is None or _emergency_session_pid != pid:
+        with _emergency_session_lock:
+            if _emergency_session is None or _emergency_session_pid != pid:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                                        pool_maxsize=const.ORION_EMERGENCY_MAX_CONCURRENCY)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _emergency_session, _emergency_session_pid = session, pid
+                logger.debug(f'emergency session created, pid={pid}')
+    return _emergency_session
+
+
+def warm_emergency_session():
+    try:
+        get_emergency_session().get(f'{const.ORION_ENDPOINT}/version',
+                                    timeout=(const.ORION_CONNECT_TIMEOUT_SEC, const.ORION_EMERGENCY_TIMEOUT_SEC))
+    except RequestException as e:
+        logger.warning(f'can not warm emergency session, {e}')
+        return False
+    return True
+
+
+def send_batch_update(fiware_service, fiware_servicepath, updates):
+    if not (isinstance(fiware_service, str) and isinstance(fiware_servicepath, str)):
+        raise TypeError('fiware_service and fiware_servicepath must be "str"')
+    if not (isinstance(updates, list) and len(updates) > 0):
+        raise TypeError('updates must be a non-empty list')
+    for entity_type, entity_id, payload in updates:
+        if not (isinstance(entity_type, str) and isinstance(entity_id, str) and isinstance(payload, dict)):
+            raise TypeError('entity_type and entity_id must be "str" and payload must be "dict"')
+        if not is_jsonable(payload):
+            raise TypeError('payload must be json serializable')
+
+    if len(updates) == 1:
+        entity_type, entity_id, payload = updates[0]
+        return [send_command(fiware_service, fiware_servicepath, entity_type, entity_id, payload)]
+
+    headers = __make_headers(fiware_service, fiware_servicepath, True)
+    endpoint = f'{const.ORION_ENDPOINT}{const.ORION_BATCH_UPDATE_PATH}'
+    body = {
+        'actionType': 'update',
+        'entities': [dict(payload, id=entity_id, type=entity_type) for entity_type, entity_id, payload in updates],
+    }
+
+    result = __request('post', endpoint, const.ORION_WRITE_TIMEOUT_SEC, headers=headers, json=body)
+    if 200 <= result.status_code < 300:
+        return [result]
+
+    logger.warning(f'batch update failed, fallback to individual updates, status_code={result.status_code}, '
+                   f'root_cause={result.text if hasattr(result, "text") else ""}')
+    return [send_command(fiware_service, fiware_servicepath, entity_type, entity_id, payload)
+            for entity_type, entity_id, payload in updates]
+
+
+class BatchUpdate:
+    def __init__(self):
+        self._updates = {}
+
+    def add(self, fiware_service, fiware_servicepath, entity_type, entity_id, payload):
+        if not (isinstance(fiware_service, str) and isinstance(fiware_servicepath, str)
+                and isinstance(entity_type, str) and isinstance(entity_id, str)):
+            raise TypeError('fiware_service, fiware_servicepath, entity_type and entity_id must be "str"')
+        if not (isinstance(payload, dict) and is_jsonable(payload)):
+            raise TypeError('payload must be json serializable "dict"')
+
+        self._updates.setdefault((fiware_service, fiware_servicepath), []).append((entity_type, entity_id, payload))
+
+    def flush(self):
+        updates, self._updates = self._updates, {}
+        return [result
+                for (fiware_service, fiware_servicepath), group in updates.items()
+                for result in send_batch_update(fiware_service, fiware_servicepath, group)]
+
+    def __len__(self):
+        return sum(len(group) for group in self._updates.values())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+        else:
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f'can not flush batch update, {e}')
+        return False
+
+
+def query_entity(fiware_service, fiware_servicepath, entity_type, query, attrs=None, key_values=False):
     if not (isinstance(fiware_service, str) and isinstance(fiware_servicepath, str)
             and isinstance(entity_type, str) and isinstance(query, str)):
         raise TypeError('fiware_service, fiware_servicepath, entity_type and query must be "str"')
 
     headers = __make_headers(fiware_service, fiware_servicepath)
     endpoint = f'{const.ORION_ENDPOINT}{const.ORION_BASE_PATH}'
-    params = {
+    params = __make_params({
         'type': entity_type,
         'limit': const.ORION_LIST_NUM_LIMIT,
         'q': query,
-    }
-    result = requests.get(endpoint, headers=headers, params=params)
+    }, attrs, key_values)
+    result = __request('get', endpoint, const.ORION_READ_TIMEOUT_SEC, headers=headers, params=params)
     if not (200 <= result.status_code < 300):
         code = result.status_code if result.status_code in (404, ) else 500
         abort(code, {
@@ -57,8 +247,8 @@ def query_entity(fiware_service, fiware_servicepath, entity_type, query):
             'root_cause': result.text if hasattr(result, 'text') else ''
         })
     try:
-        result_json = result.json()
-    except json.decoder.JSONDecodeError as e:
+        result_json = json_backend.loads(result.content)
+    except json_backend.JSONDecodeError as e:
         abort(400, {
             'message': 'can not parse result',
             'root_cause': str(e)
@@ -71,17 +261,66 @@ def query_entity(fiware_service, fiware_servicepath, entity_type, query):
     return result_json[0]
 
 
-def get_entities(fiware_service, fiware_servicepath, entity_type):
+def get_entities(fiware_service, fiware_servicepath, entity_type, attrs=None, key_values=False):
+    return list(iter_entities(fiware_service, fiware_servicepath, entity_type, attrs=attrs, key_values=key_values))
+
+
+def iter_entities(fiware_service, fiware_servicepath, entity_type, query=None, attrs=None, key_values=False,
+                  page_size=None, prefetch=False):
     if not (isinstance(fiware_service, str) and isinstance(fiware_servicepath, str) and isinstance(entity_type, str)):
         raise TypeError('fiware_service, fiware_servicepath and entity_type must be "str"')
+    if not (query is None or isinstance(query, str)):
+        raise TypeError('query must be "str"')
+    if page_size is None:
+        page_size = const.ORION_LIST_NUM_LIMIT
+    if not (isinstance(page_size, int) and not isinstance(page_size, bool) and 0 < page_size <= const.ORION_LIST_NUM_LIMIT):
+        raise ValueError(f'page_size must be between 1 and {const.ORION_LIST_NUM_LIMIT}')
 
     headers = __make_headers(fiware_service, fiware_servicepath)
     endpoint = f'{const.ORION_ENDPOINT}{const.ORION_BASE_PATH}'
-    params = {
+    params = __make_params({
         'type': entity_type,
-        'limit': const.ORION_LIST_NUM_LIMIT,
-    }
-    result = requests.get(endpoint, headers=headers, params=params)
+    }, attrs, key_values, count=True)
+    if query is not None:
+        params['q'] = query
+
+    return __iter_pages(endpoint, headers, params, page_size, prefetch)
+
+
+def __iter_pages(endpoint, headers, params, page_size, prefetch):
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    try:
+        offset = 0
+        entities, total = __get_page(endpoint, headers, params, offset, page_size)
+        while True:
+            offset += len(entities)
+            if total is not None:
+                has_next = len(entities) > 0 and offset < total
+            else:
+                has_next = len(entities) == page_size
+
+            future = None
+            if has_next and executor is not None:
+                future = executor.submit(__get_page, endpoint, headers, params, offset, page_size)
+
+            yield from entities
+            if not has_next:
+                break
+
+            if future is not None:
+                entities, total = future.result()
+            else:
+                entities, total = __get_page(endpoint, headers, params, offset, page_size)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+def __get_page(endpoint, headers, params, offset, limit):
+    page_params = dict(params)
+    page_params['offset'] = offset
+    page_params['limit'] = limit
+    result = __request('get', endpoint, const.ORION_READ_TIMEOUT_SEC, headers=headers, params=page_params)
     if not (200 <= result.status_code < 300):
         code = result.status_code if result.status_code in (404, ) else 500
         abort(code, {
@@ -89,26 +328,38 @@ def get_entities(fiware_service, fiware_servicepath, entity_type):
             'root_cause': result.text if hasattr(result, 'text') else ''
         })
     try:
-        result_json = result.json()
-    except json.decoder.JSONDecodeError as e:
+        result_json = json_backend.loads(result.content)
+    except json_backend.JSONDecodeError as e:
         abort(400, {
             'message': 'can not parse result',
             'root_cause': str(e)
         })
-    return result_json
+    if not isinstance(result_json, list):
+        abort(400, {
+            'message': f'can not retrieve entities, offset={offset}, limit={limit}',
+        })
 
+    total = None
+    result_headers = getattr(result, 'headers', None)
+    if result_headers is not None and 'Fiware-Total-Count' in result_headers:
+        try:
+            total = int(result_headers['Fiware-Total-Count'])
+        except (TypeError, ValueError):
+            total = None
+    return result_json, total
 
-def get_entity(fiware_service, fiware_servicepath, entity_type, entity_id):
+
+def get_entity(fiware_service, fiware_servicepath, entity_type, entity_id, attrs=None, key_values=False):
     if not (isinstance(fiware_service, str) and isinstance(fiware_servicepath, str)
             and isinstance(entity_type, str) and isinstance(entity_id, str)):
         raise TypeError('fiware_service, fiware_servicepath, entity_type and entity_id must be "str"')
 
     headers = __make_headers(fiware_service, fiware_servicepath)
     endpoint = f'{const.ORION_ENDPOINT}{const.ORION_BASE_PATH}{entity_id}'
-    params = {
+    params = __make_params({
         'type': entity_type
-    }
-    result = requests.get(endpoint, headers=headers, params=params)
+    }, attrs, key_values)
+    result = __request('get', endpoint, const.ORION_READ_TIMEOUT_SEC, headers=headers, params=params)
     if not (200 <= result.status_code < 300):
         code = result.status_code if result.status_code in (404, ) else 500
         abort(code, {
@@ -116,8 +367,8 @@ def get_entity(fiware_service, fiware_servicepath, entity_type, entity_id):
             'root_cause': result.text if hasattr(result, 'text') else ''
         })
     try:
-        result_json = result.json()
-    except json.decoder.JSONDecodeError as e:
+        result_json = json_backend.loads(result.content)
+    except json_backend.JSONDecodeError as e:
         abort(400, {
             'message': 'can not parse result',
             'root_cause': str(e)
@@ -125,6 +376,41 @@ def get_entity(fiware_service, fiware_servicepath, entity_type, entity_id):
     return result_json
 
 
+def __request(method, endpoint, timeout, **kwargs):
+    breaker = get_breaker()
+    try:
+        breaker.before_call()
+        with get_bulkhead(LANE_REGULAR):
+            start = time.monotonic()
+            try:
+                result = getattr(requests, method)(endpoint, timeout=(const.ORION_CONNECT_TIMEOUT_SEC, timeout), **kwargs)
+            finally:
+                Latency.record(LATENCY_ORION_REGULAR, time.monotonic() - start)
+    except CircuitOpenError as e:
+        __unavailable('orion is unavailable now', str(e), e.retry_after)
+    except BulkheadFullError as e:
+        __unavailable('too many requests to orion', str(e), 1)
+    except RequestException as e:
+        breaker.record_failure()
+        logger.warning(f'can not connect to orion, method={method}, endpoint={endpoint}, {e}')
+        __unavailable('can not connect to orion', str(e), math.ceil(const.ORION_CIRCUIT_RESET_SEC))
+
+    if result.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return result
+
+
+def __unavailable(message, root_cause, retry_after):
+    error = ServiceUnavailable(description={
+        'message': message,
+        'root_cause': root_cause,
+    })
+    error.retry_after = retry_after
+    raise error
+
+
 def __make_headers(fiware_service, fiware_servicepath, require_contenttype=False):
     headers = {
         'FIWARE-SERVICE': fiware_service,
@@ -138,9 +424,72 @@ def __make_headers(fiware_service, fiware_servicepath, require_contenttype=False
     return headers
 
 
+def __make_params(params, attrs, key_values, count=False):
+    if attrs is not None:
+        if not (isinstance(attrs, (list, tuple)) and len(attrs) > 0 and all(isinstance(attr, str) for attr in attrs)):
+            raise TypeError('attrs must be a non-empty list of "str"')
+        params['attrs'] = ','.join(attrs)
+    options = []
+    if key_values:
+        options.append('keyValues')
+    if count:
+        options.append('count')
+    if options:
+        params['options'] = ','.join(options)
+
+    return params
+
+
+@contextmanager
+def unit_of_work():
+    t = getattr(_unit_of_work, 't', None)
+    if t is not None:
+        yield t
+        return
+    _unit_of_work.t = t = __now()
+    try:
+        yield t
+    finally:
+        _unit_of_work.t = None
+
+
+def __timestamp():
+    t = getattr(_unit_of_work, 't', None)
+    return t if t is not None else __now()
+
+
+def __now():
+    global _clock
+    sec, usec = divmod(round(time.time() * 1000000), 1000000)
+    timezone = get_timezone()
+    clock = _clock
+    if clock is None or clock[0] != sec or clock[1] is not timezone:
+        iso = datetime.datetime.fromtimestamp(sec, timezone).isoformat(timespec='seconds')
+        clock = _clock = (sec, timezone, iso[:19], iso[19:])
+    return f'{clock[2]}.{usec // 1000:03d}{clock[3]}'
+
+
+def __time_instant(t):
+    return {
+        'TimeInstant': {
+            'type': 'datetime',
+            'value': t,
+        }
+    }
+
+
+def __attr(attr_type, value, metadata):
+    return {
+        'type': attr_type,
+        'value': value,
+        'metadata': metadata,
+    }
+
+
 def make_delivery_robot_command(cmd, cmd_waypoints, navigating_waypoints,
                                 remaining_waypoints_list=None, current_routes=None, order=None, caller=None):
-    t = datetime.datetime.now(TZ).isoformat(timespec='milliseconds')
+    t = __timestamp()
+    metadata = __time_instant(t)
     payload = {
         'send_cmd': {
             'value': {
@@ -149,66 +498,40 @@ def make_delivery_robot_command(cmd, cmd_waypoints, navigating_waypoints,
                 'waypoints': cmd_waypoints,
             },
         },
-        'navigating_waypoints': {
-            'type': 'object',
-            'value': navigating_waypoints,
-            'metadata': {
-                'TimeInstant': {
-                    'type': 'datetime',
-                    'value': t,
-                }
-            }
-        },
+        'navigating_waypoints': __attr('object', navigating_waypoints, metadata),
     }
     if remaining_waypoints_list is not None:
-        payload['remaining_waypoints_list'] = {
-            'type': 'array',
-            'value': remaining_waypoints_list,
-            'metadata': {
-                'TimeInstant': {
-                    'type': 'datetime',
-                    'value': t,
-                }
-            }
-        }
+        payload['remaining_waypoints_list'] = __attr('array', remaining_waypoints_list, metadata)
     if current_routes is not None:
-        payload['current_routes'] = {
-            'type': 'array',
-            'value': current_routes,
-            'metadata': {
-                'TimeInstant': {
-                    'type': 'datetime',
-                    'value': t,
-                }
-            }
-        }
+        payload['current_routes'] = __attr('array', current_routes, metadata)
     if order is not None:
-        payload['order'] = {
-            'type': 'object',
-            'value': order,
-            'metadata': {
-                'TimeInstant': {
-                    'type': 'datetime',
-                    'value': t,
-                }
-            }
-        }
+        payload['order'] = __attr('object', order, metadata)
     if caller is not None and isinstance(caller, Caller):
-        payload['caller'] = {
-            'type': 'string',
-            'value': caller.value,
-            'metadata': {
-                'TimeInstant': {
-                    'type': 'datetime',
-                    'value': t,
-                }
-            }
-        }
+        payload['caller'] = __attr('string', caller.value, metadata)
     return payload
 
 
+def make_route_cursor_command(route_cursor):
+    t = __timestamp()
+    return {
+        'route_cursor': __attr('integer', route_cursor, __time_instant(t)),
+    }
+
+
 def make_emergency_command(cmd):
-    t = datetime.datetime.now(TZ).isoformat(timespec='milliseconds')
+    return __make_emergency_payload(__timestamp(), cmd)
+
+
+def make_emergency_command_body(cmd):
+    template = _emergency_templates.get(cmd)
+    if template is None:
+        body = json_backend.dumps(__make_emergency_payload(_EMERGENCY_TIME_PLACEHOLDER, cmd))
+        prefix, suffix = body.split(_EMERGENCY_TIME_PLACEHOLDER)
+        template = _emergency_templates[cmd] = (prefix.encode('utf-8'), suffix.encode('utf-8'))
+    return template[0] + __timestamp().encode('ascii') + template[1]
+
+
+def __make_emergency_payload(t, cmd):
     payload = {
         'send_emg': {
             'value': {
@@ -221,45 +544,24 @@ def make_emergency_command(cmd):
 
 
 def make_updatemode_command(next_mode):
-    t = datetime.datetime.now(TZ).isoformat(timespec='milliseconds')
     payload = {
-        'current_mode': {
-            'type': 'string',
-            'value': next_mode,
-            'metadata': {
-                'TimeInstant': {
-                    'type': 'datetime',
-                    'value': t,
-                }
-            }
-        },
+        'current_mode': __attr('string', next_mode, __time_instant(__timestamp())),
     }
     return payload
 
 
 def make_updatestate_command(next_state):
-    t = datetime.datetime.now(TZ).isoformat(timespec='milliseconds')
     payload = {
-        'current_state': {
-            'type': 'string',
-            'value': next_state,
-            'metadata': {
-                'TimeInstant': {
-                    'type': 'datetime',
-                    'value': t,
-                }
-            }
-        },
+        'current_state': __attr('string', next_state, __time_instant(__timestamp())),
     }
     return payload
 
 
 def make_robotui_sendstate_command(next_state, destination):
-    t = datetime.datetime.now(TZ).isoformat(timespec='milliseconds')
     payload = {
         'send_state': {
             'value': {
-                'time': t,
+                'time': __timestamp(),
                 'state': next_state,
                 'destination': destination,
             }
@@ -273,11 +575,10 @@ def make_robotui_sendtokeninfo_command(token, mode):
     if not (isinstance(token, src.token.Token) and isinstance(mode, src.token.TokenMode)):
         raise TypeError('invalid token or mode')
 
-    t = datetime.datetime.now(TZ).isoformat(timespec='milliseconds')
     payload = {
         'send_token_info': {
             'value': {
-                'time': t,
+                'time': __timestamp(),
                 'token': str(token),
                 'mode': str(mode),
                 'lock_owner_id': token.lock_owner_id,
@@ -289,38 +590,11 @@ def make_robotui_sendtokeninfo_command(token, mode):
 
 
 def make_token_info_command(is_locked, robot_id, waitings):
-    t = datetime.datetime.now(TZ).isoformat(timespec='milliseconds')
+    metadata = __time_instant(__timestamp())
     payload = {
-        'is_locked': {
-            'type': 'boolean',
-            'value': is_locked,
-            'metadata': {
-                'TimeInstant': {
-                    'type': 'datetime',
-                    'value': t,
-                }
-            }
-        },
-        'lock_owner_id': {
-            'type': 'string',
-            'value': robot_id,
-            'metadata': {
-                'TimeInstant': {
-                    'type': 'datetime',
-                    'value': t,
-                }
-            }
-        },
-        'waitings': {
-            'type': 'array',
-            'value': waitings,
-            'metadata': {
-                'TimeInstant': {
-                    'type': 'datetime',
-                    'value': t,
-                }
-            }
-        },
+        'is_locked': __attr('boolean', is_locked, metadata),
+        'lock_owner_id': __attr('string', robot_id, metadata),
+        'waitings': __attr('array', waitings, metadata),
     }
     return payload
 
@@ -329,17 +603,8 @@ def make_updatelastprocessedtime_command(last_processed_time):
     if not isinstance(last_processed_time, datetime.datetime):
         raise TypeError('last_processed_time is must be "datetime"')
 
-    t = datetime.datetime.now(TZ).isoformat(timespec='milliseconds')
     payload = {
-        'last_processed_time': {
-            'type': 'ISO8601',
-            'value': last_processed_time.isoformat(timespec='milliseconds'),
-            'metadata': {
-                'TimeInstant': {
-                    'type': 'datetime',
-                    'value': t,
-                }
-            }
-        },
+        'last_processed_time': __attr('ISO8601', last_processed_time.isoformat(timespec='milliseconds'),
+                                      __time_instant(__timestamp())),
     }
     return payload
@@ -0,0 +1,77 @@
+import math
+import time
+from logging import getLogger
+from threading import BoundedSemaphore, Lock
+
+logger = getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name, retry_after):
+        super().__init__(f'circuit "{name}" is open, retry after {retry_after}sec')
+        self.retry_after = retry_after
+
+
+class BulkheadFullError(Exception):
+    def __init__(self, name, timeout):
+        super().__init__(f'bulkhead "{name}" is full, waited {timeout}sec')
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold, reset_sec):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_sec = reset_sec
+        self._failures = 0
+        self._opened_at = None
+        self._lock = Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def before_call(self):
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.reset_sec - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(self.name, math.ceil(remaining))
+            self._opened_at = time.monotonic()
+            logger.info(f'circuit "{self.name}" is half-open, try a call')
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f'circuit "{self.name}" is closed')
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f'circuit "{self.name}" is open, consecutive failures={self._failures}')
+                self._opened_at = time.monotonic()
+
+
+class Bulkhead:
+    def __init__(self, name, max_concurrency, timeout_sec):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.timeout_sec = timeout_sec
+        self._semaphore = BoundedSemaphore(max_concurrency)
+
+    def __enter__(self):
+        if not self._semaphore.acquire(timeout=self.timeout_sec):
+            raise BulkheadFullError(self.name, self.timeout_sec)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._semaphore.release()
+        return False
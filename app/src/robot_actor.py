@@ -0,0 +1,125 @@
+import datetime
+import time
+import uuid
+from logging import getLogger
+from threading import Lock, RLock
+
+from flask import abort
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+from src import const
+
+logger = getLogger(__name__)
+
+LEASE_POLL_MSEC = 50
+
+
+class RobotActor:
+    _actors = {}
+    _collection = None
+    _lock = Lock()
+
+    @classmethod
+    def of(cls, robot_id):
+        if not isinstance(robot_id, str):
+            raise TypeError(f'invalid type of robot_id, type(robot_id)={type(robot_id)}')
+        with cls._lock:
+            if robot_id not in cls._actors:
+                cls._actors[robot_id] = cls(robot_id)
+            return cls._actors[robot_id]
+
+    @classmethod
+    def _get_mongo_collection(cls):
+        if cls._collection is None:
+            with cls._lock:
+                if cls._collection is None:
+                    mongo_client = MongoClient(
+                        const.MONGODB_HOST,
+                        const.MONGODB_PORT,
+                        replicaset=const.MONGODB_REPLICASET)
+                    collection = mongo_client[const.MONGODB_DB_NAME][const.MONGODB_ROBOT_ACTOR_COLLECTION_NAME]
+                    collection.create_index([('robot_id', ASCENDING)], unique=True)
+                    cls._collection = collection
+        return cls._collection
+
+    def __init__(self, robot_id):
+        self.robot_id = robot_id
+        self._mailbox = RLock()
+        self._depth = 0
+        self._owner = None
+
+    def __enter__(self):
+        deadline = time.monotonic() + const.ROBOT_ACTOR_TIMEOUT_SEC
+        if not self._mailbox.acquire(timeout=const.ROBOT_ACTOR_TIMEOUT_SEC):
+            self._busy()
+        try:
+            if self._depth == 0:
+                self._owner = self._acquire_lease(deadline)
+        except BaseException:
+            self._mailbox.release()
+            raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._depth -= 1
+        try:
+            if self._depth == 0:
+                owner, self._owner = self._owner, None
+                self._release_lease(owner)
+        finally:
+            self._mailbox.release()
+        return False
+
+    def _acquire_lease(self, deadline):
+        owner = uuid.uuid4().hex
+        collection = self._get_mongo_collection()
+        while True:
+            now = datetime.datetime.utcnow()
+            try:
+                collection.find_one_and_update(
+                    {
+                        'robot_id': self.robot_id,
+                        '$or': [
+                            {'owner': None},
+                            {'expires_at': {'$lte': now}},
+                        ],
+                    },
+                    {
+                        '$set': {
+                            'owner': owner,
+                            'expires_at': now + datetime.timedelta(seconds=const.ROBOT_ACTOR_LEASE_SEC),
+                        }
+                    },
+                    upsert=True)
+                logger.debug(f'acquire robot lease, robot_id={self.robot_id}, owner={owner}')
+                return owner
+            except DuplicateKeyError:
+                pass
+            if time.monotonic() >= deadline:
+                self._busy()
+            time.sleep(LEASE_POLL_MSEC / 1000.0)
+
+    def _release_lease(self, owner):
+        self._get_mongo_collection().update_one(
+            {
+                'robot_id': self.robot_id,
+                'owner': owner,
+            },
+            {
+                '$set': {
+                    'owner': None,
+                    'expires_at': None,
+                }
+            }
+        )
+        logger.debug(f'release robot lease, robot_id={self.robot_id}, owner={owner}')
+
+    def _busy(self):
+        msg = f'robot({self.robot_id}) is busy now, timeout={const.ROBOT_ACTOR_TIMEOUT_SEC}sec'
+        logger.warning(msg)
+        abort(423, {
+            'message': msg,
+            'id': self.robot_id,
+        })
@@ -0,0 +1,327 @@
+import datetime
+import threading
+import time
+from logging import getLogger
+
+import dateutil.parser
+
+from src import const, orion, json_backend
+
+try:
+    import uwsgi
+except ImportError:
+    uwsgi = None
+
+logger = getLogger(__name__)
+
+CACHED_ATTRS = ['mode', 'navigating_waypoints', 'order', 'caller']
+PLACE_VERSION_KEY = 'places:version'
+
+
+class _LocalStore:
+    name = 'local'
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._data.get(key)
+
+    def set(self, key, value):
+        self._data[key] = value
+        return True
+
+    def lock(self):
+        self._lock.acquire()
+
+    def unlock(self):
+        self._lock.release()
+
+
+class _UwsgiStore:
+    name = 'uwsgi'
+
+    def __init__(self, cache_name):
+        self._cache_name = cache_name
+        self._decoded = {}
+
+    def get(self, key):
+        value = uwsgi.cache_get(key, self._cache_name)
+        if value is None:
+            return None
+        decoded = self._decoded.get(key)
+        if decoded is not None and decoded[0] == value:
+            return decoded[1]
+        try:
+            entry = json_backend.loads(value)
+        except json_backend.JSONDecodeError as e:
+            logger.warning(f'broken cache entry, key={key}, {e}')
+            return None
+        self._decoded[key] = (value, entry)
+        return entry
+
+    def set(self, key, value):
+        return bool(uwsgi.cache_update(key, json_backend.dumps(value).encode('utf-8'), 0, self._cache_name))
+
+    def lock(self):
+        uwsgi.lock()
+
+    def unlock(self):
+        uwsgi.unlock()
+
+
+def _to_timestamp(value):
+    try:
+        t = dateutil.parser.parse(value) if isinstance(value, str) else None
+    except (ValueError, OverflowError):
+        t = None
+    if t is None:
+        return None
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=datetime.timezone.utc)
+    return t.timestamp()
+
+
+def _parse_entity(entity):
+    values = {}
+    versions = []
+    if isinstance(entity.get('TimeInstant'), dict):
+        versions.append(_to_timestamp(entity['TimeInstant'].get('value')))
+    for attr in CACHED_ATTRS:
+        item = entity.get(attr)
+        if not isinstance(item, dict):
+            values[attr] = None
+            continue
+        values[attr] = item.get('value')
+        metadata = item.get('metadata')
+        if isinstance(metadata, dict) and isinstance(metadata.get('TimeInstant'), dict):
+            versions.append(_to_timestamp(metadata['TimeInstant'].get('value')))
+    versions = [v for v in versions if v is not None]
+    return values, max(versions) if versions else None
+
+
+class RobotCache:
+    _store = None
+    _place_store = None
+
+    @classmethod
+    def _get_store(cls):
+        if cls._store is None:
+            if uwsgi is not None and const.ROBOT_CACHE_NAME:
+                cls._store = _UwsgiStore(const.ROBOT_CACHE_NAME)
+            else:
+                cls._store = _LocalStore()
+            logger.debug(f'robot cache created, store={cls._store.name}')
+        return cls._store
+
+    @classmethod
+    def _get_place_store(cls):
+        if cls._place_store is None:
+            if uwsgi is not None and const.PLACE_CACHE_NAME:
+                cls._place_store = _UwsgiStore(const.PLACE_CACHE_NAME)
+            else:
+                cls._place_store = cls._get_store()
+            logger.debug(f'place cache created, store={cls._place_store.name}')
+        return cls._place_store
+
+    @classmethod
+    def _is_fresh(cls, entry):
+        if not isinstance(entry, dict) or 'entity' not in entry:
+            return False
+        return const.ROBOT_CACHE_TTL_SEC <= 0 or time.time() - entry.get('cached_at', 0) < const.ROBOT_CACHE_TTL_SEC
+
+    @classmethod
+    def _put(cls, key, entity, version, attrs=None, store=None):
+        store = store if store is not None else cls._get_store()
+        store.lock()
+        try:
+            current = store.get(key)
+            if isinstance(current, dict) and current.get('version') is not None \
+                    and (version < current['version'] if version is not None else cls._is_fresh(current)):
+                logger.debug(f'ignore stale entity, key={key}, version={version}, cached version={current["version"]}')
+                return False
+            if attrs is not None and isinstance(current, dict) and isinstance(current.get('entity'), dict):
+                entity = {k: v if k in attrs else current['entity'].get(k) for k, v in entity.items()}
+            if not store.set(key, {'entity': entity, 'version': version, 'cached_at': time.time()}):
+                logger.warning(f'can not store entity to robot cache, key={key}')
+                return False
+            return True
+        finally:
+            store.unlock()
+
+    @classmethod
+    def notify(cls, entity):
+        if isinstance(entity, dict) and isinstance(entity.get('id'), str) and entity.get('type') == const.PLACE_TYPE:
+            return cls._notify_place(entity)
+        if not (isinstance(entity, dict) and isinstance(entity.get('id'), str)
+                and entity.get('type', const.DELIVERY_ROBOT_TYPE) == const.DELIVERY_ROBOT_TYPE):
+            raise TypeError(f'invalid notified entity, {entity}')
+
+        values, version = _parse_entity(entity)
+        return cls._put(f'robot:{entity["id"]}', values, version, attrs=[attr for attr in CACHED_ATTRS if attr in entity])
+
+    @classmethod
+    def _notify_place(cls, entity):
+        store = cls._get_store()
+        store.lock()
+        try:
+            name = entity.get('name')
+            if isinstance(name, dict) and isinstance(name.get('value'), str):
+                place = {'entity': {'name': name['value']}, 'version': None, 'cached_at': time.time()}
+            else:
+                place = {}
+            if not cls._get_place_store().set(f'place:{entity["id"]}', place):
+                logger.warning(f'can not store place to place cache, place_id={entity["id"]}')
+            current = store.get(PLACE_VERSION_KEY)
+            version = (current.get('version', 0) if isinstance(current, dict) else 0) + 1
+            if not store.set(PLACE_VERSION_KEY, {'version': version}):
+                logger.error(f'can not update place version, place_id={entity["id"]}, place version={version}')
+                return False
+        finally:
+            store.unlock()
+        logger.debug(f'place changed, place_id={entity["id"]}, place version={version}')
+        return True
+
+    @classmethod
+    def set_flag(cls, name, ttl_sec):
+        store = cls._get_store()
+        store.lock()
+        try:
+            current = store.get(f'flag:{name}')
+            if isinstance(current, dict) and time.time() - current.get('set_at', 0) < ttl_sec:
+                return False
+            return store.set(f'flag:{name}', {'set_at': time.time()})
+        finally:
+            store.unlock()
+
+    @classmethod
+    def clear_flag(cls, name):
+        store = cls._get_store()
+        store.lock()
+        try:
+            store.set(f'flag:{name}', {})
+        finally:
+            store.unlock()
+
+    @classmethod
+    def get_place_version(cls):
+        entry = cls._get_store().get(PLACE_VERSION_KEY)
+        return entry.get('version', 0) if isinstance(entry, dict) else 0
+
+    @classmethod
+    def get(cls, robot_id):
+        return cls.get_with_version(robot_id)[0]
+
+    @classmethod
+    def get_with_version(cls, robot_id):
+        if not isinstance(robot_id, str):
+            raise TypeError(f'invalid type of robot_id, type(robot_id)={type(robot_id)}')
+
+        entry = cls._get_store().get(f'robot:{robot_id}')
+        if cls._is_fresh(entry):
+            return entry['entity'], entry.get('version')
+
+        logger.debug(f'robot cache miss, robot_id={robot_id}')
+        entity = orion.get_entity(
+            const.FIWARE_SERVICE,
+            const.DELIVERY_ROBOT_SERVICEPATH,
+            const.DELIVERY_ROBOT_TYPE,
+            robot_id,
+            attrs=CACHED_ATTRS + ['TimeInstant'])
+        values, version = _parse_entity(entity)
+        cls._put(f'robot:{robot_id}', values, version)
+        return values, version
+
+    @classmethod
+    def get_all(cls, robot_ids):
+        if not (isinstance(robot_ids, (list, tuple)) and all(isinstance(robot_id, str) for robot_id in robot_ids)):
+            raise TypeError('robot_ids must be a list of "str"')
+
+        store = cls._get_store()
+        entries = {robot_id: store.get(f'robot:{robot_id}') for robot_id in robot_ids}
+        if all(cls._is_fresh(entry) for entry in entries.values()):
+            return {robot_id: entry['entity'] for robot_id, entry in entries.items()}
+
+        logger.debug(f'robot cache miss, robot_ids={robot_ids}')
+        robots = {}
+        for entity in orion.iter_entities(
+                const.FIWARE_SERVICE,
+                const.DELIVERY_ROBOT_SERVICEPATH,
+                const.DELIVERY_ROBOT_TYPE,
+                attrs=CACHED_ATTRS + ['TimeInstant']):
+            if entity.get('id') in entries:
+                values, version = _parse_entity(entity)
+                cls._put(f'robot:{entity["id"]}', values, version)
+                robots[entity['id']] = values
+        return {robot_id: robots[robot_id] for robot_id in robot_ids if robot_id in robots}
+
+    @classmethod
+    def get_place_names(cls, place_ids):
+        if not (isinstance(place_ids, (list, tuple, set)) and all(isinstance(place_id, str) for place_id in place_ids)):
+            raise TypeError('place_ids must be a list of "str"')
+
+        store = cls._get_place_store()
+        names = {}
+        for place_id in place_ids:
+            entry = store.get(f'place:{place_id}')
+            if cls._is_fresh(entry):
+                names[place_id] = entry['entity']['name']
+        missing = set(place_ids) - set(names)
+        if not missing:
+            return names
+
+        logger.debug(f'place cache miss, place_ids={missing}')
+        for place in orion.iter_entities(
+                const.FIWARE_SERVICE,
+                const.DELIVERY_ROBOT_SERVICEPATH,
+                const.PLACE_TYPE,
+                attrs=['name'],
+                key_values=True):
+            if place['id'] in missing:
+                names[place['id']] = place.get('name') or ''
+                cls._put(f'place:{place["id"]}', {'name': names[place['id']]}, None, store=store)
+        for place_id in missing - set(names):
+            cls._put(f'place:{place_id}', {'name': ''}, None, store=store)
+        return {place_id: names.get(place_id, '') for place_id in place_ids}
+
+    @classmethod
+    def get_place_name(cls, place_id):
+        if not isinstance(place_id, str):
+            raise TypeError(f'invalid type of place_id, type(place_id)={type(place_id)}')
+
+        entry = cls._get_place_store().get(f'place:{place_id}')
+        if cls._is_fresh(entry):
+            return entry['entity']['name']
+
+        place = orion.get_entity(
+            const.FIWARE_SERVICE,
+            const.DELIVERY_ROBOT_SERVICEPATH,
+            const.PLACE_TYPE,
+            place_id,
+            attrs=['name'],
+            key_values=True)
+        name = place['name'] if isinstance(place, dict) and 'name' in place else ''
+        cls._put(f'place:{place_id}', {'name': name}, None, store=cls._get_place_store())
+        return name
+
+    @classmethod
+    def put_state(cls, robot_id, state, destination):
+        if not isinstance(robot_id, str):
+            raise TypeError(f'invalid type of robot_id, type(robot_id)={type(robot_id)}')
+
+        value = {'id': robot_id, 'state': state, 'destination': destination}
+        if not cls._put(f'state:{robot_id}', value, time.time()):
+            logger.warning(f'can not publish robot state, robot_id={robot_id}, state={state}')
+            return None
+        return value
+
+    @classmethod
+    def get_state(cls, robot_id):
+        if not isinstance(robot_id, str):
+            raise TypeError(f'invalid type of robot_id, type(robot_id)={type(robot_id)}')
+
+        entry = cls._get_store().get(f'state:{robot_id}')
+        if not isinstance(entry, dict) or 'entity' not in entry:
+            return None
+        return entry['entity']
@@ -0,0 +1,18 @@
+from src import const
+from src.caller import Caller
+
+
+def derive_state(navigating_waypoints, order, get_caller):
+    if not (isinstance(navigating_waypoints, dict) and 'to' in navigating_waypoints and isinstance(order, dict)
+            and 'source' in order and 'destination' in order and 'via' in order and isinstance(order['via'], list)):
+        return const.STATE_STANDBY
+
+    to = navigating_waypoints['to']
+    if to == order['source']:
+        return const.STATE_STANDBY
+    elif to == order['destination']:
+        return const.STATE_DELIVERING if Caller.value_of(get_caller()) == Caller.ORDERING else const.STATE_PICKING
+    elif to in order['via']:
+        return const.STATE_PICKING
+    else:
+        return const.STATE_MOVING
@@ -0,0 +1,56 @@
+import math
+from logging import getLogger
+
+from src import const
+from src.utils import iter_flatten
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger = getLogger(__name__)
+
+NUMPY_MIN_POINTS = 64
+
+
+def _to_xyz(point):
+    try:
+        return float(point.get('x', 0.0)), float(point.get('y', 0.0)), float(point.get('z', 0.0))
+    except (AttributeError, TypeError, ValueError):
+        raise TypeError(f'invalid point, {point}')
+
+
+def segment_lengths(points):
+    coords = [_to_xyz(point) for point in points]
+    if len(coords) < 2:
+        return []
+    if numpy is not None and len(coords) >= NUMPY_MIN_POINTS:
+        return numpy.linalg.norm(numpy.diff(numpy.asarray(coords, dtype=float), axis=0), axis=1).tolist()
+    return [math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2 + (z2 - z1) ** 2)
+            for (x1, y1, z1), (x2, y2, z2) in zip(coords, coords[1:])]
+
+
+def measure(routes, places, speed=None):
+    if speed is None:
+        speed = const.ROBOT_SPEED_MPS
+    if not (isinstance(speed, (int, float)) and speed > 0):
+        raise ValueError(f'speed must be a positive number, speed={speed}')
+
+    metrics = []
+    distances = []
+    for route in routes:
+        points = [places[place_id]['point'] for place_id in iter_flatten((route['from'], route['via'], route['to']))]
+        distance = math.fsum(segment_lengths(points))
+        distances.append(distance)
+        metrics.append({
+            'to': route['to'],
+            'distance': round(distance, 3),
+            'eta_sec': round(distance / speed, 3),
+        })
+    distance = math.fsum(distances)
+    return {
+        'distance': round(distance, 3),
+        'eta_sec': round(distance / speed, 3),
+        'routes': metrics,
+    }
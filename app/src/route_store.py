@@ -0,0 +1,137 @@
+import datetime
+from logging import getLogger
+from threading import Lock
+
+from pymongo import MongoClient, ASCENDING
+
+from src import const
+
+logger = getLogger(__name__)
+
+
+class RouteStore:
+    _collection = None
+    _lock = Lock()
+
+    @classmethod
+    def _get_mongo_collection(cls):
+        if cls._collection is None:
+            with cls._lock:
+                if cls._collection is None:
+                    mongo_client = MongoClient(
+                        const.MONGODB_HOST,
+                        const.MONGODB_PORT,
+                        replicaset=const.MONGODB_REPLICASET)
+                    collection = mongo_client[const.MONGODB_DB_NAME][const.MONGODB_ROUTE_STORE_COLLECTION_NAME]
+                    collection.create_index([('robot_id', ASCENDING)], unique=True)
+                    cls._collection = collection
+        return cls._collection
+
+    @classmethod
+    def start(cls, robot_id, remaining_waypoints_list):
+        if not isinstance(robot_id, str):
+            raise TypeError(f'invalid type of robot_id, type(robot_id)={type(robot_id)}')
+        if not isinstance(remaining_waypoints_list, list):
+            raise TypeError(f'invalid type of remaining_waypoints_list, '
+                            f'type(remaining_waypoints_list)={type(remaining_waypoints_list)}')
+
+        cls._get_mongo_collection().replace_one(
+            {
+                'robot_id': robot_id,
+            },
+            {
+                'robot_id': robot_id,
+                'remaining_waypoints_list': remaining_waypoints_list,
+                'route_cursor': 0,
+                'updated_at': datetime.datetime.utcnow(),
+            },
+            upsert=True)
+        logger.debug(f'start route, robot_id={robot_id}, len(remaining_waypoints_list)={len(remaining_waypoints_list)}')
+
+    @classmethod
+    def get(cls, robot_id):
+        if not isinstance(robot_id, str):
+            raise TypeError(f'invalid type of robot_id, type(robot_id)={type(robot_id)}')
+
+        route = cls._get_mongo_collection().find_one(
+            {
+                'robot_id': robot_id,
+            },
+            {
+                '_id': False,
+                'remaining_waypoints_list': True,
+            })
+        if route is None:
+            return None
+        return route['remaining_waypoints_list']
+
+    @classmethod
+    def get_all(cls, robot_ids):
+        if not (isinstance(robot_ids, (list, tuple)) and all(isinstance(robot_id, str) for robot_id in robot_ids)):
+            raise TypeError('robot_ids must be a list of "str"')
+
+        routes = cls._get_mongo_collection().find(
+            {
+                'robot_id': {
+                    '$in': list(robot_ids),
+                },
+            },
+            {
+                '_id': False,
+                'robot_id': True,
+                'remaining_waypoints_list': True,
+            })
+        return {route['robot_id']: route['remaining_waypoints_list'] for route in routes}
+
+    @classmethod
+    def peek(cls, robot_id):
+        if not isinstance(robot_id, str):
+            raise TypeError(f'invalid type of robot_id, type(robot_id)={type(robot_id)}')
+
+        route = cls._get_mongo_collection().find_one(
+            {
+                'robot_id': robot_id,
+                'remaining_waypoints_list.0': {
+                    '$exists': True,
+                },
+            },
+            {
+                '_id': False,
+                'remaining_waypoints_list': {'$slice': 1},
+                'route_cursor': True,
+            })
+        if route is None:
+            return None
+        return route['remaining_waypoints_list'][0], route['route_cursor']
+
+    @classmethod
+    def pop(cls, robot_id, route_cursor):
+        if not isinstance(robot_id, str):
+            raise TypeError(f'invalid type of robot_id, type(robot_id)={type(robot_id)}')
+        if not isinstance(route_cursor, int) or isinstance(route_cursor, bool):
+            raise TypeError(f'invalid type of route_cursor, type(route_cursor)={type(route_cursor)}')
+
+        result = cls._get_mongo_collection().update_one(
+            {
+                'robot_id': robot_id,
+                'route_cursor': route_cursor,
+                'remaining_waypoints_list.0': {
+                    '$exists': True,
+                },
+            },
+            {
+                '$pop': {
+                    'remaining_waypoints_list': -1,
+                },
+                '$inc': {
+                    'route_cursor': 1,
+                },
+                '$set': {
+                    'updated_at': datetime.datetime.utcnow(),
+                },
+            })
+        if result.modified_count != 1:
+            logger.warning(f'route already changed, robot_id={robot_id}, route_cursor={route_cursor}')
+            return False
+        logger.debug(f'pop route, robot_id={robot_id}, route_cursor={route_cursor}')
+        return True
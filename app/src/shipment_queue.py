@@ -0,0 +1,130 @@
+import datetime
+import uuid
+from logging import getLogger
+from threading import Lock
+
+from pymongo import MongoClient, ASCENDING, ReturnDocument
+
+from src import const
+
+logger = getLogger(__name__)
+
+STATUS_QUEUED = 'queued'
+STATUS_DISPATCHING = 'dispatching'
+STATUS_DISPATCHED = 'dispatched'
+STATUS_IGNORED = 'ignored'
+STATUS_FAILED = 'failed'
+
+
+class ShipmentQueue:
+    _collection = None
+    _lock = Lock()
+
+    @classmethod
+    def _get_mongo_collection(cls):
+        if cls._collection is None:
+            with cls._lock:
+                if cls._collection is None:
+                    mongo_client = MongoClient(
+                        const.MONGODB_HOST,
+                        const.MONGODB_PORT,
+                        replicaset=const.MONGODB_REPLICASET)
+                    collection = mongo_client[const.MONGODB_DB_NAME][const.MONGODB_SHIPMENT_QUEUE_COLLECTION_NAME]
+                    collection.create_index([('ticket_id', ASCENDING)], unique=True)
+                    collection.create_index([('status', ASCENDING), ('created_at', ASCENDING)])
+                    cls._collection = collection
+        return cls._collection
+
+    @classmethod
+    def enqueue(cls, shipment_list):
+        if not isinstance(shipment_list, dict):
+            raise TypeError(f'invalid type of shipment_list, type(shipment_list)={type(shipment_list)}')
+
+        now = datetime.datetime.utcnow()
+        ticket_id = uuid.uuid4().hex
+        cls._get_mongo_collection().insert_one({
+            'ticket_id': ticket_id,
+            'status': STATUS_QUEUED,
+            'shipment_list': shipment_list,
+            'created_at': now,
+            'updated_at': now,
+        })
+        logger.info(f'enqueue shipment, ticket_id={ticket_id}')
+        return ticket_id
+
+    @classmethod
+    def get(cls, ticket_id):
+        if not isinstance(ticket_id, str):
+            raise TypeError(f'invalid type of ticket_id, type(ticket_id)={type(ticket_id)}')
+
+        return cls._get_mongo_collection().find_one({'ticket_id': ticket_id}, {'_id': False})
+
+    @classmethod
+    def acquire(cls):
+        ticket = cls._get_mongo_collection().find_one_and_update(
+            {
+                'status': STATUS_QUEUED,
+            },
+            {
+                '$set': {
+                    'status': STATUS_DISPATCHING,
+                    'updated_at': datetime.datetime.utcnow(),
+                }
+            },
+            sort=[('created_at', ASCENDING)],
+            projection={'_id': False},
+            return_document=ReturnDocument.AFTER,
+        )
+        if ticket is not None:
+            logger.debug(f'acquire shipment, ticket_id={ticket["ticket_id"]}')
+        return ticket
+
+    @classmethod
+    def requeue(cls, timeout_sec):
+        now = datetime.datetime.utcnow()
+        result = cls._get_mongo_collection().update_many(
+            {
+                'status': STATUS_DISPATCHING,
+                'updated_at': {'$lt': now - datetime.timedelta(seconds=timeout_sec)},
+            },
+            {
+                '$set': {
+                    'status': STATUS_QUEUED,
+                    'updated_at': now,
+                }
+            }
+        )
+        if result.modified_count > 0:
+            logger.warning(f'requeue stale shipments, count={result.modified_count}')
+        return result.modified_count
+
+    @classmethod
+    def release(cls, ticket_id):
+        cls._update(ticket_id, STATUS_QUEUED)
+        logger.debug(f'release shipment, ticket_id={ticket_id}')
+
+    @classmethod
+    def complete(cls, ticket_id, result):
+        status = STATUS_DISPATCHED if result.get('result') == 'success' else STATUS_IGNORED
+        cls._update(ticket_id, status, result=result)
+        logger.info(f'dispatch shipment, ticket_id={ticket_id}, status={status}')
+
+    @classmethod
+    def fail(cls, ticket_id, message):
+        cls._update(ticket_id, STATUS_FAILED, result={'message': message})
+        logger.warning(f'fail to dispatch shipment, ticket_id={ticket_id}, message={message}')
+
+    @classmethod
+    def _update(cls, ticket_id, status, **kwargs):
+        cls._get_mongo_collection().update_one(
+            {
+                'ticket_id': ticket_id,
+            },
+            {
+                '$set': {
+                    'status': status,
+                    'updated_at': datetime.datetime.utcnow(),
+                    **kwargs,
+                }
+            }
+        )
@@ -1,8 +1,25 @@
+import hashlib
 import json
 
 
 def flatten(x):
-    return [z for y in x for z in (flatten(y) if hasattr(y, '__iter__') and not isinstance(y, str) else (y,))]
+    return list(iter_flatten(x))
+
+
+def iter_flatten(x):
+    return _iter_flatten(iter(x))
+
+
+def _iter_flatten(it):
+    stack = [it]
+    while stack:
+        for y in stack[-1]:
+            if not isinstance(y, str) and hasattr(y, '__iter__'):
+                stack.append(iter(y))
+                break
+            yield y
+        else:
+            stack.pop()
 
 
 def is_jsonable(x):
@@ -11,3 +28,7 @@ def is_jsonable(x):
         return True
     except (TypeError, OverflowError):
         return False
+
+
+def make_etag(x):
+    return hashlib.sha1(json.dumps(x, sort_keys=True, default=str).encode('utf-8')).hexdigest()
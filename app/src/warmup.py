@@ -0,0 +1,115 @@
+import time
+from logging import getLogger
+
+from src import const, orion
+from src.robot_cache import RobotCache
+from src.waypoint import PlaceIndex, Waypoint
+
+try:
+    import uwsgi
+except ImportError:
+    uwsgi = None
+
+logger = getLogger(__name__)
+
+REFRESH_PLACES_FLAG = 'warmup:places'
+REFRESH_PLACES_PENDING_SEC = 60
+
+_refreshed_place_version = None
+
+
+def warm_places(prefetch=True):
+    return PlaceIndex.load(prefetch=prefetch)
+
+
+def warm_route_plans(prefetch=True):
+    route_plans = {route_plan['id']: route_plan for route_plan in orion.iter_entities(
+        const.FIWARE_SERVICE,
+        const.DELIVERY_ROBOT_SERVICEPATH,
+        const.ROUTE_PLAN_TYPE,
+        attrs=['routes', 'source'],
+        key_values=True,
+        prefetch=prefetch)}
+    if route_plans:
+        Waypoint().compile_route_plans(route_plans)
+    return len(route_plans)
+
+
+def warm_robots(prefetch=True):
+    robot_ids = [robot_id for robot_id in const.DELIVERY_ROBOT_LIST if robot_id]
+    return len(RobotCache.get_all(robot_ids))
+
+
+PLACE_STAGES = (
+    ('places', warm_places),
+    ('route_plans', warm_route_plans),
+)
+STAGES = PLACE_STAGES + (
+    ('robots', warm_robots),
+)
+
+
+def run(stages=STAGES, prefetch=True):
+    result = {}
+    for name, stage in stages:
+        start = time.monotonic()
+        try:
+            result[name] = stage(prefetch=prefetch)
+        except Exception as e:
+            logger.warning(f'warm-up "{name}" failed, {e}')
+            result[name] = None
+            continue
+        logger.info(f'warm-up "{name}", count={result[name]}, elapsed={(time.monotonic() - start) * 1000:.1f}msec')
+    return result
+
+
+def _refresh(signum):
+    logger.debug(f'refresh warm-up by signal {signum}')
+    run()
+
+
+def _refresh_places(signum):
+    global _refreshed_place_version
+    RobotCache.clear_flag(REFRESH_PLACES_FLAG)
+    version = RobotCache.get_place_version()
+    if version == _refreshed_place_version:
+        logger.debug(f'skip refreshing places, place version={version}')
+        return
+    logger.debug(f'refresh places by signal {signum}, place version={version}')
+    _refreshed_place_version = version
+    run(PLACE_STAGES)
+
+
+def _postfork():
+    start = time.monotonic()
+    if orion.warm_emergency_session():
+        logger.info(f'warm-up "emergency_session", elapsed={(time.monotonic() - start) * 1000:.1f}msec')
+
+
+def prefork():
+    if uwsgi is None:
+        return None
+    if not const.WARMUP_ENABLED:
+        logger.info('warm-up is disabled')
+        uwsgi.post_fork_hook = _postfork
+        return None
+
+    global _refreshed_place_version
+    _refreshed_place_version = RobotCache.get_place_version()
+    result = run(prefetch=False)
+    uwsgi.post_fork_hook = _postfork
+    uwsgi.register_signal(const.WARMUP_SIGNAL, 'workers', _refresh)
+    uwsgi.register_signal(const.WARMUP_PLACES_SIGNAL, 'workers', _refresh_places)
+    if const.WARMUP_REFRESH_SEC > 0:
+        uwsgi.add_timer(const.WARMUP_SIGNAL, const.WARMUP_REFRESH_SEC)
+    return result
+
+
+def request_refresh():
+    if uwsgi is None or not const.WARMUP_ENABLED:
+        return False
+    if not RobotCache.set_flag(REFRESH_PLACES_FLAG, REFRESH_PLACES_PENDING_SEC):
+        logger.debug('refreshing places is already pending')
+        return False
+    uwsgi.signal(const.WARMUP_PLACES_SIGNAL)
+    return True
@@ -1,20 +1,77 @@
+import math
+import time
+from collections import OrderedDict
 from logging import getLogger
+from threading import Lock
+from types import MappingProxyType
 
-from src import const, orion
-from src.utils import flatten
+from flask import abort
+
+from src import const, orion, route_metrics
+from src.robot_cache import RobotCache
+from src.utils import iter_flatten, make_etag
+from src.waypoint_array import WaypointArray, intern_route, to_list
 
 logger = getLogger(__name__)
 
+WAYPOINT_CACHE_SIZE = 256
+
+
+class PlaceIndex:
+    _snapshot = None
+
+    @classmethod
+    def load(cls, prefetch=True):
+        version = RobotCache.get_place_version()
+        poses = {place['id']: place['pose'] for place in orion.iter_entities(
+            const.FIWARE_SERVICE,
+            const.DELIVERY_ROBOT_SERVICEPATH,
+            const.PLACE_TYPE,
+            attrs=['pose'],
+            key_values=True,
+            prefetch=prefetch)}
+        cls._snapshot = (version, time.time(), MappingProxyType(poses))
+        logger.debug(f'place index loaded, places={len(poses)}, place version={version}')
+        return len(poses)
+
+    @classmethod
+    def clear(cls):
+        cls._snapshot = None
+
+    @classmethod
+    def get(cls, place_ids):
+        snapshot = cls._snapshot
+        if snapshot is None:
+            return None
+        version, loaded_at, poses = snapshot
+        if version != RobotCache.get_place_version() \
+                or (const.WAYPOINT_CACHE_TTL_SEC > 0 and time.time() - loaded_at >= const.WAYPOINT_CACHE_TTL_SEC):
+            return None
+        try:
+            return {place_id: poses[place_id] for place_id in place_ids}
+        except KeyError:
+            return None
+
 
 class Waypoint:
+    _compiled = OrderedDict()
+    _lock = Lock()
+
     def estimate_routes(self, shipment_list, robot_id):
+        _, routes, waypoints_list, order = self.estimate_best_routes(shipment_list, [robot_id])
+        return routes, waypoints_list, order
+
+    def check_shipment_list(self, shipment_list):
         if not ('destination' in shipment_list and 'name' in shipment_list['destination']
                 and isinstance(shipment_list['destination']['name'], str)
                 and 'updated' in shipment_list and isinstance(shipment_list['updated'], list)
                 and all('place' in v for v in shipment_list['updated'])
                 and all(isinstance(v['place'], str) for v in shipment_list['updated'])):
             raise TypeError('invalid shipment_list')
-        if not isinstance(robot_id, str):
+
+    def estimate_best_routes(self, shipment_list, robot_ids):
+        self.check_shipment_list(shipment_list)
+        if not (isinstance(robot_ids, list) and len(robot_ids) > 0 and all(isinstance(r, str) for r in robot_ids)):
             raise TypeError('invalid robot_id')
 
         logger.info(f'shipment_list = {shipment_list}')
@@ -23,55 +80,164 @@ class Waypoint:
             const.FIWARE_SERVICE,
             const.DELIVERY_ROBOT_SERVICEPATH,
             const.PLACE_TYPE,
-            f'name=={shipment_list["destination"]["name"]}')['id']
+            f'name=={shipment_list["destination"]["name"]}',
+            attrs=['name'],
+            key_values=True)['id']
 
         via_name_list = list(set([v['place'] for v in shipment_list['updated']]))
         via_list = [orion.query_entity(
             const.FIWARE_SERVICE,
             const.DELIVERY_ROBOT_SERVICEPATH,
             const.PLACE_TYPE,
-            f'name=={v}')['id'] for v in sorted(via_name_list)]
+            f'name=={v}',
+            attrs=['name'],
+            key_values=True)['id'] for v in sorted(via_name_list)]
         via = const.VIA_SEPARATOR.join(sorted(via_list))
 
-        route_plan = orion.query_entity(
-            const.FIWARE_SERVICE,
-            const.DELIVERY_ROBOT_SERVICEPATH,
-            const.ROUTE_PLAN_TYPE,
-            f'destination=={destination};via=={via};robot_id=={robot_id}')
-        routes = route_plan['routes']['value']
-        source = route_plan['source']['value']
-
-        places = self.get_places([flatten([r['from'], r['via'], r['to'], r['destination']]) for r in routes])
+        if len(robot_ids) == 1:
+            robot_id = robot_ids[0]
+            route_plan = orion.query_entity(
+                const.FIWARE_SERVICE,
+                const.DELIVERY_ROBOT_SERVICEPATH,
+                const.ROUTE_PLAN_TYPE,
+                f'destination=={destination};via=={via};robot_id=={robot_id}',
+                attrs=['routes', 'source'],
+                key_values=True)
+            compiled = self.compile_route_plans({robot_id: route_plan})[robot_id]
+        else:
+            query = f'destination=={destination};via=={via};robot_id=={",".join(robot_ids)}'
+            route_plans = {route_plan['robot_id']: route_plan for route_plan in orion.iter_entities(
+                const.FIWARE_SERVICE,
+                const.DELIVERY_ROBOT_SERVICEPATH,
+                const.ROUTE_PLAN_TYPE,
+                query=query,
+                attrs=['robot_id', 'routes', 'source'],
+                key_values=True)}
+            candidates = [robot_id for robot_id in robot_ids if robot_id in route_plans]
+            if not candidates:
+                abort(400, {
+                    'message': f'can not retrieve an entity, entity_type={const.ROUTE_PLAN_TYPE}, query={query}',
+                })
+
+            candidate_plans = self.compile_route_plans({robot_id: route_plans[robot_id] for robot_id in candidates})
+            lengths = {robot_id: c['metrics']['distance'] if c['metrics'] is not None else math.inf
+                       for robot_id, c in candidate_plans.items()}
+            robot_id = min(candidates, key=lambda r: lengths[r])
+            logger.info(f'estimate best robot, robot_id={robot_id}, route lengths={lengths}')
+            route_plan = route_plans[robot_id]
+            compiled = candidate_plans[robot_id]
+
+        routes = route_plan['routes']
+        source = route_plan['source']
+        waypoints_list = [dict(w, waypoints=to_list(w['waypoints'])) for w in compiled['waypoints_list']]
+        metrics = compiled['metrics']
 
+        order = {
+            'source': source,
+            'via': via_list,
+            'destination': destination,
+        }
+        if metrics is not None and metrics['routes']:
+            order['metrics'] = metrics
+
+        return robot_id, routes, waypoints_list, order
+
+    def compile_route_plans(self, route_plans):
+        version = RobotCache.get_place_version()
+        compiled = {}
+        for key, route_plan in route_plans.items():
+            cached = self._cache_get(('route_plan', route_plan.get('id'), version)) if route_plan.get('id') else None
+            if cached is not None and cached['routes'] == route_plan['routes']:
+                compiled[key] = cached
+
+        missing = [key for key in route_plans if key not in compiled]
+        if missing:
+            places = self.get_places((r['from'], r['via'], r['to'], r['destination'])
+                                     for key in missing for r in route_plans[key]['routes'])
+            for key in missing:
+                route_plan = route_plans[key]
+                compiled[key] = {
+                    'routes': [intern_route(route) for route in route_plan['routes']],
+                    'waypoints_list': self.compile_waypoints_list(route_plan['routes'], places),
+                    'metrics': self.measure_routes(route_plan['routes'], places),
+                }
+                if route_plan.get('id'):
+                    self._cache_put(('route_plan', route_plan['id'], version), compiled[key])
+        return compiled
+
+    def compile_waypoints_list(self, routes, places):
         waypoints_list = []
         for route in routes:
             waypoints = self.get_waypoints([places[place_id] for place_id in route['via']], [places[route['to']]])
+            packed = WaypointArray.pack(waypoints)
             waypoints_list.append({
                 'to': route['to'],
                 'destination': route['destination'],
                 'action': route['action'],
-                'waypoints': waypoints,
+                'waypoints': packed if packed is not None else waypoints,
             })
-
-        order = {
-            'source': source,
-            'via': via_list,
-            'destination': destination,
-        }
-
-        return routes, waypoints_list, order
+        return waypoints_list
+
+    def get_refuge_waypoints(self, waiting_route):
+        key = ('waiting_route', make_etag(waiting_route), RobotCache.get_place_version())
+        waypoints = self._cache_get(key)
+        if waypoints is None:
+            places = self.get_places((waiting_route['via'], waiting_route['to']))
+            waypoints = self.get_waypoints(
+                [places[place_id] for place_id in waiting_route['via']],
+                [places[waiting_route['to']]]
+            )
+            packed = WaypointArray.pack(waypoints)
+            if packed is not None:
+                waypoints = packed
+            self._cache_put(key, waypoints)
+        return to_list(waypoints)
+
+    @classmethod
+    def _cache_get(cls, key):
+        with cls._lock:
+            entry = cls._compiled.get(key)
+            if entry is None:
+                return None
+            if const.WAYPOINT_CACHE_TTL_SEC > 0 and time.time() - entry[0] >= const.WAYPOINT_CACHE_TTL_SEC:
+                del cls._compiled[key]
+                return None
+            cls._compiled.move_to_end(key)
+            return entry[1]
+
+    @classmethod
+    def _cache_put(cls, key, value):
+        with cls._lock:
+            cls._compiled[key] = (time.time(), value)
+            cls._compiled.move_to_end(key)
+            if len(cls._compiled) > WAYPOINT_CACHE_SIZE:
+                cls._compiled.popitem(last=False)
+
+    def measure_routes(self, routes, places):
+        try:
+            return route_metrics.measure(routes, places)
+        except (KeyError, TypeError) as e:
+            logger.warning(f'can not measure routes, {e}')
+            return None
 
     def get_places(self, place_id_list):
-        place_set = set(flatten(place_id_list))
-        raw_places = {place['id']: place for place in orion.get_entities(
+        place_set = set(iter_flatten(place_id_list))
+        places = PlaceIndex.get(place_set)
+        if places is not None:
+            return places
+
+        poses = {place['id']: place['pose'] for place in orion.iter_entities(
             const.FIWARE_SERVICE,
             const.DELIVERY_ROBOT_SERVICEPATH,
-            const.PLACE_TYPE)}
+            const.PLACE_TYPE,
+            attrs=['pose'],
+            key_values=True,
+            prefetch=True) if place['id'] in place_set}
 
-        places = {place: raw_places[place]['pose']['value'] for place in place_set}
+        places = {place: poses[place] for place in place_set}
         return places
 
-    def get_waypoints(self, via_list, to_list):
+    def get_waypoints(self, via_list, to_places):
         via = [{
             'point': p['point'],
             'angle': None,
@@ -80,6 +246,6 @@ class Waypoint:
         to = [{
             'point': p['point'],
             'angle': p['angle'],
-        } for p in to_list]
+        } for p in to_places]
 
         return via + to
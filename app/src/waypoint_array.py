@@ -0,0 +1,103 @@
+import sys
+from array import array
+
+POINT_KEYS = ('x', 'y', 'z')
+ANGLE_KEYS = ('roll', 'pitch', 'yaw')
+_NO_ANGLE = {'roll': 0.0, 'pitch': 0.0, 'yaw': 0.0}
+MAX_EXACT_INT = 2 ** 53
+
+
+def _is_number(v):
+    return isinstance(v, float) or (isinstance(v, int) and not isinstance(v, bool) and -MAX_EXACT_INT <= v <= MAX_EXACT_INT)
+
+
+def _is_packable(value, keys):
+    return isinstance(value, dict) and len(value) == len(keys) and all(k in value and _is_number(value[k]) for k in keys)
+
+
+def _int_flags(values):
+    return sum(1 << i for i, v in enumerate(values) if isinstance(v, int))
+
+
+class WaypointArray:
+    __slots__ = ('xs', 'ys', 'zs', 'rolls', 'pitches', 'yaws', 'has_angles', 'int_flags')
+
+    def __init__(self):
+        self.xs = array('d')
+        self.ys = array('d')
+        self.zs = array('d')
+        self.rolls = array('d')
+        self.pitches = array('d')
+        self.yaws = array('d')
+        self.has_angles = array('b')
+        self.int_flags = array('B')
+
+    @classmethod
+    def pack(cls, waypoints):
+        if not all(isinstance(w, dict) and len(w) == 2 and 'point' in w and 'angle' in w
+                   and _is_packable(w['point'], POINT_KEYS)
+                   and (w['angle'] is None or _is_packable(w['angle'], ANGLE_KEYS)) for w in waypoints):
+            return None
+
+        points = [w['point'] for w in waypoints]
+        angles = [w['angle'] or _NO_ANGLE for w in waypoints]
+        packed = cls()
+        packed.xs = array('d', [p['x'] for p in points])
+        packed.ys = array('d', [p['y'] for p in points])
+        packed.zs = array('d', [p['z'] for p in points])
+        packed.rolls = array('d', [a['roll'] for a in angles])
+        packed.pitches = array('d', [a['pitch'] for a in angles])
+        packed.yaws = array('d', [a['yaw'] for a in angles])
+        packed.has_angles = array('b', [w['angle'] is not None for w in waypoints])
+        packed.int_flags = array('B', [_int_flags((p['x'], p['y'], p['z'], a['roll'], a['pitch'], a['yaw']))
+                                       for p, a in zip(points, angles)])
+        return packed
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        flags = self.int_flags[i]
+        if not flags:
+            return {
+                'point': {'x': self.xs[i], 'y': self.ys[i], 'z': self.zs[i]},
+                'angle': {'roll': self.rolls[i], 'pitch': self.pitches[i], 'yaw': self.yaws[i]} if self.has_angles[i] else None,
+            }
+        x, y, z, roll, pitch, yaw = (int(v) if flags >> k & 1 else v for k, v in enumerate(
+            (self.xs[i], self.ys[i], self.zs[i], self.rolls[i], self.pitches[i], self.yaws[i])))
+        return {
+            'point': {'x': x, 'y': y, 'z': z},
+            'angle': {'roll': roll, 'pitch': pitch, 'yaw': yaw} if self.has_angles[i] else None,
+        }
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __eq__(self, other):
+        if isinstance(other, WaypointArray):
+            return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+        if isinstance(other, (list, tuple)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f'WaypointArray({self.to_list()})'
+
+    def to_list(self):
+        return list(self)
+
+
+def to_list(waypoints):
+    return waypoints.to_list() if isinstance(waypoints, WaypointArray) else list(waypoints)
+
+
+def intern_route(route):
+    interned = dict(route)
+    for key in ('from', 'to', 'destination'):
+        if isinstance(interned.get(key), str):
+            interned[key] = sys.intern(interned[key])
+    if isinstance(interned.get('via'), list):
+        interned['via'] = [sys.intern(v) if isinstance(v, str) else v for v in interned['via']]
+    return interned
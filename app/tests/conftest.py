@@ -23,6 +23,7 @@ TIMEZONE = 'TIMEZONE'
 ORION_TOKEN = 'ORION_TOKEN'
 MOVENEXT_WAIT_MSEC = 'MOVENEXT_WAIT_MSEC'
 MOVENEXT_WAIT_MAX_NUM = 'MOVENEXT_WAIT_MAX_NUM'
+JSON_BACKEND = 'JSON_BACKEND'
 
 
 @pytest.fixture(scope='function', autouse=True)
@@ -88,6 +89,8 @@ def teardown_enviroments():
         del os.environ[MOVENEXT_WAIT_MSEC]
     if MOVENEXT_WAIT_MAX_NUM in os.environ:
         del os.environ[MOVENEXT_WAIT_MAX_NUM]
+    if JSON_BACKEND in os.environ:
+        del os.environ[JSON_BACKEND]
 
 
 @pytest.fixture
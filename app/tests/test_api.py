@@ -1,8 +1,12 @@
 import json
+import datetime
 import importlib
+import threading
 from unittest.mock import call
 
 import dateutil.parser
+from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+from werkzeug.exceptions import Locked, ServiceUnavailable
 
 import pytest
 import lazy_import
@@ -12,36 +16,96 @@ caller = lazy_import.lazy_module('src.caller')
 const = lazy_import.lazy_module('src.const')
 
 
+MODE_ATTRS = ['mode']
+RWL_ATTRS = ['remaining_waypoints_list', 'route_cursor']
+STATE_ATTRS = ['navigating_waypoints', 'order', 'caller']
+NW_ATTRS = ['navigating_waypoints']
+CMD_ATTRS = ['send_cmd_status', 'send_cmd_info']
+NOTIFICATION_ATTRS = ['navigating_waypoints', 'order', 'caller', 'current_mode', 'current_state', 'last_processed_time']
+
+
+def as_key_values(get_entity):
+    def _get_entity(fs, fsp, t, id, attrs=None, key_values=False):
+        assert key_values is True
+        entity = get_entity(fs, fsp, t, id)
+        if not isinstance(entity, dict):
+            return entity
+        return {k: v['value'] for k, v in entity.items() if attrs is None or k in attrs}
+    return _get_entity
+
+
+def as_cached_robot(mocked_api, get_entity):
+    _get_entity = as_key_values(get_entity)
+    mocked_api.RobotCache.get_with_version.side_effect = lambda id: (_get_entity(
+        const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.DELIVERY_ROBOT_TYPE, id, key_values=True), None)
+    mocked_api.RobotCache.get_place_name.side_effect = lambda id: _get_entity(
+        const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, id, key_values=True)['name']
+
+
+def iter_robots(fs, fsp, t, attrs=None, key_values=False, **kwargs):
+    get_entity = api.orion.get_entity.side_effect
+    if get_entity is None:
+        return iter([])
+    return iter([dict(get_entity(fs, fsp, t, robot_id, attrs=attrs, key_values=key_values), id=robot_id)
+                 for robot_id in const.DELIVERY_ROBOT_LIST])
+
+
+def robot_call(robot_id, attrs):
+    return call(const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.DELIVERY_ROBOT_TYPE, robot_id,
+                attrs=attrs, key_values=True)
+
+
+def place_call(place_id):
+    return call(const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, place_id,
+                attrs=['name'], key_values=True)
+
+
 @pytest.fixture
 def mocked_api(mocker):
     api.orion = mocker.MagicMock()
     api.Waypoint = mocker.MagicMock()
     api.MongoThrottling = mocker.MagicMock()
     api.Token = mocker.MagicMock()
+    api.RobotCache = mocker.MagicMock()
+    api.ShipmentQueue = mocker.MagicMock()
+    api.ShipmentQueue.acquire.return_value = None
+    api.RobotActor = mocker.MagicMock()
+    api.CommandLog = mocker.MagicMock()
+    api.CommandLog.get.return_value = None
+    api.RouteStore = mocker.MagicMock()
+    api.RouteStore.get.return_value = None
+    api.RouteStore.peek.return_value = None
+    api.RouteStore.get_all.return_value = {}
+    api.orion.iter_entities.side_effect = iter_robots
+    api.CommonMixin._orion_executor = mocker.MagicMock()
+    api.CommonMixin._orion_executor.submit.side_effect = lambda fn, *args: fn(*args)
     yield api
     importlib.reload(api)
 
 
 class TestShipmentAPI:
 
-    @pytest.mark.parametrize('robot_data, available_robot_id, called_robot_id', [
+    @pytest.mark.parametrize('robot_data, available_robot_ids, called_robot_id', [
         ({'robot_01': {'mode': ' ', 'rwl': []}, 'robot_02': {'mode': ' ', 'rwl': []}},
-         'robot_01', ['robot_01', 'robot_01', 'robot_01']),
+         ['robot_01', 'robot_02'], [('robot_01', RWL_ATTRS), ('robot_02', RWL_ATTRS)]),
         ({'robot_01': {'mode': 'standby', 'rwl': []}, 'robot_02': {'mode': ' ', 'rwl': []}},
-         'robot_01', ['robot_01', 'robot_01', 'robot_01']),
+         ['robot_01', 'robot_02'], [('robot_01', RWL_ATTRS), ('robot_02', RWL_ATTRS)]),
         ({'robot_01': {'mode': 'error', 'rwl': []}, 'robot_02': {'mode': ' ', 'rwl': []}},
-         'robot_01', ['robot_01', 'robot_01', 'robot_01']),
+         ['robot_01', 'robot_02'], [('robot_01', RWL_ATTRS), ('robot_02', RWL_ATTRS)]),
         ({'robot_01': {'mode': ' ', 'rwl': None}, 'robot_02': {'mode': ' ', 'rwl': []}},
-         'robot_01', ['robot_01', 'robot_01', 'robot_01']),
+         ['robot_01', 'robot_02'], [('robot_01', RWL_ATTRS), ('robot_02', RWL_ATTRS)]),
         ({'robot_01': {'mode': ' ', 'rwl': 0}, 'robot_02': {'mode': ' ', 'rwl': []}},
-         'robot_01', ['robot_01', 'robot_01', 'robot_01']),
+         ['robot_01', 'robot_02'], [('robot_01', RWL_ATTRS), ('robot_02', RWL_ATTRS)]),
         ({'robot_01': {'mode': ' ', 'rwl': 'dummy'}, 'robot_02': {'mode': ' ', 'rwl': []}},
-         'robot_01', ['robot_01', 'robot_01', 'robot_01']),
+         ['robot_01', 'robot_02'], [('robot_01', RWL_ATTRS), ('robot_02', RWL_ATTRS)]),
         ({'robot_01': {'mode': 'navi', 'rwl': []}, 'robot_02': {'mode': ' ', 'rwl': []}},
-         'robot_02', ['robot_01', 'robot_02', 'robot_02', 'robot_02']),
+         ['robot_02'], [('robot_02', RWL_ATTRS)]),
         ({'robot_01': {'mode': ' ', 'rwl': ['dummy']}, 'robot_02': {'mode': ' ', 'rwl': []}},
-         'robot_02', ['robot_01', 'robot_01', 'robot_02', 'robot_02', 'robot_02']),
+         ['robot_02'], [('robot_01', RWL_ATTRS), ('robot_02', RWL_ATTRS)]),
+        ({'robot_01': {'mode': ' ', 'rwl': []}, 'robot_02': {'mode': 'navi', 'rwl': []}},
+         ['robot_01'], [('robot_01', RWL_ATTRS)]),
     ])
+    @pytest.mark.parametrize('best_robot_index', [0, -1])
     @pytest.mark.parametrize('waypoints_list', [
         [
             {
@@ -73,11 +137,14 @@ class TestShipmentAPI:
         ({}, 'warehouse'),
     ])
     def test_success(self, app, mocked_api,
-                     robot_data, available_robot_id, called_robot_id,
+                     robot_data, available_robot_ids, called_robot_id, best_robot_index,
                      waypoints_list,
                      update_caller, caller_value):
         shipment_list = {}
         shipment_list.update(update_caller)
+        available_robot_id = available_robot_ids[best_robot_index]
+        called_robot_id = called_robot_id + [(available_robot_id, MODE_ATTRS), (available_robot_id, RWL_ATTRS),
+                                             (available_robot_id, CMD_ATTRS)]
 
         def get_entity(fs, fsp, t, id):
             return {
@@ -96,13 +163,13 @@ class TestShipmentAPI:
                     }
                 }
             }
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_delivery_robot_command.return_value = 'make_delivery_robot_command_return_value'
 
         routes = [{'from': 'B_id', 'via': ['C_id', 'D_id'], 'to': 'E_id', 'destination': 'dest_id', 'action': 'action_0'}]
         order = {'source': 'src', 'via': ['A_id'], 'destination': 'dest_id'}
 
-        mocked_api.Waypoint.return_value.estimate_routes.return_value = (routes, waypoints_list, order)
+        mocked_api.Waypoint.return_value.estimate_best_routes.return_value = (available_robot_id, routes, waypoints_list, order)
 
         response = app.test_client().post('/api/v1/shipments/', content_type='application/json', data=json.dumps(shipment_list))
         assert response.status_code == 201
@@ -114,11 +181,8 @@ class TestShipmentAPI:
         }
 
         assert mocked_api.orion.get_entity.call_count == len(called_robot_id)
-        for i, rid in enumerate(called_robot_id):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         rid)
+        for i, (rid, attrs) in enumerate(called_robot_id):
+            assert mocked_api.orion.get_entity.call_args_list[i] == robot_call(rid, attrs)
         assert mocked_api.orion.make_delivery_robot_command.call_count == 1
         rwl = [] if len(waypoints_list) == 1 else [waypoints_list[1]]
         assert mocked_api.orion.make_delivery_robot_command.call_args == call('navi',
@@ -128,14 +192,21 @@ class TestShipmentAPI:
                                                                               routes,
                                                                               order,
                                                                               caller.Caller.value_of(caller_value))
+        assert mocked_api.orion.make_route_cursor_command.call_args == call(0)
+        assert mocked_api.orion.append_attrs.call_args == call(const.FIWARE_SERVICE,
+                                                               const.DELIVERY_ROBOT_SERVICEPATH,
+                                                               const.DELIVERY_ROBOT_TYPE,
+                                                               available_robot_id,
+                                                               mocked_api.orion.make_route_cursor_command.return_value)
+        assert mocked_api.RouteStore.start.call_args_list == [call(available_robot_id, rwl)]
         assert mocked_api.orion.send_command.call_count == 1
         assert mocked_api.orion.send_command.call_args == call(const.FIWARE_SERVICE,
                                                                const.DELIVERY_ROBOT_SERVICEPATH,
                                                                const.DELIVERY_ROBOT_TYPE,
                                                                available_robot_id,
                                                                'make_delivery_robot_command_return_value')
-        assert mocked_api.CommonMixin.waypoint().estimate_routes.call_count == 1
-        assert mocked_api.CommonMixin.waypoint().estimate_routes.call_args == call(shipment_list, available_robot_id)
+        assert mocked_api.CommonMixin.waypoint().estimate_best_routes.call_count == 1
+        assert mocked_api.CommonMixin.waypoint().estimate_best_routes.call_args == call(shipment_list, available_robot_ids)
         assert mocked_api.orion.make_emergency_command.call_count == 0
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 0
         assert mocked_api.orion.make_updatemode_command.call_count == 0
@@ -149,14 +220,14 @@ class TestShipmentAPI:
         assert mocked_api.MongoThrottling.lock.call_count == 0
 
     @pytest.mark.parametrize('robot_01_data, robot_01_count', [
-        ({'mode': 'navi', 'rwl': []}, 1),
-        ({'mode': 'standby', 'rwl': ['dummy']}, 2),
-        ({'mode': 'navi', 'rwl': ['dummy']}, 1),
+        ({'mode': 'navi', 'rwl': []}, 0),
+        ({'mode': 'standby', 'rwl': ['dummy']}, 1),
+        ({'mode': 'navi', 'rwl': ['dummy']}, 0),
     ])
     @pytest.mark.parametrize('robot_02_data, robot_02_count', [
-        ({'mode': 'navi', 'rwl': []}, 1),
-        ({'mode': 'standby', 'rwl': ['dummy']}, 2),
-        ({'mode': 'navi', 'rwl': ['dummy']}, 1),
+        ({'mode': 'navi', 'rwl': []}, 0),
+        ({'mode': 'standby', 'rwl': ['dummy']}, 1),
+        ({'mode': 'navi', 'rwl': ['dummy']}, 0),
     ])
     def test_no_available_robot(self, app, mocked_api, robot_01_data, robot_01_count, robot_02_data, robot_02_count):
         shipment_list = {}
@@ -179,29 +250,31 @@ class TestShipmentAPI:
                     }
                 }
             }
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
+
+        mocked_api.ShipmentQueue.enqueue.return_value = 'ticket_01'
 
         response = app.test_client().post('/api/v1/shipments/', content_type='application/json', data=json.dumps(shipment_list))
-        assert response.status_code == 422
+        assert response.status_code == 202
         assert response.json == {
-            'message': 'no available robot'
+            'result': 'queued',
+            'ticket_id': 'ticket_01',
         }
+        assert response.headers['Location'].endswith('/api/v1/shipments/ticket_01/')
+        assert mocked_api.CommonMixin.waypoint().check_shipment_list.call_count == 1
+        assert mocked_api.ShipmentQueue.enqueue.call_count == 1
+        assert mocked_api.ShipmentQueue.enqueue.call_args == call(shipment_list)
 
         assert mocked_api.orion.get_entity.call_count == robot_01_count + robot_02_count
 
+        expected_attrs = [RWL_ATTRS]
         for i in range(robot_01_count):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         'robot_01')
+            assert mocked_api.orion.get_entity.call_args_list[i] == robot_call('robot_01', expected_attrs[i])
         for i in range(robot_02_count):
-            assert mocked_api.orion.get_entity.call_args_list[i + robot_01_count] == call(const.FIWARE_SERVICE,
-                                                                                          const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                                          const.DELIVERY_ROBOT_TYPE,
-                                                                                          'robot_02')
+            assert mocked_api.orion.get_entity.call_args_list[i + robot_01_count] == robot_call('robot_02', expected_attrs[i])
         assert mocked_api.orion.make_delivery_robot_command.call_count == 0
         assert mocked_api.orion.send_command.call_count == 0
-        assert mocked_api.CommonMixin.waypoint().estimate_routes.call_count == 0
+        assert mocked_api.CommonMixin.waypoint().estimate_best_routes.call_count == 0
         assert mocked_api.orion.make_emergency_command.call_count == 0
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 0
         assert mocked_api.orion.make_updatemode_command.call_count == 0
@@ -214,6 +287,26 @@ class TestShipmentAPI:
         assert mocked_api.Token.get.return_value.get_lock.call_count == 0
         assert mocked_api.MongoThrottling.lock.call_count == 0
 
+    def test_no_available_robot_invalid_shipment(self, app, mocked_api):
+        shipment_list = {}
+
+        def get_entity(fs, fsp, t, id):
+            return {
+                'mode': {
+                    'value': 'navi',
+                },
+            }
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
+        mocked_api.CommonMixin.waypoint().check_shipment_list.side_effect = TypeError('invalid shipment_list')
+
+        response = app.test_client().post('/api/v1/shipments/', content_type='application/json', data=json.dumps(shipment_list))
+        assert response.status_code == 400
+        assert response.json == {
+            'message': 'invalid shipment_list, {}'
+        }
+        assert mocked_api.ShipmentQueue.enqueue.call_count == 0
+        assert mocked_api.orion.send_command.call_count == 0
+
     @pytest.mark.parametrize('waypoints_list', [
         [], {}, {'a': 1}, tuple([1]), set([1, 2]), 'dummy', 0, 1e-1, None
     ])
@@ -237,13 +330,13 @@ class TestShipmentAPI:
                     }
                 }
             }
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_delivery_robot_command.return_value = 'make_delivery_robot_command_return_value'
 
         routes = [{'from': 'B_id', 'via': ['C_id', 'D_id'], 'to': 'E_id', 'destination': 'dest_id', 'action': 'action_0'}]
         order = {'source': 'src', 'via': ['A_id'], 'destination': 'dest_id'}
 
-        mocked_api.Waypoint.return_value.estimate_routes.return_value = (routes, waypoints_list, order)
+        mocked_api.Waypoint.return_value.estimate_best_routes.return_value = ('robot_01', routes, waypoints_list, order)
 
         response = app.test_client().post('/api/v1/shipments/', content_type='application/json', data=json.dumps(shipment_list))
         assert response.status_code == 200
@@ -252,15 +345,12 @@ class TestShipmentAPI:
             'message': 'no available waypoints_list',
         }
         assert mocked_api.orion.get_entity.call_count == 2
-        for i in range(2):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         'robot_01')
+        expected_calls = [robot_call(rid, attrs) for rid in ['robot_01', 'robot_02'] for attrs in [RWL_ATTRS]]
+        assert mocked_api.orion.get_entity.call_args_list == expected_calls
         assert mocked_api.orion.make_delivery_robot_command.call_count == 0
         assert mocked_api.orion.send_command.call_count == 0
-        assert mocked_api.CommonMixin.waypoint().estimate_routes.call_count == 1
-        assert mocked_api.CommonMixin.waypoint().estimate_routes.call_args == call(shipment_list, 'robot_01')
+        assert mocked_api.CommonMixin.waypoint().estimate_best_routes.call_count == 1
+        assert mocked_api.CommonMixin.waypoint().estimate_best_routes.call_args == call(shipment_list, ['robot_01', 'robot_02'])
         assert mocked_api.orion.make_emergency_command.call_count == 0
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 0
         assert mocked_api.orion.make_updatemode_command.call_count == 0
@@ -293,7 +383,7 @@ class TestShipmentAPI:
                     }
                 }
             }
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_delivery_robot_command.return_value = 'make_delivery_robot_command_return_value'
 
         routes = [{'from': 'B_id', 'via': ['C_id', 'D_id'], 'to': 'E_id', 'destination': 'dest_id', 'action': 'action_0'}]
@@ -306,19 +396,17 @@ class TestShipmentAPI:
             },
         ]
         order = {'source': 'src', 'via': ['A_id'], 'destination': 'dest_id'}
-        mocked_api.Waypoint.return_value.estimate_routes.return_value = (routes, waypoints_list, order)
+        mocked_api.Waypoint.return_value.estimate_best_routes.return_value = ('robot_01', routes, waypoints_list, order)
 
         response = app.test_client().post('/api/v1/shipments/', content_type='application/json', data=json.dumps(shipment_list))
         assert response.status_code == 500
         assert response.json == {
             'message': 'send_cmd_status still pending, robot_id=robot_01, wait_msec=10, wait_count=3',
         }
-        assert mocked_api.orion.get_entity.call_count == 5
-        for i in range(5):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         'robot_01')
+        assert mocked_api.orion.get_entity.call_count == 7
+        expected_calls = [robot_call(rid, attrs) for rid in ['robot_01', 'robot_02'] for attrs in [RWL_ATTRS]]
+        expected_calls += [robot_call('robot_01', attrs) for attrs in [MODE_ATTRS, RWL_ATTRS, CMD_ATTRS, CMD_ATTRS, CMD_ATTRS]]
+        assert mocked_api.orion.get_entity.call_args_list == expected_calls
         assert mocked_api.orion.make_delivery_robot_command.call_count == 1
         assert mocked_api.orion.make_delivery_robot_command.call_args == call('navi',
                                                                               waypoints_list[0]['waypoints'],
@@ -333,8 +421,8 @@ class TestShipmentAPI:
                                                                const.DELIVERY_ROBOT_TYPE,
                                                                'robot_01',
                                                                'make_delivery_robot_command_return_value')
-        assert mocked_api.CommonMixin.waypoint().estimate_routes.call_count == 1
-        assert mocked_api.CommonMixin.waypoint().estimate_routes.call_args == call(shipment_list, 'robot_01')
+        assert mocked_api.CommonMixin.waypoint().estimate_best_routes.call_count == 1
+        assert mocked_api.CommonMixin.waypoint().estimate_best_routes.call_args == call(shipment_list, ['robot_01', 'robot_02'])
         assert mocked_api.orion.make_emergency_command.call_count == 0
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 0
         assert mocked_api.orion.make_updatemode_command.call_count == 0
@@ -391,7 +479,7 @@ class TestShipmentAPI:
                     'value': send_cmd_info_value,
                 },
             }
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_delivery_robot_command.return_value = 'make_delivery_robot_command_return_value'
 
         routes = [{'from': 'B_id', 'via': ['C_id', 'D_id'], 'to': 'E_id', 'destination': 'dest_id', 'action': 'action_0'}]
@@ -404,19 +492,17 @@ class TestShipmentAPI:
             },
         ]
         order = {'source': 'src', 'via': ['A_id'], 'destination': 'dest_id'}
-        mocked_api.Waypoint.return_value.estimate_routes.return_value = (routes, waypoints_list, order)
+        mocked_api.Waypoint.return_value.estimate_best_routes.return_value = ('robot_01', routes, waypoints_list, order)
 
         response = app.test_client().post('/api/v1/shipments/', content_type='application/json', data=json.dumps(shipment_list))
         assert response.status_code == 500
         assert response.json == {
             'message': errmsg,
         }
-        assert mocked_api.orion.get_entity.call_count == 3
-        for i in range(3):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         'robot_01')
+        assert mocked_api.orion.get_entity.call_count == 5
+        expected_calls = [robot_call(rid, attrs) for rid in ['robot_01', 'robot_02'] for attrs in [RWL_ATTRS]]
+        expected_calls += [robot_call('robot_01', attrs) for attrs in [MODE_ATTRS, RWL_ATTRS, CMD_ATTRS]]
+        assert mocked_api.orion.get_entity.call_args_list == expected_calls
         assert mocked_api.orion.make_delivery_robot_command.call_count == 1
         assert mocked_api.orion.make_delivery_robot_command.call_args == call('navi',
                                                                               waypoints_list[0]['waypoints'],
@@ -431,8 +517,8 @@ class TestShipmentAPI:
                                                                const.DELIVERY_ROBOT_TYPE,
                                                                'robot_01',
                                                                'make_delivery_robot_command_return_value')
-        assert mocked_api.CommonMixin.waypoint().estimate_routes.call_count == 1
-        assert mocked_api.CommonMixin.waypoint().estimate_routes.call_args == call(shipment_list, 'robot_01')
+        assert mocked_api.CommonMixin.waypoint().estimate_best_routes.call_count == 1
+        assert mocked_api.CommonMixin.waypoint().estimate_best_routes.call_args == call(shipment_list, ['robot_01', 'robot_02'])
         assert mocked_api.orion.make_emergency_command.call_count == 0
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 0
         assert mocked_api.orion.make_updatemode_command.call_count == 0
@@ -454,7 +540,7 @@ class TestShipmentAPI:
             def _result(fs, fsp, t, id):
                 nonlocal c
                 result = None
-                if c < 3:
+                if c < 7:
                     result = {
                         'mode': {
                             'value': 'standby'
@@ -492,7 +578,7 @@ class TestShipmentAPI:
                 return result
             return _result
 
-        mocked_api.orion.get_entity.side_effect = get_entity()
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity())
         mocked_api.orion.make_delivery_robot_command.return_value = 'make_delivery_robot_command_return_value'
 
         routes = [{'from': 'B_id', 'via': ['C_id', 'D_id'], 'to': 'E_id', 'destination': 'dest_id', 'action': 'action_0'}]
@@ -505,7 +591,7 @@ class TestShipmentAPI:
             },
         ]
         order = {'source': 'src', 'via': ['A_id'], 'destination': 'dest_id'}
-        mocked_api.Waypoint.return_value.estimate_routes.return_value = (routes, waypoints_list, order)
+        mocked_api.Waypoint.return_value.estimate_best_routes.return_value = ('robot_01', routes, waypoints_list, order)
 
         response = app.test_client().post('/api/v1/shipments/', content_type='application/json', data=json.dumps(shipment_list))
         assert response.status_code == 201
@@ -515,12 +601,10 @@ class TestShipmentAPI:
             'order': order,
             'caller': 'warehouse',
         }
-        assert mocked_api.orion.get_entity.call_count == 4
-        for i in range(4):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         'robot_01')
+        assert mocked_api.orion.get_entity.call_count == 6
+        expected_calls = [robot_call(rid, attrs) for rid in ['robot_01', 'robot_02'] for attrs in [RWL_ATTRS]]
+        expected_calls += [robot_call('robot_01', attrs) for attrs in [MODE_ATTRS, RWL_ATTRS, CMD_ATTRS, CMD_ATTRS]]
+        assert mocked_api.orion.get_entity.call_args_list == expected_calls
         assert mocked_api.orion.make_delivery_robot_command.call_count == 2
         assert mocked_api.orion.make_delivery_robot_command.call_args_list[0] == call('navi',
                                                                                       waypoints_list[0]['waypoints'],
@@ -543,8 +627,8 @@ class TestShipmentAPI:
                                                                            const.DELIVERY_ROBOT_TYPE,
                                                                            'robot_01',
                                                                            'make_delivery_robot_command_return_value')
-        assert mocked_api.CommonMixin.waypoint().estimate_routes.call_count == 1
-        assert mocked_api.CommonMixin.waypoint().estimate_routes.call_args == call(shipment_list, 'robot_01')
+        assert mocked_api.CommonMixin.waypoint().estimate_best_routes.call_count == 1
+        assert mocked_api.CommonMixin.waypoint().estimate_best_routes.call_args == call(shipment_list, ['robot_01', 'robot_02'])
         assert mocked_api.orion.make_emergency_command.call_count == 0
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 0
         assert mocked_api.orion.make_updatemode_command.call_count == 0
@@ -578,7 +662,7 @@ class TestShipmentAPI:
                 }
             }
 
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_delivery_robot_command.return_value = 'make_delivery_robot_command_return_value'
 
         routes = [{'from': 'B_id', 'via': ['C_id', 'D_id'], 'to': 'E_id', 'destination': 'dest_id', 'action': 'action_0'}]
@@ -591,7 +675,7 @@ class TestShipmentAPI:
             },
         ]
         order = {'source': 'src', 'via': ['A_id'], 'destination': 'dest_id'}
-        mocked_api.Waypoint.return_value.estimate_routes.return_value = (routes, waypoints_list, order)
+        mocked_api.Waypoint.return_value.estimate_best_routes.return_value = ('robot_01', routes, waypoints_list, order)
 
         response = app.test_client().post('/api/v1/shipments/', content_type='application/json', data=json.dumps(shipment_list))
         assert response.status_code == 500
@@ -599,12 +683,10 @@ class TestShipmentAPI:
             'message': 'cannot move robot(robot_01) to "E_id" using "navi" and "refresh", '
             'navi result=ignore refresh result=ignore'
         }
-        assert mocked_api.orion.get_entity.call_count == 4
-        for i in range(4):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         'robot_01')
+        assert mocked_api.orion.get_entity.call_count == 6
+        expected_calls = [robot_call(rid, attrs) for rid in ['robot_01', 'robot_02'] for attrs in [RWL_ATTRS]]
+        expected_calls += [robot_call('robot_01', attrs) for attrs in [MODE_ATTRS, RWL_ATTRS, CMD_ATTRS, CMD_ATTRS]]
+        assert mocked_api.orion.get_entity.call_args_list == expected_calls
         assert mocked_api.orion.make_delivery_robot_command.call_count == 2
         assert mocked_api.orion.make_delivery_robot_command.call_args_list[0] == call('navi',
                                                                                       waypoints_list[0]['waypoints'],
@@ -627,8 +709,8 @@ class TestShipmentAPI:
                                                                            const.DELIVERY_ROBOT_TYPE,
                                                                            'robot_01',
                                                                            'make_delivery_robot_command_return_value')
-        assert mocked_api.CommonMixin.waypoint().estimate_routes.call_count == 1
-        assert mocked_api.CommonMixin.waypoint().estimate_routes.call_args == call(shipment_list, 'robot_01')
+        assert mocked_api.CommonMixin.waypoint().estimate_best_routes.call_count == 1
+        assert mocked_api.CommonMixin.waypoint().estimate_best_routes.call_args == call(shipment_list, ['robot_01', 'robot_02'])
         assert mocked_api.orion.make_emergency_command.call_count == 0
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 0
         assert mocked_api.orion.make_updatemode_command.call_count == 0
@@ -659,7 +741,7 @@ class TestShipmentAPI:
         assert mocked_api.orion.get_entity.call_count == 0
         assert mocked_api.orion.make_delivery_robot_command.call_count == 0
         assert mocked_api.orion.send_command.call_count == 0
-        assert mocked_api.CommonMixin.waypoint().estimate_routes.call_count == 0
+        assert mocked_api.CommonMixin.waypoint().estimate_best_routes.call_count == 0
         assert mocked_api.orion.make_emergency_command.call_count == 0
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 0
         assert mocked_api.orion.make_updatemode_command.call_count == 0
@@ -672,6 +754,73 @@ class TestShipmentAPI:
         assert mocked_api.Token.get.return_value.get_lock.call_count == 0
         assert mocked_api.MongoThrottling.lock.call_count == 0
 
+    def test_move_failed(self, app, mocked_api):
+        waypoints_list = [
+            {'to': 'E_id', 'destination': 'dest_id', 'action': {}, 'waypoints': [{'point': 'pE', 'angle': 'aE'}]},
+            {'to': 'F_id', 'destination': 'dest_id', 'action': {}, 'waypoints': [{'point': 'pF', 'angle': 'aF'}]},
+        ]
+
+        def get_entity(fs, fsp, t, id):
+            return {
+                'mode': {'value': 'standby'},
+                'remaining_waypoints_list': {'value': []},
+                'send_cmd_status': {'value': 'OK'},
+                'send_cmd_info': {'value': {'result': 'error', 'errors': ['dummy']}},
+            }
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
+        mocked_api.Waypoint.return_value.estimate_best_routes.return_value = ('robot_01', [], waypoints_list, {})
+
+        response = app.test_client().post('/api/v1/shipments/', content_type='application/json', data=json.dumps({}))
+        assert response.status_code == 500
+
+        assert mocked_api.RobotActor.of.call_args_list[0] == call('robot_01')
+        assert mocked_api.orion.send_command.call_count == 1
+        assert mocked_api.RouteStore.start.call_count == 0
+        assert mocked_api.orion.append_attrs.call_count == 0
+
+
+class TestShipmentStatusAPI:
+
+    @pytest.mark.parametrize('status, result', [
+        ('queued', None),
+        ('dispatching', None),
+        ('dispatched', {'result': 'success', 'delivery_robot': {'id': 'robot_01'}, 'order': {}, 'caller': 'warehouse'}),
+        ('failed', {'message': 'dummy'}),
+    ])
+    def test_success(self, app, mocked_api, status, result):
+        ticket = {
+            'ticket_id': 'ticket_01',
+            'status': status,
+            'shipment_list': {},
+            'created_at': datetime.datetime(2020, 1, 2, 3, 4, 5),
+            'updated_at': datetime.datetime(2020, 1, 2, 3, 4, 6),
+        }
+        if result is not None:
+            ticket['result'] = result
+        mocked_api.ShipmentQueue.get.return_value = ticket
+
+        response = app.test_client().get('/api/v1/shipments/ticket_01/')
+        assert response.status_code == 200
+        assert response.json == {
+            'ticket_id': 'ticket_01',
+            'status': status,
+            'created_at': '2020-01-02T03:04:05',
+            'updated_at': '2020-01-02T03:04:06',
+            'result': result,
+        }
+        assert mocked_api.ShipmentQueue.get.call_args == call('ticket_01')
+        assert mocked_api.orion.get_entity.call_count == 0
+
+    def test_not_found(self, app, mocked_api):
+        mocked_api.ShipmentQueue.get.return_value = None
+
+        response = app.test_client().get('/api/v1/shipments/ticket_01/')
+        assert response.status_code == 404
+        assert response.json == {
+            'message': 'ticket(ticket_01) not found',
+            'id': 'ticket_01',
+        }
+
 
 class TestRobotStateAPI:
 
@@ -708,24 +857,20 @@ class TestRobotStateAPI:
                     }
                 }
 
-        mocked_api.orion.get_entity.side_effect = get_entity
+        as_cached_robot(mocked_api, get_entity)
 
         response = app.test_client().get(f'/api/v1/robots/{robot_id}/')
         assert response.status_code == 200
         assert response.json == {'id': robot_id, 'state': const.STATE_MOVING, 'destination': place_name}
 
-        assert mocked_api.orion.get_entity.call_count == call_count
-
-        for i in range(2):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         robot_id)
+        assert mocked_api.orion.get_entity.call_count == 0
+        assert mocked_api.RobotCache.get_with_version.call_count == 1
+        assert mocked_api.RobotCache.get_with_version.call_args == call(robot_id)
         if call_count > 2:
-            assert mocked_api.orion.get_entity.call_args_list[2] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.PLACE_TYPE,
-                                                                         'A_id')
+            assert mocked_api.RobotCache.get_place_name.call_count == 1
+            assert mocked_api.RobotCache.get_place_name.call_args == call('A_id')
+        else:
+            assert mocked_api.RobotCache.get_place_name.call_count == 0
         assert mocked_api.orion.make_delivery_robot_command.call_count == 0
         assert mocked_api.orion.make_emergency_command.call_count == 0
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 0
@@ -770,18 +915,16 @@ class TestRobotStateAPI:
                     }
                 }
 
-        mocked_api.orion.get_entity.side_effect = get_entity
+        as_cached_robot(mocked_api, get_entity)
 
         response = app.test_client().get(f'/api/v1/robots/{robot_id}/')
         assert response.status_code == 200
         assert response.json == {'id': robot_id, 'state': const.STATE_STANDBY, 'destination': ''}
 
-        assert mocked_api.orion.get_entity.call_count == 3
-        for i in range(3):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         robot_id)
+        assert mocked_api.orion.get_entity.call_count == 0
+        assert mocked_api.RobotCache.get_with_version.call_count == 1
+        assert mocked_api.RobotCache.get_with_version.call_args == call(robot_id)
+        assert mocked_api.RobotCache.get_place_name.call_count == 0
         assert mocked_api.orion.make_delivery_robot_command.call_count == 0
         assert mocked_api.orion.make_emergency_command.call_count == 0
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 0
@@ -830,18 +973,16 @@ class TestRobotStateAPI:
                     }
                 }
 
-        mocked_api.orion.get_entity.side_effect = get_entity
+        as_cached_robot(mocked_api, get_entity)
 
         response = app.test_client().get(f'/api/v1/robots/{robot_id}/')
         assert response.status_code == 200
         assert response.json == {'id': robot_id, 'state': const.STATE_STANDBY, 'destination': ''}
 
-        assert mocked_api.orion.get_entity.call_count == 3
-        for i in range(3):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         robot_id)
+        assert mocked_api.orion.get_entity.call_count == 0
+        assert mocked_api.RobotCache.get_with_version.call_count == 1
+        assert mocked_api.RobotCache.get_with_version.call_args == call(robot_id)
+        assert mocked_api.RobotCache.get_place_name.call_count == 0
         assert mocked_api.orion.make_delivery_robot_command.call_count == 0
         assert mocked_api.orion.make_emergency_command.call_count == 0
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 0
@@ -947,7 +1088,7 @@ class TestRobotStateAPI:
                     }
                 }
 
-        mocked_api.orion.get_entity.side_effect = get_entity
+        as_cached_robot(mocked_api, get_entity)
 
         response = app.test_client().get(f'/api/v1/robots/{robot_id}/')
         assert response.status_code == 200
@@ -955,17 +1096,14 @@ class TestRobotStateAPI:
 
         assert response.json == {'id': robot_id, 'state': s, 'destination': place_name}
 
-        assert mocked_api.orion.get_entity.call_count == call_count
-        for i in range(3):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         robot_id)
+        assert mocked_api.orion.get_entity.call_count == 0
+        assert mocked_api.RobotCache.get_with_version.call_count == 1
+        assert mocked_api.RobotCache.get_with_version.call_args == call(robot_id)
         if call_count > 3:
-            assert mocked_api.orion.get_entity.call_args_list[3] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.PLACE_TYPE,
-                                                                         'A_id')
+            assert mocked_api.RobotCache.get_place_name.call_count == 1
+            assert mocked_api.RobotCache.get_place_name.call_args == call('A_id')
+        else:
+            assert mocked_api.RobotCache.get_place_name.call_count == 0
         assert mocked_api.orion.make_delivery_robot_command.call_count == 0
         assert mocked_api.orion.make_emergency_command.call_count == 0
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 0
@@ -981,6 +1119,185 @@ class TestRobotStateAPI:
         assert mocked_api.Token.get.return_value.get_lock.call_count == 0
         assert mocked_api.MongoThrottling.lock.call_count == 0
 
+    @pytest.mark.parametrize('version', [None, 1577901845.678])
+    def test_etag(self, app, mocked_api, version):
+        robot_id = 'robot_01'
+        robot_entity = {'mode': 'navi', 'navigating_waypoints': {'to': 'B_id', 'destination': 'A_id'}}
+        mocked_api.RobotCache.get_with_version.return_value = (robot_entity, version)
+        mocked_api.RobotCache.get_place_name.return_value = 'place_A'
+        expected = {'id': robot_id, 'state': const.STATE_MOVING, 'destination': 'place_A'}
+        if version is None:
+            etag = api.make_etag(expected)
+        else:
+            etag = api.make_etag([robot_id, version, 'A_id'])
+
+        response = app.test_client().get(f'/api/v1/robots/{robot_id}/')
+        assert response.status_code == 200
+        assert response.json == expected
+        assert response.headers['ETag'] == f'"{etag}"'
+        assert mocked_api.RobotCache.get_place_name.call_count == 1
+
+        response = app.test_client().get(f'/api/v1/robots/{robot_id}/', headers={'If-None-Match': f'"{etag}"'})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == f'"{etag}"'
+        assert response.get_data() == b''
+        if version is None:
+            assert mocked_api.RobotCache.get_place_name.call_count == 2
+        else:
+            assert mocked_api.RobotCache.get_place_name.call_count == 1
+
+        response = app.test_client().get(f'/api/v1/robots/{robot_id}/', headers={'If-None-Match': '"dummy"'})
+        assert response.status_code == 200
+        assert response.json == expected
+
+        assert mocked_api.RobotCache.get_with_version.call_count == 3
+        assert mocked_api.orion.get_entity.call_count == 0
+
+
+class TestRobotListAPI:
+
+    def setup_cache(self, mocked_api):
+        mocked_api.RobotCache.get_all.return_value = {
+            'robot_01': {'mode': 'navi', 'navigating_waypoints': {'to': 'B_id', 'destination': 'A_id'},
+                         'order': None, 'caller': None},
+            'robot_02': {'mode': 'standby', 'navigating_waypoints': None, 'order': None, 'caller': None},
+        }
+        mocked_api.RobotCache.get_place_names.return_value = {'A_id': 'place_A'}
+
+    def test_success(self, app, mocked_api):
+        self.setup_cache(mocked_api)
+        expected = [
+            {'id': 'robot_01', 'state': const.STATE_MOVING, 'destination': 'place_A'},
+            {'id': 'robot_02', 'state': const.STATE_STANDBY, 'destination': ''},
+        ]
+
+        response = app.test_client().get('/api/v1/robots/')
+        assert response.status_code == 200
+        assert response.json == expected
+        assert response.headers['ETag'] == f'"{api.make_etag(expected)}"'
+
+        assert mocked_api.RobotCache.get_all.call_count == 1
+        assert mocked_api.RobotCache.get_all.call_args == call(['robot_01', 'robot_02'])
+        assert mocked_api.RobotCache.get_place_names.call_count == 1
+        assert mocked_api.RobotCache.get_place_names.call_args == call(['A_id'])
+        assert mocked_api.RobotCache.get.call_count == 0
+        assert mocked_api.orion.get_entity.call_count == 0
+
+    def test_not_modified(self, app, mocked_api):
+        self.setup_cache(mocked_api)
+        response = app.test_client().get('/api/v1/robots/')
+        etag = response.headers['ETag']
+
+        response = app.test_client().get('/api/v1/robots/', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        assert response.get_data() == b''
+
+        response = app.test_client().get('/api/v1/robots/', headers={'If-None-Match': '"dummy"'})
+        assert response.status_code == 200
+
+
+class TestRobotStateStreamAPI:
+
+    @pytest.fixture(autouse=True)
+    def gevent_mode(self, mocker):
+        mocker.patch.object(const, 'GEVENT_ASYNC_CORES', 1000)
+
+    @pytest.fixture
+    def mocked_clock(self, mocker):
+        mocker.patch.object(api, 'sleep')
+        clock = mocker.patch.object(api, 'monotonic')
+        clock.return_value = 0
+        return clock
+
+    @pytest.mark.parametrize('accept', ['application/json', 'text/event-stream'])
+    def test_prefork_mode(self, app, mocked_api, mocked_clock, mocker, accept):
+        mocker.patch.object(const, 'GEVENT_ASYNC_CORES', 0)
+
+        response = app.test_client().get('/api/v1/robots/robot_01/streams/', headers={'Accept': accept})
+        assert response.status_code == 501
+        assert response.json == {
+            'message': 'robot state stream is available only in gevent mode (GEVENT_ASYNC_CORES)',
+        }
+        assert mocked_api.RobotCache.get_state.call_count == 0
+        assert api.sleep.call_count == 0
+
+    def test_longpoll_published(self, app, mocked_api, mocked_clock):
+        state = {'id': 'robot_01', 'state': const.STATE_MOVING, 'destination': 'place_A'}
+        mocked_api.RobotCache.get_state.return_value = state
+
+        response = app.test_client().get('/api/v1/robots/robot_01/streams/')
+        assert response.status_code == 200
+        assert response.json == state
+        assert response.headers['ETag'] == f'"{api.make_etag(state)}"'
+
+        assert mocked_api.RobotCache.get_state.call_args == call('robot_01')
+        assert mocked_api.RobotCache.get.call_count == 0
+        assert mocked_api.orion.get_entity.call_count == 0
+        assert api.sleep.call_count == 0
+
+    def test_longpoll_not_published(self, app, mocked_api, mocked_clock):
+        mocked_api.RobotCache.get_state.return_value = None
+        mocked_api.RobotCache.get.return_value = {'mode': 'navi', 'navigating_waypoints': None}
+
+        response = app.test_client().get('/api/v1/robots/robot_01/streams/')
+        assert response.status_code == 200
+        assert response.json == {'id': 'robot_01', 'state': const.STATE_MOVING, 'destination': ''}
+        assert mocked_api.RobotCache.get.call_args == call('robot_01')
+        assert mocked_api.orion.get_entity.call_count == 0
+
+    def test_longpoll_changed(self, app, mocked_api, mocked_clock):
+        old = {'id': 'robot_01', 'state': const.STATE_MOVING, 'destination': 'place_A'}
+        new = {'id': 'robot_01', 'state': const.STATE_PICKING, 'destination': 'place_A'}
+        mocked_api.RobotCache.get_state.side_effect = [old, old, new]
+
+        response = app.test_client().get('/api/v1/robots/robot_01/streams/',
+                                         headers={'If-None-Match': f'"{api.make_etag(old)}"'})
+        assert response.status_code == 200
+        assert response.json == new
+        assert response.headers['ETag'] == f'"{api.make_etag(new)}"'
+        assert api.sleep.call_count == 2
+        assert api.sleep.call_args == call(const.ROBOT_STATE_STREAM_INTERVAL_MSEC / 1000.0)
+
+    def test_longpoll_timeout(self, app, mocked_api, mocked_clock):
+        state = {'id': 'robot_01', 'state': const.STATE_MOVING, 'destination': 'place_A'}
+        mocked_api.RobotCache.get_state.return_value = state
+        mocked_clock.side_effect = [0, 1, const.ROBOT_STATE_STREAM_SEC]
+
+        response = app.test_client().get('/api/v1/robots/robot_01/streams/',
+                                         headers={'If-None-Match': f'"{api.make_etag(state)}"'})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == f'"{api.make_etag(state)}"'
+        assert api.sleep.call_count == 1
+
+    @pytest.mark.parametrize('last_event_id, expected_events', [
+        (None, [0, 1]),
+        ('old', [1]),
+    ])
+    def test_event_stream(self, app, mocked_api, mocked_clock, last_event_id, expected_events):
+        states = [
+            {'id': 'robot_01', 'state': const.STATE_MOVING, 'destination': 'place_A'},
+            {'id': 'robot_01', 'state': const.STATE_PICKING, 'destination': 'place_A'},
+        ]
+        mocked_api.RobotCache.get_state.side_effect = [states[0], states[0], states[1]]
+        mocked_clock.side_effect = [0, 1, 2, const.ROBOT_STATE_STREAM_SEC]
+        headers = {'Accept': 'text/event-stream'}
+        if last_event_id is not None:
+            headers['Last-Event-ID'] = api.make_etag(states[0])
+
+        response = app.test_client().get('/api/v1/robots/robot_01/streams/', headers=headers)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        assert response.headers['Cache-Control'] == 'no-cache'
+
+        expected = f'retry: {const.ROBOT_STATE_STREAM_INTERVAL_MSEC}\n\n'
+        for i in expected_events:
+            data = json.dumps(states[i], separators=(',', ':'))
+            expected += f'id: {api.make_etag(states[i])}\nevent: state\ndata: {data}\n\n'
+        assert response.get_data(as_text=True) == expected
+        assert mocked_api.RobotCache.get_state.call_count == 3
+        assert mocked_api.orion.get_entity.call_count == 0
+
 
 class TestMoveNextAPI:
 
@@ -1031,7 +1348,7 @@ class TestMoveNextAPI:
                     }
                 }
             }
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_delivery_robot_command.return_value = 'make_delivery_robot_command_return_value'
 
         response = app.test_client().patch(f'/api/v1/robots/{robot_id}/nexts/')
@@ -1039,16 +1356,14 @@ class TestMoveNextAPI:
         assert response.json == {'result': 'success'}
 
         assert mocked_api.orion.get_entity.call_count == 3
+        expected_attrs = [MODE_ATTRS, RWL_ATTRS, CMD_ATTRS]
         for i in range(3):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         robot_id)
+            assert mocked_api.orion.get_entity.call_args_list[i] == robot_call(robot_id, expected_attrs[i])
         assert mocked_api.orion.make_delivery_robot_command.call_count == 1
         assert mocked_api.orion.make_delivery_robot_command.call_args == call('navi',
                                                                               rwl[0]['waypoints'],
                                                                               rwl[0],
-                                                                              [] if len(rwl) == 1 else [rwl[1]],
+                                                                              None,
                                                                               None,
                                                                               None,
                                                                               None)
@@ -1060,6 +1375,9 @@ class TestMoveNextAPI:
                                                                'make_delivery_robot_command_return_value')
         assert mocked_api.CommonMixin.waypoint().estimate_routes.call_count == 0
         assert mocked_api.orion.make_emergency_command.call_count == 0
+        assert mocked_api.RobotActor.of.call_args_list == [call(robot_id), call(robot_id)]
+        assert mocked_api.RobotActor.of.return_value.__enter__.call_count == 2
+        assert mocked_api.RobotActor.of.return_value.__exit__.call_count == 2
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 0
         assert mocked_api.orion.make_updatemode_command.call_count == 0
         assert mocked_api.orion.make_updatestate_command.call_count == 0
@@ -1095,7 +1413,7 @@ class TestMoveNextAPI:
                     }
                 }
             }
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
 
         response = app.test_client().patch(f'/api/v1/robots/{robot_id}/nexts/')
         assert response.status_code == 423
@@ -1105,10 +1423,7 @@ class TestMoveNextAPI:
         }
 
         assert mocked_api.orion.get_entity.call_count == 1
-        assert mocked_api.orion.get_entity.call_args_list[0] == call(const.FIWARE_SERVICE,
-                                                                     const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                     const.DELIVERY_ROBOT_TYPE,
-                                                                     robot_id)
+        assert mocked_api.orion.get_entity.call_args_list[0] == robot_call(robot_id, MODE_ATTRS)
         assert mocked_api.orion.make_delivery_robot_command.call_count == 0
         assert mocked_api.orion.send_command.call_count == 0
         assert mocked_api.CommonMixin.waypoint().estimate_routes.call_count == 0
@@ -1150,7 +1465,7 @@ class TestMoveNextAPI:
                     }
                 }
             }
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
 
         response = app.test_client().patch(f'/api/v1/robots/{robot_id}/nexts/')
         assert response.status_code == 412
@@ -1160,11 +1475,9 @@ class TestMoveNextAPI:
         }
 
         assert mocked_api.orion.get_entity.call_count == 2
+        expected_attrs = [MODE_ATTRS, RWL_ATTRS]
         for i in range(2):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         robot_id)
+            assert mocked_api.orion.get_entity.call_args_list[i] == robot_call(robot_id, expected_attrs[i])
         assert mocked_api.orion.make_delivery_robot_command.call_count == 0
         assert mocked_api.orion.send_command.call_count == 0
         assert mocked_api.CommonMixin.waypoint().estimate_routes.call_count == 0
@@ -1180,6 +1493,138 @@ class TestMoveNextAPI:
         assert mocked_api.Token.get.return_value.get_lock.call_count == 0
         assert mocked_api.MongoThrottling.lock.call_count == 0
 
+    @pytest.mark.parametrize('route_cursor, expected_index', [
+        (None, 0), (0, 0), (1, 1), (2, 2), (2.0, 2), (-1, 0), ('1', 0), (True, 0),
+    ])
+    def test_route_cursor(self, app, mocked_api, route_cursor, expected_index):
+        robot_id = 'robot_01'
+        rwl = [{'to': f'{i}_id', 'destination': 'dest_id', 'action': {}, 'waypoints': [{'point': f'p{i}', 'angle': None}]}
+               for i in range(3)]
+
+        def get_entity(fs, fsp, t, id):
+            entity = {
+                'mode': {'value': 'standby'},
+                'remaining_waypoints_list': {'value': rwl},
+                'send_cmd_status': {'value': 'OK'},
+                'send_cmd_info': {'value': {'result': 'ack'}},
+            }
+            if route_cursor is not None:
+                entity['route_cursor'] = {'value': route_cursor}
+            return entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
+
+        response = app.test_client().patch(f'/api/v1/robots/{robot_id}/nexts/')
+        assert response.status_code == 200
+
+        assert mocked_api.orion.make_delivery_robot_command.call_args == call('navi',
+                                                                              rwl[expected_index]['waypoints'],
+                                                                              rwl[expected_index],
+                                                                              None,
+                                                                              None,
+                                                                              None,
+                                                                              None)
+        assert mocked_api.orion.make_route_cursor_command.call_args == call(expected_index + 1)
+        assert mocked_api.orion.append_attrs.call_args == call(const.FIWARE_SERVICE,
+                                                               const.DELIVERY_ROBOT_SERVICEPATH,
+                                                               const.DELIVERY_ROBOT_TYPE,
+                                                               robot_id,
+                                                               mocked_api.orion.make_route_cursor_command.return_value)
+        assert mocked_api.CommonMixin._orion_executor.submit.call_count == 0
+
+    @pytest.mark.parametrize('route_cursor', [
+        0, 2,
+    ])
+    def test_route_store(self, app, mocked_api, route_cursor):
+        robot_id = 'robot_01'
+        head = {'to': 'C_id', 'destination': 'dest_id', 'action': {}, 'waypoints': [{'point': 'pC', 'angle': None}]}
+        mocked_api.RouteStore.peek.return_value = (head, route_cursor)
+
+        def get_entity(fs, fsp, t, id):
+            return {
+                'mode': {'value': 'standby'},
+                'send_cmd_status': {'value': 'OK'},
+                'send_cmd_info': {'value': {'result': 'ack'}},
+            }
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
+
+        response = app.test_client().patch(f'/api/v1/robots/{robot_id}/nexts/')
+        assert response.status_code == 200
+
+        assert mocked_api.RouteStore.peek.call_args_list == [call(robot_id)]
+        assert mocked_api.RouteStore.pop.call_args_list == [call(robot_id, route_cursor)]
+        assert mocked_api.RouteStore.get.call_count == 0
+        assert mocked_api.orion.get_entity.call_args_list == [robot_call(robot_id, MODE_ATTRS), robot_call(robot_id, CMD_ATTRS)]
+        assert mocked_api.orion.make_delivery_robot_command.call_args == call('navi',
+                                                                              head['waypoints'],
+                                                                              head,
+                                                                              None,
+                                                                              None,
+                                                                              None,
+                                                                              None)
+        assert mocked_api.orion.send_command.call_count == 1
+        assert mocked_api.orion.make_route_cursor_command.call_args == call(route_cursor + 1)
+        assert mocked_api.orion.append_attrs.call_count == 1
+        assert mocked_api.CommonMixin._orion_executor.submit.call_count == 1
+
+    def test_route_cursor_not_advanced(self, app, mocked_api):
+        robot_id = 'robot_01'
+        head = {'to': 'C_id', 'destination': 'dest_id', 'action': {}, 'waypoints': [{'point': 'pC', 'angle': None}]}
+        mocked_api.RouteStore.peek.return_value = (head, 0)
+
+        def get_entity(fs, fsp, t, id):
+            return {
+                'mode': {'value': 'standby'},
+                'send_cmd_status': {'value': 'OK'},
+                'send_cmd_info': {'value': {'result': 'error', 'errors': ['dummy']}},
+            }
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
+
+        response = app.test_client().patch(f'/api/v1/robots/{robot_id}/nexts/')
+        assert response.status_code == 500
+
+        assert mocked_api.orion.send_command.call_count == 1
+        assert mocked_api.orion.append_attrs.call_count == 0
+        assert mocked_api.RouteStore.pop.call_count == 0
+
+    def test_route_store_finished(self, app, mocked_api):
+        robot_id = 'robot_01'
+        mocked_api.RouteStore.get.return_value = []
+        mocked_api.orion.get_entity.side_effect = as_key_values(lambda fs, fsp, t, id: {'mode': {'value': 'standby'}})
+
+        response = app.test_client().patch(f'/api/v1/robots/{robot_id}/nexts/')
+        assert response.status_code == 412
+        assert response.json == {
+            'message': 'no remaining waypoints for robot(robot_01)',
+            'id': 'robot_01',
+        }
+
+        assert mocked_api.RouteStore.peek.call_args_list == [call(robot_id)]
+        assert mocked_api.RouteStore.pop.call_count == 0
+        assert mocked_api.orion.get_entity.call_args_list == [robot_call(robot_id, MODE_ATTRS)]
+        assert mocked_api.orion.make_delivery_robot_command.call_count == 0
+
+    @pytest.mark.parametrize('route_cursor', [
+        3, 4,
+    ])
+    def test_route_cursor_finished(self, app, mocked_api, route_cursor):
+        robot_id = 'robot_01'
+
+        def get_entity(fs, fsp, t, id):
+            return {
+                'mode': {'value': 'standby'},
+                'remaining_waypoints_list': {'value': [{'to': 'A_id', 'waypoints': []}] * 3},
+                'route_cursor': {'value': route_cursor},
+            }
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
+
+        response = app.test_client().patch(f'/api/v1/robots/{robot_id}/nexts/')
+        assert response.status_code == 412
+        assert response.json == {
+            'message': 'no remaining waypoints for robot(robot_01)',
+            'id': 'robot_01',
+        }
+        assert mocked_api.orion.make_delivery_robot_command.call_count == 0
+
     def test_send_cmd_status_pending(self, app, mocked_api):
         robot_id = 'robot_01'
         mode = 'standby'
@@ -1209,7 +1654,7 @@ class TestMoveNextAPI:
                     }
                 }
             }
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_delivery_robot_command.return_value = 'make_delivery_robot_command_return_value'
 
         response = app.test_client().patch(f'/api/v1/robots/{robot_id}/nexts/')
@@ -1218,16 +1663,14 @@ class TestMoveNextAPI:
             'message': 'send_cmd_status still pending, robot_id=robot_01, wait_msec=10, wait_count=3',
         }
         assert mocked_api.orion.get_entity.call_count == 5
+        expected_attrs = [MODE_ATTRS, RWL_ATTRS, CMD_ATTRS, CMD_ATTRS, CMD_ATTRS]
         for i in range(5):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         'robot_01')
+            assert mocked_api.orion.get_entity.call_args_list[i] == robot_call('robot_01', expected_attrs[i])
         assert mocked_api.orion.make_delivery_robot_command.call_count == 1
         assert mocked_api.orion.make_delivery_robot_command.call_args == call('navi',
                                                                               rwl[0]['waypoints'],
                                                                               rwl[0],
-                                                                              [],
+                                                                              None,
                                                                               None,
                                                                               None,
                                                                               None)
@@ -1303,7 +1746,7 @@ class TestMoveNextAPI:
                     'value': send_cmd_info_value,
                 },
             }
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_delivery_robot_command.return_value = 'make_delivery_robot_command_return_value'
 
         response = app.test_client().patch(f'/api/v1/robots/{robot_id}/nexts/')
@@ -1312,16 +1755,14 @@ class TestMoveNextAPI:
             'message': errmsg,
         }
         assert mocked_api.orion.get_entity.call_count == 3
+        expected_attrs = [MODE_ATTRS, RWL_ATTRS, CMD_ATTRS]
         for i in range(3):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         'robot_01')
+            assert mocked_api.orion.get_entity.call_args_list[i] == robot_call('robot_01', expected_attrs[i])
         assert mocked_api.orion.make_delivery_robot_command.call_count == 1
         assert mocked_api.orion.make_delivery_robot_command.call_args == call('navi',
                                                                               rwl[0]['waypoints'],
                                                                               rwl[0],
-                                                                              [],
+                                                                              None,
                                                                               None,
                                                                               None,
                                                                               None)
@@ -1400,7 +1841,7 @@ class TestMoveNextAPI:
                 return result
             return _result
 
-        mocked_api.orion.get_entity.side_effect = get_entity()
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity())
         mocked_api.orion.make_delivery_robot_command.return_value = 'make_delivery_robot_command_return_value'
 
         response = app.test_client().patch(f'/api/v1/robots/{robot_id}/nexts/')
@@ -1408,23 +1849,21 @@ class TestMoveNextAPI:
         assert response.json == {'result': 'success'}
 
         assert mocked_api.orion.get_entity.call_count == 4
+        expected_attrs = [MODE_ATTRS, RWL_ATTRS, CMD_ATTRS, CMD_ATTRS]
         for i in range(4):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         'robot_01')
+            assert mocked_api.orion.get_entity.call_args_list[i] == robot_call('robot_01', expected_attrs[i])
         assert mocked_api.orion.make_delivery_robot_command.call_count == 2
         assert mocked_api.orion.make_delivery_robot_command.call_args_list[0] == call('navi',
                                                                                       rwl[0]['waypoints'],
                                                                                       rwl[0],
-                                                                                      [],
+                                                                                      None,
                                                                                       None,
                                                                                       None,
                                                                                       None)
         assert mocked_api.orion.make_delivery_robot_command.call_args_list[1] == call('refresh',
                                                                                       rwl[0]['waypoints'],
                                                                                       rwl[0],
-                                                                                      [],
+                                                                                      None,
                                                                                       None,
                                                                                       None,
                                                                                       None)
@@ -1477,7 +1916,7 @@ class TestMoveNextAPI:
                     }
                 }
             }
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_delivery_robot_command.return_value = 'make_delivery_robot_command_return_value'
 
         response = app.test_client().patch(f'/api/v1/robots/{robot_id}/nexts/')
@@ -1487,23 +1926,21 @@ class TestMoveNextAPI:
             'navi result=ignore refresh result=ignore'
         }
         assert mocked_api.orion.get_entity.call_count == 4
+        expected_attrs = [MODE_ATTRS, RWL_ATTRS, CMD_ATTRS, CMD_ATTRS]
         for i in range(4):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         'robot_01')
+            assert mocked_api.orion.get_entity.call_args_list[i] == robot_call('robot_01', expected_attrs[i])
         assert mocked_api.orion.make_delivery_robot_command.call_count == 2
         assert mocked_api.orion.make_delivery_robot_command.call_args_list[0] == call('navi',
                                                                                       rwl[0]['waypoints'],
                                                                                       rwl[0],
-                                                                                      [],
+                                                                                      None,
                                                                                       None,
                                                                                       None,
                                                                                       None)
         assert mocked_api.orion.make_delivery_robot_command.call_args_list[1] == call('refresh',
                                                                                       rwl[0]['waypoints'],
                                                                                       rwl[0],
-                                                                                      [],
+                                                                                      None,
                                                                                       None,
                                                                                       None,
                                                                                       None)
@@ -1527,27 +1964,73 @@ class TestMoveNextAPI:
         assert mocked_api.Token.get.return_value.get_lock.call_count == 0
         assert mocked_api.MongoThrottling.lock.call_count == 0
 
+    @pytest.fixture
+    def rwl_entity(self, mocked_api):
+        rwl = [
+            {
+                'to': 'E_id', 'destination': 'dest_id', 'action': 'action_0',
+                'waypoints': [{'point': 'pE', 'angle': 'aE'}],
+            },
+        ]
+
+        def get_entity(fs, fsp, t, id):
+            return {
+                'mode': {'value': 'standby'},
+                'remaining_waypoints_list': {'value': rwl},
+                'send_cmd_status': {'value': 'OK'},
+                'send_cmd_info': {'value': {'result': 'ack'}},
+            }
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
+        yield rwl
+
+    def test_without_idempotency_key(self, app, mocked_api, rwl_entity):
+        for _ in range(2):
+            response = app.test_client().patch('/api/v1/robots/robot_01/nexts/')
+            assert response.status_code == 200
+            assert response.json == {'result': 'success'}
+
+        assert mocked_api.orion.send_command.call_count == 2
+        assert mocked_api.CommandLog.key_of.call_count == 0
+        assert mocked_api.CommandLog.get.call_count == 0
+        assert mocked_api.CommandLog.put.call_count == 0
+
+    def test_idempotency_key(self, app, mocked_api, rwl_entity):
+        response = app.test_client().patch('/api/v1/robots/robot_01/nexts/', headers={'Idempotency-Key': 'key_01'})
+        assert response.status_code == 200
+        assert response.json == {'result': 'success'}
+
+        assert mocked_api.CommandLog.key_of.call_args_list[0] == call('nexts', 'robot_01', 'key_01')
+        assert mocked_api.CommandLog.put.call_args_list[-1] == call(mocked_api.CommandLog.key_of.return_value,
+                                                                    {'result': 'success'})
+        assert mocked_api.orion.send_command.call_count == 1
+
+    def test_idempotency_key_replay(self, app, mocked_api, rwl_entity):
+        mocked_api.CommandLog.get.return_value = {'result': 'success'}
+
+        response = app.test_client().patch('/api/v1/robots/robot_01/nexts/', headers={'Idempotency-Key': 'key_01'})
+        assert response.status_code == 200
+        assert response.json == {'result': 'success'}
+
+        assert mocked_api.CommandLog.key_of.call_args_list == [call('nexts', 'robot_01', 'key_01')]
+        assert mocked_api.orion.get_entity.call_count == 0
+        assert mocked_api.orion.send_command.call_count == 0
+        assert mocked_api.CommandLog.put.call_count == 0
+
 
 class TestEmergencyAPI:
 
     def test_success(self, app, mocked_api):
         robot_id = 'robot_01'
 
-        mocked_api.orion.make_emergency_command.return_value = 'make_emergency_command_return_value'
-
         response = app.test_client().patch(f'/api/v1/robots/{robot_id}/emergencies/')
         assert response.status_code == 200
         assert response.json == {'result': 'success'}
 
         assert mocked_api.orion.get_entity.call_count == 0
-        assert mocked_api.orion.make_emergency_command.call_count == 1
-        assert mocked_api.orion.make_emergency_command.call_args == call('stop')
-        assert mocked_api.orion.send_command.call_count == 1
-        assert mocked_api.orion.send_command.call_args == call(const.FIWARE_SERVICE,
-                                                               const.DELIVERY_ROBOT_SERVICEPATH,
-                                                               const.DELIVERY_ROBOT_TYPE,
-                                                               robot_id,
-                                                               'make_emergency_command_return_value')
+        assert mocked_api.orion.send_emergency_command.call_count == 1
+        assert mocked_api.orion.send_emergency_command.call_args == call(robot_id, 'stop')
+        assert mocked_api.orion.make_emergency_command.call_count == 0
+        assert mocked_api.orion.send_command.call_count == 0
         assert mocked_api.CommonMixin.waypoint().estimate_routes.call_count == 0
         assert mocked_api.orion.make_delivery_robot_command.call_count == 0
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 0
@@ -1560,6 +2043,116 @@ class TestEmergencyAPI:
         assert mocked_api.Token.get.call_count == 0
         assert mocked_api.Token.get.return_value.get_lock.call_count == 0
         assert mocked_api.MongoThrottling.lock.call_count == 0
+        assert mocked_api.RobotActor.of.call_count == 0
+
+
+class TestEmergencyAllAPI:
+
+    def test_success(self, app, mocked_api):
+        response = app.test_client().patch('/api/v1/robots/emergencies/')
+        assert response.status_code == 200
+        assert response.json == {
+            'result': 'success',
+            'robots': [
+                {'id': 'robot_01', 'result': 'success'},
+                {'id': 'robot_02', 'result': 'success'},
+            ],
+        }
+
+        assert sorted(mocked_api.orion.send_emergency_command.call_args_list) == [
+            call('robot_01', 'stop'), call('robot_02', 'stop'),
+        ]
+        assert mocked_api.orion.get_entity.call_count == 0
+        assert mocked_api.orion.send_command.call_count == 0
+        assert mocked_api.RobotActor.of.call_count == 0
+
+    def test_partial_failure(self, app, mocked_api):
+        def send_emergency_command(robot_id, cmd):
+            if robot_id == 'robot_02':
+                raise ServiceUnavailable(description={'message': 'can not connect to orion', 'root_cause': 'timeout'})
+        mocked_api.orion.send_emergency_command.side_effect = send_emergency_command
+
+        response = app.test_client().patch('/api/v1/robots/emergencies/')
+        assert response.status_code == 500
+        assert response.json == {
+            'result': 'failure',
+            'robots': [
+                {'id': 'robot_01', 'result': 'success'},
+                {'id': 'robot_02', 'result': 'failure', 'code': 503,
+                 'error': {'message': 'can not connect to orion', 'root_cause': 'timeout'}},
+            ],
+        }
+        assert mocked_api.orion.send_emergency_command.call_count == 2
+
+    def test_concurrent(self, app, mocked_api):
+        barrier = threading.Barrier(2, timeout=1)
+        mocked_api.orion.send_emergency_command.side_effect = lambda robot_id, cmd: barrier.wait()
+
+        response = app.test_client().patch('/api/v1/robots/emergencies/')
+        assert response.status_code == 200
+        assert not barrier.broken
+
+
+class TestMetricsAPI:
+
+    @pytest.mark.parametrize('path', [
+        '/api/v1/metrics/', '/api/v1/metrics/emergencies/',
+    ])
+    def test_success(self, app, mocked_api, mocker, path):
+        mocker.patch.object(mocked_api.Latency, 'snapshot', return_value={
+            'orion_regular': {'count': 2, 'avg_msec': 1.5, 'max_msec': 2.0},
+            'orion_emergency': {'count': 1, 'avg_msec': 0.5, 'max_msec': 0.5},
+        })
+
+        response = app.test_client().get(path)
+        assert response.status_code == 200
+        assert response.json == {
+            'orion_regular': {'count': 2, 'avg_msec': 1.5, 'max_msec': 2.0},
+            'orion_emergency': {'count': 1, 'avg_msec': 0.5, 'max_msec': 0.5},
+        }
+
+
+class TestRobotCacheNotificationAPI:
+
+    def test_success(self, app, mocked_api):
+        data = [
+            {'id': 'robot_01', 'type': const.DELIVERY_ROBOT_TYPE, 'mode': {'value': 'navi'}},
+            {'id': 'robot_02', 'type': const.DELIVERY_ROBOT_TYPE, 'mode': {'value': 'standby'}},
+            {'id': 'robot_03', 'type': 'dummy', 'mode': {'value': 'standby'}},
+        ]
+        mocked_api.RobotCache.notify.side_effect = [True, False, TypeError('invalid')]
+
+        response = app.test_client().post(f'/api/v1/robots/notifications/caches/',
+                                          content_type='application/json', data=json.dumps({'data': data}))
+        assert response.status_code == 200
+        assert response.json == {
+            'result': 'success',
+            'processed_data': data[:1],
+            'ignored_data': data[1:],
+        }
+
+        assert mocked_api.RobotCache.notify.call_args_list == [call(d) for d in data]
+        assert mocked_api.orion.get_entity.call_count == 0
+        assert mocked_api.orion.send_command.call_count == 0
+        assert mocked_api.MongoThrottling.lock.call_count == 0
+
+    @pytest.mark.parametrize('notified, refresh_count', [
+        ([True, True], 1),
+        ([True, False], 0),
+        ([False, False], 0),
+    ])
+    def test_place(self, mocker, app, mocked_api, notified, refresh_count):
+        mocker.patch.object(api.warmup, 'request_refresh')
+        data = [
+            {'id': 'robot_01', 'type': const.DELIVERY_ROBOT_TYPE, 'mode': {'value': 'navi'}},
+            {'id': 'A_id', 'type': const.PLACE_TYPE, 'pose': {'value': {}}},
+        ]
+        mocked_api.RobotCache.notify.side_effect = notified
+
+        response = app.test_client().post(f'/api/v1/robots/notifications/caches/',
+                                          content_type='application/json', data=json.dumps({'data': data}))
+        assert response.status_code == 200
+        assert api.warmup.request_refresh.call_count == refresh_count
 
 
 class TestRobotNotificationAPI:
@@ -1604,7 +2197,7 @@ class TestRobotNotificationAPI:
                     'value': last_processed_time,
                 }
             }
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_updatelastprocessedtime_command.return_value = 'make_updatelastprocessedtime_command_return_value'
 
         response = app.test_client().post(f'/api/v1/robots/notifications/',
@@ -1616,10 +2209,7 @@ class TestRobotNotificationAPI:
             'ignored_data': [data],
         }
         assert mocked_api.orion.get_entity.call_count == 1
-        assert mocked_api.orion.get_entity.call_args == call(const.FIWARE_SERVICE,
-                                                             const.DELIVERY_ROBOT_SERVICEPATH,
-                                                             const.DELIVERY_ROBOT_TYPE,
-                                                             robot_id)
+        assert mocked_api.orion.get_entity.call_args == robot_call(robot_id, NOTIFICATION_ATTRS)
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 1
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_args == call(dateutil.parser.parse(time))
         assert mocked_api.orion.make_updatemode_command.call_count == 0
@@ -1684,7 +2274,7 @@ class TestRobotNotificationAPI:
                     'value': last_processed_time,
                 }
             }
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_updatelastprocessedtime_command.return_value = 'make_updatelastprocessedtime_command_return_value'
         mocked_api.orion.make_updatemode_command.return_value = 'make_updatemode_command_return_value'
 
@@ -1697,10 +2287,7 @@ class TestRobotNotificationAPI:
             'ignored_data': [],
         }
         assert mocked_api.orion.get_entity.call_count == 1
-        assert mocked_api.orion.get_entity.call_args == call(const.FIWARE_SERVICE,
-                                                             const.DELIVERY_ROBOT_SERVICEPATH,
-                                                             const.DELIVERY_ROBOT_TYPE,
-                                                             robot_id)
+        assert mocked_api.orion.get_entity.call_args == robot_call(robot_id, NOTIFICATION_ATTRS)
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 1
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_args == call(dateutil.parser.parse(time))
         assert mocked_api.orion.make_updatemode_command.call_count == 1
@@ -1783,7 +2370,7 @@ class TestRobotNotificationAPI:
             else:
                 return d_name
 
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_updatelastprocessedtime_command.return_value = 'make_updatelastprocessedtime_command_return_value'
         mocked_api.orion.make_updatemode_command.return_value = 'make_updatemode_command_return_value'
         mocked_api.orion.make_updatestate_command.return_value = 'make_updatestate_command_return_value'
@@ -1799,22 +2386,15 @@ class TestRobotNotificationAPI:
         }
         if d_value == '':
             assert mocked_api.orion.get_entity.call_count == 2
+            expected_attrs = [NOTIFICATION_ATTRS, NW_ATTRS]
             for i in range(2):
-                assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                             const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                             const.DELIVERY_ROBOT_TYPE,
-                                                                             robot_id)
+                assert mocked_api.orion.get_entity.call_args_list[i] == robot_call(robot_id, expected_attrs[i])
         else:
             assert mocked_api.orion.get_entity.call_count == 3
+            expected_attrs = [NOTIFICATION_ATTRS, NW_ATTRS]
             for i in range(2):
-                assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                             const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                             const.DELIVERY_ROBOT_TYPE,
-                                                                             robot_id)
-            assert mocked_api.orion.get_entity.call_args_list[2] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.PLACE_TYPE,
-                                                                         d_value['destination'])
+                assert mocked_api.orion.get_entity.call_args_list[i] == robot_call(robot_id, expected_attrs[i])
+            assert mocked_api.orion.get_entity.call_args_list[2] == place_call(d_value['destination'])
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 1
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_args == call(dateutil.parser.parse(time))
         assert mocked_api.orion.make_updatemode_command.call_count == 1
@@ -1945,7 +2525,7 @@ class TestRobotNotificationAPI:
                     'value': c,
                 }
             }
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_updatelastprocessedtime_command.return_value = 'make_updatelastprocessedtime_command_return_value'
 
         response = app.test_client().post(f'/api/v1/robots/notifications/',
@@ -1957,10 +2537,7 @@ class TestRobotNotificationAPI:
             'ignored_data': [data],
         }
         assert mocked_api.orion.get_entity.call_count == 1
-        assert mocked_api.orion.get_entity.call_args == call(const.FIWARE_SERVICE,
-                                                             const.DELIVERY_ROBOT_SERVICEPATH,
-                                                             const.DELIVERY_ROBOT_TYPE,
-                                                             robot_id)
+        assert mocked_api.orion.get_entity.call_args == robot_call(robot_id, NOTIFICATION_ATTRS)
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 1
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_args == call(dateutil.parser.parse(time))
         assert mocked_api.orion.make_updatemode_command.call_count == 0
@@ -2129,7 +2706,7 @@ class TestRobotNotificationAPI:
                     }
                 }
 
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_updatelastprocessedtime_command.return_value = 'make_updatelastprocessedtime_command_return_value'
         mocked_api.orion.make_updatemode_command.return_value = 'make_updatemode_command_return_value'
         mocked_api.orion.make_updatestate_command.return_value = 'make_updatestate_command_return_value'
@@ -2146,21 +2723,13 @@ class TestRobotNotificationAPI:
 
         if next_state == current_state:
             assert mocked_api.orion.get_entity.call_count == 1
-            assert mocked_api.orion.get_entity.call_args_list[0] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         robot_id)
+            assert mocked_api.orion.get_entity.call_args_list[0] == robot_call(robot_id, NOTIFICATION_ATTRS)
         else:
             assert mocked_api.orion.get_entity.call_count == 3
+            expected_attrs = [NOTIFICATION_ATTRS, NW_ATTRS]
             for i in range(2):
-                assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                             const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                             const.DELIVERY_ROBOT_TYPE,
-                                                                             robot_id)
-            assert mocked_api.orion.get_entity.call_args_list[2] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.PLACE_TYPE,
-                                                                         'A_id')
+                assert mocked_api.orion.get_entity.call_args_list[i] == robot_call(robot_id, expected_attrs[i])
+            assert mocked_api.orion.get_entity.call_args_list[2] == place_call('A_id')
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 1
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_args == call(dateutil.parser.parse(time))
         assert mocked_api.orion.make_updatemode_command.call_count == 1
@@ -2276,7 +2845,7 @@ class TestRobotNotificationAPI:
                     }
                 }
 
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_updatelastprocessedtime_command.return_value = 'make_updatelastprocessedtime_command_return_value'
         mocked_api.orion.make_updatemode_command.return_value = 'make_updatemode_command_return_value'
         mocked_api.orion.make_updatestate_command.return_value = 'make_updatestate_command_return_value'
@@ -2293,21 +2862,13 @@ class TestRobotNotificationAPI:
 
         if next_state == current_state:
             assert mocked_api.orion.get_entity.call_count == 1
-            assert mocked_api.orion.get_entity.call_args_list[0] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         robot_id)
+            assert mocked_api.orion.get_entity.call_args_list[0] == robot_call(robot_id, NOTIFICATION_ATTRS)
         else:
             assert mocked_api.orion.get_entity.call_count == 3
+            expected_attrs = [NOTIFICATION_ATTRS, NW_ATTRS]
             for i in range(2):
-                assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                             const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                             const.DELIVERY_ROBOT_TYPE,
-                                                                             robot_id)
-            assert mocked_api.orion.get_entity.call_args_list[2] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.PLACE_TYPE,
-                                                                         'A_id')
+                assert mocked_api.orion.get_entity.call_args_list[i] == robot_call(robot_id, expected_attrs[i])
+            assert mocked_api.orion.get_entity.call_args_list[2] == place_call('A_id')
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 1
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_args == call(dateutil.parser.parse(time))
         assert mocked_api.orion.make_updatemode_command.call_count == 1
@@ -2435,7 +2996,7 @@ class TestRobotNotificationAPI:
                     }
                 }
 
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_delivery_robot_command.return_value = 'make_delivery_robot_command_return_value'
         mocked_api.orion.make_updatelastprocessedtime_command.return_value = 'make_updatelastprocessedtime_command_return_value'
         mocked_api.orion.make_updatemode_command.return_value = 'make_updatemode_command_return_value'
@@ -2454,20 +3015,15 @@ class TestRobotNotificationAPI:
             'ignored_data': [],
         }
         assert mocked_api.orion.get_entity.call_count == 5
+        expected_attrs = [NOTIFICATION_ATTRS, RWL_ATTRS, CMD_ATTRS, NW_ATTRS]
         for i in range(4):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         robot_id)
-        assert mocked_api.orion.get_entity.call_args_list[4] == call(const.FIWARE_SERVICE,
-                                                                     const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                     const.PLACE_TYPE,
-                                                                     'A_id')
+            assert mocked_api.orion.get_entity.call_args_list[i] == robot_call(robot_id, expected_attrs[i])
+        assert mocked_api.orion.get_entity.call_args_list[4] == place_call('A_id')
         assert mocked_api.orion.make_delivery_robot_command.call_count == 1
         assert mocked_api.orion.make_delivery_robot_command.call_args == call('navi',
                                                                               rwl[0]['waypoints'],
                                                                               rwl[0],
-                                                                              [],
+                                                                              None,
                                                                               None,
                                                                               None,
                                                                               None)
@@ -2521,7 +3077,7 @@ class TestRobotNotificationAPI:
         assert mocked_api.orion.make_delivery_robot_command.call_args_list[0] == call('navi',
                                                                                       rwl[0]['waypoints'],
                                                                                       rwl[0],
-                                                                                      [],
+                                                                                      None,
                                                                                       None,
                                                                                       None,
                                                                                       None)
@@ -2612,7 +3168,7 @@ class TestRobotNotificationAPI:
                     }
                 }
 
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_delivery_robot_command.return_value = 'make_delivery_robot_command_return_value'
         mocked_api.orion.make_updatelastprocessedtime_command.return_value = 'make_updatelastprocessedtime_command_return_value'
         mocked_api.orion.make_updatemode_command.return_value = 'make_updatemode_command_return_value'
@@ -2622,8 +3178,7 @@ class TestRobotNotificationAPI:
 
         refuge_waypoints = [{'point': 'pB', 'angle': 'aB'}]
         mocked_api.Token.get.return_value.get_lock.return_value = False
-        mocked_api.Waypoint.return_value.get_places.return_value = {'A_id': 'place_A', 'B_id': 'place_B'}
-        mocked_api.Waypoint.return_value.get_waypoints.return_value = refuge_waypoints
+        mocked_api.Waypoint.return_value.get_refuge_waypoints.return_value = refuge_waypoints
         response = app.test_client().post(f'/api/v1/robots/notifications/',
                                           content_type='application/json', data=json.dumps(notified_data))
         assert response.status_code == 200
@@ -2639,15 +3194,10 @@ class TestRobotNotificationAPI:
             assert mocked_api.orion.get_entity.call_count == 3
             lo = 2
 
+        expected_attrs = [NOTIFICATION_ATTRS, NW_ATTRS, CMD_ATTRS, NW_ATTRS]
         for i in range(lo):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         robot_id)
-        assert mocked_api.orion.get_entity.call_args_list[lo] == call(const.FIWARE_SERVICE,
-                                                                      const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                      const.PLACE_TYPE,
-                                                                      'A_id')
+            assert mocked_api.orion.get_entity.call_args_list[i] == robot_call(robot_id, expected_attrs[i])
+        assert mocked_api.orion.get_entity.call_args_list[lo] == place_call('A_id')
 
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 1
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_args == call(dateutil.parser.parse(time))
@@ -2724,13 +3274,10 @@ class TestRobotNotificationAPI:
         assert mocked_api.orion.make_emergency_command.call_count == 0
         assert mocked_api.CommonMixin.waypoint().estimate_routes.call_count == 0
         if waiting_route:
-            assert mocked_api.CommonMixin.waypoint().get_places.call_count == 1
-            assert mocked_api.CommonMixin.waypoint().get_places.call_args == call([['A_id', 'B_id']])
-            assert mocked_api.CommonMixin.waypoint().get_waypoints.call_count == 1
-            assert mocked_api.CommonMixin.waypoint().get_waypoints.call_args == call(['place_A'], ['place_B'])
+            assert mocked_api.CommonMixin.waypoint().get_refuge_waypoints.call_count == 1
+            assert mocked_api.CommonMixin.waypoint().get_refuge_waypoints.call_args == call(waiting_route)
         else:
-            assert mocked_api.CommonMixin.waypoint().get_places.call_count == 0
-            assert mocked_api.CommonMixin.waypoint().get_waypoints.call_count == 0
+            assert mocked_api.CommonMixin.waypoint().get_refuge_waypoints.call_count == 0
         assert mocked_api.MongoThrottling.lock.call_count == 1
         assert mocked_api.MongoThrottling.lock.call_args == call(robot_id, dateutil.parser.parse(time))
 
@@ -2814,7 +3361,7 @@ class TestRobotNotificationAPI:
                     }
                 }
 
-        mocked_api.orion.get_entity.side_effect = get_entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
         mocked_api.orion.make_delivery_robot_command.return_value = 'make_delivery_robot_command_return_value'
         mocked_api.orion.make_updatelastprocessedtime_command.return_value = 'make_updatelastprocessedtime_command_return_value'
         mocked_api.orion.make_updatemode_command.return_value = 'make_updatemode_command_return_value'
@@ -2822,11 +3369,15 @@ class TestRobotNotificationAPI:
         mocked_api.orion.make_robotui_sendstate_command.return_value = 'make_robotui_sendstate_command_return_value'
         mocked_api.orion.make_robotui_sendtokeninfo_command.return_value = 'make_robotui_sendtokeninfo_command_return_value'
 
-        mocked_api.Token.get.return_value.release_lock.return_value = new_owner_id
+        calls = []
+        mocked_api.Token.get.return_value.release_lock.side_effect = lambda *args: calls.append('release') or new_owner_id
+        mocked_api.orion.make_delivery_robot_command.side_effect = \
+            lambda *args: calls.append('navi') or 'make_delivery_robot_command_return_value'
 
         response = app.test_client().post(f'/api/v1/robots/notifications/',
                                           content_type='application/json', data=json.dumps(notified_data))
         assert response.status_code == 200
+        assert calls == (['release', 'navi', 'navi'] if new_owner_id else ['release', 'navi'])
         assert response.json == {
             'result': 'success',
             'processed_data': [data],
@@ -2836,26 +3387,15 @@ class TestRobotNotificationAPI:
         if new_owner_id:
             assert mocked_api.orion.get_entity.call_count == 7
             for i in range(2):
-                assert mocked_api.orion.get_entity.call_args_list[i+3] == call(const.FIWARE_SERVICE,
-                                                                               const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                               const.DELIVERY_ROBOT_TYPE,
-                                                                               new_owner_id)
+                assert mocked_api.orion.get_entity.call_args_list[i+3] == robot_call(new_owner_id, [RWL_ATTRS, CMD_ATTRS][i])
         else:
             assert mocked_api.orion.get_entity.call_count == 5
 
+        expected_attrs = [NOTIFICATION_ATTRS, RWL_ATTRS]
         for i in range(2):
-            assert mocked_api.orion.get_entity.call_args_list[i] == call(const.FIWARE_SERVICE,
-                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                         const.DELIVERY_ROBOT_TYPE,
-                                                                         robot_id)
-        assert mocked_api.orion.get_entity.call_args_list[-2] == call(const.FIWARE_SERVICE,
-                                                                      const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                      const.DELIVERY_ROBOT_TYPE,
-                                                                      robot_id)
-        assert mocked_api.orion.get_entity.call_args_list[-1] == call(const.FIWARE_SERVICE,
-                                                                      const.DELIVERY_ROBOT_SERVICEPATH,
-                                                                      const.PLACE_TYPE,
-                                                                      'A_id')
+            assert mocked_api.orion.get_entity.call_args_list[i] == robot_call(robot_id, expected_attrs[i])
+        assert mocked_api.orion.get_entity.call_args_list[-2] == robot_call(robot_id, NW_ATTRS)
+        assert mocked_api.orion.get_entity.call_args_list[-1] == place_call('A_id')
 
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_count == 1
         assert mocked_api.orion.make_updatelastprocessedtime_command.call_args == call(dateutil.parser.parse(time))
@@ -2865,13 +3405,15 @@ class TestRobotNotificationAPI:
         assert mocked_api.orion.make_updatestate_command.call_args == call(const.STATE_PICKING)
         assert mocked_api.orion.make_robotui_sendstate_command.call_count == 1
         assert mocked_api.orion.make_robotui_sendstate_command.call_args == call(const.STATE_PICKING, 'dest_name')
+        assert mocked_api.RobotCache.put_state.call_count == 1
+        assert mocked_api.RobotCache.put_state.call_args == call(robot_id, const.STATE_PICKING, 'dest_name')
 
         if new_owner_id:
             assert mocked_api.orion.make_delivery_robot_command.call_count == 2
             assert mocked_api.orion.make_delivery_robot_command.call_args_list[0] == call('navi',
                                                                                           rwl[0]['waypoints'],
                                                                                           rwl[0],
-                                                                                          [],
+                                                                                          None,
                                                                                           None,
                                                                                           None,
                                                                                           None)
@@ -2880,7 +3422,7 @@ class TestRobotNotificationAPI:
         assert mocked_api.orion.make_delivery_robot_command.call_args_list[0] == call('navi',
                                                                                       rwl[0]['waypoints'],
                                                                                       rwl[0],
-                                                                                      [],
+                                                                                      None,
                                                                                       None,
                                                                                       None,
                                                                                       None)
@@ -2896,25 +3438,39 @@ class TestRobotNotificationAPI:
         assert mocked_api.orion.make_robotui_sendtokeninfo_command.call_args_list[0] == call(mocked_api.Token.get.return_value,
                                                                                              api.TokenMode.RELEASE)
 
+        assert mocked_api.orion.BatchUpdate.call_count == 1
+        batch = mocked_api.orion.BatchUpdate.return_value
+        assert mocked_api.Token.get.return_value.release_lock.call_count == 1
+        assert mocked_api.Token.get.return_value.release_lock.call_args == call(robot_id)
+        assert batch.__enter__.call_count == 1
+        assert batch.__exit__.call_count == 1
+        assert mocked_api.Token.get.return_value.__enter__.call_count == 0
+
+        if new_owner_id:
+            assert batch.add.call_count == 3
+            for i in range(1, 3):
+                assert batch.add.call_args_list[i] == call(const.FIWARE_SERVICE,
+                                                           const.ROBOT_UI_SERVICEPATH,
+                                                           const.ROBOT_UI_TYPE,
+                                                           new_ui_id,
+                                                           'make_robotui_sendtokeninfo_command_return_value')
+        else:
+            assert batch.add.call_count == 1
+        assert batch.add.call_args_list[0] == call(const.FIWARE_SERVICE,
+                                                   const.ROBOT_UI_SERVICEPATH,
+                                                   const.ROBOT_UI_TYPE,
+                                                   ui_id,
+                                                   'make_robotui_sendtokeninfo_command_return_value')
+
         if new_owner_id:
-            assert mocked_api.orion.send_command.call_count == 9
-            assert mocked_api.orion.send_command.call_args_list[4] == call(const.FIWARE_SERVICE,
+            assert mocked_api.orion.send_command.call_count == 6
+            assert mocked_api.orion.send_command.call_args_list[3] == call(const.FIWARE_SERVICE,
                                                                            const.DELIVERY_ROBOT_SERVICEPATH,
                                                                            const.DELIVERY_ROBOT_TYPE,
                                                                            new_owner_id,
                                                                            'make_delivery_robot_command_return_value')
-            assert mocked_api.orion.send_command.call_args_list[5] == call(const.FIWARE_SERVICE,
-                                                                           const.ROBOT_UI_SERVICEPATH,
-                                                                           const.ROBOT_UI_TYPE,
-                                                                           new_ui_id,
-                                                                           'make_robotui_sendtokeninfo_command_return_value')
-            assert mocked_api.orion.send_command.call_args_list[6] == call(const.FIWARE_SERVICE,
-                                                                           const.ROBOT_UI_SERVICEPATH,
-                                                                           const.ROBOT_UI_TYPE,
-                                                                           new_ui_id,
-                                                                           'make_robotui_sendtokeninfo_command_return_value')
         else:
-            assert mocked_api.orion.send_command.call_count == 6
+            assert mocked_api.orion.send_command.call_count == 5
 
         assert mocked_api.orion.send_command.call_args_list[0] == call(const.FIWARE_SERVICE,
                                                                        const.DELIVERY_ROBOT_SERVICEPATH,
@@ -2931,11 +3487,6 @@ class TestRobotNotificationAPI:
                                                                        const.DELIVERY_ROBOT_TYPE,
                                                                        robot_id,
                                                                        'make_delivery_robot_command_return_value')
-        assert mocked_api.orion.send_command.call_args_list[3] == call(const.FIWARE_SERVICE,
-                                                                       const.ROBOT_UI_SERVICEPATH,
-                                                                       const.ROBOT_UI_TYPE,
-                                                                       ui_id,
-                                                                       'make_robotui_sendtokeninfo_command_return_value')
         assert mocked_api.orion.send_command.call_args_list[-2] == call(const.FIWARE_SERVICE,
                                                                         const.DELIVERY_ROBOT_SERVICEPATH,
                                                                         const.DELIVERY_ROBOT_TYPE,
@@ -2998,3 +3549,361 @@ class TestRobotNotificationAPI:
         assert mocked_api.Token.get.return_value.get_lock.call_count == 0
         assert mocked_api.MongoThrottling.lock.call_count == 1
         assert mocked_api.MongoThrottling.lock.call_args == call(robot_id, dateutil.parser.parse(time))
+
+
+class TestGetAvailableRobots:
+
+    @pytest.mark.parametrize('robot_data, expected', [
+        ({'robot_01': {'rwl': [{}, {}], 'cursor': None}, 'robot_02': {'rwl': [{}, {}], 'cursor': 2}}, ['robot_02']),
+        ({'robot_01': {'rwl': [{}, {}], 'cursor': 1}, 'robot_02': {'rwl': [], 'cursor': None}}, ['robot_02']),
+        ({'robot_01': {'rwl': [{}, {}], 'cursor': 5}, 'robot_02': {'rwl': None, 'cursor': 0}}, ['robot_01', 'robot_02']),
+    ])
+    def test_route_cursor(self, mocked_api, robot_data, expected):
+        def get_entity(fs, fsp, t, id):
+            entity = {
+                'mode': {'value': 'standby'},
+                'remaining_waypoints_list': {'value': robot_data[id]['rwl']},
+            }
+            if robot_data[id]['cursor'] is not None:
+                entity['route_cursor'] = {'value': robot_data[id]['cursor']}
+            return entity
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
+
+        assert api.ShipmentAPI().get_available_robots() == [{'id': robot_id} for robot_id in expected]
+
+    def test_route_store(self, mocked_api):
+        mocked_api.RouteStore.get_all.return_value = {'robot_01': [{}], 'robot_02': []}
+        mocked_api.orion.get_entity.side_effect = as_key_values(lambda fs, fsp, t, id: {'mode': {'value': 'standby'}})
+
+        assert api.ShipmentAPI().get_available_robots() == [{'id': 'robot_02'}]
+        assert mocked_api.orion.iter_entities.call_args_list == [
+            call(const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.DELIVERY_ROBOT_TYPE,
+                 attrs=MODE_ATTRS, key_values=True),
+        ]
+        assert mocked_api.RouteStore.get_all.call_args_list == [call(['robot_01', 'robot_02'])]
+        assert mocked_api.RouteStore.get.call_count == 0
+        assert mocked_api.orion.get_entity.call_count == 0
+
+    def test_navi_and_unknown(self, mocked_api):
+        mocked_api.orion.iter_entities.side_effect = None
+        mocked_api.orion.iter_entities.return_value = iter([
+            {'id': 'robot_01', 'mode': 'navi'},
+            {'id': 'robot_03', 'mode': 'standby'},
+        ])
+
+        assert api.ShipmentAPI().get_available_robots() == []
+        assert mocked_api.RouteStore.get_all.call_count == 0
+        assert mocked_api.orion.get_entity.call_count == 0
+
+
+class TestDispatchShipments:
+
+    def make_ticket(self, ticket_id):
+        return {'ticket_id': ticket_id, 'status': 'dispatching', 'shipment_list': {'id': ticket_id}}
+
+    def test_empty_queue(self, mocker, mocked_api):
+        view = api.RobotNotificationAPI()
+        mocker.patch.object(view, 'get_available_robots')
+        mocker.patch.object(view, 'dispatch_shipment')
+
+        view._dispatch_shipments()
+
+        assert mocked_api.ShipmentQueue.acquire.call_count == 1
+        assert view.get_available_robots.call_count == 0
+        assert view.dispatch_shipment.call_count == 0
+
+    def test_dispatch_until_no_robot(self, mocker, mocked_api):
+        view = api.RobotNotificationAPI()
+        mocker.patch.object(view, 'get_available_robots', side_effect=[
+            [{'id': 'robot_01'}, {'id': 'robot_02'}], [{'id': 'robot_02'}], [],
+        ])
+        mocker.patch.object(view, 'dispatch_shipment', side_effect=[
+            {'result': 'success', 'delivery_robot': {'id': 'robot_01'}}, {'result': 'ignore'},
+        ])
+        mocked_api.ShipmentQueue.acquire.side_effect = [
+            self.make_ticket('t1'), self.make_ticket('t2'), self.make_ticket('t3'),
+        ]
+
+        view._dispatch_shipments()
+
+        assert view.dispatch_shipment.call_args_list == [
+            call({'id': 't1'}, [{'id': 'robot_01'}, {'id': 'robot_02'}]),
+            call({'id': 't2'}, [{'id': 'robot_02'}]),
+        ]
+        assert mocked_api.ShipmentQueue.complete.call_args_list == [
+            call('t1', {'result': 'success', 'delivery_robot': {'id': 'robot_01'}}),
+            call('t2', {'result': 'ignore'}),
+        ]
+        assert mocked_api.ShipmentQueue.release.call_args_list == [call('t3')]
+        assert mocked_api.ShipmentQueue.fail.call_count == 0
+
+    def test_exclude_dispatched_robot(self, mocker, mocked_api):
+        view = api.RobotNotificationAPI()
+        mocker.patch.object(view, 'get_available_robots', return_value=[{'id': 'robot_01'}, {'id': 'robot_02'}])
+        mocker.patch.object(view, 'dispatch_shipment', side_effect=[
+            {'result': 'success', 'delivery_robot': {'id': 'robot_01'}},
+            {'result': 'success', 'delivery_robot': {'id': 'robot_02'}},
+        ])
+        mocked_api.ShipmentQueue.acquire.side_effect = [
+            self.make_ticket('t1'), self.make_ticket('t2'), self.make_ticket('t3'),
+        ]
+
+        view._dispatch_shipments()
+
+        assert view.dispatch_shipment.call_args_list == [
+            call({'id': 't1'}, [{'id': 'robot_01'}, {'id': 'robot_02'}]),
+            call({'id': 't2'}, [{'id': 'robot_02'}]),
+        ]
+        assert mocked_api.ShipmentQueue.release.call_args_list == [call('t3')]
+
+    def test_dispatch_error(self, mocker, mocked_api):
+        view = api.RobotNotificationAPI()
+        mocker.patch.object(view, 'get_available_robots', return_value=[{'id': 'robot_01'}])
+        mocker.patch.object(view, 'dispatch_shipment', side_effect=[
+            api.HTTPException(description={'message': 'dummy'}), TypeError('invalid shipment_list'),
+            ConnectionError('mongodb is down'), KeyError('id'), {'result': 'ignore'},
+        ])
+        mocked_api.ShipmentQueue.acquire.side_effect = [
+            self.make_ticket('t1'), self.make_ticket('t2'), self.make_ticket('t3'), self.make_ticket('t4'),
+            self.make_ticket('t5'), None,
+        ]
+
+        view._dispatch_shipments()
+
+        assert mocked_api.ShipmentQueue.fail.call_args_list == [
+            call('t1', 'dummy'),
+            call('t2', 'invalid shipment_list'),
+            call('t3', 'mongodb is down'),
+            call('t4', "'id'"),
+        ]
+        assert mocked_api.ShipmentQueue.complete.call_args_list == [call('t5', {'result': 'ignore'})]
+        assert mocked_api.ShipmentQueue.release.call_count == 0
+
+    @pytest.mark.parametrize('error', [
+        ServiceUnavailable(description={'message': 'orion is unavailable now'}),
+        Locked(description={'message': 'robot(robot_01) is busy now'}),
+        ConnectionFailure('mongodb is down'),
+        ServerSelectionTimeoutError('mongodb is down'),
+    ])
+    def test_dispatch_retryable_error(self, mocker, mocked_api, error):
+        view = api.RobotNotificationAPI()
+        mocker.patch.object(view, 'get_available_robots', return_value=[{'id': 'robot_01'}])
+        mocker.patch.object(view, 'dispatch_shipment', side_effect=[error, {'result': 'ignore'}])
+        mocked_api.ShipmentQueue.acquire.side_effect = [self.make_ticket('t1'), self.make_ticket('t2'), None]
+
+        view._dispatch_shipments()
+
+        assert view.dispatch_shipment.call_count == 1
+        assert mocked_api.ShipmentQueue.release.call_args_list == [call('t1')]
+        assert mocked_api.ShipmentQueue.fail.call_count == 0
+        assert mocked_api.ShipmentQueue.complete.call_count == 0
+
+    def test_requeue_stale(self, mocker, mocked_api):
+        view = api.RobotNotificationAPI()
+
+        view._dispatch_shipments()
+
+        assert mocked_api.ShipmentQueue.requeue.call_args_list == [call(const.SHIPMENT_DISPATCH_TIMEOUT_SEC)]
+        assert mocked_api.ShipmentQueue.acquire.call_count == 1
+
+    @pytest.mark.parametrize('next_mode, current_mode, acquire_count', [
+        ('standby', 'navi', 1),
+        ('standby', 'standby', 0),
+        ('navi', 'standby', 0),
+    ])
+    def test_triggered_by_standby(self, app, mocked_api, next_mode, current_mode, acquire_count):
+        data = {
+            'id': 'robot_01',
+            'mode': {
+                'value': next_mode,
+            },
+            'time': {
+                'value': '2020-01-02T03:04:05.678+09:00',
+            },
+        }
+
+        def get_entity(fs, fsp, t, id):
+            return {
+                'navigating_waypoints': {
+                    'value': None,
+                },
+                'order': {
+                    'value': None,
+                },
+                'caller': {
+                    'value': None,
+                },
+                'current_mode': {
+                    'value': current_mode,
+                },
+                'current_state': {
+                    'value': const.STATE_STANDBY if next_mode == 'standby' else const.STATE_MOVING,
+                },
+                'last_processed_time': {
+                    'value': '2020-01-02T03:04:05.000+09:00',
+                }
+            }
+        mocked_api.orion.get_entity.side_effect = as_key_values(get_entity)
+
+        response = app.test_client().post(f'/api/v1/robots/notifications/',
+                                          content_type='application/json', data=json.dumps({'data': [data]}))
+        assert response.status_code == 200
+        assert mocked_api.ShipmentQueue.acquire.call_count == acquire_count
+
+
+class TestDispatchShipment:
+
+    def test_robot_assigned_meanwhile(self, mocker, mocked_api):
+        view = api.ShipmentAPI()
+        mocker.patch.object(view, '_CommonMixin__check_navi', side_effect=lambda robot_id: robot_id == 'robot_01')
+        mocker.patch.object(view, 'check_working', return_value=False)
+        mocker.patch.object(view, 'move_robot')
+        waypoints_list = [{'to': 'E_id', 'waypoints': [{'point': 'pE', 'angle': 'aE'}]}]
+        mocked_api.Waypoint.return_value.estimate_best_routes.side_effect = [
+            ('robot_01', 'routes_01', waypoints_list, 'order_01'),
+            ('robot_02', 'routes_02', waypoints_list, 'order_02'),
+        ]
+
+        result = view.dispatch_shipment({}, [{'id': 'robot_01'}, {'id': 'robot_02'}])
+
+        assert result == {'result': 'success', 'delivery_robot': {'id': 'robot_02'}, 'order': 'order_02',
+                          'caller': 'warehouse'}
+        assert mocked_api.Waypoint.return_value.estimate_best_routes.call_args_list == [
+            call({}, ['robot_01', 'robot_02']),
+            call({}, ['robot_02']),
+        ]
+        assert mocked_api.RobotActor.of.call_args_list == [call('robot_01'), call('robot_02')]
+        assert view.move_robot.call_count == 1
+        assert view.move_robot.call_args[0][0] == 'robot_02'
+        assert mocked_api.RouteStore.start.call_args_list == [call('robot_02', [])]
+
+    def test_all_robots_assigned_meanwhile(self, mocker, mocked_api):
+        view = api.ShipmentAPI()
+        mocker.patch.object(view, '_CommonMixin__check_navi', return_value=False)
+        mocker.patch.object(view, 'check_working', return_value=True)
+        mocker.patch.object(view, 'move_robot')
+        waypoints_list = [{'to': 'E_id', 'waypoints': [{'point': 'pE', 'angle': 'aE'}]}]
+        mocked_api.Waypoint.return_value.estimate_best_routes.return_value = ('robot_01', 'routes', waypoints_list, 'order')
+
+        with pytest.raises(Locked):
+            view.dispatch_shipment({}, [{'id': 'robot_01'}])
+
+        assert view.move_robot.call_count == 0
+        assert mocked_api.RouteStore.start.call_count == 0
+
+
+class TestShipmentAPIQueue:
+
+    shipment_list = {'destination': {'name': 'dest'}, 'updated': [{'place': 'A'}]}
+
+    def make_ticket(self, ticket_id):
+        return {'ticket_id': ticket_id, 'status': 'dispatching', 'shipment_list': {'id': ticket_id}}
+
+    def view_class(self, app):
+        return app.view_functions[api.ShipmentAPI.NAME].view_class
+
+    def post(self, app):
+        return app.test_client().post('/api/v1/shipments/', content_type='application/json',
+                                      data=json.dumps(self.shipment_list))
+
+    def test_empty_queue(self, mocker, app, mocked_api):
+        view_class = self.view_class(app)
+        mocker.patch.object(view_class, 'get_available_robots', return_value=[{'id': 'robot_01'}])
+        mocker.patch.object(view_class, 'dispatch_shipment',
+                            return_value={'result': 'success', 'delivery_robot': {'id': 'robot_01'}})
+
+        response = self.post(app)
+
+        assert response.status_code == 201
+        assert view_class.dispatch_shipment.call_args_list == [call(self.shipment_list, [{'id': 'robot_01'}])]
+        assert view_class.get_available_robots.call_count == 1
+        assert mocked_api.ShipmentQueue.acquire.call_count == 1
+        assert mocked_api.ShipmentQueue.enqueue.call_count == 0
+
+    def test_drain_queue_first(self, mocker, app, mocked_api):
+        view_class = self.view_class(app)
+        mocker.patch.object(view_class, 'get_available_robots', side_effect=[
+            [{'id': 'robot_01'}], [{'id': 'robot_01'}], [],
+        ])
+        mocker.patch.object(view_class, 'dispatch_shipment',
+                            return_value={'result': 'success', 'delivery_robot': {'id': 'robot_01'}})
+        mocked_api.ShipmentQueue.acquire.side_effect = [self.make_ticket('t0'), None, None]
+        mocked_api.ShipmentQueue.enqueue.return_value = 't1'
+
+        response = self.post(app)
+
+        assert response.status_code == 202
+        assert response.json == {'result': 'queued', 'ticket_id': 't1'}
+        assert view_class.dispatch_shipment.call_args_list == [call({'id': 't0'}, [{'id': 'robot_01'}])]
+        assert mocked_api.ShipmentQueue.complete.call_args_list == [
+            call('t0', {'result': 'success', 'delivery_robot': {'id': 'robot_01'}}),
+        ]
+        assert mocked_api.ShipmentQueue.enqueue.call_args_list == [call(self.shipment_list)]
+        assert mocked_api.ShipmentQueue.acquire.call_count == 3
+
+    def test_dispatch_after_enqueue(self, mocker, app, mocked_api):
+        view_class = self.view_class(app)
+        mocker.patch.object(view_class, 'get_available_robots', side_effect=[[], [{'id': 'robot_01'}]])
+        mocker.patch.object(view_class, 'dispatch_shipment',
+                            return_value={'result': 'success', 'delivery_robot': {'id': 'robot_01'}})
+        mocked_api.ShipmentQueue.acquire.side_effect = [self.make_ticket('t1'), None]
+        mocked_api.ShipmentQueue.enqueue.return_value = 't1'
+
+        response = self.post(app)
+
+        assert response.status_code == 202
+        assert response.json == {'result': 'queued', 'ticket_id': 't1'}
+        assert view_class.dispatch_shipment.call_args_list == [call({'id': 't1'}, [{'id': 'robot_01'}])]
+        assert mocked_api.ShipmentQueue.complete.call_args_list == [
+            call('t1', {'result': 'success', 'delivery_robot': {'id': 'robot_01'}}),
+        ]
+        assert mocked_api.ShipmentQueue.release.call_count == 0
+
+    def test_robot_busy(self, mocker, app, mocked_api):
+        view_class = self.view_class(app)
+        mocker.patch.object(view_class, 'get_available_robots', return_value=[{'id': 'robot_01'}])
+        mocker.patch.object(view_class, 'dispatch_shipment', side_effect=Locked(description={'message': 'busy'}))
+        mocked_api.ShipmentQueue.enqueue.return_value = 't1'
+
+        response = self.post(app)
+
+        assert response.status_code == 202
+        assert response.json == {'result': 'queued', 'ticket_id': 't1'}
+        assert mocked_api.ShipmentQueue.enqueue.call_args_list == [call(self.shipment_list)]
+
+    def test_dispatch_after_enqueue_error(self, mocker, app, mocked_api):
+        view_class = self.view_class(app)
+        mocker.patch.object(view_class, 'get_available_robots', return_value=[])
+        mocked_api.ShipmentQueue.acquire.side_effect = ConnectionFailure('mongodb is down')
+        mocked_api.ShipmentQueue.enqueue.return_value = 't1'
+
+        response = self.post(app)
+
+        assert response.status_code == 202
+        assert response.json == {'result': 'queued', 'ticket_id': 't1'}
+
+    @pytest.mark.parametrize('error', [None, ServiceUnavailable()])
+    def test_sweep(self, mocker, mocked_api, error):
+        mocker.patch.object(api.CommonMixin, '_dispatch_shipments', side_effect=error)
+
+        api._sweep_shipments(const.SHIPMENT_SWEEP_SIGNAL)
+
+        assert api.CommonMixin._dispatch_shipments.call_count == 1
+
+    @pytest.mark.parametrize('sweep_sec, expected', [(30, True), (0, False)])
+    def test_prefork(self, mocker, mocked_api, sweep_sec, expected):
+        mocker.patch.object(api, 'uwsgi')
+        mocker.patch.object(const, 'SHIPMENT_SWEEP_SEC', sweep_sec)
+
+        assert api.prefork() is expected
+        if expected:
+            assert api.uwsgi.register_signal.call_args_list == [
+                call(const.SHIPMENT_SWEEP_SIGNAL, 'worker', api._sweep_shipments),
+            ]
+            assert api.uwsgi.add_timer.call_args_list == [call(const.SHIPMENT_SWEEP_SIGNAL, 30)]
+        else:
+            assert api.uwsgi.register_signal.call_count == 0
+            assert api.uwsgi.add_timer.call_count == 0
+
+    def test_prefork_without_uwsgi(self, mocked_api):
+        assert api.prefork() is False
@@ -0,0 +1,121 @@
+import datetime
+import importlib
+from unittest.mock import call
+
+import pytest
+import freezegun
+import lazy_import
+command_log = lazy_import.lazy_module('src.command_log')
+const = lazy_import.lazy_module('src.const')
+
+
+@pytest.fixture
+def CommandLog():
+    yield command_log.CommandLog
+    importlib.reload(command_log)
+
+
+@pytest.fixture
+def mocked_mongo(mocker):
+    command_log.MongoClient = mocker.MagicMock()
+    collection = mocker.MagicMock()
+    command_log.MongoClient.return_value = {
+        const.MONGODB_DB_NAME: {
+            const.MONGODB_COMMAND_LOG_COLLECTION_NAME: collection
+        }
+    }
+    yield command_log.MongoClient, collection
+
+
+class TestCommandLogGetMongoCollection:
+
+    def test_get_collection(self, CommandLog, mocked_mongo):
+        MongoClient, collection = mocked_mongo
+
+        c1 = CommandLog._get_mongo_collection()
+        c2 = CommandLog._get_mongo_collection()
+
+        assert id(collection) == id(c1)
+        assert id(collection) == id(c2)
+        assert MongoClient.call_count == 1
+        assert collection.create_index.call_args_list == [
+            call([('key', 1)], unique=True),
+            call([('expires_at', 1)], expireAfterSeconds=0),
+        ]
+
+
+class TestCommandLogKeyOf:
+
+    def test_key_of(self, CommandLog):
+        key = CommandLog.key_of('move_robot', 'robot_01', [{'point': 'p'}], {'to': 'A', 'waypoints': []})
+
+        assert isinstance(key, str)
+        assert key == CommandLog.key_of('move_robot', 'robot_01', [{'point': 'p'}], {'waypoints': [], 'to': 'A'})
+        assert key != CommandLog.key_of('move_robot', 'robot_02', [{'point': 'p'}], {'to': 'A', 'waypoints': []})
+        assert key != CommandLog.key_of('move_robot', 'robot_01', [{'point': 'q'}], {'to': 'A', 'waypoints': []})
+
+
+class TestCommandLogGet:
+
+    @freezegun.freeze_time('2020-01-02T03:04:05')
+    @pytest.mark.parametrize('record, expected', [
+        ({'key': 'key_01', 'result': 'ack'}, 'ack'),
+        ({'key': 'key_01', 'result': {'result': 'success'}}, {'result': 'success'}),
+        (None, None),
+    ])
+    def test_get(self, CommandLog, mocked_mongo, record, expected):
+        _, collection = mocked_mongo
+        collection.find_one.return_value = record
+
+        assert CommandLog.get('key_01') == expected
+        assert collection.find_one.call_args == call(
+            {'key': 'key_01', 'expires_at': {'$gt': datetime.datetime(2020, 1, 2, 3, 4, 5)}},
+            {'_id': False})
+
+    def test_get_disabled(self, mocker, CommandLog, mocked_mongo):
+        _, collection = mocked_mongo
+        mocker.patch.object(const, 'COMMAND_IDEMPOTENCY_TTL_SEC', 0)
+
+        assert CommandLog.get('key_01') is None
+        assert collection.find_one.call_count == 0
+
+    @pytest.mark.parametrize('key', [
+        None, 1, [], {},
+    ])
+    def test_get_exception(self, CommandLog, mocked_mongo, key):
+        with pytest.raises(TypeError):
+            CommandLog.get(key)
+
+
+class TestCommandLogPut:
+
+    @freezegun.freeze_time('2020-01-02T03:04:05')
+    def test_put(self, CommandLog, mocked_mongo):
+        _, collection = mocked_mongo
+
+        CommandLog.put('key_01', 'ack')
+
+        assert collection.replace_one.call_args == call(
+            {'key': 'key_01'},
+            {
+                'key': 'key_01',
+                'result': 'ack',
+                'expires_at': datetime.datetime(2020, 1, 2, 3, 4, 5) + datetime.timedelta(
+                    seconds=const.COMMAND_IDEMPOTENCY_TTL_SEC),
+            },
+            upsert=True)
+
+    def test_put_disabled(self, mocker, CommandLog, mocked_mongo):
+        _, collection = mocked_mongo
+        mocker.patch.object(const, 'COMMAND_IDEMPOTENCY_TTL_SEC', 0)
+
+        CommandLog.put('key_01', 'ack')
+
+        assert collection.replace_one.call_count == 0
+
+    @pytest.mark.parametrize('key', [
+        None, 1, [], {},
+    ])
+    def test_put_exception(self, CommandLog, mocked_mongo, key):
+        with pytest.raises(TypeError):
+            CommandLog.put(key, 'ack')
@@ -0,0 +1,114 @@
+import os
+import importlib
+
+import pytest
+import lazy_import
+
+config = lazy_import.lazy_module('src.config')
+const = lazy_import.lazy_module('src.const')
+
+
+@pytest.fixture
+def reload_const():
+    yield
+    importlib.reload(const)
+
+
+class TestConfig:
+
+    def test_environ(self):
+        c = config.Config(os.environ)
+
+        assert c.ORION_ENDPOINT == 'ORION_ENDPOINT'
+        assert c.DELIVERY_ROBOT_LIST == ['robot_01', 'robot_02']
+        assert c.ID_TABLE == {'robot_01': 'ui_01', 'robot_02': 'ui_02'}
+        assert c.MONGODB_PORT == 27017
+        assert c.MOVENEXT_WAIT_MSEC == 10
+        assert c.ORION_TOKEN is None
+        assert c.TIMEZONE == 'UTC'
+        assert c.ROBOT_SPEED_MPS == 0.5
+        assert set(c.as_dict()) == config.NAMES
+
+    @pytest.mark.parametrize('name, value, expected', [
+        ('ROBOT_SPEED_MPS', '1.5', 1.5),
+        ('ROBOT_CACHE_TTL_SEC', '0', 0),
+        ('ORION_TOKEN', 'token', 'token'),
+        ('JSON_BACKEND', 'orjson', 'orjson'),
+        ('GEVENT_ASYNC_CORES', '1000', 1000),
+        ('WARMUP_ENABLED', '0', False),
+        ('WARMUP_ENABLED', 'True', True),
+    ])
+    def test_value(self, name, value, expected):
+        environ = dict(os.environ)
+        environ[name] = value
+
+        assert getattr(config.Config(environ), name) == expected
+
+    def test_required(self):
+        environ = dict(os.environ)
+        del environ['ORION_ENDPOINT']
+        del environ['MONGODB_HOST']
+
+        with pytest.raises(config.ConfigError) as e:
+            config.Config(environ)
+
+        assert str(e.value) == 'invalid environment variables, ORION_ENDPOINT is required, MONGODB_HOST is required'
+
+    @pytest.mark.parametrize('name, value', [
+        ('DELIVERY_ROBOT_LIST', 'robot_01'),
+        ('DELIVERY_ROBOT_LIST', '{"a": 1}'),
+        ('ID_TABLE', '["ui_01"]'),
+        ('MONGODB_PORT', 'port'),
+        ('MONGODB_PORT', '0'),
+        ('MONGODB_PORT', '65536'),
+        ('MOVENEXT_WAIT_MSEC', '-1'),
+        ('MOVENEXT_WAIT_MAX_NUM', '1.5'),
+        ('ROBOT_SPEED_MPS', '0'),
+        ('ROBOT_SPEED_MPS', 'nan'),
+        ('ROBOT_STATE_STREAM_INTERVAL_MSEC', '0'),
+        ('JSON_BACKEND', 'simplejson'),
+        ('WARMUP_ENABLED', 'yes'),
+    ])
+    def test_invalid(self, name, value):
+        environ = dict(os.environ)
+        environ[name] = value
+
+        with pytest.raises(config.ConfigError) as e:
+            config.Config(environ)
+
+        assert str(e.value).startswith(f'invalid environment variables, {name} is invalid (')
+
+    def test_immutable_attrs(self):
+        c = config.Config(os.environ)
+        with pytest.raises(AttributeError):
+            c.UNKNOWN = 1
+
+
+@pytest.mark.usefixtures('reload_const')
+class TestConst:
+
+    def test_lazy(self):
+        importlib.reload(const)
+        assert 'ORION_ENDPOINT' not in vars(const)
+
+        os.environ['ORION_ENDPOINT'] = 'http://orion:1026'
+        assert const.ORION_ENDPOINT == 'http://orion:1026'
+        assert vars(const)['ORION_ENDPOINT'] == 'http://orion:1026'
+        assert vars(const)['DELIVERY_ROBOT_LIST'] == ['robot_01', 'robot_02']
+
+        os.environ['ORION_ENDPOINT'] = 'http://orion:1027'
+        assert const.ORION_ENDPOINT == 'http://orion:1026'
+        importlib.reload(const)
+        assert const.ORION_ENDPOINT == 'http://orion:1027'
+
+    def test_invalid(self):
+        importlib.reload(const)
+        del os.environ['ORION_ENDPOINT']
+
+        with pytest.raises(config.ConfigError):
+            const.ORION_ENDPOINT
+        assert const.PLACE_TYPE == 'place'
+
+    def test_unknown(self):
+        with pytest.raises(AttributeError):
+            const.UNKNOWN
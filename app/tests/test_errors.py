@@ -1,6 +1,7 @@
 import importlib
 
 from flask import jsonify, abort
+from werkzeug.exceptions import ServiceUnavailable
 
 import pytest
 import lazy_import
@@ -129,3 +130,22 @@ class TestErrorHandler:
         assert errors.logger.error.call_count == 1
         assert errors.logger.error.call_args[0] == logger_args
         assert errors.logger.warning.call_count == 0
+
+    @pytest.mark.parametrize('retry_after, expected_header', [
+        (3, '3'), (None, None),
+    ])
+    def test_retry_after(self, app, errors, retry_after, expected_header):
+        app.register_blueprint(errors.app)
+
+        @app.route('/')
+        def test():
+            error = ServiceUnavailable(description={'msg': 'status_code==503'})
+            if retry_after is not None:
+                error.retry_after = retry_after
+            raise error
+
+        response = app.test_client().get('/')
+        assert response.status_code == 503
+        assert response.json == {'msg': 'status_code==503'}
+        assert response.headers.get('Retry-After') == expected_header
+        assert errors.logger.error.call_count == 1
@@ -0,0 +1,132 @@
+import os
+import json
+import datetime
+import importlib
+
+import pytest
+import lazy_import
+from flask import Flask, jsonify, request
+
+json_backend = lazy_import.lazy_module('src.json_backend')
+const = lazy_import.lazy_module('src.const')
+
+
+@pytest.fixture
+def reload_module():
+    yield
+    os.environ.pop('JSON_BACKEND', None)
+    importlib.reload(const)
+    importlib.reload(json_backend)
+
+
+def select(name):
+    if name:
+        os.environ['JSON_BACKEND'] = name
+    importlib.reload(const)
+    importlib.reload(json_backend)
+    return json_backend
+
+
+@pytest.mark.usefixtures('reload_module')
+class TestSelectBackend:
+
+    def test_default(self):
+        try:
+            import orjson  # noqa: F401
+            expected = 'orjson'
+        except ImportError:
+            expected = 'json'
+        assert select('').backend.name in (expected, 'ujson')
+
+    def test_stdlib(self):
+        assert select('json').backend.name == 'json'
+
+    def test_not_installed(self, mocker):
+        mocker.patch.dict('sys.modules', {'ujson': None})
+        assert select('ujson').backend.name == 'json'
+
+    def test_unsupported(self):
+        with pytest.raises(ValueError) as e:
+            json_backend._select_backend('simplejson')
+        assert str(e.value) == 'unsupported json backend, simplejson'
+
+    def test_reset(self, mocker):
+        assert select('json').backend.name == 'json'
+
+        ujson = mocker.MagicMock()
+        ujson.JSONDecodeError = type('JSONDecodeError', (ValueError, ), {})
+        mocker.patch.dict('sys.modules', {'ujson': ujson})
+        os.environ['JSON_BACKEND'] = 'ujson'
+        assert json_backend.backend.name == 'json'
+
+        const.reset()
+        assert json_backend.backend.name == 'ujson'
+        assert json_backend.JSONDecodeError == (json.decoder.JSONDecodeError, ujson.JSONDecodeError)
+
+
+@pytest.mark.usefixtures('reload_module')
+@pytest.mark.parametrize('name', ['', 'json', 'orjson', 'ujson'])
+class TestLoadsDumps:
+
+    @pytest.mark.parametrize('obj', [
+        {'id': 'place_A', 'type': 'place', 'pose': {'type': 'object', 'value': {'point': {'x': 1.5, 'y': -2, 'z': 0}}}},
+        [{'id': 'robot_01', 'name': {'type': 'string', 'value': 'ロボット'}}],
+        [],
+        {},
+        'dummy',
+        1,
+        None,
+    ])
+    def test_roundtrip(self, name, obj):
+        jb = select(name)
+        assert jb.loads(jb.dumps(obj)) == obj
+        assert jb.loads(jb.dumps(obj).encode('utf-8')) == obj
+
+    def test_sort_keys(self, name):
+        jb = select(name)
+        assert jb.dumps({'b': 1, 'a': 2}, sort_keys=True) == '{"a":2,"b":1}'
+
+    def test_non_ascii(self, name):
+        jb = select(name)
+        assert jb.dumps({'name': 'ロボット'}) == '{"name":"ロボット"}'
+
+    @pytest.mark.parametrize('s', [b'', b'doc', b'{"a":', '[1,'])
+    def test_decode_error(self, name, s):
+        jb = select(name)
+        with pytest.raises(jb.JSONDecodeError):
+            jb.loads(s)
+
+
+@pytest.mark.usefixtures('reload_module')
+@pytest.mark.parametrize('name', ['', 'json'])
+class TestFlaskJSON:
+
+    def make_app(self, name, json_as_ascii):
+        jb = select(name)
+        app = Flask(__name__)
+        app.json_encoder = jb.JSONEncoder
+        app.json_decoder = jb.JSONDecoder
+        app.config['JSON_AS_ASCII'] = json_as_ascii
+
+        @app.route('/', methods=['POST'])
+        def echo():
+            return jsonify({'body': request.json, 'time': datetime.datetime(2020, 1, 2, 3, 4, 5)})
+        return app
+
+    @pytest.mark.parametrize('json_as_ascii, expected', [
+        (False, '"body":{"name":"ロボット"}'.encode('utf-8')),
+        (True, b'"body":{"name":"\\u30ed\\u30dc\\u30c3\\u30c8"}'),
+    ])
+    def test_jsonify(self, name, json_as_ascii, expected):
+        response = self.make_app(name, json_as_ascii).test_client().post(
+            '/', content_type='application/json', data=json.dumps({'name': 'ロボット'}))
+
+        assert response.status_code == 200
+        assert expected in response.data
+        assert response.json == {'body': {'name': 'ロボット'}, 'time': 'Thu, 02 Jan 2020 03:04:05 GMT'}
+
+    def test_invalid_body(self, name):
+        response = self.make_app(name, False).test_client().post(
+            '/', content_type='application/json', data='{"name":')
+
+        assert response.status_code == 400
@@ -0,0 +1,52 @@
+import importlib
+from unittest.mock import call
+
+import pytest
+import lazy_import
+metrics = lazy_import.lazy_module('src.metrics')
+
+
+@pytest.fixture
+def Latency():
+    yield metrics.Latency
+    importlib.reload(metrics)
+
+
+class TestLatency:
+
+    def test_local(self, Latency):
+        Latency.record(metrics.LATENCY_ORION_EMERGENCY, 0.002)
+        Latency.record(metrics.LATENCY_ORION_EMERGENCY, 0.004)
+        Latency.record(metrics.LATENCY_ORION_REGULAR, 0.1)
+
+        assert Latency._get_metrics().name == 'local'
+        assert Latency.snapshot() == {
+            'orion_regular': {'count': 1, 'avg_msec': 100.0, 'max_msec': 100.0},
+            'orion_emergency': {'count': 2, 'avg_msec': 3.0, 'max_msec': 4.0},
+        }
+
+    def test_empty(self, Latency):
+        assert Latency.snapshot() == {
+            'orion_regular': {'count': 0, 'avg_msec': 0.0, 'max_msec': 0.0},
+            'orion_emergency': {'count': 0, 'avg_msec': 0.0, 'max_msec': 0.0},
+        }
+
+    def test_uwsgi(self, mocker, Latency):
+        uwsgi = mocker.patch.object(metrics, 'uwsgi')
+        uwsgi.metric_get.return_value = 0
+
+        Latency.record(metrics.LATENCY_ORION_EMERGENCY, 0.0015)
+
+        assert Latency._get_metrics().name == 'uwsgi'
+        assert uwsgi.metric_inc.call_args_list == [
+            call('orion_emergency_count', 1),
+            call('orion_emergency_usec_sum', 1500),
+        ]
+        assert uwsgi.metric_set_max.call_args_list == [call('orion_emergency_usec_max', 1500)]
+
+    @pytest.mark.parametrize('name', [
+        'dummy', None,
+    ])
+    def test_unknown(self, Latency, name):
+        with pytest.raises(ValueError):
+            Latency.record(name, 0.001)
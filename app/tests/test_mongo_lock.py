@@ -1,5 +1,7 @@
 import datetime
 import importlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import call
 
 import pytest
@@ -149,6 +151,17 @@ class TestMongoThrottlingGetMongoCollection:
                  upsert=True),
         ]
 
+    def test_get_collection_concurrently(self, MongoThrottling, mocked_mongo):
+        MongoClient, collection = mocked_mongo
+        collection.replace_one.side_effect = lambda *args, **kwargs: time.sleep(0.01)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = [f.result() for f in [executor.submit(MongoThrottling._get_mongo_collection) for _ in range(4)]]
+
+        assert all(id(collection) == id(c) for c in results)
+        assert MongoClient.call_count == 1
+        assert collection.replace_one.call_count == 2
+
 
 class TestMongoThrottlingMsec:
 
@@ -6,7 +6,7 @@ from unittest.mock import call
 
 import requests
 import dateutil.parser
-from werkzeug.exceptions import InternalServerError, NotFound, BadRequest
+from werkzeug.exceptions import InternalServerError, NotFound, BadRequest, ServiceUnavailable
 
 import pytest
 import freezegun
@@ -16,6 +16,9 @@ const = lazy_import.lazy_module('src.const')
 caller = lazy_import.lazy_module('src.caller')
 token = lazy_import.lazy_module('src.token')
 
+READ_TIMEOUT = (3.0, 10.0)
+WRITE_TIMEOUT = (3.0, 10.0)
+
 
 @pytest.fixture
 def mocked_requests(mocker):
@@ -91,7 +94,7 @@ class TestSendCommand:
         }
         if expected_token is not None:
             headers['Authorization'] = expected_token
-        assert mocked_requests.patch.call_args == call(endpoint, headers=headers, json=payload)
+        assert mocked_requests.patch.call_args == call(endpoint, headers=headers, json=payload, timeout=WRITE_TIMEOUT)
 
     @pytest.mark.parametrize('response_code, expected_exception, expected_value', [
         (300, InternalServerError, '500 Internal Server Error'),
@@ -144,7 +147,7 @@ class TestSendCommand:
             'FIWARE-SERVICE': fiware_service,
             'FIWARE-SERVICEPATH': fiware_servicepath,
         }
-        assert mocked_requests.patch.call_args == call(endpoint, headers=headers, json=payload)
+        assert mocked_requests.patch.call_args == call(endpoint, headers=headers, json=payload, timeout=WRITE_TIMEOUT)
 
     @pytest.mark.parametrize(
         'fiware_service, fiware_servicepath, entity_type, entity_id', [
@@ -196,6 +199,199 @@ class TestSendCommand:
         assert str(e.value) == 'payload must be json serializable'
 
 
+@pytest.mark.usefixtures('reload_module')
+class TestAppendAttrs:
+
+    def test_success(self, mocked_requests, mocked_response):
+        mocked_response.status_code = 204
+        mocked_requests.post.return_value = mocked_response
+        payload = {'route_cursor': {'type': 'integer', 'value': 1}}
+
+        result = orion.append_attrs('dummy_service', 'dummy_servicepath', 'dummy_type', 'dummy_id', payload)
+
+        assert result.status_code == 204
+        assert mocked_requests.patch.call_count == 0
+        assert mocked_requests.post.call_count == 1
+
+        endpoint = f'{const.ORION_ENDPOINT}/v2/entities/dummy_id/attrs?type=dummy_type'
+        headers = {
+            'Content-Type': 'application/json',
+            'FIWARE-SERVICE': 'dummy_service',
+            'FIWARE-SERVICEPATH': 'dummy_servicepath',
+        }
+        assert mocked_requests.post.call_args == call(endpoint, headers=headers, json=payload, timeout=WRITE_TIMEOUT)
+
+    def test_missing_attribute(self, mocker, mocked_requests):
+        entity = {'id': 'dummy_id', 'type': 'dummy_type', 'mode': {'type': 'string', 'value': 'standby'}}
+
+        def patch(endpoint, json, **kwargs):
+            if not set(json) <= set(entity):
+                return mocker.MagicMock(status_code=422, text='{"error":"Unprocessable","description":"do not exist"}')
+            entity.update(json)
+            return mocker.MagicMock(status_code=204)
+
+        def post(endpoint, json, **kwargs):
+            entity.update(json)
+            return mocker.MagicMock(status_code=204)
+        mocked_requests.patch.side_effect = patch
+        mocked_requests.post.side_effect = post
+
+        with pytest.raises(InternalServerError):
+            orion.send_command('dummy_service', 'dummy_servicepath', 'dummy_type', 'dummy_id',
+                               orion.make_route_cursor_command(1))
+        assert 'route_cursor' not in entity
+
+        orion.append_attrs('dummy_service', 'dummy_servicepath', 'dummy_type', 'dummy_id', orion.make_route_cursor_command(1))
+        assert entity['route_cursor']['value'] == 1
+
+        orion.append_attrs('dummy_service', 'dummy_servicepath', 'dummy_type', 'dummy_id', orion.make_route_cursor_command(2))
+        assert entity['route_cursor']['value'] == 2
+
+    def test_invalid_args(self, mocked_requests):
+        with pytest.raises(TypeError) as e:
+            orion.append_attrs('dummy_service', 'dummy_servicepath', 'dummy_type', 1, {})
+
+        assert mocked_requests.post.call_count == 0
+        assert str(e.value) == 'fiware_service, fiware_servicepath, entity_type and entity_id must be "str"'
+
+
+@pytest.mark.usefixtures('reload_module')
+class TestSendBatchUpdate:
+
+    def test_batch(self, mocked_requests, mocked_response):
+        mocked_response.status_code = 204
+        mocked_requests.post.return_value = mocked_response
+        updates = [
+            ('type_a', 'id_a', {'attr': {'value': 1}}),
+            ('type_b', 'id_b', {'attr': {'value': 2}}),
+        ]
+
+        result = orion.send_batch_update('dummy_service', 'dummy_servicepath', updates)
+
+        assert result == [mocked_response]
+        assert mocked_requests.patch.call_count == 0
+        assert mocked_requests.post.call_count == 1
+        headers = {
+            'Content-Type': 'application/json',
+            'FIWARE-SERVICE': 'dummy_service',
+            'FIWARE-SERVICEPATH': 'dummy_servicepath',
+        }
+        body = {
+            'actionType': 'update',
+            'entities': [
+                {'id': 'id_a', 'type': 'type_a', 'attr': {'value': 1}},
+                {'id': 'id_b', 'type': 'type_b', 'attr': {'value': 2}},
+            ],
+        }
+        assert mocked_requests.post.call_args == call(f'{const.ORION_ENDPOINT}/v2/op/update', headers=headers, json=body,
+                                                      timeout=WRITE_TIMEOUT)
+
+    def test_single(self, mocked_requests, mocked_response):
+        mocked_response.status_code = 204
+        mocked_requests.patch.return_value = mocked_response
+
+        result = orion.send_batch_update('dummy_service', 'dummy_servicepath', [('type_a', 'id_a', {'attr': {'value': 1}})])
+
+        assert result == [mocked_response]
+        assert mocked_requests.post.call_count == 0
+        assert mocked_requests.patch.call_count == 1
+        assert mocked_requests.patch.call_args[0][0] == f'{const.ORION_ENDPOINT}/v2/entities/id_a/attrs?type=type_a'
+
+    @pytest.mark.parametrize('response_code', [400, 404, 500])
+    def test_fallback(self, mocker, mocked_requests, mocked_response, response_code):
+        mocked_response.status_code = response_code
+        mocked_response.text = 'root_cause'
+        mocked_requests.post.return_value = mocked_response
+        patched_response = mocker.MagicMock(spec=requests.Response)
+        patched_response.status_code = 204
+        mocked_requests.patch.return_value = patched_response
+        updates = [
+            ('type_a', 'id_a', {'attr': {'value': 1}}),
+            ('type_b', 'id_b', {'attr': {'value': 2}}),
+        ]
+
+        result = orion.send_batch_update('dummy_service', 'dummy_servicepath', updates)
+
+        assert result == [patched_response, patched_response]
+        assert mocked_requests.post.call_count == 1
+        assert mocked_requests.patch.call_count == 2
+        assert mocked_requests.patch.call_args_list[0][0][0] == f'{const.ORION_ENDPOINT}/v2/entities/id_a/attrs?type=type_a'
+        assert mocked_requests.patch.call_args_list[0][1]['json'] == {'attr': {'value': 1}}
+        assert mocked_requests.patch.call_args_list[1][0][0] == f'{const.ORION_ENDPOINT}/v2/entities/id_b/attrs?type=type_b'
+        assert mocked_requests.patch.call_args_list[1][1]['json'] == {'attr': {'value': 2}}
+
+    @pytest.mark.parametrize('fiware_service, fiware_servicepath, updates', [
+        (None, 'dummy_servicepath', [('type_a', 'id_a', {})]),
+        ('dummy_service', 1, [('type_a', 'id_a', {})]),
+        ('dummy_service', 'dummy_servicepath', []),
+        ('dummy_service', 'dummy_servicepath', None),
+        ('dummy_service', 'dummy_servicepath', [(None, 'id_a', {})]),
+        ('dummy_service', 'dummy_servicepath', [('type_a', 1, {})]),
+        ('dummy_service', 'dummy_servicepath', [('type_a', 'id_a', [])]),
+        ('dummy_service', 'dummy_servicepath', [('type_a', 'id_a', {'a': object()})]),
+    ])
+    def test_invalid_args(self, mocked_requests, fiware_service, fiware_servicepath, updates):
+        with pytest.raises(TypeError):
+            orion.send_batch_update(fiware_service, fiware_servicepath, updates)
+
+        assert mocked_requests.post.call_count == 0
+        assert mocked_requests.patch.call_count == 0
+
+
+@pytest.mark.usefixtures('reload_module')
+class TestBatchUpdate:
+
+    def test_flush_per_servicepath(self, mocker):
+        mocked_send_batch_update = mocker.patch.object(orion, 'send_batch_update', return_value=['result'])
+        batch = orion.BatchUpdate()
+        batch.add('service', 'path_a', 'type_a', 'id_1', {'a': 1})
+        batch.add('service', 'path_b', 'type_b', 'id_2', {'b': 2})
+        batch.add('service', 'path_a', 'type_a', 'id_3', {'a': 3})
+        assert len(batch) == 3
+
+        assert batch.flush() == ['result', 'result']
+        assert len(batch) == 0
+        assert mocked_send_batch_update.call_args_list == [
+            call('service', 'path_a', [('type_a', 'id_1', {'a': 1}), ('type_a', 'id_3', {'a': 3})]),
+            call('service', 'path_b', [('type_b', 'id_2', {'b': 2})]),
+        ]
+
+        assert batch.flush() == []
+        assert mocked_send_batch_update.call_count == 2
+
+    def test_context_manager(self, mocker):
+        mocked_send_batch_update = mocker.patch.object(orion, 'send_batch_update')
+        with orion.BatchUpdate() as batch:
+            batch.add('service', 'path', 'type', 'id', {'a': 1})
+            assert mocked_send_batch_update.call_count == 0
+
+        assert mocked_send_batch_update.call_count == 1
+        assert mocked_send_batch_update.call_args == call('service', 'path', [('type', 'id', {'a': 1})])
+
+    def test_context_manager_with_exception(self, mocker):
+        mocked_send_batch_update = mocker.patch.object(orion, 'send_batch_update', side_effect=InternalServerError)
+        with pytest.raises(ValueError):
+            with orion.BatchUpdate() as batch:
+                batch.add('service', 'path', 'type', 'id', {'a': 1})
+                raise ValueError()
+
+        assert mocked_send_batch_update.call_count == 1
+
+    @pytest.mark.parametrize('args', [
+        (None, 'path', 'type', 'id', {}),
+        ('service', None, 'type', 'id', {}),
+        ('service', 'path', None, 'id', {}),
+        ('service', 'path', 'type', None, {}),
+        ('service', 'path', 'type', 'id', []),
+        ('service', 'path', 'type', 'id', {'a': object()}),
+    ])
+    def test_invalid_args(self, args):
+        batch = orion.BatchUpdate()
+        with pytest.raises(TypeError):
+            batch.add(*args)
+        assert len(batch) == 0
+
+
 @pytest.mark.usefixtures('reload_module')
 class TestQueryEntity:
 
@@ -217,7 +413,7 @@ class TestQueryEntity:
         query = 'foo==dummy_query'
 
         mocked_response.status_code = 200
-        mocked_response.json.return_value = [{'result': 'test'}]
+        mocked_response.content = json.dumps([{'result': 'test'}]).encode('utf-8')
 
         mocked_requests.get.return_value = mocked_response
 
@@ -243,7 +439,7 @@ class TestQueryEntity:
             'limit': const.ORION_LIST_NUM_LIMIT,
             'q': query,
         }
-        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params)
+        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params, timeout=READ_TIMEOUT)
 
     @pytest.mark.parametrize('response_code, expected_exception, expected_value', [
         (300, InternalServerError, '500 Internal Server Error'),
@@ -297,16 +493,18 @@ class TestQueryEntity:
             'limit': const.ORION_LIST_NUM_LIMIT,
             'q': query,
         }
-        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params)
+        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params, timeout=READ_TIMEOUT)
 
-    def test_json_decodeerror(self, mocked_requests, mocked_response):
+    def test_json_decodeerror(self, mocker, mocked_requests, mocked_response):
         fiware_service = 'dummy_service'
         fiware_servicepath = 'dummy_servicepath'
         entity_type = 'dummy_type'
         query = 'foo==dummy_query'
 
         mocked_response.status_code = 200
-        mocked_response.json.side_effect = json.decoder.JSONDecodeError('test error', doc='doc', pos=1)
+        mocked_response.content = b'doc'
+        mocker.patch.object(orion.json_backend, 'loads',
+                            side_effect=json.decoder.JSONDecodeError('test error', doc='doc', pos=1))
 
         mocked_requests.get.return_value = mocked_response
 
@@ -335,12 +533,12 @@ class TestQueryEntity:
             'limit': const.ORION_LIST_NUM_LIMIT,
             'q': query,
         }
-        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params)
+        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params, timeout=READ_TIMEOUT)
 
     @pytest.mark.parametrize('response_json', [
         'dummy', 0, 1e-1, True, [], ['a', 1], {}, {'a': 1}, tuple(['a', 1]), set([1, 2]), dt.datetime.utcnow(), None
     ])
-    def test_invalid_json(self, mocked_requests, mocked_response, response_json):
+    def test_invalid_json(self, mocker, mocked_requests, mocked_response, response_json):
         fiware_service = 'dummy_service'
         fiware_servicepath = 'dummy_servicepath'
         entity_type = 'dummy_type'
@@ -349,7 +547,7 @@ class TestQueryEntity:
         expected_msg = {'message': f'can not retrieve an entity, entity_type={entity_type}, query={query}'}
 
         mocked_response.status_code = 200
-        mocked_response.json.return_value = response_json
+        mocker.patch.object(orion.json_backend, 'loads', return_value=response_json)
 
         mocked_requests.get.return_value = mocked_response
 
@@ -374,7 +572,7 @@ class TestQueryEntity:
             'limit': const.ORION_LIST_NUM_LIMIT,
             'q': query,
         }
-        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params)
+        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params, timeout=READ_TIMEOUT)
 
     @pytest.mark.parametrize(
         'fiware_service, fiware_servicepath, entity_type, query', [
@@ -426,7 +624,7 @@ class TestGetEntities:
         response_json = [{'result': 'test1'}, {'result': 'test2'}]
 
         mocked_response.status_code = 200
-        mocked_response.json.return_value = response_json
+        mocked_response.content = json.dumps(response_json).encode('utf-8')
 
         mocked_requests.get.return_value = mocked_response
 
@@ -449,9 +647,11 @@ class TestGetEntities:
 
         params = {
             'type': entity_type,
+            'options': 'count',
+            'offset': 0,
             'limit': const.ORION_LIST_NUM_LIMIT,
         }
-        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params)
+        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params, timeout=READ_TIMEOUT)
 
     @pytest.mark.parametrize('response_code, expected_exception, expected_value', [
         (300, InternalServerError, '500 Internal Server Error'),
@@ -501,17 +701,21 @@ class TestGetEntities:
         }
         params = {
             'type': entity_type,
+            'options': 'count',
+            'offset': 0,
             'limit': const.ORION_LIST_NUM_LIMIT,
         }
-        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params)
+        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params, timeout=READ_TIMEOUT)
 
-    def test_json_decodeerror(self, mocked_requests, mocked_response):
+    def test_json_decodeerror(self, mocker, mocked_requests, mocked_response):
         fiware_service = 'dummy_service'
         fiware_servicepath = 'dummy_servicepath'
         entity_type = 'dummy_type'
 
         mocked_response.status_code = 200
-        mocked_response.json.side_effect = json.decoder.JSONDecodeError('test error', doc='doc', pos=1)
+        mocked_response.content = b'doc'
+        mocker.patch.object(orion.json_backend, 'loads',
+                            side_effect=json.decoder.JSONDecodeError('test error', doc='doc', pos=1))
 
         mocked_requests.get.return_value = mocked_response
 
@@ -537,9 +741,11 @@ class TestGetEntities:
         }
         params = {
             'type': entity_type,
+            'options': 'count',
+            'offset': 0,
             'limit': const.ORION_LIST_NUM_LIMIT,
         }
-        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params)
+        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params, timeout=READ_TIMEOUT)
 
     @pytest.mark.parametrize('fiware_service, fiware_servicepath, entity_type', [
         ('dummy', 0, 1e-1),
@@ -567,6 +773,129 @@ class TestGetEntities:
         assert str(e.value) == 'fiware_service, fiware_servicepath and entity_type must be "str"'
 
 
+@pytest.mark.usefixtures('reload_module')
+class TestIterEntities:
+
+    def make_response(self, mocker, entities, total=None):
+        response = mocker.MagicMock(spec=requests.Response)
+        response.status_code = 200
+        response.content = json.dumps(entities).encode('utf-8')
+        response.headers = {} if total is None else {'Fiware-Total-Count': str(total)}
+        return response
+
+    def expected_call(self, offset, limit, extra_params=None):
+        params = {
+            'type': 'dummy_type',
+            'options': 'count',
+            'offset': offset,
+            'limit': limit,
+        }
+        if extra_params:
+            params.update(extra_params)
+        return call(f'{const.ORION_ENDPOINT}/v2/entities/', headers={
+            'FIWARE-SERVICE': 'dummy_service',
+            'FIWARE-SERVICEPATH': 'dummy_servicepath',
+        }, params=params, timeout=READ_TIMEOUT)
+
+    @pytest.mark.parametrize('prefetch', [False, True])
+    @pytest.mark.parametrize('with_total', [False, True])
+    @pytest.mark.parametrize('num, page_size, expected_offsets', [
+        (0, 2, [0]),
+        (1, 2, [0]),
+        (2, 2, [0, 2]),
+        (5, 2, [0, 2, 4]),
+        (6, 3, [0, 3, 6]),
+        (7, 1000, [0]),
+    ])
+    def test_pages(self, mocker, mocked_requests, prefetch, with_total, num, page_size, expected_offsets):
+        entities = [{'id': f'place_{i}'} for i in range(num)]
+
+        def get(endpoint, headers, params, timeout):
+            offset, limit = params['offset'], params['limit']
+            return self.make_response(mocker, entities[offset:offset + limit], num if with_total else None)
+        mocked_requests.get.side_effect = get
+
+        result = orion.iter_entities('dummy_service', 'dummy_servicepath', 'dummy_type',
+                                     page_size=page_size, prefetch=prefetch)
+
+        assert mocked_requests.get.call_count == 0
+        assert list(result) == entities
+        if with_total and num > 0 and num % page_size == 0:
+            expected_offsets = expected_offsets[:-1]
+        assert mocked_requests.get.call_args_list == [self.expected_call(o, page_size) for o in expected_offsets]
+
+    def test_stream(self, mocker, mocked_requests):
+        entities = [{'id': f'place_{i}'} for i in range(4)]
+
+        def get(endpoint, headers, params, timeout):
+            offset, limit = params['offset'], params['limit']
+            return self.make_response(mocker, entities[offset:offset + limit], len(entities))
+        mocked_requests.get.side_effect = get
+
+        result = orion.iter_entities('dummy_service', 'dummy_servicepath', 'dummy_type', page_size=2)
+
+        assert next(result) == entities[0]
+        assert next(result) == entities[1]
+        assert mocked_requests.get.call_count == 1
+        assert next(result) == entities[2]
+        assert mocked_requests.get.call_count == 2
+
+    def test_query_and_projection(self, mocker, mocked_requests):
+        mocked_requests.get.return_value = self.make_response(mocker, [{'id': 'robot_01', 'mode': 'navi'}], 1)
+
+        result = list(orion.iter_entities('dummy_service', 'dummy_servicepath', 'dummy_type', query='mode==navi',
+                                          attrs=['mode'], key_values=True))
+
+        assert result == [{'id': 'robot_01', 'mode': 'navi'}]
+        assert mocked_requests.get.call_args == self.expected_call(0, const.ORION_LIST_NUM_LIMIT, {
+            'q': 'mode==navi',
+            'attrs': 'mode',
+            'options': 'keyValues,count',
+        })
+
+    @pytest.mark.parametrize('prefetch', [False, True])
+    def test_response_error_on_next_page(self, mocker, mocked_requests, prefetch):
+        error_response = mocker.MagicMock(spec=requests.Response)
+        error_response.status_code = 500
+        error_response.text = 'root_cause'
+        mocked_requests.get.side_effect = [self.make_response(mocker, [{'id': 'a'}, {'id': 'b'}], 4), error_response]
+
+        result = orion.iter_entities('dummy_service', 'dummy_servicepath', 'dummy_type', page_size=2, prefetch=prefetch)
+
+        assert next(result) == {'id': 'a'}
+        assert next(result) == {'id': 'b'}
+        with pytest.raises(InternalServerError) as e:
+            next(result)
+        assert str(e.value) == "500 Internal Server Error: {'message': 'can not get entities from orion', " \
+            "'root_cause': 'root_cause'}"
+
+    @pytest.mark.parametrize('response_json', [{}, {'id': 'a'}, 'dummy', 0, None])
+    def test_not_list(self, mocker, mocked_requests, response_json):
+        mocked_requests.get.return_value = self.make_response(mocker, response_json)
+
+        with pytest.raises(BadRequest) as e:
+            list(orion.iter_entities('dummy_service', 'dummy_servicepath', 'dummy_type', page_size=10))
+
+        result = {'message': 'can not retrieve entities, offset=0, limit=10'}
+        assert str(e.value) == f'400 Bad Request: {result}'
+
+    @pytest.mark.parametrize('query', [0, 1e-1, True, [], {}])
+    def test_invalid_query(self, mocked_requests, query):
+        with pytest.raises(TypeError) as e:
+            orion.iter_entities('dummy_service', 'dummy_servicepath', 'dummy_type', query=query)
+
+        assert mocked_requests.get.call_count == 0
+        assert str(e.value) == 'query must be "str"'
+
+    @pytest.mark.parametrize('page_size', [0, -1, 1001, 1e-1, True, '10'])
+    def test_invalid_page_size(self, mocked_requests, page_size):
+        with pytest.raises(ValueError) as e:
+            orion.iter_entities('dummy_service', 'dummy_servicepath', 'dummy_type', page_size=page_size)
+
+        assert mocked_requests.get.call_count == 0
+        assert str(e.value) == f'page_size must be between 1 and {const.ORION_LIST_NUM_LIMIT}'
+
+
 @pytest.mark.usefixtures('reload_module')
 class TestGetEntity:
 
@@ -590,7 +919,7 @@ class TestGetEntity:
         response_json = {'result': 'test1'}
 
         mocked_response.status_code = 200
-        mocked_response.json.return_value = response_json
+        mocked_response.content = json.dumps(response_json).encode('utf-8')
 
         mocked_requests.get.return_value = mocked_response
 
@@ -614,7 +943,7 @@ class TestGetEntity:
         params = {
             'type': entity_type,
         }
-        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params)
+        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params, timeout=READ_TIMEOUT)
 
     @pytest.mark.parametrize('response_code, expected_exception, expected_value', [
         (300, InternalServerError, '500 Internal Server Error'),
@@ -666,16 +995,18 @@ class TestGetEntity:
         params = {
             'type': entity_type,
         }
-        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params)
+        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params, timeout=READ_TIMEOUT)
 
-    def test_json_decodeerror(self, mocked_requests, mocked_response):
+    def test_json_decodeerror(self, mocker, mocked_requests, mocked_response):
         fiware_service = 'dummy_service'
         fiware_servicepath = 'dummy_servicepath'
         entity_type = 'dummy_type'
         entity_id = 'dummy_id'
 
         mocked_response.status_code = 200
-        mocked_response.json.side_effect = json.decoder.JSONDecodeError('test error', doc='doc', pos=1)
+        mocked_response.content = b'doc'
+        mocker.patch.object(orion.json_backend, 'loads',
+                            side_effect=json.decoder.JSONDecodeError('test error', doc='doc', pos=1))
 
         mocked_requests.get.return_value = mocked_response
 
@@ -702,7 +1033,7 @@ class TestGetEntity:
         params = {
             'type': entity_type,
         }
-        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params)
+        assert mocked_requests.get.call_args == call(endpoint, headers=headers, params=params, timeout=READ_TIMEOUT)
 
     @pytest.mark.parametrize('fiware_service, fiware_servicepath, entity_type, entity_id', [
         ('dummy', 0, 1e-1, True),
@@ -730,6 +1061,329 @@ class TestGetEntity:
         assert str(e.value) == 'fiware_service, fiware_servicepath, entity_type and entity_id must be "str"'
 
 
+@pytest.mark.usefixtures('reload_module')
+class TestResilience:
+
+    def send(self):
+        return orion.send_command('dummy_service', 'dummy_servicepath', 'dummy_type', 'dummy_id', {'msg': 'dummy'})
+
+    def test_config_reset(self, mocker):
+        breaker = orion.get_breaker()
+        bulkhead = orion.get_bulkhead(orion.LANE_REGULAR)
+        assert orion.get_breaker() is breaker
+        assert orion.get_bulkhead(orion.LANE_REGULAR) is bulkhead
+        assert orion.get_timezone().zone == 'UTC'
+
+        mocker.patch.dict(os.environ, {
+            'ORION_CIRCUIT_FAILURE_THRESHOLD': '2', 'ORION_MAX_CONCURRENCY': '3', 'TIMEZONE': 'Asia/Tokyo',
+        })
+        const.reset()
+
+        assert orion.get_breaker() is not breaker
+        assert orion.get_breaker().failure_threshold == 2
+        assert orion.get_bulkhead(orion.LANE_REGULAR).max_concurrency == 3
+        assert orion.get_bulkhead(orion.LANE_EMERGENCY).max_concurrency == const.ORION_EMERGENCY_MAX_CONCURRENCY
+        assert orion.get_timezone().zone == 'Asia/Tokyo'
+        with freezegun.freeze_time('2020-01-02T03:04:05.678+00:00'):
+            assert orion.make_updatemode_command('navi')['current_mode']['metadata']['TimeInstant']['value'] == \
+                '2020-01-02T12:04:05.678+09:00'
+        const.reset()
+
+    def test_connection_error(self, mocked_requests):
+        mocked_requests.patch.side_effect = requests.exceptions.ConnectTimeout('timeout')
+
+        with pytest.raises(ServiceUnavailable) as e:
+            self.send()
+
+        assert e.value.description == {'message': 'can not connect to orion', 'root_cause': 'timeout'}
+        assert e.value.retry_after == 10
+        assert mocked_requests.patch.call_args[1]['timeout'] == WRITE_TIMEOUT
+
+    @pytest.mark.parametrize('error', [
+        requests.exceptions.ConnectionError('dummy'), requests.exceptions.ReadTimeout('dummy'), 500, 503,
+    ])
+    def test_open_circuit(self, mocked_requests, mocked_response, error):
+        if isinstance(error, int):
+            mocked_response.status_code = error
+            mocked_requests.patch.return_value = mocked_response
+        else:
+            mocked_requests.patch.side_effect = error
+
+        for _ in range(const.ORION_CIRCUIT_FAILURE_THRESHOLD):
+            with pytest.raises((ServiceUnavailable, InternalServerError)):
+                self.send()
+        assert orion.get_breaker().is_open
+
+        with pytest.raises(ServiceUnavailable) as e:
+            self.send()
+        assert e.value.description['message'] == 'orion is unavailable now'
+        assert 0 < e.value.retry_after <= const.ORION_CIRCUIT_RESET_SEC
+        assert mocked_requests.patch.call_count == const.ORION_CIRCUIT_FAILURE_THRESHOLD
+
+        with pytest.raises(ServiceUnavailable):
+            orion.get_entity('dummy_service', 'dummy_servicepath', 'dummy_type', 'dummy_id')
+        assert mocked_requests.get.call_count == 0
+
+    @pytest.mark.parametrize('status_code', [200, 204])
+    def test_reset_failures(self, mocked_requests, mocked_response, status_code):
+        mocked_response.status_code = status_code
+        mocked_requests.patch.return_value = mocked_response
+        mocked_requests.patch.side_effect = [requests.exceptions.ConnectionError('dummy')] * (
+            const.ORION_CIRCUIT_FAILURE_THRESHOLD - 1) + [mocked_response] + [requests.exceptions.ConnectionError('dummy')]
+
+        for _ in range(const.ORION_CIRCUIT_FAILURE_THRESHOLD - 1):
+            with pytest.raises(ServiceUnavailable):
+                self.send()
+        assert self.send() == mocked_response
+        with pytest.raises(ServiceUnavailable):
+            self.send()
+
+        assert not orion.get_breaker().is_open
+
+    def test_latency(self, mocker, mocked_requests, mocked_response):
+        record = mocker.patch.object(orion.Latency, 'record')
+        mocked_response.status_code = 204
+        mocked_requests.patch.return_value = mocked_response
+
+        self.send()
+        mocked_requests.patch.side_effect = requests.exceptions.ConnectionError('dummy')
+        with pytest.raises(ServiceUnavailable):
+            self.send()
+
+        assert [c[0][0] for c in record.call_args_list] == ['orion_regular', 'orion_regular']
+
+    def test_bulkhead_full(self, mocker, mocked_requests):
+        mocker.patch.object(const, 'ORION_MAX_CONCURRENCY', 1)
+        mocker.patch.object(const, 'ORION_BULKHEAD_TIMEOUT_SEC', 0)
+        orion.get_bulkhead(orion.LANE_REGULAR).__enter__()
+
+        with pytest.raises(ServiceUnavailable) as e:
+            self.send()
+
+        assert e.value.description['message'] == 'too many requests to orion'
+        assert e.value.retry_after == 1
+        assert mocked_requests.patch.call_count == 0
+
+
+@pytest.mark.usefixtures('reload_module')
+class TestSendEmergencyCommand:
+
+    @freezegun.freeze_time('2020-01-02T03:04:05+00:00')
+    def test_success(self, mocker, mocked_requests, mocked_response):
+        record = mocker.patch.object(orion.Latency, 'record')
+        session = mocked_requests.Session.return_value
+        mocked_response.status_code = 204
+        session.patch.return_value = mocked_response
+
+        assert orion.send_emergency_command('dummy_id', 'stop') == mocked_response
+
+        endpoint = f'{const.ORION_ENDPOINT}/v2/entities/dummy_id/attrs?type={const.DELIVERY_ROBOT_TYPE}'
+        headers = {
+            'Content-Type': 'application/json',
+            'FIWARE-SERVICE': const.FIWARE_SERVICE,
+            'FIWARE-SERVICEPATH': const.DELIVERY_ROBOT_SERVICEPATH,
+        }
+        assert session.patch.call_count == 1
+        args, kwargs = session.patch.call_args
+        assert args == (endpoint, )
+        assert kwargs['headers'] == headers
+        assert kwargs['timeout'] == (3.0, 3.0)
+        assert json.loads(kwargs['data']) == orion.make_emergency_command('stop')
+        assert mocked_requests.patch.call_count == 0
+        assert record.call_args[0][0] == orion.LATENCY_ORION_EMERGENCY
+
+    def test_session_reused(self, mocked_requests, mocked_response):
+        mocked_response.status_code = 204
+        mocked_requests.Session.return_value.patch.return_value = mocked_response
+
+        orion.send_emergency_command('dummy_id', 'stop')
+        orion.send_emergency_command('dummy_id', 'stop')
+
+        assert mocked_requests.Session.call_count == 1
+        assert mocked_requests.Session.return_value.patch.call_count == 2
+
+    def test_session_after_fork(self, mocker, mocked_requests):
+        getpid = mocker.patch.object(orion.os, 'getpid', return_value=100)
+        mocked_requests.Session.side_effect = lambda: mocker.MagicMock()
+        s1 = orion.get_emergency_session()
+        getpid.return_value = 101
+        s2 = orion.get_emergency_session()
+
+        assert mocked_requests.Session.call_count == 2
+        assert orion.get_emergency_session() is s2
+        assert s1 is not s2
+
+    @pytest.mark.parametrize('response_code, expected_exception', [
+        (400, InternalServerError),
+        (404, NotFound),
+    ])
+    def test_response_error(self, mocked_requests, mocked_response, response_code, expected_exception):
+        mocked_response.status_code = response_code
+        mocked_response.text = 'root_cause'
+        mocked_requests.Session.return_value.patch.return_value = mocked_response
+
+        with pytest.raises(expected_exception) as e:
+            orion.send_emergency_command('dummy_id', 'stop')
+        assert e.value.description == {'message': 'can not send emergency command to orion', 'root_cause': 'root_cause'}
+
+    def test_connection_error(self, mocked_requests):
+        mocked_requests.Session.return_value.patch.side_effect = requests.exceptions.ConnectTimeout('timeout')
+
+        for _ in range(const.ORION_CIRCUIT_FAILURE_THRESHOLD + 1):
+            with pytest.raises(ServiceUnavailable) as e:
+                orion.send_emergency_command('dummy_id', 'stop')
+            assert e.value.description == {'message': 'can not connect to orion', 'root_cause': 'timeout'}
+            assert e.value.retry_after == 1
+
+        assert not orion.get_breaker().is_open
+
+    def test_open_circuit(self, mocked_requests, mocked_response):
+        mocked_response.status_code = 204
+        mocked_requests.Session.return_value.patch.return_value = mocked_response
+        for _ in range(const.ORION_CIRCUIT_FAILURE_THRESHOLD):
+            orion.get_breaker().record_failure()
+
+        assert orion.send_emergency_command('dummy_id', 'stop') == mocked_response
+
+    def test_bulkhead_full(self, mocker, mocked_requests):
+        mocker.patch.object(const, 'ORION_EMERGENCY_MAX_CONCURRENCY', 1)
+        mocker.patch.object(const, 'ORION_BULKHEAD_TIMEOUT_SEC', 0)
+        orion.get_bulkhead(orion.LANE_EMERGENCY).__enter__()
+
+        with pytest.raises(ServiceUnavailable) as e:
+            orion.send_emergency_command('dummy_id', 'stop')
+
+        assert e.value.description['message'] == 'too many emergency requests to orion'
+        assert mocked_requests.Session.return_value.patch.call_count == 0
+
+    @pytest.mark.parametrize('entity_id, cmd', [
+        (None, 'stop'), ('dummy_id', None), (1, 'stop'), ('dummy_id', {}),
+    ])
+    def test_invalid_args(self, mocked_requests, entity_id, cmd):
+        with pytest.raises(TypeError):
+            orion.send_emergency_command(entity_id, cmd)
+
+    @pytest.mark.parametrize('error, expected', [
+        (None, True),
+        (requests.exceptions.ConnectionError('dummy'), False),
+    ])
+    def test_warm_emergency_session(self, mocked_requests, error, expected):
+        mocked_requests.Session.return_value.get.side_effect = error
+
+        assert orion.warm_emergency_session() is expected
+        assert mocked_requests.Session.return_value.get.call_args == call(
+            f'{const.ORION_ENDPOINT}/version', timeout=(3.0, 3.0))
+
+
+@pytest.mark.usefixtures('reload_module')
+class TestProjection:
+
+    @pytest.mark.parametrize('attrs, key_values, expected_params', [
+        (None, False, {}),
+        (['mode'], False, {'attrs': 'mode'}),
+        (None, True, {'options': 'keyValues'}),
+        (['mode', 'navigating_waypoints'], True, {'attrs': 'mode,navigating_waypoints', 'options': 'keyValues'}),
+        (('send_cmd_status', 'send_cmd_info'), True, {'attrs': 'send_cmd_status,send_cmd_info', 'options': 'keyValues'}),
+    ])
+    @pytest.mark.parametrize('func, args, response_json, expected_path, base_params', [
+        ('get_entity', ('dummy_id', ), {'id': 'dummy_id', 'mode': 'navi'}, '/v2/entities/dummy_id',
+         {'type': 'dummy_type'}),
+        ('get_entities', tuple(), [{'id': 'dummy_id', 'mode': 'navi'}], '/v2/entities/',
+         {'type': 'dummy_type', 'offset': 0, 'limit': 1000}),
+        ('query_entity', ('foo==dummy_query', ), [{'id': 'dummy_id', 'mode': 'navi'}], '/v2/entities/',
+         {'type': 'dummy_type', 'limit': 1000, 'q': 'foo==dummy_query'}),
+    ])
+    def test_success(self, mocked_requests, mocked_response,
+                     attrs, key_values, expected_params, func, args, response_json, expected_path, base_params):
+        mocked_response.status_code = 200
+        mocked_response.content = json.dumps(response_json).encode('utf-8')
+        mocked_requests.get.return_value = mocked_response
+
+        result = getattr(orion, func)('dummy_service', 'dummy_servicepath', 'dummy_type', *args,
+                                      attrs=attrs, key_values=key_values)
+
+        assert result == (response_json[0] if func == 'query_entity' else response_json)
+        assert mocked_requests.get.call_count == 1
+
+        headers = {
+            'FIWARE-SERVICE': 'dummy_service',
+            'FIWARE-SERVICEPATH': 'dummy_servicepath',
+        }
+        params = dict(base_params)
+        params.update(expected_params)
+        if func == 'get_entities':
+            params['options'] = ','.join([o for o in [expected_params.get('options'), 'count'] if o])
+        assert mocked_requests.get.call_args == call(f'{const.ORION_ENDPOINT}{expected_path}', headers=headers, params=params,
+                                                     timeout=READ_TIMEOUT)
+
+    @pytest.mark.parametrize('attrs', [
+        [], tuple(), 'mode', ['mode', 1], [None], {'mode': 'navi'}, 0,
+    ])
+    @pytest.mark.parametrize('func, args', [
+        ('get_entity', ('dummy_id', )),
+        ('get_entities', tuple()),
+        ('query_entity', ('foo==dummy_query', )),
+    ])
+    def test_invalid_attrs(self, mocked_requests, attrs, func, args):
+        with pytest.raises(TypeError) as e:
+            getattr(orion, func)('dummy_service', 'dummy_servicepath', 'dummy_type', *args, attrs=attrs)
+
+        assert mocked_requests.get.call_count == 0
+        assert str(e.value) == 'attrs must be a non-empty list of "str"'
+
+
+@pytest.mark.usefixtures('reload_module')
+class TestUnitOfWork:
+
+    def test_same_time(self):
+        with freezegun.freeze_time('2020-01-02T03:04:05.000+00:00') as frozen:
+            with orion.unit_of_work() as t:
+                state = orion.make_updatestate_command('moving')
+                frozen.tick(dt.timedelta(seconds=1))
+                sendstate = orion.make_robotui_sendstate_command('moving', 'A')
+                with orion.unit_of_work() as inner:
+                    mode = orion.make_updatemode_command('navi')
+            after = orion.make_updatemode_command('navi')
+
+        assert t == inner == '2020-01-02T03:04:05.000+00:00'
+        assert state['current_state']['metadata']['TimeInstant']['value'] == t
+        assert sendstate['send_state']['value']['time'] == t
+        assert mode['current_mode']['metadata']['TimeInstant']['value'] == t
+        assert after['current_mode']['metadata']['TimeInstant']['value'] == '2020-01-02T03:04:06.000+00:00'
+
+    def test_exception(self):
+        with freezegun.freeze_time('2020-01-02T03:04:05.000+00:00') as frozen:
+            with pytest.raises(ValueError):
+                with orion.unit_of_work():
+                    raise ValueError('dummy')
+            frozen.tick(dt.timedelta(seconds=1))
+            payload = orion.make_updatemode_command('navi')
+
+        assert payload['current_mode']['metadata']['TimeInstant']['value'] == '2020-01-02T03:04:06.000+00:00'
+
+    def test_clock(self):
+        os.environ['TIMEZONE'] = 'America/New_York'
+        importlib.reload(const)
+        importlib.reload(orion)
+
+        with freezegun.freeze_time('2020-03-08T06:59:59.998+00:00') as frozen:
+            times = []
+            for _ in range(3):
+                times.append(orion.make_robotui_sendstate_command('moving', 'A')['send_state']['value']['time'])
+                frozen.tick(dt.timedelta(milliseconds=1))
+
+        assert times == ['2020-03-08T01:59:59.998-05:00', '2020-03-08T01:59:59.999-05:00', '2020-03-08T03:00:00.000-04:00']
+
+    def test_shared_metadata(self):
+        payload = orion.make_delivery_robot_command('navi', [], {}, remaining_waypoints_list=[], current_routes=[],
+                                                    order={}, caller=caller.Caller.ORDERING)
+
+        metadata = payload['navigating_waypoints']['metadata']
+        assert all(payload[key]['metadata'] is metadata
+                   for key in ['remaining_waypoints_list', 'current_routes', 'order', 'caller'])
+        assert json.loads(json.dumps(payload))['caller']['metadata'] == metadata
+
+
 @pytest.mark.usefixtures('reload_module')
 class TestMakeDeliveryRobotCommand:
 
@@ -858,6 +1512,32 @@ class TestMakeDeliveryRobotCommand:
                            if v['value'] is not None or k == 'navigating_waypoints'}
 
 
+@pytest.mark.usefixtures('reload_module')
+class TestMakeRouteCursorCommand:
+
+    @pytest.mark.parametrize('route_cursor', [
+        0, 3,
+    ])
+    def test_success(self, route_cursor):
+        time = '2020-01-02T03:04:05.000+00:00'
+
+        with freezegun.freeze_time(time):
+            payload = orion.make_route_cursor_command(route_cursor)
+
+        assert payload == {
+            'route_cursor': {
+                'type': 'integer',
+                'value': route_cursor,
+                'metadata': {
+                    'TimeInstant': {
+                        'type': 'datetime',
+                        'value': time,
+                    }
+                }
+            }
+        }
+
+
 @pytest.mark.usefixtures('reload_module')
 class TestMakeEmergencyCommand:
 
@@ -908,6 +1588,30 @@ class TestMakeEmergencyCommand:
         }
 
 
+@pytest.mark.usefixtures('reload_module')
+class TestMakeEmergencyCommandBody:
+
+    @pytest.mark.parametrize('timezone', [
+        None, 'UTC', 'Asia/Tokyo',
+    ])
+    @pytest.mark.parametrize('cmd', [
+        'stop', 'resume', '"quoted"', 'ストップ',
+    ])
+    def test_body(self, timezone, cmd):
+        if timezone is not None:
+            os.environ['TIMEZONE'] = timezone
+            importlib.reload(const)
+            importlib.reload(orion)
+
+        with freezegun.freeze_time('2020-01-02T03:04:05+09:00'):
+            body = orion.make_emergency_command_body(cmd)
+            assert isinstance(body, bytes)
+            assert json.loads(body) == orion.make_emergency_command(cmd)
+
+        with freezegun.freeze_time('2020-01-03T03:04:05+09:00'):
+            assert json.loads(orion.make_emergency_command_body(cmd)) == orion.make_emergency_command(cmd)
+
+
 @pytest.mark.usefixtures('reload_module')
 class TestMakeUpdateModeCommmand:
 
@@ -0,0 +1,112 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import lazy_import
+resilience = lazy_import.lazy_module('src.resilience')
+
+
+class TestCircuitBreaker:
+
+    def test_closed(self):
+        breaker = resilience.CircuitBreaker('dummy', 3, 10)
+
+        for _ in range(2):
+            breaker.before_call()
+            breaker.record_failure()
+        breaker.record_success()
+        for _ in range(2):
+            breaker.before_call()
+            breaker.record_failure()
+
+        assert not breaker.is_open
+        breaker.before_call()
+
+    def test_open(self, mocker):
+        monotonic = mocker.patch.object(resilience.time, 'monotonic', return_value=100.0)
+        breaker = resilience.CircuitBreaker('dummy', 2, 10)
+
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.is_open
+
+        monotonic.return_value = 102.5
+        with pytest.raises(resilience.CircuitOpenError) as e:
+            breaker.before_call()
+        assert e.value.retry_after == 8
+        assert str(e.value) == 'circuit "dummy" is open, retry after 8sec'
+
+    def test_half_open(self, mocker):
+        monotonic = mocker.patch.object(resilience.time, 'monotonic', return_value=100.0)
+        breaker = resilience.CircuitBreaker('dummy', 1, 10)
+        breaker.record_failure()
+
+        monotonic.return_value = 110.0
+        breaker.before_call()
+        with pytest.raises(resilience.CircuitOpenError):
+            breaker.before_call()
+
+        breaker.record_failure()
+        monotonic.return_value = 115.0
+        with pytest.raises(resilience.CircuitOpenError):
+            breaker.before_call()
+
+        monotonic.return_value = 120.0
+        breaker.before_call()
+        breaker.record_success()
+        assert not breaker.is_open
+        breaker.before_call()
+
+    def test_disabled(self):
+        breaker = resilience.CircuitBreaker('dummy', 0, 10)
+
+        for _ in range(10):
+            breaker.before_call()
+            breaker.record_failure()
+
+        assert not breaker.is_open
+
+
+class TestBulkhead:
+
+    def test_enter_exit(self):
+        bulkhead = resilience.Bulkhead('dummy', 2, 0)
+
+        with bulkhead:
+            with bulkhead:
+                with pytest.raises(resilience.BulkheadFullError) as e:
+                    with bulkhead:
+                        pass
+        assert str(e.value) == 'bulkhead "dummy" is full, waited 0sec'
+
+        with bulkhead:
+            with bulkhead:
+                pass
+
+    def test_release_on_exception(self):
+        bulkhead = resilience.Bulkhead('dummy', 1, 0)
+
+        with pytest.raises(ValueError):
+            with bulkhead:
+                raise ValueError('dummy')
+
+        with bulkhead:
+            pass
+
+    def test_isolation(self):
+        regular = resilience.Bulkhead('regular', 1, 0.01)
+        emergency = resilience.Bulkhead('emergency', 1, 0.01)
+
+        def slow():
+            with regular:
+                time.sleep(0.1)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(slow)
+            time.sleep(0.02)
+            with pytest.raises(resilience.BulkheadFullError):
+                with regular:
+                    pass
+            with emergency:
+                assert not future.done()
+            future.result()
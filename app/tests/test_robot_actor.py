@@ -0,0 +1,193 @@
+import datetime
+import importlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import call
+
+import pytest
+import freezegun
+import lazy_import
+from werkzeug.exceptions import HTTPException
+
+robot_actor = lazy_import.lazy_module('src.robot_actor')
+const = lazy_import.lazy_module('src.const')
+
+
+@pytest.fixture
+def RobotActor():
+    yield robot_actor.RobotActor
+    importlib.reload(robot_actor)
+
+
+@pytest.fixture
+def mocked_mongo(mocker):
+    robot_actor.MongoClient = mocker.MagicMock()
+    collection = mocker.MagicMock()
+    robot_actor.MongoClient.return_value = {
+        const.MONGODB_DB_NAME: {
+            const.MONGODB_ROBOT_ACTOR_COLLECTION_NAME: collection
+        }
+    }
+    yield robot_actor.MongoClient, collection
+
+
+def lease_call(robot_id, now):
+    return call(
+        {
+            'robot_id': robot_id,
+            '$or': [
+                {'owner': None},
+                {'expires_at': {'$lte': now}},
+            ],
+        },
+        {
+            '$set': {
+                'owner': 'owner_01',
+                'expires_at': now + datetime.timedelta(seconds=const.ROBOT_ACTOR_LEASE_SEC),
+            }
+        },
+        upsert=True)
+
+
+class TestRobotActorOf:
+
+    def test_of(self, RobotActor):
+        actor1 = RobotActor.of('robot_01')
+        actor2 = RobotActor.of('robot_01')
+        actor3 = RobotActor.of('robot_02')
+
+        assert actor1 is actor2
+        assert actor1 is not actor3
+        assert actor1.robot_id == 'robot_01'
+        assert actor3.robot_id == 'robot_02'
+
+    @pytest.mark.parametrize('robot_id', [
+        None, 1, [], {},
+    ])
+    def test_of_exception(self, RobotActor, robot_id):
+        with pytest.raises(TypeError):
+            RobotActor.of(robot_id)
+
+
+class TestRobotActorGetMongoCollection:
+
+    def test_get_collection(self, RobotActor, mocked_mongo):
+        MongoClient, collection = mocked_mongo
+
+        c1 = RobotActor._get_mongo_collection()
+        c2 = RobotActor._get_mongo_collection()
+
+        assert id(collection) == id(c1)
+        assert id(collection) == id(c2)
+        assert MongoClient.call_count == 1
+        assert MongoClient.call_args == call(const.MONGODB_HOST, int(const.MONGODB_PORT), replicaset=const.MONGODB_REPLICASET)
+        assert collection.create_index.call_args_list == [call([('robot_id', 1)], unique=True)]
+
+
+class TestRobotActorLease:
+
+    @freezegun.freeze_time('2020-01-02T03:04:05')
+    def test_enter_exit(self, mocker, RobotActor, mocked_mongo):
+        _, collection = mocked_mongo
+        mocker.patch.object(robot_actor.uuid, 'uuid4').return_value.hex = 'owner_01'
+        now = datetime.datetime(2020, 1, 2, 3, 4, 5)
+
+        with RobotActor.of('robot_01') as actor:
+            assert actor.robot_id == 'robot_01'
+            assert collection.find_one_and_update.call_args_list == [lease_call('robot_01', now)]
+            assert collection.update_one.call_count == 0
+
+        assert collection.update_one.call_args_list == [
+            call({'robot_id': 'robot_01', 'owner': 'owner_01'}, {'$set': {'owner': None, 'expires_at': None}}),
+        ]
+
+    def test_reentrant(self, RobotActor, mocked_mongo):
+        _, collection = mocked_mongo
+        actor = RobotActor.of('robot_01')
+
+        with actor:
+            with actor:
+                pass
+            assert collection.update_one.call_count == 0
+
+        assert collection.find_one_and_update.call_count == 1
+        assert collection.update_one.call_count == 1
+
+    def test_release_on_exception(self, RobotActor, mocked_mongo):
+        _, collection = mocked_mongo
+
+        with pytest.raises(ValueError):
+            with RobotActor.of('robot_01'):
+                raise ValueError('dummy')
+
+        assert collection.update_one.call_count == 1
+        with RobotActor.of('robot_01'):
+            pass
+        assert collection.find_one_and_update.call_count == 2
+
+    def test_wait_for_other_process(self, mocker, RobotActor, mocked_mongo):
+        _, collection = mocked_mongo
+        mocker.patch.object(robot_actor, 'LEASE_POLL_MSEC', 1)
+        collection.find_one_and_update.side_effect = [
+            robot_actor.DuplicateKeyError('dummy'), robot_actor.DuplicateKeyError('dummy'), None,
+        ]
+
+        with RobotActor.of('robot_01'):
+            pass
+
+        assert collection.find_one_and_update.call_count == 3
+        assert collection.update_one.call_count == 1
+
+    def test_timeout(self, mocker, RobotActor, mocked_mongo):
+        _, collection = mocked_mongo
+        mocker.patch.object(robot_actor, 'LEASE_POLL_MSEC', 1)
+        mocker.patch.object(const, 'ROBOT_ACTOR_TIMEOUT_SEC', 0.01)
+        collection.find_one_and_update.side_effect = robot_actor.DuplicateKeyError('dummy')
+
+        with pytest.raises(HTTPException) as e:
+            with RobotActor.of('robot_01'):
+                pass
+
+        assert e.value.code == 423
+        assert e.value.description == {
+            'message': 'robot(robot_01) is busy now, timeout=0.01sec',
+            'id': 'robot_01',
+        }
+        assert collection.update_one.call_count == 0
+        assert RobotActor.of('robot_01')._mailbox.acquire(blocking=False)
+        RobotActor.of('robot_01')._mailbox.release()
+
+
+class TestRobotActorMailbox:
+
+    def test_serialize_same_robot(self, RobotActor, mocked_mongo):
+        events = []
+
+        def work(robot_id, name):
+            with RobotActor.of(robot_id):
+                events.append(f'{name}:start')
+                time.sleep(0.02)
+                events.append(f'{name}:end')
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            list(executor.map(lambda name: work('robot_01', name), ['a', 'b', 'c']))
+
+        assert len(events) == 6
+        for i in range(0, 6, 2):
+            assert events[i].split(':')[0] == events[i + 1].split(':')[0]
+            assert events[i].endswith(':start') and events[i + 1].endswith(':end')
+
+    def test_parallel_robots(self, RobotActor, mocked_mongo):
+        elapsed = []
+
+        def work(robot_id):
+            with RobotActor.of(robot_id):
+                start = time.monotonic()
+                time.sleep(0.05)
+                elapsed.append((robot_id, start))
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(work, ['robot_01', 'robot_02']))
+
+        starts = sorted(start for _, start in elapsed)
+        assert starts[1] - starts[0] < 0.05
@@ -0,0 +1,408 @@
+import importlib
+from unittest.mock import call
+
+import pytest
+import lazy_import
+robot_cache = lazy_import.lazy_module('src.robot_cache')
+const = lazy_import.lazy_module('src.const')
+json_backend = lazy_import.lazy_module('src.json_backend')
+
+
+@pytest.fixture
+def RobotCache(mocker):
+    importlib.reload(const)
+    importlib.reload(robot_cache)
+    robot_cache.orion = mocker.MagicMock()
+    yield robot_cache.RobotCache
+    importlib.reload(robot_cache)
+
+
+def make_notification(robot_id, mode, time, **kwargs):
+    entity = {
+        'id': robot_id,
+        'type': const.DELIVERY_ROBOT_TYPE,
+        'mode': {
+            'type': 'string',
+            'value': mode,
+            'metadata': {
+                'TimeInstant': {
+                    'type': 'datetime',
+                    'value': time,
+                }
+            }
+        },
+    }
+    for k, v in kwargs.items():
+        entity[k] = {'type': 'object', 'value': v}
+    return entity
+
+
+class TestNotify:
+
+    def test_notify(self, RobotCache):
+        nw = {'to': 'A_id', 'destination': 'A_id'}
+        assert RobotCache.notify(make_notification('robot_01', 'navi', '2020-01-02T03:04:05.678+09:00',
+                                                   navigating_waypoints=nw)) is True
+
+        assert RobotCache.get('robot_01') == {
+            'mode': 'navi',
+            'navigating_waypoints': nw,
+            'order': None,
+            'caller': None,
+        }
+        assert robot_cache.orion.get_entity.call_count == 0
+
+    def test_partial_notification(self, RobotCache):
+        nw = {'to': 'A_id', 'destination': 'A_id'}
+        assert RobotCache.notify(make_notification('robot_01', 'navi', '2020-01-02T03:04:05.000+09:00',
+                                                   navigating_waypoints=nw, caller='warehouse')) is True
+        assert RobotCache.notify(make_notification('robot_01', 'standby', '2020-01-02T03:04:06.000+09:00')) is True
+
+        assert RobotCache.get('robot_01') == {
+            'mode': 'standby',
+            'navigating_waypoints': nw,
+            'order': None,
+            'caller': 'warehouse',
+        }
+
+    @pytest.mark.parametrize('old_time, new_time, expected', [
+        ('2020-01-02T03:04:05.000+09:00', '2020-01-02T03:04:06.000+09:00', 'new'),
+        ('2020-01-02T03:04:05.000+09:00', '2020-01-02T03:04:05.000+09:00', 'new'),
+        ('2020-01-02T03:04:05.000+09:00', '2020-01-02T03:04:04.999+09:00', 'old'),
+        ('2020-01-01T18:04:05.000Z', '2020-01-02T03:04:04.000+09:00', 'old'),
+        ('2020-01-01T18:04:05.000', '2020-01-02T03:04:06.000+09:00', 'new'),
+        ('2020-01-02T03:04:05.000+09:00', None, 'old'),
+        ('2020-01-02T03:04:05.000+09:00', 'invalid', 'old'),
+        (None, '2020-01-02T03:04:05.000+09:00', 'new'),
+        (None, None, 'new'),
+    ])
+    def test_stale(self, RobotCache, old_time, new_time, expected):
+        RobotCache.notify(make_notification('robot_01', 'old', old_time))
+        result = RobotCache.notify(make_notification('robot_01', 'new', new_time))
+
+        assert result is (expected == 'new')
+        assert RobotCache.get('robot_01')['mode'] == expected
+
+    def test_entity_timeinstant(self, RobotCache):
+        RobotCache.notify(make_notification('robot_01', 'old', None, TimeInstant='2020-01-02T03:04:05.000+09:00'))
+        entity = make_notification('robot_01', 'new', None)
+        entity['TimeInstant'] = {'type': 'datetime', 'value': '2020-01-02T03:04:04.000+09:00'}
+
+        assert RobotCache.notify(entity) is False
+
+    @pytest.mark.parametrize('entity', [
+        None, [], {}, {'id': 1}, {'id': 'robot_01', 'type': 'dummy'},
+    ])
+    def test_invalid(self, RobotCache, entity):
+        with pytest.raises(TypeError):
+            RobotCache.notify(entity)
+
+
+class TestGet:
+
+    def test_read_through(self, RobotCache):
+        nw = {'to': 'A_id', 'destination': 'A_id'}
+        robot_cache.orion.get_entity.return_value = make_notification('robot_01', 'navi', '2020-01-02T03:04:05.000+09:00',
+                                                                      navigating_waypoints=nw)
+        expected = {
+            'mode': 'navi',
+            'navigating_waypoints': nw,
+            'order': None,
+            'caller': None,
+        }
+
+        assert RobotCache.get('robot_01') == expected
+        assert RobotCache.get('robot_01') == expected
+
+        assert robot_cache.orion.get_entity.call_count == 1
+        assert robot_cache.orion.get_entity.call_args == call(
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.DELIVERY_ROBOT_TYPE, 'robot_01',
+            attrs=['mode', 'navigating_waypoints', 'order', 'caller', 'TimeInstant'])
+
+    def test_expired(self, mocker, RobotCache):
+        mocked_time = mocker.patch.object(robot_cache, 'time')
+        mocked_time.time.return_value = 1000.0
+        RobotCache.notify(make_notification('robot_01', 'navi', '2020-01-02T03:04:05.000+09:00'))
+        robot_cache.orion.get_entity.return_value = make_notification('robot_01', 'standby', '2020-01-02T03:04:06.000+09:00')
+
+        mocked_time.time.return_value = 1000.0 + const.ROBOT_CACHE_TTL_SEC - 1
+        assert RobotCache.get('robot_01')['mode'] == 'navi'
+        assert robot_cache.orion.get_entity.call_count == 0
+
+        mocked_time.time.return_value = 1000.0 + const.ROBOT_CACHE_TTL_SEC
+        assert RobotCache.get('robot_01')['mode'] == 'standby'
+        assert robot_cache.orion.get_entity.call_count == 1
+
+    def test_expired_without_version(self, mocker, RobotCache):
+        mocked_time = mocker.patch.object(robot_cache, 'time')
+        mocked_time.time.return_value = 1000.0
+        RobotCache.notify(make_notification('robot_01', 'navi', '2020-01-02T03:04:05.000+09:00'))
+        robot_cache.orion.get_entity.return_value = make_notification('robot_01', 'standby', None)
+
+        mocked_time.time.return_value = 1000.0 + const.ROBOT_CACHE_TTL_SEC
+        assert RobotCache.get('robot_01')['mode'] == 'standby'
+        assert robot_cache.orion.get_entity.call_count == 1
+
+        mocked_time.time.return_value = 1000.0 + const.ROBOT_CACHE_TTL_SEC * 2 - 1
+        assert RobotCache.get('robot_01')['mode'] == 'standby'
+        assert robot_cache.orion.get_entity.call_count == 1
+
+    def test_with_version(self, RobotCache):
+        RobotCache.notify(make_notification('robot_01', 'navi', '2020-01-02T03:04:05.678+09:00'))
+        entity, version = RobotCache.get_with_version('robot_01')
+
+        assert entity['mode'] == 'navi'
+        assert version == 1577901845.678
+
+        robot_cache.orion.get_entity.return_value = make_notification('robot_02', 'standby', None)
+        assert RobotCache.get_with_version('robot_02') == (
+            {'mode': 'standby', 'navigating_waypoints': None, 'order': None, 'caller': None}, None)
+
+    def test_invalid(self, RobotCache):
+        with pytest.raises(TypeError):
+            RobotCache.get(None)
+        with pytest.raises(TypeError):
+            RobotCache.get_with_version(None)
+
+
+class TestGetAll:
+
+    def test_bulk_query(self, RobotCache):
+        robot_cache.orion.iter_entities.return_value = iter([
+            make_notification('robot_02', 'standby', '2020-01-02T03:04:05.000+09:00'),
+            make_notification('robot_01', 'navi', '2020-01-02T03:04:05.000+09:00'),
+            make_notification('robot_03', 'navi', '2020-01-02T03:04:05.000+09:00'),
+        ])
+
+        result = RobotCache.get_all(['robot_01', 'robot_02', 'robot_04'])
+        assert list(result.keys()) == ['robot_01', 'robot_02']
+        assert result['robot_01']['mode'] == 'navi'
+        assert result['robot_02']['mode'] == 'standby'
+        assert robot_cache.orion.iter_entities.call_count == 1
+        assert robot_cache.orion.iter_entities.call_args == call(
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.DELIVERY_ROBOT_TYPE,
+            attrs=['mode', 'navigating_waypoints', 'order', 'caller', 'TimeInstant'])
+
+        assert RobotCache.get('robot_01')['mode'] == 'navi'
+        assert robot_cache.orion.get_entity.call_count == 0
+
+    def test_cached(self, RobotCache):
+        RobotCache.notify(make_notification('robot_01', 'navi', '2020-01-02T03:04:05.000+09:00'))
+        RobotCache.notify(make_notification('robot_02', 'standby', '2020-01-02T03:04:05.000+09:00'))
+
+        result = RobotCache.get_all(['robot_01', 'robot_02'])
+        assert {k: v['mode'] for k, v in result.items()} == {'robot_01': 'navi', 'robot_02': 'standby'}
+        assert robot_cache.orion.iter_entities.call_count == 0
+
+    @pytest.mark.parametrize('robot_ids', [None, 'robot_01', [1]])
+    def test_invalid(self, RobotCache, robot_ids):
+        with pytest.raises(TypeError):
+            RobotCache.get_all(robot_ids)
+
+
+class TestGetPlaceNames:
+
+    def test_place_index(self, RobotCache):
+        robot_cache.orion.iter_entities.side_effect = lambda *args, **kwargs: iter([
+            {'id': 'A_id', 'name': 'place_A'},
+            {'id': 'B_id', 'name': 'place_B'},
+            {'id': 'C_id', 'name': None},
+        ])
+
+        assert RobotCache.get_place_names(['A_id', 'C_id', 'D_id']) == {'A_id': 'place_A', 'C_id': '', 'D_id': ''}
+        assert robot_cache.orion.iter_entities.call_count == 1
+        assert robot_cache.orion.iter_entities.call_args == call(
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, attrs=['name'], key_values=True)
+
+        assert RobotCache.get_place_names(['A_id', 'C_id', 'D_id']) == {'A_id': 'place_A', 'C_id': '', 'D_id': ''}
+        assert robot_cache.orion.iter_entities.call_count == 1
+
+        assert RobotCache.get_place_names(['A_id', 'B_id']) == {'A_id': 'place_A', 'B_id': 'place_B'}
+        assert RobotCache.get_place_name('B_id') == 'place_B'
+        assert robot_cache.orion.iter_entities.call_count == 2
+        assert robot_cache.orion.get_entity.call_count == 0
+
+    def test_cache_requested_places_only(self, RobotCache):
+        robot_cache.orion.iter_entities.return_value = iter([{'id': f'{i}_id', 'name': f'place_{i}'} for i in range(100)])
+
+        assert RobotCache.get_place_names(['1_id']) == {'1_id': 'place_1'}
+
+        store = RobotCache._get_place_store()
+        assert store.get('place:1_id')['entity'] == {'name': 'place_1'}
+        assert store.get('place:2_id') is None
+
+    def test_empty(self, RobotCache):
+        assert RobotCache.get_place_names([]) == {}
+        assert robot_cache.orion.iter_entities.call_count == 0
+
+
+class TestGetPlaceName:
+
+    @pytest.mark.parametrize('place, expected', [
+        ({'name': 'place_A'}, 'place_A'),
+        ({}, ''),
+        (None, ''),
+    ])
+    def test_read_through(self, RobotCache, place, expected):
+        robot_cache.orion.get_entity.return_value = place
+
+        assert RobotCache.get_place_name('A_id') == expected
+        assert RobotCache.get_place_name('A_id') == expected
+
+        assert robot_cache.orion.get_entity.call_count == 1
+        assert robot_cache.orion.get_entity.call_args == call(
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'A_id',
+            attrs=['name'], key_values=True)
+
+
+class TestNotifyPlace:
+
+    def test_place_version(self, RobotCache):
+        assert RobotCache.get_place_version() == 0
+
+        assert RobotCache.notify({'id': 'A_id', 'type': const.PLACE_TYPE, 'pose': {'type': 'object', 'value': {}}}) is True
+        assert RobotCache.get_place_version() == 1
+        assert RobotCache.notify({'id': 'B_id', 'type': const.PLACE_TYPE}) is True
+        assert RobotCache.get_place_version() == 2
+
+    def test_place_name(self, RobotCache):
+        robot_cache.orion.get_entity.return_value = {'name': 'place_A'}
+        assert RobotCache.get_place_name('A_id') == 'place_A'
+
+        RobotCache.notify({'id': 'A_id', 'type': const.PLACE_TYPE, 'name': {'type': 'string', 'value': 'place_A2'}})
+        assert RobotCache.get_place_name('A_id') == 'place_A2'
+        assert robot_cache.orion.get_entity.call_count == 1
+
+        RobotCache.notify({'id': 'A_id', 'type': const.PLACE_TYPE, 'pose': {'type': 'object', 'value': {}}})
+        robot_cache.orion.get_entity.return_value = {'name': 'place_A3'}
+        assert RobotCache.get_place_name('A_id') == 'place_A3'
+        assert robot_cache.orion.get_entity.call_count == 2
+
+
+class TestFlag:
+
+    def test_set_and_clear(self, mocker, RobotCache):
+        mocked_time = mocker.patch.object(robot_cache, 'time')
+        mocked_time.time.return_value = 1000.0
+
+        assert RobotCache.set_flag('dummy', 10) is True
+        assert RobotCache.set_flag('dummy', 10) is False
+        assert RobotCache.set_flag('other', 10) is True
+
+        RobotCache.clear_flag('dummy')
+        assert RobotCache.set_flag('dummy', 10) is True
+
+        mocked_time.time.return_value = 1010.0
+        assert RobotCache.set_flag('dummy', 10) is True
+
+
+class TestState:
+
+    def test_put_and_get(self, mocker, RobotCache):
+        mocked_time = mocker.patch.object(robot_cache, 'time')
+        mocked_time.time.return_value = 1000.0
+        assert RobotCache.get_state('robot_01') is None
+
+        assert RobotCache.put_state('robot_01', 'moving', 'place_A') == {
+            'id': 'robot_01', 'state': 'moving', 'destination': 'place_A'}
+        mocked_time.time.return_value = 1001.0 + const.ROBOT_CACHE_TTL_SEC
+        RobotCache.put_state('robot_01', 'picking', 'place_A')
+
+        assert RobotCache.get_state('robot_01') == {'id': 'robot_01', 'state': 'picking', 'destination': 'place_A'}
+        assert RobotCache.get_state('robot_02') is None
+        assert robot_cache.orion.get_entity.call_count == 0
+
+    def test_invalid(self, RobotCache):
+        with pytest.raises(TypeError):
+            RobotCache.put_state(None, 'moving', '')
+        with pytest.raises(TypeError):
+            RobotCache.get_state(None)
+
+
+class TestUwsgiStore:
+
+    def test_shared_store(self, mocker, RobotCache):
+        shared = {}
+        mocked_uwsgi = mocker.MagicMock()
+        mocked_uwsgi.cache_get.side_effect = lambda key, cache: shared.get((cache, key))
+        mocked_uwsgi.cache_update.side_effect = lambda key, value, expires, cache: shared.update({(cache, key): value}) or True
+        robot_cache.uwsgi = mocked_uwsgi
+
+        RobotCache.notify(make_notification('robot_01', 'navi', '2020-01-02T03:04:05.000+09:00'))
+
+        assert RobotCache._get_store().name == 'uwsgi'
+        assert mocked_uwsgi.lock.call_count == 1
+        assert mocked_uwsgi.unlock.call_count == 1
+        entry = json_backend.loads(shared[(const.ROBOT_CACHE_NAME, 'robot:robot_01')])
+        assert entry['entity']['mode'] == 'navi'
+
+        RobotCache._store = None
+        assert RobotCache.get('robot_01')['mode'] == 'navi'
+        assert robot_cache.orion.get_entity.call_count == 0
+
+    def test_update_failure(self, mocker, RobotCache):
+        mocked_uwsgi = mocker.MagicMock()
+        mocked_uwsgi.cache_get.return_value = None
+        mocked_uwsgi.cache_update.return_value = None
+        robot_cache.uwsgi = mocked_uwsgi
+
+        assert RobotCache.notify(make_notification('robot_01', 'navi', '2020-01-02T03:04:05.000+09:00')) is False
+        assert mocked_uwsgi.unlock.call_count == 1
+
+    def test_place_store(self, mocker, RobotCache):
+        shared = {}
+        mocked_uwsgi = mocker.MagicMock()
+        mocked_uwsgi.cache_get.side_effect = lambda key, cache: shared.get((cache, key))
+        mocked_uwsgi.cache_update.side_effect = lambda key, value, expires, cache: shared.update({(cache, key): value}) or True
+        robot_cache.uwsgi = mocked_uwsgi
+        robot_cache.orion.get_entity.return_value = {'name': 'place_A'}
+
+        assert RobotCache.get_place_name('A_id') == 'place_A'
+        assert RobotCache.notify({'id': 'B_id', 'type': const.PLACE_TYPE, 'name': {'type': 'string', 'value': 'place_B'}})
+
+        assert RobotCache._get_place_store().name == 'uwsgi'
+        assert sorted(key for key in shared) == [
+            (const.PLACE_CACHE_NAME, 'place:A_id'),
+            (const.PLACE_CACHE_NAME, 'place:B_id'),
+            (const.ROBOT_CACHE_NAME, robot_cache.PLACE_VERSION_KEY),
+        ]
+
+    @pytest.mark.parametrize('failed_cache, expected', [
+        ('places', True),
+        ('robots', False),
+    ])
+    def test_notify_place_failure(self, mocker, RobotCache, failed_cache, expected):
+        mocked_uwsgi = mocker.MagicMock()
+        mocked_uwsgi.cache_get.return_value = None
+        mocked_uwsgi.cache_update.side_effect = lambda key, value, expires, cache: cache != failed_cache
+        robot_cache.uwsgi = mocked_uwsgi
+
+        assert RobotCache.notify({'id': 'A_id', 'type': const.PLACE_TYPE}) is expected
+        assert mocked_uwsgi.unlock.call_count == 1
+
+    def test_put_state_failure(self, mocker, RobotCache):
+        mocked_uwsgi = mocker.MagicMock()
+        mocked_uwsgi.cache_get.return_value = None
+        mocked_uwsgi.cache_update.return_value = None
+        robot_cache.uwsgi = mocked_uwsgi
+
+        assert RobotCache.put_state('robot_01', 'moving', 'place_A') is None
+
+    def test_decoded_entry_reused(self, mocker, RobotCache):
+        shared = {}
+        mocked_uwsgi = mocker.MagicMock()
+        mocked_uwsgi.cache_get.side_effect = lambda key, cache: shared.get((cache, key))
+        mocked_uwsgi.cache_update.side_effect = lambda key, value, expires, cache: shared.update({(cache, key): value}) or True
+        robot_cache.uwsgi = mocked_uwsgi
+        order = {'source': 'S_id', 'destination': 'D_id', 'via': ['A_id']}
+
+        RobotCache.notify(make_notification('robot_01', 'navi', '2020-01-02T03:04:05.000+09:00', order=order))
+        first = RobotCache.get('robot_01')
+        assert first['order'] == order
+        assert RobotCache.get('robot_01') is first
+
+        RobotCache.notify(make_notification('robot_01', 'standby', '2020-01-02T03:04:06.000+09:00'))
+        second = RobotCache.get('robot_01')
+        assert second is not first
+        assert second['mode'] == 'standby'
+        assert second['order'] == order
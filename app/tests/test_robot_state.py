@@ -0,0 +1,54 @@
+import importlib
+
+import pytest
+import lazy_import
+robot_state = lazy_import.lazy_module('src.robot_state')
+const = lazy_import.lazy_module('src.const')
+
+
+@pytest.fixture
+def reload_module():
+    importlib.reload(robot_state)
+    yield
+
+
+@pytest.mark.usefixtures('reload_module')
+class TestDeriveState:
+
+    order = {'source': 'S_id', 'destination': 'D_id', 'via': ['A_id', 'B_id']}
+
+    @pytest.mark.parametrize('to, caller, expected', [
+        ('S_id', 'warehouse', 'standby'),
+        ('D_id', 'warehouse', 'picking'),
+        ('D_id', 'ordering', 'delivering'),
+        ('A_id', 'warehouse', 'picking'),
+        ('B_id', 'warehouse', 'picking'),
+        ('X_id', 'warehouse', 'moving'),
+        ({}, 'warehouse', 'moving'),
+        (None, 'warehouse', 'moving'),
+    ])
+    def test_state(self, to, caller, expected):
+        assert robot_state.derive_state({'to': to}, self.order, lambda: caller) == expected
+
+    @pytest.mark.parametrize('nw', [None, {}, [], 'dummy', {'destination': 'D_id'}])
+    def test_standby(self, nw):
+        assert robot_state.derive_state(nw, self.order, lambda: 'warehouse') == const.STATE_STANDBY
+
+    @pytest.mark.parametrize('order', [
+        None, [], {}, 'dummy',
+        {'source': 'S_id', 'destination': 'D_id'},
+        {'source': 'S_id', 'via': []},
+        {'destination': 'D_id', 'via': []},
+        {'source': 'S_id', 'destination': 'D_id', 'via': 'A_id'},
+    ])
+    def test_invalid_order(self, order):
+        assert robot_state.derive_state({'to': 'A_id'}, order, lambda: 'warehouse') == const.STATE_STANDBY
+
+    def test_caller_only_for_destination(self):
+        def get_caller():
+            raise AssertionError('caller must not be read')
+        assert robot_state.derive_state({'to': 'A_id'}, self.order, get_caller) == const.STATE_PICKING
+
+    def test_unknown_caller(self):
+        with pytest.raises(ValueError):
+            robot_state.derive_state({'to': 'D_id'}, self.order, lambda: 'dummy')
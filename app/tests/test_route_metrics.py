@@ -0,0 +1,96 @@
+import importlib
+import math
+
+import pytest
+import lazy_import
+
+const = lazy_import.lazy_module('src.const')
+route_metrics = lazy_import.lazy_module('src.route_metrics')
+
+
+@pytest.fixture
+def places():
+    yield {
+        'S_id': {'point': {'x': 0.0, 'y': 0.0, 'z': 0.0}},
+        'A_id': {'point': {'x': 3.0, 'y': 4.0, 'z': 0.0}},
+        'B_id': {'point': {'x': 3.0, 'y': 4.0, 'z': 12.0}},
+        'C_id': {'point': {'x': '6', 'y': '8'}},
+        'X_id': {'point': None},
+        'Y_id': {'point': {'x': 'a'}},
+    }
+
+
+class TestSegmentLengths:
+
+    @pytest.mark.parametrize('ids, expected', [
+        ([], []),
+        (['S_id'], []),
+        (['S_id', 'A_id'], [5.0]),
+        (['S_id', 'A_id', 'B_id'], [5.0, 12.0]),
+        (['S_id', 'C_id', 'S_id'], [10.0, 10.0]),
+        (['A_id', 'A_id'], [0.0]),
+    ])
+    def test_success(self, places, ids, expected):
+        assert route_metrics.segment_lengths([places[i]['point'] for i in ids]) == pytest.approx(expected)
+
+    @pytest.mark.parametrize('ids', [
+        ['S_id', 'X_id'], ['Y_id', 'S_id'],
+    ])
+    def test_invalid_point(self, places, ids):
+        with pytest.raises(TypeError):
+            route_metrics.segment_lengths([places[i]['point'] for i in ids])
+
+    def test_many_points(self):
+        points = [{'x': float(i), 'y': 0.0, 'z': 0.0} for i in range(route_metrics.NUMPY_MIN_POINTS * 10)]
+        assert route_metrics.segment_lengths(points) == pytest.approx([1.0] * (len(points) - 1))
+
+    def test_many_points_with_numpy(self):
+        pytest.importorskip('numpy')
+        importlib.reload(route_metrics)
+        assert route_metrics.numpy is not None
+        points = [{'x': float(i), 'y': float(i), 'z': 0.0} for i in range(route_metrics.NUMPY_MIN_POINTS * 10)]
+        assert route_metrics.segment_lengths(points) == pytest.approx([math.sqrt(2)] * (len(points) - 1))
+
+
+class TestMeasure:
+
+    def test_success(self, places):
+        routes = [
+            {'from': 'S_id', 'via': ['A_id'], 'to': 'B_id'},
+            {'from': 'B_id', 'via': [], 'to': 'A_id'},
+            {'from': 'A_id', 'via': [], 'to': 'A_id'},
+        ]
+
+        assert route_metrics.measure(routes, places, speed=2.0) == {
+            'distance': 29.0,
+            'eta_sec': 14.5,
+            'routes': [
+                {'to': 'B_id', 'distance': 17.0, 'eta_sec': 8.5},
+                {'to': 'A_id', 'distance': 12.0, 'eta_sec': 6.0},
+                {'to': 'A_id', 'distance': 0.0, 'eta_sec': 0.0},
+            ],
+        }
+
+    def test_default_speed(self, places):
+        routes = [{'from': 'S_id', 'via': [], 'to': 'A_id'}]
+
+        metrics = route_metrics.measure(routes, places)
+        assert metrics['eta_sec'] == round(5.0 / const.ROBOT_SPEED_MPS, 3)
+
+    def test_no_routes(self, places):
+        assert route_metrics.measure([], places) == {'distance': 0.0, 'eta_sec': 0.0, 'routes': []}
+
+    @pytest.mark.parametrize('speed', [
+        0, -1.0, '1', 'a',
+    ])
+    def test_invalid_speed(self, places, speed):
+        with pytest.raises(ValueError):
+            route_metrics.measure([{'from': 'S_id', 'via': [], 'to': 'A_id'}], places, speed=speed)
+
+    @pytest.mark.parametrize('route, exception', [
+        ({'from': 'S_id', 'via': [], 'to': 'X_id'}, TypeError),
+        ({'from': 'S_id', 'via': [], 'to': 'Z_id'}, KeyError),
+    ])
+    def test_invalid_place(self, places, route, exception):
+        with pytest.raises(exception):
+            route_metrics.measure([route], places)
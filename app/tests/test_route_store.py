@@ -0,0 +1,168 @@
+import datetime
+import importlib
+from unittest.mock import call
+
+import pytest
+import freezegun
+import lazy_import
+route_store = lazy_import.lazy_module('src.route_store')
+const = lazy_import.lazy_module('src.const')
+
+
+@pytest.fixture
+def RouteStore():
+    yield route_store.RouteStore
+    importlib.reload(route_store)
+
+
+@pytest.fixture
+def mocked_mongo(mocker):
+    route_store.MongoClient = mocker.MagicMock()
+    collection = mocker.MagicMock()
+    route_store.MongoClient.return_value = {
+        const.MONGODB_DB_NAME: {
+            const.MONGODB_ROUTE_STORE_COLLECTION_NAME: collection
+        }
+    }
+    yield route_store.MongoClient, collection
+
+
+class TestRouteStoreGetMongoCollection:
+
+    def test_get_collection(self, RouteStore, mocked_mongo):
+        MongoClient, collection = mocked_mongo
+
+        c1 = RouteStore._get_mongo_collection()
+        c2 = RouteStore._get_mongo_collection()
+
+        assert id(collection) == id(c1)
+        assert id(collection) == id(c2)
+        assert MongoClient.call_count == 1
+        assert collection.create_index.call_args_list == [call([('robot_id', 1)], unique=True)]
+
+
+class TestRouteStoreStart:
+
+    @freezegun.freeze_time('2020-01-02T03:04:05')
+    def test_start(self, RouteStore, mocked_mongo):
+        _, collection = mocked_mongo
+
+        RouteStore.start('robot_01', [{'to': 'B_id'}, {'to': 'C_id'}])
+
+        assert collection.replace_one.call_args == call(
+            {'robot_id': 'robot_01'},
+            {
+                'robot_id': 'robot_01',
+                'remaining_waypoints_list': [{'to': 'B_id'}, {'to': 'C_id'}],
+                'route_cursor': 0,
+                'updated_at': datetime.datetime(2020, 1, 2, 3, 4, 5),
+            },
+            upsert=True)
+
+    @pytest.mark.parametrize('robot_id, rwl', [
+        (None, []), (1, []), ('robot_01', None), ('robot_01', {}), ('robot_01', 'dummy'),
+    ])
+    def test_start_exception(self, RouteStore, mocked_mongo, robot_id, rwl):
+        with pytest.raises(TypeError):
+            RouteStore.start(robot_id, rwl)
+
+
+class TestRouteStoreGet:
+
+    @pytest.mark.parametrize('record, expected', [
+        ({'remaining_waypoints_list': [{'to': 'B_id'}]}, [{'to': 'B_id'}]),
+        ({'remaining_waypoints_list': []}, []),
+        (None, None),
+    ])
+    def test_get(self, RouteStore, mocked_mongo, record, expected):
+        _, collection = mocked_mongo
+        collection.find_one.return_value = record
+
+        assert RouteStore.get('robot_01') == expected
+        assert collection.find_one.call_args == call(
+            {'robot_id': 'robot_01'}, {'_id': False, 'remaining_waypoints_list': True})
+
+    @pytest.mark.parametrize('robot_id', [
+        None, 1, [], {},
+    ])
+    def test_get_exception(self, RouteStore, mocked_mongo, robot_id):
+        with pytest.raises(TypeError):
+            RouteStore.get(robot_id)
+
+
+class TestRouteStoreGetAll:
+
+    def test_get_all(self, RouteStore, mocked_mongo):
+        _, collection = mocked_mongo
+        collection.find.return_value = iter([
+            {'robot_id': 'robot_01', 'remaining_waypoints_list': [{'to': 'B_id'}]},
+            {'robot_id': 'robot_02', 'remaining_waypoints_list': []},
+        ])
+
+        assert RouteStore.get_all(['robot_01', 'robot_02', 'robot_03']) == {
+            'robot_01': [{'to': 'B_id'}],
+            'robot_02': [],
+        }
+        assert collection.find.call_args == call(
+            {'robot_id': {'$in': ['robot_01', 'robot_02', 'robot_03']}},
+            {'_id': False, 'robot_id': True, 'remaining_waypoints_list': True})
+
+    @pytest.mark.parametrize('robot_ids', [
+        None, 'robot_01', [1], ('robot_01', None),
+    ])
+    def test_get_all_exception(self, RouteStore, mocked_mongo, robot_ids):
+        with pytest.raises(TypeError):
+            RouteStore.get_all(robot_ids)
+
+
+class TestRouteStorePeek:
+
+    @pytest.mark.parametrize('record, expected', [
+        ({'remaining_waypoints_list': [{'to': 'B_id'}], 'route_cursor': 0}, ({'to': 'B_id'}, 0)),
+        ({'remaining_waypoints_list': [{'to': 'D_id'}], 'route_cursor': 2}, ({'to': 'D_id'}, 2)),
+        (None, None),
+    ])
+    def test_peek(self, RouteStore, mocked_mongo, record, expected):
+        _, collection = mocked_mongo
+        collection.find_one.return_value = record
+
+        assert RouteStore.peek('robot_01') == expected
+        assert collection.find_one.call_args == call(
+            {'robot_id': 'robot_01', 'remaining_waypoints_list.0': {'$exists': True}},
+            {'_id': False, 'remaining_waypoints_list': {'$slice': 1}, 'route_cursor': True})
+        assert collection.update_one.call_count == 0
+
+    @pytest.mark.parametrize('robot_id', [
+        None, 1, [], {},
+    ])
+    def test_peek_exception(self, RouteStore, mocked_mongo, robot_id):
+        with pytest.raises(TypeError):
+            RouteStore.peek(robot_id)
+
+
+class TestRouteStorePop:
+
+    @freezegun.freeze_time('2020-01-02T03:04:05')
+    @pytest.mark.parametrize('modified_count, expected', [
+        (1, True),
+        (0, False),
+    ])
+    def test_pop(self, RouteStore, mocked_mongo, modified_count, expected):
+        _, collection = mocked_mongo
+        collection.update_one.return_value.modified_count = modified_count
+
+        assert RouteStore.pop('robot_01', 2) is expected
+        assert collection.update_one.call_args == call(
+            {'robot_id': 'robot_01', 'route_cursor': 2, 'remaining_waypoints_list.0': {'$exists': True}},
+            {
+                '$pop': {'remaining_waypoints_list': -1},
+                '$inc': {'route_cursor': 1},
+                '$set': {'updated_at': datetime.datetime(2020, 1, 2, 3, 4, 5)},
+            })
+
+    @pytest.mark.parametrize('robot_id, route_cursor', [
+        (None, 0), (1, 0), ([], 0), ({}, 0), ('robot_01', None), ('robot_01', '0'), ('robot_01', 1.0), ('robot_01', True),
+    ])
+    def test_pop_exception(self, RouteStore, mocked_mongo, robot_id, route_cursor):
+        with pytest.raises(TypeError):
+            RouteStore.pop(robot_id, route_cursor)
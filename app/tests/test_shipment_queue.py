@@ -0,0 +1,192 @@
+import datetime
+import importlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import call
+
+import pytest
+import freezegun
+import lazy_import
+shipment_queue = lazy_import.lazy_module('src.shipment_queue')
+const = lazy_import.lazy_module('src.const')
+
+
+@pytest.fixture
+def ShipmentQueue():
+    yield shipment_queue.ShipmentQueue
+    importlib.reload(shipment_queue)
+
+
+@pytest.fixture
+def mocked_mongo(mocker):
+    shipment_queue.MongoClient = mocker.MagicMock()
+    collection = mocker.MagicMock()
+    shipment_queue.MongoClient.return_value = {
+        const.MONGODB_DB_NAME: {
+            const.MONGODB_SHIPMENT_QUEUE_COLLECTION_NAME: collection
+        }
+    }
+    yield shipment_queue.MongoClient, collection
+
+
+class TestShipmentQueueGetMongoCollection:
+
+    def test_get_collection(self, ShipmentQueue, mocked_mongo):
+        MongoClient, collection = mocked_mongo
+
+        c1 = ShipmentQueue._get_mongo_collection()
+        c2 = ShipmentQueue._get_mongo_collection()
+
+        assert id(collection) == id(c1)
+        assert id(collection) == id(c2)
+        assert MongoClient.call_count == 1
+        assert MongoClient.call_args == call(const.MONGODB_HOST, int(const.MONGODB_PORT), replicaset=const.MONGODB_REPLICASET)
+        assert collection.create_index.call_args_list == [
+            call([('ticket_id', 1)], unique=True),
+            call([('status', 1), ('created_at', 1)]),
+        ]
+
+    def test_get_collection_concurrently(self, ShipmentQueue, mocked_mongo):
+        MongoClient, collection = mocked_mongo
+        collection.create_index.side_effect = lambda *args, **kwargs: time.sleep(0.01)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = [f.result() for f in [executor.submit(ShipmentQueue._get_mongo_collection) for _ in range(4)]]
+
+        assert all(id(collection) == id(c) for c in results)
+        assert MongoClient.call_count == 1
+        assert collection.create_index.call_count == 2
+
+
+class TestShipmentQueueEnqueue:
+
+    @freezegun.freeze_time('2020-01-02T03:04:05')
+    def test_enqueue(self, mocker, ShipmentQueue, mocked_mongo):
+        _, collection = mocked_mongo
+        mocker.patch.object(shipment_queue.uuid, 'uuid4').return_value.hex = 'ticket_01'
+        shipment_list = {'destination': {'name': 'dest'}, 'updated': []}
+
+        ticket_id = ShipmentQueue.enqueue(shipment_list)
+
+        assert ticket_id == 'ticket_01'
+        assert collection.insert_one.call_count == 1
+        assert collection.insert_one.call_args == call({
+            'ticket_id': 'ticket_01',
+            'status': 'queued',
+            'shipment_list': shipment_list,
+            'created_at': datetime.datetime(2020, 1, 2, 3, 4, 5),
+            'updated_at': datetime.datetime(2020, 1, 2, 3, 4, 5),
+        })
+
+    @pytest.mark.parametrize('shipment_list', [
+        None, 1, 'a', [], tuple(),
+    ])
+    def test_enqueue_exception(self, ShipmentQueue, mocked_mongo, shipment_list):
+        _, collection = mocked_mongo
+
+        with pytest.raises(TypeError):
+            ShipmentQueue.enqueue(shipment_list)
+
+        assert collection.insert_one.call_count == 0
+
+
+class TestShipmentQueueGet:
+
+    @pytest.mark.parametrize('result', [
+        {'ticket_id': 'ticket_01', 'status': 'queued'}, None,
+    ])
+    def test_get(self, ShipmentQueue, mocked_mongo, result):
+        _, collection = mocked_mongo
+        collection.find_one.return_value = result
+
+        assert ShipmentQueue.get('ticket_01') == result
+        assert collection.find_one.call_args == call({'ticket_id': 'ticket_01'}, {'_id': False})
+
+    @pytest.mark.parametrize('ticket_id', [
+        None, 1, True, {}, [],
+    ])
+    def test_get_exception(self, ShipmentQueue, mocked_mongo, ticket_id):
+        with pytest.raises(TypeError):
+            ShipmentQueue.get(ticket_id)
+
+
+class TestShipmentQueueAcquire:
+
+    @freezegun.freeze_time('2020-01-02T03:04:05')
+    @pytest.mark.parametrize('result', [
+        {'ticket_id': 'ticket_01', 'status': 'dispatching'}, None,
+    ])
+    def test_acquire(self, ShipmentQueue, mocked_mongo, result):
+        _, collection = mocked_mongo
+        collection.find_one_and_update.return_value = result
+
+        assert ShipmentQueue.acquire() == result
+        assert collection.find_one_and_update.call_count == 1
+        assert collection.find_one_and_update.call_args == call(
+            {
+                'status': 'queued',
+            },
+            {
+                '$set': {
+                    'status': 'dispatching',
+                    'updated_at': datetime.datetime(2020, 1, 2, 3, 4, 5),
+                }
+            },
+            sort=[('created_at', 1)],
+            projection={'_id': False},
+            return_document=shipment_queue.ReturnDocument.AFTER,
+        )
+
+
+class TestShipmentQueueRequeue:
+
+    @freezegun.freeze_time('2020-01-02T03:04:05')
+    @pytest.mark.parametrize('modified_count', [0, 2])
+    def test_requeue(self, ShipmentQueue, mocked_mongo, modified_count):
+        _, collection = mocked_mongo
+        collection.update_many.return_value.modified_count = modified_count
+
+        assert ShipmentQueue.requeue(60) == modified_count
+        assert collection.update_many.call_count == 1
+        assert collection.update_many.call_args == call(
+            {
+                'status': 'dispatching',
+                'updated_at': {'$lt': datetime.datetime(2020, 1, 2, 3, 3, 5)},
+            },
+            {
+                '$set': {
+                    'status': 'queued',
+                    'updated_at': datetime.datetime(2020, 1, 2, 3, 4, 5),
+                }
+            }
+        )
+
+
+class TestShipmentQueueUpdate:
+
+    @freezegun.freeze_time('2020-01-02T03:04:05')
+    @pytest.mark.parametrize('method, args, expected', [
+        ('release', [], {'status': 'queued'}),
+        ('complete', [{'result': 'success', 'delivery_robot': {'id': 'robot_01'}}],
+         {'status': 'dispatched', 'result': {'result': 'success', 'delivery_robot': {'id': 'robot_01'}}}),
+        ('complete', [{'result': 'ignore', 'message': 'no available waypoints_list'}],
+         {'status': 'ignored', 'result': {'result': 'ignore', 'message': 'no available waypoints_list'}}),
+        ('fail', ['dummy'], {'status': 'failed', 'result': {'message': 'dummy'}}),
+    ])
+    def test_update(self, ShipmentQueue, mocked_mongo, method, args, expected):
+        _, collection = mocked_mongo
+
+        getattr(ShipmentQueue, method)('ticket_01', *args)
+
+        assert collection.update_one.call_count == 1
+        assert collection.update_one.call_args == call(
+            {
+                'ticket_id': 'ticket_01',
+            },
+            {
+                '$set': {
+                    'updated_at': datetime.datetime(2020, 1, 2, 3, 4, 5),
+                    **expected,
+                }
+            }
+        )
@@ -1,6 +1,8 @@
 import datetime as dt
 
 import importlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import call
 
 import pytest
@@ -141,15 +143,9 @@ class TestGetLock:
     ])
     def test_isnot_locked(self, mocked_token, loi, w, robot_id):
         mocked_entity = {
-            'is_locked': {
-                'value': False,
-            },
-            'lock_owner_id': {
-                'value': loi,
-            },
-            'waitings': {
-                'value': w,
-            },
+            'is_locked': False,
+            'lock_owner_id': loi,
+            'waitings': w,
         }
         mocked_token.orion.get_entity.return_value = mocked_entity
 
@@ -172,7 +168,8 @@ class TestGetLock:
 
         assert mocked_token.orion.get_entity.call_count == 1
         assert mocked_token.orion.get_entity.call_args == call(
-            const.FIWARE_SERVICE, const.TOKEN_SERVICEPATH, const.TOKEN_TYPE, tkn_str)
+            const.FIWARE_SERVICE, const.TOKEN_SERVICEPATH, const.TOKEN_TYPE, tkn_str,
+            attrs=['is_locked', 'lock_owner_id', 'waitings'], key_values=True)
 
         assert mocked_token.orion.make_token_info_command.call_count == 1
         assert mocked_token.orion.make_token_info_command.call_args == call(True, robot_id, [])
@@ -197,15 +194,9 @@ class TestGetLock:
     ])
     def test_is_locked(self, mocked_token, loi, poi, w, robot_id, update_waitings):
         mocked_entity = {
-            'is_locked': {
-                'value': True,
-            },
-            'lock_owner_id': {
-                'value': loi,
-            },
-            'waitings': {
-                'value': w,
-            },
+            'is_locked': True,
+            'lock_owner_id': loi,
+            'waitings': w,
         }
         mocked_token.orion.get_entity.return_value = mocked_entity
 
@@ -231,7 +222,8 @@ class TestGetLock:
 
             assert mocked_token.orion.get_entity.call_count == 1
             assert mocked_token.orion.get_entity.call_args == call(
-                const.FIWARE_SERVICE, const.TOKEN_SERVICEPATH, const.TOKEN_TYPE, tkn_str)
+                const.FIWARE_SERVICE, const.TOKEN_SERVICEPATH, const.TOKEN_TYPE, tkn_str,
+                attrs=['is_locked', 'lock_owner_id', 'waitings'], key_values=True)
 
             assert mocked_token.orion.make_token_info_command.call_count == 1
             assert mocked_token.orion.make_token_info_command.call_args == call(True, loi, w + [robot_id])
@@ -245,7 +237,8 @@ class TestGetLock:
             assert token.waitings == w
             assert mocked_token.orion.get_entity.call_count == 1
             assert mocked_token.orion.get_entity.call_args == call(
-                const.FIWARE_SERVICE, const.TOKEN_SERVICEPATH, const.TOKEN_TYPE, tkn_str)
+                const.FIWARE_SERVICE, const.TOKEN_SERVICEPATH, const.TOKEN_TYPE, tkn_str,
+                attrs=['is_locked', 'lock_owner_id', 'waitings'], key_values=True)
 
             assert mocked_token.orion.make_token_info_command.call_count == 0
 
@@ -262,15 +255,9 @@ class TestReleaseLock:
     ])
     def test_not_waitings(self, mocked_token, is_locked, loi):
         mocked_entity = {
-            'is_locked': {
-                'value': is_locked,
-            },
-            'lock_owner_id': {
-                'value': loi,
-            },
-            'waitings': {
-                'value': [],
-            },
+            'is_locked': is_locked,
+            'lock_owner_id': loi,
+            'waitings': [],
         }
         mocked_token.orion.get_entity.return_value = mocked_entity
 
@@ -294,7 +281,8 @@ class TestReleaseLock:
 
         assert mocked_token.orion.get_entity.call_count == 1
         assert mocked_token.orion.get_entity.call_args == call(
-            const.FIWARE_SERVICE, const.TOKEN_SERVICEPATH, const.TOKEN_TYPE, tkn_str)
+            const.FIWARE_SERVICE, const.TOKEN_SERVICEPATH, const.TOKEN_TYPE, tkn_str,
+            attrs=['is_locked', 'lock_owner_id', 'waitings'], key_values=True)
 
         assert mocked_token.orion.make_token_info_command.call_count == 1
         assert mocked_token.orion.make_token_info_command.call_args == call(False, '', [])
@@ -315,15 +303,9 @@ class TestReleaseLock:
     ])
     def test_waitings(self, mocked_token, is_locked, loi, w, no, nw):
         mocked_entity = {
-            'is_locked': {
-                'value': is_locked,
-            },
-            'lock_owner_id': {
-                'value': loi,
-            },
-            'waitings': {
-                'value': w,
-            },
+            'is_locked': is_locked,
+            'lock_owner_id': loi,
+            'waitings': w,
         }
         mocked_token.orion.get_entity.return_value = mocked_entity
 
@@ -347,7 +329,8 @@ class TestReleaseLock:
 
         assert mocked_token.orion.get_entity.call_count == 1
         assert mocked_token.orion.get_entity.call_args == call(
-            const.FIWARE_SERVICE, const.TOKEN_SERVICEPATH, const.TOKEN_TYPE, tkn_str)
+            const.FIWARE_SERVICE, const.TOKEN_SERVICEPATH, const.TOKEN_TYPE, tkn_str,
+            attrs=['is_locked', 'lock_owner_id', 'waitings'], key_values=True)
 
         assert mocked_token.orion.make_token_info_command.call_count == 1
         assert mocked_token.orion.make_token_info_command.call_args == call(True, no, nw)
@@ -355,3 +338,59 @@ class TestReleaseLock:
         assert mocked_token.orion.send_command.call_count == 1
         assert mocked_token.orion.send_command.call_args == call(
             const.FIWARE_SERVICE, const.TOKEN_SERVICEPATH, const.TOKEN_TYPE, tkn_str, mocked_payload)
+
+
+class TestConcurrency:
+
+    @pytest.fixture
+    def shared_entity(self, mocked_token):
+        entity = {'is_locked': False, 'lock_owner_id': '', 'waitings': []}
+
+        def get_entity(*args, **kwargs):
+            result = dict(entity)
+            time.sleep(0.01)
+            return result
+
+        def send_command(service, servicepath, entity_type, entity_id, payload):
+            entity.update(payload)
+
+        mocked_token.orion.get_entity.side_effect = get_entity
+        mocked_token.orion.send_command.side_effect = send_command
+        mocked_token.orion.make_token_info_command.side_effect = lambda is_locked, lock_owner_id, waitings: {
+            'is_locked': is_locked,
+            'lock_owner_id': lock_owner_id,
+            'waitings': waitings,
+        }
+        yield entity
+
+    def test_get_lock(self, mocked_token, shared_entity):
+        token = mocked_token.Token('token_a')
+        robot_ids = [f'robot_{i:02d}' for i in range(4)]
+
+        with ThreadPoolExecutor(max_workers=len(robot_ids)) as executor:
+            results = list(executor.map(token.get_lock, robot_ids))
+
+        assert sorted(results) == [False, False, False, True]
+        owner_id = robot_ids[results.index(True)]
+        assert shared_entity['lock_owner_id'] == owner_id
+        assert sorted(shared_entity['waitings']) == sorted(set(robot_ids) - {owner_id})
+
+    def test_hold(self, mocked_token, shared_entity):
+        token = mocked_token.Token('token_a')
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            with token:
+                future = executor.submit(token.get_lock, 'robot_01')
+                time.sleep(0.05)
+                assert not future.done()
+                assert mocked_token.orion.get_entity.call_count == 0
+            assert future.result() is True
+
+    def test_reentrant(self, mocked_token, shared_entity):
+        token = mocked_token.Token('token_a')
+
+        with token:
+            assert token.get_lock('robot_01') is True
+            assert token.release_lock('robot_01') is None
+
+        assert shared_entity == {'is_locked': False, 'lock_owner_id': '', 'waitings': []}
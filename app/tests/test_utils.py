@@ -1,6 +1,6 @@
 import datetime
 
-from src.utils import flatten, is_jsonable
+from src.utils import flatten, iter_flatten, is_jsonable
 
 import pytest
 
@@ -48,6 +48,52 @@ class TestFlatten:
         with pytest.raises(expected):
             flatten(target)
 
+    def test_deep_nesting(self):
+        target = [0]
+        for i in range(1, 10000):
+            target = [target, i]
+        assert flatten(target) == list(range(10000))
+
+    @pytest.mark.parametrize('target, expected', [
+        ((x for x in []), []),
+        ((x for x in [1, [2, (3, 4)], 'ab']), [1, 2, 3, 4, 'ab']),
+        ([(r['from'], r['via'], r['to']) for r in [{'from': 'A', 'via': ['B', 'C'], 'to': 'D'}]], ['A', 'B', 'C', 'D']),
+        ([iter([1, iter([2])]), 3], [1, 2, 3]),
+    ])
+    def test_iterable(self, target, expected):
+        assert flatten(target) == expected
+
+
+class TestIterFlatten:
+
+    def test_lazy(self):
+        consumed = []
+
+        def gen():
+            for i in range(3):
+                consumed.append(i)
+                yield [i]
+
+        it = iter_flatten(gen())
+        assert consumed == []
+        assert next(it) == 0
+        assert consumed == [0]
+        assert list(it) == [1, 2]
+
+    @pytest.mark.parametrize('target, expected', [
+        ([['A_id', ['B_id', 'A_id']], 'C_id'], {'A_id', 'B_id', 'C_id'}),
+        ([], set()),
+    ])
+    def test_set(self, target, expected):
+        assert set(iter_flatten(target)) == expected
+
+    @pytest.mark.parametrize('target', [
+        None, 1, True,
+    ])
+    def test_exception(self, target):
+        with pytest.raises(TypeError):
+            iter_flatten(target)
+
 
 class TestIsJsonable:
 
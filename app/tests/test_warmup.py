@@ -0,0 +1,163 @@
+from unittest.mock import call
+
+import pytest
+import lazy_import
+
+const = lazy_import.lazy_module('src.const')
+warmup = lazy_import.lazy_module('src.warmup')
+waypoint = lazy_import.lazy_module('src.waypoint')
+
+
+@pytest.fixture
+def mocked_warmup(mocker):
+    mocker.patch.object(warmup, 'orion')
+    mocker.patch.object(waypoint, 'orion')
+    mocker.patch.object(warmup, 'RobotCache')
+    mocker.patch.object(waypoint, 'RobotCache')
+    mocker.patch.object(warmup, 'uwsgi')
+    mocker.patch.object(warmup, '_refreshed_place_version', None)
+    waypoint.RobotCache.get_place_version.return_value = 0
+    warmup.RobotCache.get_place_version.return_value = 0
+    waypoint.Waypoint._compiled.clear()
+    waypoint.PlaceIndex.clear()
+
+    def iter_entities(fs, fsp, t, **kwargs):
+        if t == const.PLACE_TYPE:
+            return iter([
+                {'id': 'S_id', 'pose': {'point': {'x': 0.0, 'y': 0.0, 'z': 0.0}, 'angle': 'aS'}},
+                {'id': 'A_id', 'pose': {'point': {'x': 3.0, 'y': 4.0, 'z': 0.0}, 'angle': 'aA'}},
+            ])
+        elif t == const.ROUTE_PLAN_TYPE:
+            return iter([{
+                'id': 'plan_01',
+                'source': 'S_id',
+                'routes': [{'from': 'S_id', 'via': [], 'to': 'A_id', 'destination': 'A_id', 'action': {}}],
+            }])
+        return iter([])
+    warmup.orion.iter_entities.side_effect = iter_entities
+    waypoint.orion.iter_entities.side_effect = iter_entities
+    warmup.RobotCache.get_all.return_value = {'robot_01': {}, 'robot_02': {}}
+    yield warmup
+    waypoint.Waypoint._compiled.clear()
+    waypoint.PlaceIndex.clear()
+
+
+class TestRun:
+
+    def test_run(self, mocked_warmup):
+        assert mocked_warmup.run() == {'places': 2, 'route_plans': 1, 'robots': 2}
+
+        assert waypoint.PlaceIndex.get(['S_id', 'A_id']) == {
+            'S_id': {'point': {'x': 0.0, 'y': 0.0, 'z': 0.0}, 'angle': 'aS'},
+            'A_id': {'point': {'x': 3.0, 'y': 4.0, 'z': 0.0}, 'angle': 'aA'},
+        }
+        assert mocked_warmup.RobotCache.get_all.call_args == call(['robot_01', 'robot_02'])
+        assert mocked_warmup.orion.iter_entities.call_args_list == [
+            call(const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.ROUTE_PLAN_TYPE,
+                 attrs=['routes', 'source'], key_values=True, prefetch=True),
+        ]
+        assert waypoint.orion.iter_entities.call_args_list == [
+            call(const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE,
+                 attrs=['pose'], key_values=True, prefetch=True),
+        ]
+
+    def test_compiled_route_plan(self, mocked_warmup):
+        mocked_warmup.run()
+        waypoint.orion.iter_entities.reset_mock()
+
+        compiled = waypoint.Waypoint().compile_route_plans({'robot_01': {
+            'id': 'plan_01',
+            'source': 'S_id',
+            'routes': [{'from': 'S_id', 'via': [], 'to': 'A_id', 'destination': 'A_id', 'action': {}}],
+        }})
+        assert compiled['robot_01']['metrics']['distance'] == 5.0
+        assert waypoint.orion.iter_entities.call_count == 0
+
+    def test_stage_error(self, mocked_warmup):
+        waypoint.orion.iter_entities.side_effect = Exception('orion is down')
+        mocked_warmup.RobotCache.get_all.side_effect = Exception('orion is down')
+
+        assert mocked_warmup.run() == {'places': None, 'route_plans': None, 'robots': None}
+        assert waypoint.PlaceIndex.get(['S_id']) is None
+
+
+class TestPrefork:
+
+    @pytest.mark.parametrize('refresh_sec, timer_count', [
+        (600, 1), (0, 0),
+    ])
+    def test_prefork(self, mocker, mocked_warmup, refresh_sec, timer_count):
+        mocker.patch.object(const, 'WARMUP_REFRESH_SEC', refresh_sec)
+
+        assert mocked_warmup.prefork() == {'places': 2, 'route_plans': 1, 'robots': 2}
+        assert mocked_warmup.uwsgi.register_signal.call_args_list == [
+            call(const.WARMUP_SIGNAL, 'workers', mocked_warmup._refresh),
+            call(const.WARMUP_PLACES_SIGNAL, 'workers', mocked_warmup._refresh_places),
+        ]
+        assert [c[1]['prefetch'] for c in mocked_warmup.orion.iter_entities.call_args_list] == [False]
+        assert [c[1]['prefetch'] for c in waypoint.orion.iter_entities.call_args_list] == [False]
+        assert mocked_warmup.uwsgi.post_fork_hook == mocked_warmup._postfork
+        assert mocked_warmup.uwsgi.add_timer.call_count == timer_count
+        if timer_count:
+            assert mocked_warmup.uwsgi.add_timer.call_args == call(const.WARMUP_SIGNAL, refresh_sec)
+
+    def test_disabled(self, mocker, mocked_warmup):
+        mocker.patch.object(const, 'WARMUP_ENABLED', False)
+
+        assert mocked_warmup.prefork() is None
+        assert mocked_warmup.uwsgi.post_fork_hook == mocked_warmup._postfork
+        assert mocked_warmup.uwsgi.register_signal.call_count == 0
+        assert mocked_warmup.uwsgi.add_timer.call_count == 0
+        assert mocked_warmup.orion.iter_entities.call_count == 0
+        assert waypoint.orion.iter_entities.call_count == 0
+        assert mocked_warmup.RobotCache.get_all.call_count == 0
+        assert mocked_warmup.request_refresh() is False
+        assert mocked_warmup.uwsgi.signal.call_count == 0
+
+    def test_postfork(self, mocked_warmup):
+        mocked_warmup._postfork()
+
+        assert mocked_warmup.orion.warm_emergency_session.call_count == 1
+        assert mocked_warmup.orion.iter_entities.call_count == 0
+
+    def test_without_uwsgi(self, mocker, mocked_warmup):
+        mocker.patch.object(warmup, 'uwsgi', None)
+
+        assert mocked_warmup.prefork() is None
+        assert mocked_warmup.request_refresh() is False
+        assert waypoint.orion.iter_entities.call_count == 0
+
+    def test_refresh(self, mocked_warmup):
+        mocked_warmup._refresh(const.WARMUP_SIGNAL)
+
+        assert waypoint.PlaceIndex.get(['A_id']) is not None
+        assert mocked_warmup.RobotCache.get_all.call_count == 1
+
+    def test_request_refresh(self, mocked_warmup):
+        mocked_warmup.RobotCache.set_flag.side_effect = [True, False]
+
+        assert mocked_warmup.request_refresh() is True
+        assert mocked_warmup.request_refresh() is False
+        assert mocked_warmup.RobotCache.set_flag.call_args == call(mocked_warmup.REFRESH_PLACES_FLAG,
+                                                                   mocked_warmup.REFRESH_PLACES_PENDING_SEC)
+        assert mocked_warmup.uwsgi.signal.call_args_list == [call(const.WARMUP_PLACES_SIGNAL)]
+
+    def test_refresh_places(self, mocked_warmup):
+        mocked_warmup.prefork()
+        waypoint.orion.iter_entities.reset_mock()
+        mocked_warmup.orion.iter_entities.reset_mock()
+        mocked_warmup.RobotCache.get_all.reset_mock()
+
+        mocked_warmup._refresh_places(const.WARMUP_PLACES_SIGNAL)
+        assert mocked_warmup.RobotCache.clear_flag.call_args == call(mocked_warmup.REFRESH_PLACES_FLAG)
+        assert waypoint.orion.iter_entities.call_count == 0
+
+        mocked_warmup.RobotCache.get_place_version.return_value = 1
+        waypoint.RobotCache.get_place_version.return_value = 1
+        for _ in range(3):
+            mocked_warmup._refresh_places(const.WARMUP_PLACES_SIGNAL)
+        assert mocked_warmup.RobotCache.clear_flag.call_count == 4
+        assert waypoint.orion.iter_entities.call_count == 1
+        assert mocked_warmup.orion.iter_entities.call_count == 1
+        assert mocked_warmup.RobotCache.get_all.call_count == 0
+        assert waypoint.PlaceIndex.get(['A_id']) is not None
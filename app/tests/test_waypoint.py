@@ -1,23 +1,32 @@
 import datetime as dt
+import json
+import sys
 
 from unittest.mock import call
 
 import pytest
+import freezegun
 import lazy_import
 
+from werkzeug.exceptions import BadRequest
+
 const = lazy_import.lazy_module('src.const')
 waypoint = lazy_import.lazy_module('src.waypoint')
+waypoint_array = lazy_import.lazy_module('src.waypoint_array')
 
 
 @pytest.fixture
 def mocked_waypoint(mocker):
     waypoint.orion = mocker.MagicMock()
+    waypoint.Waypoint._compiled.clear()
+    waypoint.PlaceIndex.clear()
     yield waypoint
+    waypoint.PlaceIndex.clear()
 
 
 class TestEstimateRoute:
     def return_value_of_query_entity(self, result_places, result_routes, result_source, qc):
-        def _result(fs, fsp, t, q):
+        def _result(fs, fsp, t, q, attrs=None, key_values=False):
             if t == const.PLACE_TYPE:
                 nonlocal qc
                 v = result_places[qc]
@@ -25,27 +34,23 @@ class TestEstimateRoute:
                 return v
             else:
                 return {
-                    'routes': {
-                        'value': result_routes,
-                    },
-                    'source': {
-                        'value': result_source,
-                    },
+                    'routes': result_routes,
+                    'source': result_source,
                 }
         return _result
 
     def return_value_of_get_entities(self):
         return [
-            {'id': 'dest_id', 'pose': {'value': {'point': 'pdest', 'angle': 'adest'}}},
-            {'id': 'A_id', 'pose': {'value': {'point': 'pA', 'angle': 'aA'}}},
-            {'id': 'B_id', 'pose': {'value': {'point': 'pB', 'angle': 'aB'}}},
-            {'id': 'C_id', 'pose': {'value': {'point': 'pC', 'angle': 'aC'}}},
-            {'id': 'D_id', 'pose': {'value': {'point': 'pD', 'angle': 'aD'}}},
-            {'id': 'E_id', 'pose': {'value': {'point': 'pE', 'angle': 'aE'}}},
-            {'id': 'F_id', 'pose': {'value': {'point': 'pF', 'angle': 'aF'}}},
-            {'id': 'G_id', 'pose': {'value': {'point': 'pG', 'angle': 'aG'}}},
-            {'id': 'H_id', 'pose': {'value': {'point': 'pH', 'angle': 'aH'}}},
-            {'id': 'Z_id', 'pose': {'value': {'point': 'pZ', 'angle': 'aZ'}}},
+            {'id': 'dest_id', 'pose': {'point': 'pdest', 'angle': 'adest'}},
+            {'id': 'A_id', 'pose': {'point': 'pA', 'angle': 'aA'}},
+            {'id': 'B_id', 'pose': {'point': 'pB', 'angle': 'aB'}},
+            {'id': 'C_id', 'pose': {'point': 'pC', 'angle': 'aC'}},
+            {'id': 'D_id', 'pose': {'point': 'pD', 'angle': 'aD'}},
+            {'id': 'E_id', 'pose': {'point': 'pE', 'angle': 'aE'}},
+            {'id': 'F_id', 'pose': {'point': 'pF', 'angle': 'aF'}},
+            {'id': 'G_id', 'pose': {'point': 'pG', 'angle': 'aG'}},
+            {'id': 'H_id', 'pose': {'point': 'pH', 'angle': 'aH'}},
+            {'id': 'Z_id', 'pose': {'point': 'pZ', 'angle': 'aZ'}},
         ]
 
     @pytest.mark.parametrize('updated', [
@@ -71,7 +76,7 @@ class TestEstimateRoute:
                                                                                            result_routes,
                                                                                            result_source,
                                                                                            0)
-        mocked_waypoint.orion.get_entities.return_value = self.return_value_of_get_entities()
+        mocked_waypoint.orion.iter_entities.return_value = iter(self.return_value_of_get_entities())
         routes, waypoints_list, order = mocked_waypoint.Waypoint().estimate_routes(shipment_list, robot_id)
 
         assert routes == result_routes
@@ -87,15 +92,19 @@ class TestEstimateRoute:
 
         assert mocked_waypoint.orion.query_entity.call_count == 3
         assert mocked_waypoint.orion.query_entity.call_args_list[0] == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_dest')
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_dest',
+            attrs=['name'], key_values=True)
         assert mocked_waypoint.orion.query_entity.call_args_list[1] == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_A')
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_A',
+            attrs=['name'], key_values=True)
         assert mocked_waypoint.orion.query_entity.call_args_list[2] == call(
             const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.ROUTE_PLAN_TYPE,
-            'destination==dest_id;via==A_id;robot_id==robot_01')
-        assert mocked_waypoint.orion.get_entities.call_count == 1
-        assert mocked_waypoint.orion.get_entities.call_args == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE)
+            'destination==dest_id;via==A_id;robot_id==robot_01',
+            attrs=['routes', 'source'], key_values=True)
+        assert mocked_waypoint.orion.iter_entities.call_count == 1
+        assert mocked_waypoint.orion.iter_entities.call_args == call(
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE,
+            attrs=['pose'], key_values=True, prefetch=True)
 
     @pytest.mark.parametrize('updated', [
         [{'place': 'place_A'}], [{'place': 'place_A'}, {'place': 'place_A'}],
@@ -128,7 +137,7 @@ class TestEstimateRoute:
                                                                                            result_routes,
                                                                                            result_source,
                                                                                            0)
-        mocked_waypoint.orion.get_entities.return_value = self.return_value_of_get_entities()
+        mocked_waypoint.orion.iter_entities.return_value = iter(self.return_value_of_get_entities())
         routes, waypoints_list, order = mocked_waypoint.Waypoint().estimate_routes(shipment_list, robot_id)
 
         assert routes == result_routes
@@ -156,15 +165,19 @@ class TestEstimateRoute:
 
         assert mocked_waypoint.orion.query_entity.call_count == 3
         assert mocked_waypoint.orion.query_entity.call_args_list[0] == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_dest')
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_dest',
+            attrs=['name'], key_values=True)
         assert mocked_waypoint.orion.query_entity.call_args_list[1] == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_A')
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_A',
+            attrs=['name'], key_values=True)
         assert mocked_waypoint.orion.query_entity.call_args_list[2] == call(
             const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.ROUTE_PLAN_TYPE,
-            'destination==dest_id;via==A_id;robot_id==robot_01')
-        assert mocked_waypoint.orion.get_entities.call_count == 1
-        assert mocked_waypoint.orion.get_entities.call_args == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE)
+            'destination==dest_id;via==A_id;robot_id==robot_01',
+            attrs=['routes', 'source'], key_values=True)
+        assert mocked_waypoint.orion.iter_entities.call_count == 1
+        assert mocked_waypoint.orion.iter_entities.call_args == call(
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE,
+            attrs=['pose'], key_values=True, prefetch=True)
 
     @pytest.mark.parametrize('updated', [
         [{'place': 'place_A'}, {'place': 'place_B'}], [{'place': 'place_A'}, {'place': 'place_B'}, {'place': 'place_A'}],
@@ -189,7 +202,7 @@ class TestEstimateRoute:
                                                                                            result_routes,
                                                                                            result_source,
                                                                                            0)
-        mocked_waypoint.orion.get_entities.return_value = self.return_value_of_get_entities()
+        mocked_waypoint.orion.iter_entities.return_value = iter(self.return_value_of_get_entities())
         routes, waypoints_list, order = mocked_waypoint.Waypoint().estimate_routes(shipment_list, robot_id)
 
         assert routes == result_routes
@@ -205,17 +218,22 @@ class TestEstimateRoute:
 
         assert mocked_waypoint.orion.query_entity.call_count == 4
         assert mocked_waypoint.orion.query_entity.call_args_list[0] == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_dest')
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_dest',
+            attrs=['name'], key_values=True)
         assert mocked_waypoint.orion.query_entity.call_args_list[1] == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_A')
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_A',
+            attrs=['name'], key_values=True)
         assert mocked_waypoint.orion.query_entity.call_args_list[2] == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_B')
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_B',
+            attrs=['name'], key_values=True)
         assert mocked_waypoint.orion.query_entity.call_args_list[3] == call(
             const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.ROUTE_PLAN_TYPE,
-            'destination==dest_id;via==A_id|B_id;robot_id==robot_01')
-        assert mocked_waypoint.orion.get_entities.call_count == 1
-        assert mocked_waypoint.orion.get_entities.call_args == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE)
+            'destination==dest_id;via==A_id|B_id;robot_id==robot_01',
+            attrs=['routes', 'source'], key_values=True)
+        assert mocked_waypoint.orion.iter_entities.call_count == 1
+        assert mocked_waypoint.orion.iter_entities.call_args == call(
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE,
+            attrs=['pose'], key_values=True, prefetch=True)
 
     @pytest.mark.parametrize('updated', [
         [{'place': 'place_A'}, {'place': 'place_B'}], [{'place': 'place_A'}, {'place': 'place_B'}, {'place': 'place_A'}],
@@ -248,7 +266,7 @@ class TestEstimateRoute:
                                                                                            result_routes,
                                                                                            result_source,
                                                                                            0)
-        mocked_waypoint.orion.get_entities.return_value = self.return_value_of_get_entities()
+        mocked_waypoint.orion.iter_entities.return_value = iter(self.return_value_of_get_entities())
         routes, waypoints_list, order = mocked_waypoint.Waypoint().estimate_routes(shipment_list, robot_id)
 
         assert routes == result_routes
@@ -276,17 +294,22 @@ class TestEstimateRoute:
 
         assert mocked_waypoint.orion.query_entity.call_count == 4
         assert mocked_waypoint.orion.query_entity.call_args_list[0] == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_dest')
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_dest',
+            attrs=['name'], key_values=True)
         assert mocked_waypoint.orion.query_entity.call_args_list[1] == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_A')
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_A',
+            attrs=['name'], key_values=True)
         assert mocked_waypoint.orion.query_entity.call_args_list[2] == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_B')
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_B',
+            attrs=['name'], key_values=True)
         assert mocked_waypoint.orion.query_entity.call_args_list[3] == call(
             const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.ROUTE_PLAN_TYPE,
-            'destination==dest_id;via==A_id|B_id;robot_id==robot_01')
-        assert mocked_waypoint.orion.get_entities.call_count == 1
-        assert mocked_waypoint.orion.get_entities.call_args == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE)
+            'destination==dest_id;via==A_id|B_id;robot_id==robot_01',
+            attrs=['routes', 'source'], key_values=True)
+        assert mocked_waypoint.orion.iter_entities.call_count == 1
+        assert mocked_waypoint.orion.iter_entities.call_args == call(
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE,
+            attrs=['pose'], key_values=True, prefetch=True)
 
     @pytest.mark.parametrize('updated', [
         [],
@@ -311,7 +334,7 @@ class TestEstimateRoute:
                                                                                            result_routes,
                                                                                            result_source,
                                                                                            0)
-        mocked_waypoint.orion.get_entities.return_value = self.return_value_of_get_entities()
+        mocked_waypoint.orion.iter_entities.return_value = iter(self.return_value_of_get_entities())
         routes, waypoints_list, order = mocked_waypoint.Waypoint().estimate_routes(shipment_list, robot_id)
 
         assert routes == result_routes
@@ -327,13 +350,16 @@ class TestEstimateRoute:
 
         assert mocked_waypoint.orion.query_entity.call_count == 2
         assert mocked_waypoint.orion.query_entity.call_args_list[0] == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_dest')
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_dest',
+            attrs=['name'], key_values=True)
         assert mocked_waypoint.orion.query_entity.call_args_list[1] == call(
             const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.ROUTE_PLAN_TYPE,
-            'destination==dest_id;via==;robot_id==robot_01')
-        assert mocked_waypoint.orion.get_entities.call_count == 1
-        assert mocked_waypoint.orion.get_entities.call_args == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE)
+            'destination==dest_id;via==;robot_id==robot_01',
+            attrs=['routes', 'source'], key_values=True)
+        assert mocked_waypoint.orion.iter_entities.call_count == 1
+        assert mocked_waypoint.orion.iter_entities.call_args == call(
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE,
+            attrs=['pose'], key_values=True, prefetch=True)
 
     @pytest.mark.parametrize('updated', [
         [{'place': 'place_A'}], [{'place': 'place_A'}, {'place': 'place_A'}],
@@ -357,7 +383,7 @@ class TestEstimateRoute:
                                                                                            result_routes,
                                                                                            result_source,
                                                                                            0)
-        mocked_waypoint.orion.get_entities.return_value = self.return_value_of_get_entities()
+        mocked_waypoint.orion.iter_entities.return_value = iter(self.return_value_of_get_entities())
         routes, waypoints_list, order = mocked_waypoint.Waypoint().estimate_routes(shipment_list, robot_id)
 
         assert routes == result_routes
@@ -366,15 +392,19 @@ class TestEstimateRoute:
 
         assert mocked_waypoint.orion.query_entity.call_count == 3
         assert mocked_waypoint.orion.query_entity.call_args_list[0] == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_dest')
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_dest',
+            attrs=['name'], key_values=True)
         assert mocked_waypoint.orion.query_entity.call_args_list[1] == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_A')
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE, 'name==place_A',
+            attrs=['name'], key_values=True)
         assert mocked_waypoint.orion.query_entity.call_args_list[2] == call(
             const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.ROUTE_PLAN_TYPE,
-            'destination==dest_id;via==A_id;robot_id==robot_01')
-        assert mocked_waypoint.orion.get_entities.call_count == 1
-        assert mocked_waypoint.orion.get_entities.call_args == call(
-            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE)
+            'destination==dest_id;via==A_id;robot_id==robot_01',
+            attrs=['routes', 'source'], key_values=True)
+        assert mocked_waypoint.orion.iter_entities.call_count == 1
+        assert mocked_waypoint.orion.iter_entities.call_args == call(
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE,
+            attrs=['pose'], key_values=True, prefetch=True)
 
     @pytest.mark.parametrize('shipment_list, msg', [
         ({'destination': {'name': 0}, 'updated': [{'place': 'dummy'}]}, 'invalid shipment_list'),
@@ -446,14 +476,14 @@ class TestEstimateRoute:
                                                                                            result_routes,
                                                                                            result_source,
                                                                                            0)
-        mocked_waypoint.orion.get_entities.return_value = self.return_value_of_get_entities()
+        mocked_waypoint.orion.iter_entities.return_value = iter(self.return_value_of_get_entities())
         with pytest.raises(TypeError) as e:
             mocked_waypoint.Waypoint().estimate_routes(shipment_list, robot_id)
 
         assert str(e.value) == msg
 
         assert mocked_waypoint.orion.query_entity.call_count == 0
-        assert mocked_waypoint.orion.get_entities.call_count == 0
+        assert mocked_waypoint.orion.iter_entities.call_count == 0
 
     @pytest.mark.parametrize('robot_id, msg', [
         (0, 'invalid robot_id'),
@@ -484,11 +514,328 @@ class TestEstimateRoute:
                                                                                            result_routes,
                                                                                            result_source,
                                                                                            0)
-        mocked_waypoint.orion.get_entities.return_value = self.return_value_of_get_entities()
+        mocked_waypoint.orion.iter_entities.return_value = iter(self.return_value_of_get_entities())
         with pytest.raises(TypeError) as e:
             mocked_waypoint.Waypoint().estimate_routes(shipment_list, robot_id)
 
         assert str(e.value) == msg
 
         assert mocked_waypoint.orion.query_entity.call_count == 0
-        assert mocked_waypoint.orion.get_entities.call_count == 0
+        assert mocked_waypoint.orion.iter_entities.call_count == 0
+
+
+class TestEstimateBestRoutes:
+    def return_value_of_query_entity(self, places):
+        def _result(fs, fsp, t, q, attrs=None, key_values=False):
+            return {'id': places[q.split('==')[1]]}
+        return _result
+
+    def return_value_of_iter_entities(self, route_plans):
+        def _result(fs, fsp, t, query=None, attrs=None, key_values=False, **kwargs):
+            if t == const.ROUTE_PLAN_TYPE:
+                return iter(route_plans)
+            return iter([
+                {'id': 'S_id', 'pose': {'point': {'x': 0.0, 'y': 0.0, 'z': 0.0}, 'angle': 'aS'}},
+                {'id': 'A_id', 'pose': {'point': {'x': 3.0, 'y': 4.0, 'z': 0.0}, 'angle': 'aA'}},
+                {'id': 'B_id', 'pose': {'point': {'x': 30.0, 'y': 40.0, 'z': 0.0}, 'angle': 'aB'}},
+                {'id': 'dest_id', 'pose': {'point': {'x': 3.0, 'y': 0.0, 'z': 0.0}, 'angle': 'adest'}},
+            ])
+        return _result
+
+    def make_route_plan(self, robot_id, from_id):
+        return {
+            'id': f'plan_{robot_id}',
+            'robot_id': robot_id,
+            'source': from_id,
+            'routes': [{'from': from_id, 'via': [], 'to': 'A_id', 'destination': 'dest_id', 'action': {}}],
+        }
+
+    @pytest.mark.parametrize('robot_ids, from_ids, expected', [
+        (['robot_01', 'robot_02'], ['B_id', 'S_id'], 'robot_02'),
+        (['robot_01', 'robot_02'], ['S_id', 'B_id'], 'robot_01'),
+        (['robot_01', 'robot_02'], ['S_id', 'S_id'], 'robot_01'),
+        (['robot_02', 'robot_01'], ['S_id', 'S_id'], 'robot_02'),
+        (['robot_01', 'robot_02', 'robot_03'], ['B_id', None, 'S_id'], 'robot_03'),
+    ])
+    def test_shortest_route(self, mocked_waypoint, robot_ids, from_ids, expected):
+        shipment_list = {
+            'destination': {
+                'name': 'place_dest',
+            },
+            'updated': [{'place': 'place_A'}],
+        }
+        route_plans = [self.make_route_plan(r, f) for r, f in zip(robot_ids, from_ids) if f is not None]
+
+        mocked_waypoint.orion.query_entity.side_effect = self.return_value_of_query_entity({
+            'place_dest': 'dest_id',
+            'place_A': 'A_id',
+        })
+        mocked_waypoint.orion.iter_entities.side_effect = self.return_value_of_iter_entities(route_plans)
+
+        robot_id, routes, waypoints_list, order = mocked_waypoint.Waypoint().estimate_best_routes(shipment_list, robot_ids)
+
+        assert robot_id == expected
+        assert routes == [p for p in route_plans if p['robot_id'] == expected][0]['routes']
+        distance = 5.0 if routes[0]['from'] == 'S_id' else 45.0
+        assert order == {
+            'source': routes[0]['from'],
+            'via': ['A_id'],
+            'destination': 'dest_id',
+            'metrics': {
+                'distance': distance,
+                'eta_sec': distance / const.ROBOT_SPEED_MPS,
+                'routes': [{'to': 'A_id', 'distance': distance, 'eta_sec': distance / const.ROBOT_SPEED_MPS}],
+            },
+        }
+        assert len(waypoints_list) == 1
+
+        assert mocked_waypoint.orion.iter_entities.call_count == 2
+        assert mocked_waypoint.orion.iter_entities.call_args_list[0] == call(
+            const.FIWARE_SERVICE,
+            const.DELIVERY_ROBOT_SERVICEPATH,
+            const.ROUTE_PLAN_TYPE,
+            query=f'destination==dest_id;via==A_id;robot_id=={",".join(robot_ids)}',
+            attrs=['robot_id', 'routes', 'source'],
+            key_values=True)
+
+    def test_no_route_plan(self, mocked_waypoint):
+        shipment_list = {
+            'destination': {
+                'name': 'place_dest',
+            },
+            'updated': [{'place': 'place_A'}],
+        }
+        mocked_waypoint.orion.query_entity.side_effect = self.return_value_of_query_entity({
+            'place_dest': 'dest_id',
+            'place_A': 'A_id',
+        })
+        mocked_waypoint.orion.iter_entities.side_effect = self.return_value_of_iter_entities([])
+
+        with pytest.raises(BadRequest):
+            mocked_waypoint.Waypoint().estimate_best_routes(shipment_list, ['robot_01', 'robot_02'])
+
+        assert mocked_waypoint.orion.iter_entities.call_count == 1
+
+    @pytest.mark.parametrize('robot_ids', [
+        [], 'robot_01', ['robot_01', 1], None,
+    ])
+    def test_invalid_robot_ids(self, mocked_waypoint, robot_ids):
+        shipment_list = {
+            'destination': {
+                'name': 'place_dest',
+            },
+            'updated': [{'place': 'place_A'}],
+        }
+        with pytest.raises(TypeError) as e:
+            mocked_waypoint.Waypoint().estimate_best_routes(shipment_list, robot_ids)
+
+        assert str(e.value) == 'invalid robot_id'
+        assert mocked_waypoint.orion.query_entity.call_count == 0
+        assert mocked_waypoint.orion.iter_entities.call_count == 0
+
+
+class TestMeasureRoutes:
+
+    @pytest.mark.parametrize('routes, expected', [
+        ([{'from': 'S_id', 'via': ['A_id'], 'to': 'S_id'}], 10.0),
+        ([], 0.0),
+    ])
+    def test_success(self, mocked_waypoint, routes, expected):
+        places = {
+            'S_id': {'point': {'x': 0.0, 'y': 0.0, 'z': 0.0}},
+            'A_id': {'point': {'x': 3.0, 'y': 4.0, 'z': 0.0}},
+        }
+        assert mocked_waypoint.Waypoint().measure_routes(routes, places)['distance'] == expected
+
+    @pytest.mark.parametrize('routes', [
+        [{'from': 'S_id', 'via': [], 'to': 'X_id'}],
+        [{'from': 'S_id', 'via': [], 'to': 'Y_id'}],
+    ])
+    def test_invalid(self, mocked_waypoint, routes):
+        places = {
+            'S_id': {'point': {'x': 0.0, 'y': 0.0, 'z': 0.0}},
+            'X_id': {'point': None},
+        }
+        assert mocked_waypoint.Waypoint().measure_routes(routes, places) is None
+
+
+class TestCompileRoutePlans:
+
+    @pytest.fixture
+    def places(self, mocked_waypoint, mocker):
+        mocker.patch.object(mocked_waypoint, 'RobotCache')
+        mocked_waypoint.RobotCache.get_place_version.return_value = 0
+        mocked_waypoint.orion.iter_entities.side_effect = lambda *args, **kwargs: iter([
+            {'id': 'S_id', 'pose': {'point': {'x': 0.0, 'y': 0.0, 'z': 0.0}, 'angle': 'aS'}},
+            {'id': 'A_id', 'pose': {'point': {'x': 3.0, 'y': 4.0, 'z': 0.0}, 'angle': 'aA'}},
+            {'id': 'B_id', 'pose': {'point': {'x': 3.0, 'y': 0.0, 'z': 0.0}, 'angle': 'aB'}},
+        ])
+        yield mocked_waypoint
+
+    def make_route_plan(self, plan_id, to='A_id'):
+        route_plan = {
+            'source': 'S_id',
+            'routes': [{'from': 'S_id', 'via': ['B_id'], 'to': to, 'destination': to, 'action': {}}],
+        }
+        if plan_id is not None:
+            route_plan['id'] = plan_id
+        return route_plan
+
+    def test_cache_hit(self, places):
+        compiled1 = places.Waypoint().compile_route_plans({'robot_01': self.make_route_plan('plan_01')})
+        compiled2 = places.Waypoint().compile_route_plans({'robot_01': self.make_route_plan('plan_01')})
+
+        assert compiled1 == compiled2
+        assert compiled1['robot_01']['waypoints_list'] == [{
+            'to': 'A_id',
+            'destination': 'A_id',
+            'action': {},
+            'waypoints': [
+                {'point': {'x': 3.0, 'y': 0.0, 'z': 0.0}, 'angle': None},
+                {'point': {'x': 3.0, 'y': 4.0, 'z': 0.0}, 'angle': 'aA'},
+            ],
+        }]
+        assert compiled1['robot_01']['metrics']['distance'] == 7.0
+        assert places.orion.iter_entities.call_count == 1
+
+    def test_partial_hit(self, places):
+        places.Waypoint().compile_route_plans({'robot_01': self.make_route_plan('plan_01')})
+        compiled = places.Waypoint().compile_route_plans({
+            'robot_01': self.make_route_plan('plan_01'),
+            'robot_02': self.make_route_plan('plan_02', to='S_id'),
+        })
+
+        assert compiled['robot_02']['metrics']['distance'] == 6.0
+        assert places.orion.iter_entities.call_count == 2
+        assert places.Waypoint().compile_route_plans({
+            'robot_01': self.make_route_plan('plan_01'),
+            'robot_02': self.make_route_plan('plan_02', to='S_id'),
+        }) == compiled
+        assert places.orion.iter_entities.call_count == 2
+
+    def test_place_version_changed(self, places):
+        places.Waypoint().compile_route_plans({'robot_01': self.make_route_plan('plan_01')})
+        places.RobotCache.get_place_version.return_value = 1
+        places.Waypoint().compile_route_plans({'robot_01': self.make_route_plan('plan_01')})
+
+        assert places.orion.iter_entities.call_count == 2
+
+    def test_routes_changed(self, places):
+        places.Waypoint().compile_route_plans({'robot_01': self.make_route_plan('plan_01')})
+        compiled = places.Waypoint().compile_route_plans({'robot_01': self.make_route_plan('plan_01', to='S_id')})
+
+        assert compiled['robot_01']['waypoints_list'][0]['to'] == 'S_id'
+        assert places.orion.iter_entities.call_count == 2
+
+    def test_no_id(self, places):
+        places.Waypoint().compile_route_plans({'robot_01': self.make_route_plan(None)})
+        places.Waypoint().compile_route_plans({'robot_01': self.make_route_plan(None)})
+
+        assert places.orion.iter_entities.call_count == 2
+
+    def test_expired(self, places, mocker):
+        mocker.patch.object(places.const, 'WAYPOINT_CACHE_TTL_SEC', 10)
+        with freezegun.freeze_time('2020-01-02T03:04:05') as frozen:
+            places.Waypoint().compile_route_plans({'robot_01': self.make_route_plan('plan_01')})
+            frozen.tick(9)
+            places.Waypoint().compile_route_plans({'robot_01': self.make_route_plan('plan_01')})
+            assert places.orion.iter_entities.call_count == 1
+            frozen.tick(1)
+            places.Waypoint().compile_route_plans({'robot_01': self.make_route_plan('plan_01')})
+            assert places.orion.iter_entities.call_count == 2
+
+    def test_refuge_waypoints(self, places):
+        waiting_route = {'via': ['B_id'], 'to': 'A_id'}
+
+        waypoints = places.Waypoint().get_refuge_waypoints(waiting_route)
+        assert waypoints == [
+            {'point': {'x': 3.0, 'y': 0.0, 'z': 0.0}, 'angle': None},
+            {'point': {'x': 3.0, 'y': 4.0, 'z': 0.0}, 'angle': 'aA'},
+        ]
+        assert places.Waypoint().get_refuge_waypoints({'to': 'A_id', 'via': ['B_id']}) == waypoints
+        assert places.orion.iter_entities.call_count == 1
+
+        places.Waypoint().get_refuge_waypoints({'via': [], 'to': 'A_id'})
+        assert places.orion.iter_entities.call_count == 2
+        places.RobotCache.get_place_version.return_value = 1
+        places.Waypoint().get_refuge_waypoints(waiting_route)
+        assert places.orion.iter_entities.call_count == 3
+
+    def test_packed_waypoints(self, places):
+        places.orion.iter_entities.side_effect = lambda *args, **kwargs: iter([
+            {'id': 'S_id', 'pose': {'point': {'x': 0.0, 'y': 0.0, 'z': 0.0}, 'angle': {'roll': 0.0, 'pitch': 0.0, 'yaw': 0.0}}},
+            {'id': 'A_id', 'pose': {'point': {'x': 3.0, 'y': 4.0, 'z': 0.0}, 'angle': {'roll': 0.0, 'pitch': 0.0, 'yaw': 1.5}}},
+            {'id': 'B_id', 'pose': {'point': {'x': 3.0, 'y': 0.0, 'z': 0.0}, 'angle': {'roll': 0.0, 'pitch': 0.0, 'yaw': 3.0}}},
+        ])
+        expected = [
+            {'point': {'x': 3.0, 'y': 0.0, 'z': 0.0}, 'angle': None},
+            {'point': {'x': 3.0, 'y': 4.0, 'z': 0.0}, 'angle': {'roll': 0.0, 'pitch': 0.0, 'yaw': 1.5}},
+        ]
+
+        compiled = places.Waypoint().compile_route_plans({'robot_01': self.make_route_plan('plan_01')})
+        waypoints = compiled['robot_01']['waypoints_list'][0]['waypoints']
+        assert isinstance(waypoints, waypoint_array.WaypointArray)
+        assert waypoints == expected
+        assert compiled['robot_01']['routes'][0]['via'][0] is sys.intern('B_id')
+
+        refuge_waypoints = places.Waypoint().get_refuge_waypoints({'via': ['B_id'], 'to': 'A_id'})
+        assert isinstance(refuge_waypoints, list)
+        assert refuge_waypoints == expected
+        assert json.dumps(places.Waypoint().get_refuge_waypoints({'via': ['B_id'], 'to': 'A_id'})) == json.dumps(expected)
+
+
+class TestGetPlaces:
+
+    @pytest.mark.parametrize('place_id_list, expected', [
+        ([['A_id', 'B_id']], {'A_id': 'pose_A', 'B_id': 'pose_B'}),
+        ([['A_id'], ['A_id', ['C_id']]], {'A_id': 'pose_A', 'C_id': 'pose_C'}),
+        ([], {}),
+    ])
+    def test_success(self, mocked_waypoint, place_id_list, expected):
+        mocked_waypoint.orion.iter_entities.return_value = iter([
+            {'id': 'A_id', 'pose': 'pose_A'},
+            {'id': 'B_id', 'pose': 'pose_B'},
+            {'id': 'C_id', 'pose': 'pose_C'},
+        ])
+
+        assert mocked_waypoint.Waypoint().get_places(place_id_list) == expected
+        assert mocked_waypoint.orion.iter_entities.call_count == 1
+        assert mocked_waypoint.orion.iter_entities.call_args == call(
+            const.FIWARE_SERVICE, const.DELIVERY_ROBOT_SERVICEPATH, const.PLACE_TYPE,
+            attrs=['pose'], key_values=True, prefetch=True)
+
+    def test_unknown_place(self, mocked_waypoint):
+        mocked_waypoint.orion.iter_entities.return_value = iter([
+            {'id': 'A_id', 'pose': 'pose_A'},
+        ])
+
+        with pytest.raises(KeyError):
+            mocked_waypoint.Waypoint().get_places([['A_id', 'Z_id']])
+
+    @pytest.mark.parametrize('place_id_list, version, expected, call_count', [
+        ([['A_id', 'B_id']], 0, {'A_id': 'pose_A', 'B_id': 'pose_B'}, 1),
+        ([['A_id', 'C_id']], 0, {'A_id': 'pose_A', 'C_id': 'pose_C'}, 2),
+        ([['A_id', 'B_id']], 1, {'A_id': 'pose_A', 'B_id': 'pose_B'}, 2),
+    ])
+    def test_place_index(self, mocker, mocked_waypoint, place_id_list, version, expected, call_count):
+        mocker.patch.object(mocked_waypoint, 'RobotCache')
+        mocked_waypoint.RobotCache.get_place_version.return_value = 0
+        mocked_waypoint.orion.iter_entities.side_effect = [
+            iter([{'id': 'A_id', 'pose': 'pose_A'}, {'id': 'B_id', 'pose': 'pose_B'}]),
+            iter([{'id': 'A_id', 'pose': 'pose_A'}, {'id': 'B_id', 'pose': 'pose_B'}, {'id': 'C_id', 'pose': 'pose_C'}]),
+        ]
+        assert mocked_waypoint.PlaceIndex.load() == 2
+
+        mocked_waypoint.RobotCache.get_place_version.return_value = version
+        assert mocked_waypoint.Waypoint().get_places(place_id_list) == expected
+        assert mocked_waypoint.orion.iter_entities.call_count == call_count
+
+    def test_place_index_expired(self, mocker, mocked_waypoint):
+        mocker.patch.object(mocked_waypoint.const, 'WAYPOINT_CACHE_TTL_SEC', 10)
+        mocked_waypoint.orion.iter_entities.return_value = iter([{'id': 'A_id', 'pose': 'pose_A'}])
+        with freezegun.freeze_time('2020-01-02T03:04:05') as frozen:
+            mocked_waypoint.PlaceIndex.load()
+            frozen.tick(9)
+            assert mocked_waypoint.PlaceIndex.get(['A_id']) == {'A_id': 'pose_A'}
+            frozen.tick(1)
+            assert mocked_waypoint.PlaceIndex.get(['A_id']) is None
@@ -0,0 +1,120 @@
+import json
+import sys
+
+import pytest
+import lazy_import
+
+waypoint_array = lazy_import.lazy_module('src.waypoint_array')
+
+
+def make_waypoints(num):
+    return [{
+        'point': {'x': i * 0.25, 'y': -i * 0.5, 'z': 0.0},
+        'angle': {'roll': 0.0, 'pitch': 0.0, 'yaw': i * 0.1} if i % 2 else None,
+    } for i in range(num)]
+
+
+class TestWaypointArray:
+
+    @pytest.mark.parametrize('num', [0, 1, 10])
+    def test_pack(self, num):
+        waypoints = make_waypoints(num)
+        packed = waypoint_array.WaypointArray.pack(waypoints)
+
+        assert isinstance(packed, waypoint_array.WaypointArray)
+        assert len(packed) == num
+        assert packed == waypoints
+        assert packed.to_list() == waypoints
+        assert list(packed) == waypoints
+        assert json.dumps(packed.to_list()) == json.dumps(waypoints)
+
+    def test_pack_int(self):
+        waypoints = [
+            {'point': {'x': 1, 'y': 2.5, 'z': 0}, 'angle': {'roll': 0, 'pitch': 0.0, 'yaw': -3}},
+            {'point': {'x': 1.0, 'y': 2, 'z': 0.0}, 'angle': None},
+        ]
+        packed = waypoint_array.WaypointArray.pack(waypoints)
+
+        assert packed.to_list() == waypoints
+        assert json.dumps(packed.to_list()) == json.dumps(waypoints)
+        assert [type(v) for v in packed[0]['point'].values()] == [int, float, int]
+        assert [type(v) for v in packed[0]['angle'].values()] == [int, float, int]
+        assert [type(v) for v in packed[1]['point'].values()] == [float, int, float]
+
+    @pytest.mark.parametrize('waypoints', [
+        [{'point': {'x': 1.0, 'y': 2.0, 'z': 3.0}, 'angle': 'a'}],
+        [{'point': 'p', 'angle': None}],
+        [{'point': {'x': 1.0, 'y': 2.0}, 'angle': None}],
+        [{'point': {'x': 1.0, 'y': 2.0, 'z': '3'}, 'angle': None}],
+        [{'point': {'x': 1.0, 'y': 2.0, 'z': True}, 'angle': None}],
+        [{'point': {'x': 1.0, 'y': 2.0, 'z': 2 ** 53 + 1}, 'angle': None}],
+        [{'point': {'x': 1.0, 'y': 2.0, 'z': 3.0, 'w': 4.0}, 'angle': None}],
+        [{'point': {'x': 1.0, 'y': 2.0, 'z': 3.0}, 'angle': {'roll': 0.0, 'pitch': 0.0}}],
+        [{'point': {'x': 1.0, 'y': 2.0, 'z': 3.0}, 'angle': None, 'extra': 1}],
+        [{'point': {'x': 1.0, 'y': 2.0, 'z': 3.0}}],
+        ['w'],
+    ])
+    def test_pack_not_packable(self, waypoints):
+        assert waypoint_array.WaypointArray.pack(waypoints) is None
+
+    def test_getitem(self):
+        waypoints = make_waypoints(5)
+        packed = waypoint_array.WaypointArray.pack(waypoints)
+
+        assert packed[1] == waypoints[1]
+        assert packed[-1] == waypoints[-1]
+        assert packed[1:] == waypoints[1:]
+        assert packed[::2] == waypoints[::2]
+        with pytest.raises(IndexError):
+            packed[5]
+
+    def test_eq(self):
+        packed = waypoint_array.WaypointArray.pack(make_waypoints(3))
+
+        assert packed == waypoint_array.WaypointArray.pack(make_waypoints(3))
+        assert packed != waypoint_array.WaypointArray.pack(make_waypoints(2))
+        assert packed != make_waypoints(2)
+        assert packed != 'waypoints'
+
+    def test_size(self):
+        waypoints = make_waypoints(1000)
+        packed = waypoint_array.WaypointArray.pack(waypoints)
+
+        nbytes = sum(sys.getsizeof(getattr(packed, name)) for name in packed.__slots__) + sys.getsizeof(packed)
+        assert nbytes < sum(sys.getsizeof(w) + sys.getsizeof(w['point']) for w in waypoints)
+
+
+class TestToList:
+
+    def test_packed(self):
+        waypoints = make_waypoints(3)
+
+        assert waypoint_array.to_list(waypoint_array.WaypointArray.pack(waypoints)) == waypoints
+
+    def test_list(self):
+        waypoints = [{'point': 'p', 'angle': 'a'}]
+        result = waypoint_array.to_list(waypoints)
+
+        assert result == waypoints
+        assert result is not waypoints
+
+
+class TestInternRoute:
+
+    def test_intern(self):
+        route = {
+            'from': ''.join(['S', '_id']),
+            'via': [''.join(['A', '_id'])],
+            'to': ''.join(['B', '_id']),
+            'destination': ''.join(['B', '_id']),
+            'action': {},
+        }
+        interned = waypoint_array.intern_route(route)
+
+        assert interned == route
+        assert interned['from'] is sys.intern('S_id')
+        assert interned['via'][0] is sys.intern('A_id')
+        assert interned['to'] is interned['destination']
+
+    def test_no_via(self):
+        assert waypoint_array.intern_route({'from': 'S_id', 'to': 1}) == {'from': 'S_id', 'to': 1}